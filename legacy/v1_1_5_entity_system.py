@@ -20,6 +20,13 @@ import math
 from datetime import datetime, timedelta
 from pathlib import Path
 
+# v1.7.0: 编译态学习实体匹配器(按文件签名缓存,学习时增量更新)
+try:
+    from entity_matcher import get_entity_matcher, learned_file_signature, note_learned
+    ENTITY_MATCHER_ENABLED = True
+except ImportError:
+    ENTITY_MATCHER_ENABLED = False
+
 # ============================================================
 # 配置
 # ============================================================
@@ -113,6 +120,9 @@ def extract_entities_layer1(content):
 
 def extract_entities_layer2(content, memory_dir):
     """Layer 2: 学习过的实体识别（0 Token）"""
+    if ENTITY_MATCHER_ENABLED:
+        return list(set(get_entity_matcher(memory_dir).find_all(content, ignore_case=True)))
+
     entities = []
     learned = load_learned_entities(memory_dir)
     
@@ -314,7 +324,9 @@ def learn_new_entities(new_entities, memory_dir):
     2. 尝试归纳模式
     """
     config = ENTITY_SYSTEM_CONFIG["learning"]
+    previous_signature = learned_file_signature(memory_dir) if ENTITY_MATCHER_ENABLED else None
     learned = load_learned_entities(memory_dir)
+    added_exact, added_patterns = [], []
     
     for entity in new_entities:
         # 避免重复
@@ -327,6 +339,7 @@ def learn_new_entities(new_entities, memory_dir):
         
         # 添加到精确列表
         learned["exact"].append(entity)
+        added_exact.append(entity)
         
         # 初始化访问统计
         learned["access_stats"][entity] = {
@@ -340,8 +353,12 @@ def learn_new_entities(new_entities, memory_dir):
             pattern = try_generalize_pattern(entity, learned["exact"])
             if pattern and pattern not in learned["patterns"]:
                 learned["patterns"].append(pattern)
+                added_patterns.append(pattern)
     
     save_learned_entities(memory_dir, learned)
+    
+    if ENTITY_MATCHER_ENABLED:
+        note_learned(memory_dir, previous_signature, added_exact, added_patterns)
 
 def update_entity_access(entity, memory_dir):
     """更新实体访问统计"""
@@ -13,6 +13,7 @@ Memory System v1.1.7 - LLM 深度集成模块
 import os
 import re
 import json
+import time
 from typing import Optional, Dict, Any, Tuple, List
 
 # ============================================================
@@ -202,6 +203,55 @@ def get_api_key(config_dict: Optional[Dict] = None, param_key: Optional[str] = N
 # LLM 调用封装
 # ============================================================
 
+# v1.7.0: 响应缓存提供者(由 memory.py 注入,返回带 get/put 的缓存对象或 None)
+RESPONSE_CACHE_PROVIDER = None
+
+# v1.7.0: 共享 HTTP 传输提供者(由 memory.py 注入,返回 llm_transport.LLMTransport);
+# 未注入时回退到 requests
+TRANSPORT_PROVIDER = None
+
+# v1.7.0: 熔断器提供者(由 memory.py 注入,返回 circuit_breaker.CircuitBreaker 或 None);
+# 熔断中直接回退,超时按熔断器的自适应超时计算
+CIRCUIT_BREAKER_PROVIDER = None
+
+
+def _post_chat_completion(base_url: str, key: str, model: str, messages, max_tokens: int, timeout: float) -> Tuple[int, Dict, str]:
+    """
+    发送 /chat/completions 请求,返回 (状态码, 响应 JSON, 错误信息)
+    """
+    if TRANSPORT_PROVIDER is not None:
+        from llm_transport import LLMTimeoutError, LLMTransportError
+
+        try:
+            result = TRANSPORT_PROVIDER().chat_completion(
+                base_url, key, model, messages, max_tokens=max_tokens, temperature=0.3, timeout=timeout
+            )
+        except LLMTimeoutError:
+            return 0, {}, "Request timeout"
+        except LLMTransportError as e:
+            return 0, {}, f"Request error: {str(e)}"
+        if "error" in result:
+            return 0, {}, str(result["error"])[:120]
+        return 200, result, ""
+
+    import requests
+
+    try:
+        response = requests.post(
+            f"{base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
+            json={"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": 0.3},
+            timeout=timeout,
+        )
+    except requests.exceptions.Timeout:
+        return 0, {}, "Request timeout"
+    except requests.exceptions.RequestException as e:
+        return 0, {}, f"Request error: {str(e)}"
+    if response.status_code != 200:
+        return response.status_code, {}, f"HTTP {response.status_code}: {response.text[:100]}"
+    return 200, response.json(), ""
+
+
 def call_llm_with_fallback(
     prompt: str,
     system_prompt: str,
@@ -248,54 +298,57 @@ def call_llm_with_fallback(
     model = os.environ.get("MEMORY_LLM_MODEL", api_config["default_model"])
     timeout = LLM_INTEGRATION_CONFIG["fallback"]["timeout_seconds"]
     
+    # v1.7.0: 相同请求直接取缓存
+    cache = RESPONSE_CACHE_PROVIDER() if RESPONSE_CACHE_PROVIDER else None
+    if cache is not None:
+        cached = cache.get(model, system_prompt, prompt, max_tokens)
+        if cached is not None:
+            stats["llm_success"] = True
+            stats["cache_hit"] = True
+            return cached, "llm", stats
+    
+    breaker = CIRCUIT_BREAKER_PROVIDER() if CIRCUIT_BREAKER_PROVIDER else None
+    if breaker is not None:
+        if not breaker.allow():
+            stats["llm_error"] = "Circuit open"
+            stats["fallback_used"] = True
+            stats["short_circuited"] = True
+            return fallback_result, "rule_fallback", stats
+        timeout = min(timeout, breaker.timeout_for(max_tokens))
+    
     stats["llm_called"] = True
     
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    
+    started = time.monotonic()
     try:
-        import requests
-        
-        headers = {
-            "Authorization": f"Bearer {key}",
-            "Content-Type": "application/json"
-        }
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-        
-        data = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": 0.3,
-        }
+        status, result, error = _post_chat_completion(base_url, key, model, messages, max_tokens, timeout)
         
-        response = requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=timeout
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
+        if status == 200:
             content = result["choices"][0]["message"]["content"]
             usage = result.get("usage", {})
+            if breaker is not None:
+                breaker.record_success(max_tokens, time.monotonic() - started)
             
             stats["llm_success"] = True
             stats["tokens_used"] = usage.get("total_tokens", 0)
             
+            if cache is not None:
+                cache.put(model, system_prompt, prompt, max_tokens, content.strip(), stats["tokens_used"])
+            
             return content.strip(), "llm", stats
         else:
-            stats["llm_error"] = f"HTTP {response.status_code}: {response.text[:100]}"
+            stats["llm_error"] = error
             
-    except requests.exceptions.Timeout:
-        stats["llm_error"] = "Request timeout"
-    except requests.exceptions.RequestException as e:
-        stats["llm_error"] = f"Request error: {str(e)}"
     except Exception as e:
         stats["llm_error"] = f"Unexpected error: {str(e)}"
     
+    if breaker is not None:
+        breaker.record_failure(max_tokens, timeout=timeout if stats["llm_error"] == "Request timeout" else None)
+    
     # 回退
     stats["fallback_used"] = True
     return fallback_result, "rule_fallback", stats
@@ -18,6 +18,39 @@ def now_iso():
 # Phase 0: 清理过期记忆
 # ============================================================
 
+def split_expired(memories, now=None):
+    """按 expires_at 拆分为 (有效, 过期) 两组"""
+    now = now or datetime.utcnow()
+    valid = []
+    expired = []
+    
+    for mem in memories:
+        expires_at = mem.get('expires_at')
+        
+        if expires_at:
+            try:
+                expire_time = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+                if expire_time.replace(tzinfo=None) <= now:
+                    expired.append(mem)
+                else:
+                    valid.append(mem)
+            except:
+                valid.append(mem)
+        else:
+            valid.append(mem)
+    
+    return valid, expired
+
+def expired_log_entry(mem):
+    """过期日志条目"""
+    return {
+        "memory_id": mem['id'],
+        "content": mem.get('content', ''),
+        "created_at": mem.get('created', ''),
+        "expires_at": mem.get('expires_at', ''),
+        "expired_at": now_iso()
+    }
+
 def phase0_expire_memories(memory_dir):
     """Phase 0: 清理过期记忆"""
     now = datetime.utcnow()
@@ -37,24 +70,8 @@ def phase0_expire_memories(memory_dir):
                 if line.strip():
                     memories.append(json.loads(line))
         
-        valid = []
-        expired = []
-        
-        for mem in memories:
-            expires_at = mem.get('expires_at')
-            
-            if expires_at:
-                try:
-                    expire_time = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-                    if expire_time.replace(tzinfo=None) <= now:
-                        expired.append(mem)
-                        total_expired += 1
-                    else:
-                        valid.append(mem)
-                except:
-                    valid.append(mem)
-            else:
-                valid.append(mem)
+        valid, expired = split_expired(memories, now)
+        total_expired += len(expired)
         
         # 保存有效记忆
         with open(active_path, 'w', encoding='utf-8') as f:
@@ -65,14 +82,7 @@ def phase0_expire_memories(memory_dir):
         if expired:
             with open(expired_log_path, 'a', encoding='utf-8') as f:
                 for mem in expired:
-                    log_entry = {
-                        "memory_id": mem['id'],
-                        "content": mem.get('content', ''),
-                        "created_at": mem.get('created', ''),
-                        "expires_at": mem.get('expires_at', ''),
-                        "expired_at": now_iso()
-                    }
-                    f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+                    f.write(json.dumps(expired_log_entry(mem), ensure_ascii=False) + '\n')
     
     return total_expired
 
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Archive Store
+归档池分段存储:只追加的压缩段文件 + 段尾索引,归档成本与归档条数成正比
+
+设计要点:
+- 每类记忆一个目录 layer2/archive/{mem_type}/,段文件 {起始序号}-{结束序号}.seg 写入后不再修改
+  (临时文件 + os.replace),按起始序号排列即归档顺序
+- 段文件 = 压缩的 JSONL 正文 + 压缩的 JSON 段尾(id 列表、时间范围、条数、原始字节数)
+  + 定长尾标(正文/段尾长度、魔数、编码);统计与按 id / 时间过滤只读段尾
+- 编码:gzip(默认)或 lzma,均为标准库;段内记录自描述编码,可混用
+- 合并:段数超过 max_segments 时,选原始字节数最小的连续窗口合并成一段
+  ({窗口首序号}-{窗口尾序号}.seg),先写新段再删旧段;中途崩溃留下的被覆盖段在读取时忽略
+- 兼容旧格式:layer2/archive/{mem_type}.jsonl 作为最早的一段读取,合并时转换为段文件并删除
+"""
+
+import gzip
+import json
+import lzma
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+DEFAULT_CODEC = "gzip"
+DEFAULT_MAX_SEGMENTS = 16
+
+SEGMENT_SUFFIX = ".seg"
+_MAGIC = b"MSEG"
+_TRAILER = struct.Struct("<QQ4sB")  # 正文长度, 段尾长度, 魔数, 编码
+_SEGMENT_NAME = re.compile(r"^(\d{8})-(\d{8})\.seg$")
+
+_CODECS = {
+    1: ("gzip", lambda data: gzip.compress(data, compresslevel=6, mtime=0), gzip.decompress),
+    2: ("lzma", lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+_CODEC_IDS = {name: codec_id for codec_id, (name, _, _) in _CODECS.items()}
+
+
+class ArchiveCorruptError(ValueError):
+    """段文件损坏或格式不符"""
+
+
+class Segment(NamedTuple):
+    """段文件元数据(来自段尾)"""
+    path: Path
+    first: int
+    last: int
+    count: int
+    ids: List[str]
+    time_min: Optional[str]
+    time_max: Optional[str]
+    raw_bytes: int
+    stored_bytes: int
+
+
+def _record_time(record: Dict) -> Optional[str]:
+    return record.get("created") or record.get("timestamp")
+
+
+def encode_segment(records: List[Dict], codec: str = DEFAULT_CODEC) -> bytes:
+    """编码一个段文件"""
+    codec_id = _CODEC_IDS.get(codec)
+    if codec_id is None:
+        raise ValueError(f"unknown archive codec: {codec}")
+    _, compress, _ = _CODECS[codec_id]
+    raw = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+    times = [t for t in (_record_time(r) for r in records) if t]
+    footer = {
+        "version": 1,
+        "count": len(records),
+        "ids": [r.get("id") for r in records],
+        "time_min": min(times) if times else None,
+        "time_max": max(times) if times else None,
+        "raw_bytes": len(raw),
+    }
+    body = compress(raw)
+    footer_data = compress(json.dumps(footer, ensure_ascii=False).encode("utf-8"))
+    return body + footer_data + _TRAILER.pack(len(body), len(footer_data), _MAGIC, codec_id)
+
+
+def _read_trailer(f, size: int):
+    if size < _TRAILER.size:
+        raise ArchiveCorruptError("segment too short")
+    f.seek(size - _TRAILER.size)
+    body_len, footer_len, magic, codec_id = _TRAILER.unpack(f.read(_TRAILER.size))
+    if magic != _MAGIC or codec_id not in _CODECS or body_len + footer_len + _TRAILER.size != size:
+        raise ArchiveCorruptError("bad segment trailer")
+    return body_len, footer_len, codec_id
+
+
+class ArchiveStore:
+    """归档池分段存储"""
+
+    def __init__(self, memory_dir, codec: str = DEFAULT_CODEC, max_segments: int = DEFAULT_MAX_SEGMENTS):
+        if codec not in _CODEC_IDS:
+            raise ValueError(f"unknown archive codec: {codec}")
+        self.memory_dir = Path(memory_dir)
+        self.codec = codec
+        self.max_segments = max(1, int(max_segments))
+        self._footers: Dict[Path, tuple] = {}  # 路径 → ((size, mtime_ns), Segment)
+
+    # ================================================================
+    # 路径与段尾
+    # ================================================================
+
+    def segment_dir(self, mem_type: str) -> Path:
+        return self.memory_dir / "layer2/archive" / mem_type
+
+    def legacy_path(self, mem_type: str) -> Path:
+        return self.memory_dir / f"layer2/archive/{mem_type}.jsonl"
+
+    def _footer(self, path: Path, first: int, last: int) -> Segment:
+        st = path.stat()
+        key = (st.st_size, st.st_mtime_ns)
+        cached = self._footers.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        with open(path, "rb") as f:
+            body_len, footer_len, codec_id = _read_trailer(f, st.st_size)
+            f.seek(body_len)
+            try:
+                footer = json.loads(_CODECS[codec_id][2](f.read(footer_len)))
+            except (OSError, EOFError, lzma.LZMAError, ValueError) as e:
+                raise ArchiveCorruptError(f"{path.name}: bad footer ({e})") from e
+        segment = Segment(
+            path, first, last, footer["count"], footer["ids"],
+            footer.get("time_min"), footer.get("time_max"), footer.get("raw_bytes", 0), st.st_size,
+        )
+        self._footers[path] = (key, segment)
+        return segment
+
+    def segments(self, mem_type: str) -> List[Segment]:
+        """按归档顺序排列的段(合并中断遗留、已被覆盖的段不计入)"""
+        directory = self.segment_dir(mem_type)
+        if not directory.is_dir():
+            return []
+        ranges = []
+        for path in directory.iterdir():
+            match = _SEGMENT_NAME.match(path.name)
+            if match:
+                ranges.append((int(match.group(1)), int(match.group(2)), path))
+        # 起始序号升序、跨度降序:被覆盖的段紧跟在覆盖它的段之后
+        ranges.sort(key=lambda item: (item[0], -item[1]))
+        segments = []
+        covered_until = -1
+        for first, last, path in ranges:
+            if last <= covered_until:
+                continue
+            segments.append(self._footer(path, first, last))
+            covered_until = last
+        return segments
+
+    def _next_seq(self, mem_type: str) -> int:
+        segments = self.segments(mem_type)
+        return segments[-1].last + 1 if segments else 1
+
+    def next_segment_path(self, mem_type: str) -> Path:
+        """下一个追加段的路径"""
+        seq = self._next_seq(mem_type)
+        return self.segment_dir(mem_type) / f"{seq:08d}-{seq:08d}{SEGMENT_SUFFIX}"
+
+    # ================================================================
+    # 写入
+    # ================================================================
+
+    def encode(self, records: List[Dict]) -> bytes:
+        return encode_segment(records, self.codec)
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def append(self, mem_type: str, records: List[Dict]) -> Optional[Path]:
+        """追加一段(不读取已有归档),段数超限时合并"""
+        if not records:
+            return None
+        path = self.next_segment_path(mem_type)
+        self._write(path, self.encode(records))
+        self.maybe_merge(mem_type)
+        return path
+
+    def maybe_merge(self, mem_type: str) -> Optional[Dict]:
+        """段数超过 max_segments 时合并"""
+        if len(self.segments(mem_type)) > self.max_segments:
+            return self.merge(mem_type)
+        return None
+
+    def merge(self, mem_type: str, max_segments: Optional[int] = None) -> Dict:
+        """
+        合并到不超过 max_segments 段:选原始字节数最小的连续窗口合并;
+        旧格式 JSONL 先转换为最早的一段
+
+        返回: {"merged": 合并的段数, "segments": 合并后段数}
+        """
+        limit = max(1, max_segments or self.max_segments)
+        self._migrate_legacy(mem_type)
+        segments = self.segments(mem_type)
+        if len(segments) <= limit:
+            return {"merged": 0, "segments": len(segments)}
+
+        width = len(segments) - limit + 1
+        sizes = [s.raw_bytes for s in segments]
+        start = min(range(len(segments) - width + 1), key=lambda i: sum(sizes[i:i + width]))
+        window = segments[start:start + width]
+
+        records = []
+        for segment in window:
+            records.extend(self._read_segment(segment.path))
+        path = self.segment_dir(mem_type) / f"{window[0].first:08d}-{window[-1].last:08d}{SEGMENT_SUFFIX}"
+        self._write(path, self.encode(records))
+        for segment in window:
+            if segment.path != path:
+                segment.path.unlink(missing_ok=True)
+                self._footers.pop(segment.path, None)
+        return {"merged": len(window), "segments": len(segments) - width + 1}
+
+    def _migrate_legacy(self, mem_type: str):
+        """旧格式 layer2/archive/{mem_type}.jsonl → 序号 0 的段"""
+        legacy = self.legacy_path(mem_type)
+        if not legacy.exists():
+            return
+        records = list(self._read_legacy(legacy))
+        segments = self.segments(mem_type)
+        if records:
+            if segments and segments[0].first == 0:
+                # 已有序号 0 的段(旧文件迁移后又被写入):作为新段追加
+                path = self.next_segment_path(mem_type)
+            else:
+                path = self.segment_dir(mem_type) / f"{0:08d}-{0:08d}{SEGMENT_SUFFIX}"
+            self._write(path, self.encode(records))
+        legacy.unlink()
+
+    # ================================================================
+    # 读取
+    # ================================================================
+
+    @staticmethod
+    def _read_legacy(path: Path) -> Iterator[Dict]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    @staticmethod
+    def _read_segment(path: Path) -> List[Dict]:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            body_len, _, codec_id = _read_trailer(f, size)
+            f.seek(0)
+            try:
+                raw = _CODECS[codec_id][2](f.read(body_len))
+            except (OSError, EOFError, lzma.LZMAError) as e:
+                raise ArchiveCorruptError(f"{path.name}: bad body ({e})") from e
+        return [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+
+    def iter_records(
+        self,
+        mem_type: str,
+        ids: Optional[Iterable[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        按归档顺序遍历记录
+
+        ids / since / until 先用段尾过滤段(只解压可能命中的段),再过滤记录;
+        时间按 created(或 timestamp)的 ISO 字符串比较
+        """
+        wanted = set(ids) if ids is not None else None
+
+        def keep(record: Dict) -> bool:
+            if wanted is not None and record.get("id") not in wanted:
+                return False
+            if since is not None or until is not None:
+                t = _record_time(record)
+                if not t or (since is not None and t < since) or (until is not None and t > until):
+                    return False
+            return True
+
+        legacy = self.legacy_path(mem_type)
+        if legacy.exists():
+            for record in self._read_legacy(legacy):
+                if keep(record):
+                    yield record
+
+        for segment in self.segments(mem_type):
+            if wanted is not None and wanted.isdisjoint(segment.ids):
+                continue
+            if since is not None and (segment.time_max is None or segment.time_max < since):
+                continue
+            if until is not None and (segment.time_min is None or segment.time_min > until):
+                continue
+            for record in self._read_segment(segment.path):
+                if keep(record):
+                    yield record
+
+    def load(self, mem_type: str) -> List[Dict]:
+        return list(self.iter_records(mem_type))
+
+    def count(self, mem_type: str) -> int:
+        """归档条数(段只读段尾)"""
+        total = sum(s.count for s in self.segments(mem_type))
+        legacy = self.legacy_path(mem_type)
+        if legacy.exists():
+            with open(legacy, encoding="utf-8") as f:
+                total += sum(1 for line in f if line.strip())
+        return total
+
+    def stats(self, mem_type: str) -> Dict:
+        """段数、条数、原始/存储字节数(旧格式 JSONL 按原始大小计)"""
+        segments = self.segments(mem_type)
+        legacy = self.legacy_path(mem_type)
+        legacy_bytes = legacy.stat().st_size if legacy.exists() else 0
+        return {
+            "segments": len(segments),
+            "records": self.count(mem_type),
+            "raw_bytes": sum(s.raw_bytes for s in segments) + legacy_bytes,
+            "stored_bytes": sum(s.stored_bytes for s in segments) + legacy_bytes,
+        }
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Cache Manager
+多级查询缓存:进程内 LRU(L1) + 可选 SQLite 磁盘缓存(L2,跨进程共享)
+
+设计要点:
+- L1 有界(OrderedDict LRU),超出容量按最久未用淘汰
+- L2 存于 state/query_cache.db,多个 CLI 进程共享,同样有条目上限
+- 失效靠存储代数(generation):任何写入都会递增 state/store_generation,
+  缓存条目记录写入时的代数,读取时代数不一致即视为过期
+- 统计命中/未命中/淘汰/失效次数,L2 启用时累计写入数据库
+"""
+
+import atexit
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_DISK_MAX_ENTRIES = 2000
+DEFAULT_TTL_SECONDS = 1800
+
+GENERATION_FILE = "state/store_generation"
+CACHE_DB_FILE = "state/query_cache.db"
+
+L2_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS query_cache (
+    key TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_query_cache_access ON query_cache(last_access);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_STAT_NAMES = ("l1_hits", "l2_hits", "misses", "sets", "evictions", "invalidations")
+
+
+# ============================================================
+# 存储代数
+# ============================================================
+
+def read_generation(memory_dir) -> int:
+    """读取当前存储代数(文件不存在时为 0)"""
+    try:
+        with open(Path(memory_dir) / GENERATION_FILE, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(memory_dir) -> int:
+    """
+    递增存储代数(每次写入记忆后调用)
+
+    取 max(当前 + 1, 当前纳秒时间):并发进程同时递增时也会得到不同的值,
+    不会出现两次写入共用一个代数导致缓存漏失效。
+    """
+    path = Path(memory_dir) / GENERATION_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    generation = max(read_generation(memory_dir) + 1, time.time_ns())
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, path)
+    return generation
+
+
+# ============================================================
+# 缓存管理器
+# ============================================================
+
+class CacheManager:
+    """查询结果多级缓存"""
+
+    def __init__(
+        self,
+        memory_dir,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        disk: bool = True,
+        disk_max_entries: int = DEFAULT_DISK_MAX_ENTRIES,
+    ):
+        self.memory_dir = Path(memory_dir)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = max(1, int(disk_max_entries))
+
+        self._lock = threading.Lock()
+        self._l1: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats: Dict[str, int] = {name: 0 for name in _STAT_NAMES}
+        self._flushed: Dict[str, int] = {name: 0 for name in _STAT_NAMES}
+
+        self._db_path = self.memory_dir / CACHE_DB_FILE
+        self._conn: Optional[sqlite3.Connection] = None
+        if disk:
+            try:
+                self._db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(self._db_path), timeout=2.0, check_same_thread=False)
+                self._conn.executescript(L2_SCHEMA_SQL)
+                self._conn.commit()
+                atexit.register(self.flush_stats)
+            except sqlite3.Error:
+                self._conn = None  # 降级为仅 L1
+
+    # ================================================================
+    # 代数
+    # ================================================================
+
+    def generation(self) -> int:
+        """
+        当前存储代数
+
+        每次都重新读取代数文件(只有一个整数):不按 mtime 缓存,粗粒度 mtime 的文件系统上
+        同一时间片内的两次递增 mtime 相同,按 mtime 缓存会继续返回旧代数
+        """
+        return read_generation(self.memory_dir)
+
+    def bump_generation(self) -> int:
+        """递增代数,并清空本进程 L1"""
+        generation = bump_generation(self.memory_dir)
+        with self._lock:
+            self._l1.clear()
+        return generation
+
+    # ================================================================
+    # 读写
+    # ================================================================
+
+    def get_query_result(self, key: str) -> Optional[Any]:
+        """读取缓存:L1 → L2,代数不符或超过 TTL 视为失效"""
+        generation = self.generation()
+        now = time.time()
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                entry_gen, created, value = entry
+                if entry_gen == generation and now - created < self.ttl_seconds:
+                    self._l1.move_to_end(key)
+                    self._stats["l1_hits"] += 1
+                    return copy.deepcopy(value)
+                del self._l1[key]
+                self._stats["invalidations"] += 1
+
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT generation, created, value FROM query_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        if row[0] == generation and now - row[1] < self.ttl_seconds:
+                            self._conn.execute(
+                                "UPDATE query_cache SET last_access = ? WHERE key = ?", (now, key)
+                            )
+                            self._conn.commit()
+                            value = json.loads(row[2])
+                            self._put_l1(key, (generation, row[1], value))
+                            self._stats["l2_hits"] += 1
+                            return copy.deepcopy(value)
+                        self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                        self._conn.commit()
+                        self._stats["invalidations"] += 1
+            except (sqlite3.Error, ValueError):
+                pass  # L2 异常视为未命中
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set_query_result(self, key: str, value: Any):
+        """写入缓存(L1 + L2)"""
+        generation = self.generation()
+        now = time.time()
+        stored = copy.deepcopy(value)
+
+        with self._lock:
+            self._put_l1(key, (generation, now, stored))
+            self._stats["sets"] += 1
+
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, generation, created, last_access, value) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, generation, now, now, json.dumps(stored, ensure_ascii=False, default=str)),
+                )
+                # 旧代数条目已不可能命中,顺带清掉
+                self._conn.execute("DELETE FROM query_cache WHERE generation != ?", (generation,))
+                overflow = self._conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0] - self.disk_max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM query_cache WHERE key IN "
+                        "(SELECT key FROM query_cache ORDER BY last_access LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._stats["evictions"] += overflow
+                self._conn.commit()
+            except (sqlite3.Error, TypeError, ValueError):
+                pass  # L2 写入失败不影响 L1
+
+    def _put_l1(self, key: str, entry: tuple):
+        """写入 L1 并按 LRU 淘汰(调用方持锁)"""
+        self._l1[key] = entry
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.max_entries:
+            self._l1.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._l1.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM query_cache")
+                    self._conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    # ================================================================
+    # 统计
+    # ================================================================
+
+    def flush_stats(self):
+        """把本进程新增的计数累加到 L2 统计表"""
+        if self._conn is None:
+            return
+        with self._lock:
+            delta = {name: self._stats[name] - self._flushed[name] for name in _STAT_NAMES}
+            if not any(delta.values()):
+                return
+            try:
+                for name, value in delta.items():
+                    self._conn.execute(
+                        "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        (name, value),
+                    )
+                self._conn.commit()
+                self._flushed = dict(self._stats)
+            except sqlite3.Error:
+                pass
+
+    def get_stats(self, cumulative: bool = False) -> Dict[str, Any]:
+        """
+        统计信息
+
+        cumulative=True 时返回 L2 统计表中所有进程的累计值(含本进程未刷新部分)
+        """
+        with self._lock:
+            counters = dict(self._stats)
+            l1_entries = len(self._l1)
+
+        l2_entries = 0
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    l2_entries = self._conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+                    if cumulative:
+                        for name, value in self._conn.execute("SELECT name, value FROM cache_stats"):
+                            if name in counters:
+                                counters[name] += value - self._flushed.get(name, 0)
+            except sqlite3.Error:
+                pass
+
+        hits = counters["l1_hits"] + counters["l2_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "l1_entries": l1_entries,
+            "l1_max_entries": self.max_entries,
+            "l2_enabled": self._conn is not None,
+            "l2_entries": l2_entries,
+            "l2_max_entries": self.disk_max_entries,
+            "generation": self.generation(),
+        }
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_MANAGERS: Dict[str, CacheManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_cache_manager(memory_dir, **kwargs) -> CacheManager:
+    """获取(并缓存)指定记忆目录的缓存管理器,kwargs 仅在首次创建时生效"""
+    key = str(Path(memory_dir).resolve())
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(key)
+        if manager is None:
+            manager = CacheManager(memory_dir, **kwargs)
+            _MANAGERS[key] = manager
+        return manager
+
+
+def invalidate_store(memory_dir) -> int:
+    """记忆存储被写入后调用:递增代数,使所有进程的缓存失效"""
+    manager = _MANAGERS.get(str(Path(memory_dir).resolve()))
+    if manager is not None:
+        return manager.bump_generation()
+    return bump_generation(memory_dir)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Circuit Breaker
+LLM 调用熔断器 + 基于延迟分位数的自适应超时
+
+设计要点:
+- 所有 LLM 调用点(call_llm、v1.1.7 call_llm_with_fallback)共用进程内同一个熔断器
+- 连续失败(含超时)达到 failure_threshold 次后熔断(open):冷却期内的调用直接
+  短路到规则兜底,不再发请求;冷却期满进入半开(half_open),只放行一个探测请求,
+  成功则恢复(closed),失败则重新熔断
+- 超时不再固定 60s:按请求类别(max_tokens)维护最近 window 次成功延迟,
+  超时 = 分位数(percentile) × multiplier,夹在 [min_seconds, max_seconds];
+  样本不足 min_samples 时使用 max_seconds。超时的请求按超时值记入样本,
+  端点整体变慢时超时会随之放宽
+- 端点宕机时一次 consolidation 的代价从"每个片段等满超时"降为
+  "failure_threshold 次超时 + 其余调用立即兜底"
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional
+
+DEFAULT_OPTIONS = {
+    "breaker_failure_threshold": 5,
+    "breaker_cooldown_seconds": 60.0,
+    "timeout_min_seconds": 5.0,
+    "timeout_max_seconds": 60.0,
+    "timeout_percentile": 0.95,
+    "timeout_multiplier": 3.0,
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class AdaptiveTimeout:
+    """按最近延迟分位数计算的超时"""
+
+    def __init__(
+        self,
+        min_seconds: float = 5.0,
+        max_seconds: float = 60.0,
+        percentile: float = 0.95,
+        multiplier: float = 3.0,
+        window: int = 50,
+        min_samples: int = 5,
+    ):
+        self.min_seconds = float(min_seconds)
+        self.max_seconds = max(float(max_seconds), self.min_seconds)
+        self.percentile = min(1.0, max(0.0, float(percentile)))
+        self.multiplier = float(multiplier)
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, latency: float):
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(float(latency))
+
+    def timeout_for(self, key: Hashable) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.max_seconds
+        value = samples[min(len(samples) - 1, int(self.percentile * len(samples)))]
+        return min(self.max_seconds, max(self.min_seconds, value * self.multiplier))
+
+
+class CircuitBreaker:
+    """连续失败熔断器(closed → open → half_open → closed)"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 60.0,
+        timeouts: Optional[AdaptiveTimeout] = None,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = float(cooldown_seconds)
+        self.timeouts = timeouts or AdaptiveTimeout()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"successes": 0, "failures": 0, "timeouts": 0, "short_circuited": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def is_open(self) -> bool:
+        """是否处于熔断期(不消耗探测名额,供调度器判断是否跳过限速)"""
+        with self._lock:
+            return self._current_state() == OPEN
+
+    def allow(self) -> bool:
+        """本次调用是否放行;不放行时计入 short_circuited"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.stats["short_circuited"] += 1
+            return False
+
+    def record_success(self, key: Hashable = None, latency: Optional[float] = None):
+        if latency is not None:
+            self.timeouts.observe(key, latency)
+        with self._lock:
+            self.stats["successes"] += 1
+            self._failures = 0
+            self._state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, key: Hashable = None, timeout: Optional[float] = None):
+        """记录失败;timeout 不为 None 表示超时,按超时值记入延迟样本"""
+        if timeout is not None:
+            self.timeouts.observe(key, timeout)
+        with self._lock:
+            self.stats["failures"] += 1
+            if timeout is not None:
+                self.stats["timeouts"] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.stats["opened"] += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def timeout_for(self, key: Hashable = None) -> float:
+        return self.timeouts.timeout_for(key)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "state": self._current_state()}
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_BREAKER: Optional[CircuitBreaker] = None
+_BREAKER_OPTIONS: Optional[Dict] = None
+_BREAKER_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(options: Optional[Dict] = None) -> CircuitBreaker:
+    """
+    获取进程内共享的 LLM 熔断器
+
+    options: 配置里的 llm_fallback 段,读取 breaker_* / timeout_*;参数变化时重建
+    """
+    global _BREAKER, _BREAKER_OPTIONS
+    options = options or {}
+    resolved = {key: options.get(key, default) for key, default in DEFAULT_OPTIONS.items()}
+    with _BREAKER_LOCK:
+        if _BREAKER is None or resolved != _BREAKER_OPTIONS:
+            _BREAKER = CircuitBreaker(
+                failure_threshold=resolved["breaker_failure_threshold"],
+                cooldown_seconds=resolved["breaker_cooldown_seconds"],
+                timeouts=AdaptiveTimeout(
+                    min_seconds=resolved["timeout_min_seconds"],
+                    max_seconds=resolved["timeout_max_seconds"],
+                    percentile=resolved["timeout_percentile"],
+                    multiplier=resolved["timeout_multiplier"],
+                ),
+            )
+            _BREAKER_OPTIONS = resolved
+        return _BREAKER
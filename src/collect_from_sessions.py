@@ -45,6 +45,17 @@ def save_pending(memory_dir, pending):
         for item in pending:
             f.write(json.dumps(item, ensure_ascii=False) + '\n')
 
+def load_pending_index_config(memory_dir):
+    """读取 pending 倒排索引配置(与 memory.py 的 pending_index 配置一致)"""
+    defaults = {'enabled': True, 'persist': True}
+    config_path = memory_dir / 'config.json'
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return defaults
+    return {**defaults, **config.get('pending_index', {})}
+
 def extract_user_messages(session_file, hours=24):
     """从对话文件提取用户消息"""
     cutoff = datetime.now() - timedelta(hours=hours)
@@ -196,7 +207,29 @@ def collect_from_sessions(hours=24, dry_run=False):
         # 保存
         save_pending(memory_dir, pending)
         print(f"💾 已保存到 pending buffer (总计 {len(pending)} 条)")
-    
+
+        # v1.7.0: 同步 pending 倒排索引(前缀未变,只解析新增部分)
+        # 遵循 pending_index 配置:禁用或不持久化时不建索引文件
+        index_config = load_pending_index_config(memory_dir)
+        if index_config.get('enabled', True) and index_config.get('persist', True):
+            try:
+                from pending_index import get_pending_index
+
+                index = get_pending_index(memory_dir)
+                indexed = index.refresh()
+                index.save()
+                print(f"📇 pending 索引已更新 (+{indexed} 条)")
+            except ImportError:
+                pass
+
+        # v1.7.0: 递增存储代数,使查询缓存失效
+        try:
+            from cache_manager import invalidate_store
+
+            invalidate_store(memory_dir)
+        except ImportError:
+            pass
+
     return new_count
 
 if __name__ == '__main__':
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Consolidation Checkpoint
+Consolidation 检查点:阶段产物与 LLM 结果落盘,`consolidate --resume` 从中断处继续
+
+设计要点:
+- 阶段级:state/consolidation.json 的 phase_data 保存 run_id、已完成阶段、
+  Phase 1-3 的产物(segments / filtered / extracted);每完成一个阶段整体原子写入
+  (临时文件 + os.replace)
+- 阶段内:Phase 2/3 的 LLM 结果按轮(每轮 batch_size × max_concurrency 个片段)
+  追加到 state/consolidation_journal.jsonl,以片段内容哈希为键;恢复时已有结果的片段
+  不再请求。日志行带 run_id,新一轮运行清空日志;末行写到一半时读取忽略
+- Phase 0、4-6.9 在工作集上变换并统一提交(见 consolidation_workset),中断时未落盘,
+  恢复后重新执行即可;提交成功后记录 "commit",之后的派生阶段逐个记录完成,
+  恢复时不会重复应用衰减等非幂等变换
+- TimeBudget:--time-budget 秒数用尽时在阶段/轮次边界抛 ConsolidationPaused,
+  检查点保留,下一个 cron 窗口用 --resume 继续
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STATE_FILE = "state/consolidation.json"
+JOURNAL_FILE = "state/consolidation_journal.jsonl"
+
+
+class ConsolidationPaused(Exception):
+    """时间预算用尽,在检查点处暂停"""
+
+    def __init__(self, phase: str):
+        super().__init__(f"time budget exhausted before {phase}")
+        self.phase = phase
+
+
+class TimeBudget:
+    """运行时间预算(seconds 为空或 ≤ 0 表示不限)"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.started = time.monotonic()
+
+    def exceeded(self) -> bool:
+        return self.seconds is not None and time.monotonic() - self.started >= self.seconds
+
+    def check(self, phase: str):
+        if self.exceeded():
+            raise ConsolidationPaused(phase)
+
+
+def content_key(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:24]
+
+
+def write_state(path: Path, state: Dict):
+    """原子写入状态文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LLMJournal:
+    """某一阶段的 LLM 结果日志(内容哈希 → 结果)"""
+
+    def __init__(self, path: Path, run_id: str, phase: str):
+        self.path = path
+        self.run_id = run_id
+        self.phase = phase
+        self._results: Dict[str, Any] = {}
+        self.replayed = 0
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时写到一半的末行
+                    if entry.get("run") == run_id and entry.get("phase") == phase:
+                        self._results[entry["key"]] = entry["result"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: str) -> Any:
+        if key in self._results:
+            self.replayed += 1
+        return self._results.get(key)
+
+    def record(self, items: Iterable[Tuple[str, Any]]):
+        """追加一轮结果并 fsync(None 结果不记录,恢复时重新请求)"""
+        lines = []
+        for key, result in items:
+            if result is None:
+                continue
+            self._results[key] = result
+            entry = {"run": self.run_id, "phase": self.phase, "key": key, "result": result}
+            lines.append(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ConsolidationCheckpoint:
+    """state/consolidation.json 上的检查点读写"""
+
+    def __init__(self, memory_dir):
+        self.memory_dir = Path(memory_dir)
+        self.state_path = self.memory_dir / STATE_FILE
+        self.journal_path = self.memory_dir / JOURNAL_FILE
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        else:
+            self.state = {"last_run": None, "last_success": None, "current_phase": None, "phase_data": {}, "retry_count": 0}
+        self.state.setdefault("phase_data", {})
+
+    @property
+    def phase_data(self) -> Dict:
+        return self.state["phase_data"]
+
+    @property
+    def completed(self) -> List[str]:
+        return self.phase_data.get("completed", [])
+
+    def resumable(self) -> bool:
+        """是否有未完成的运行可继续"""
+        return bool(self.phase_data.get("run_id")) and self.state.get("current_phase") is not None
+
+    def begin(self, started: str, resume: bool = False, keep_data: bool = False) -> bool:
+        """
+        开始一次运行;resume 且存在未完成运行时沿用其检查点,
+        keep_data(--phase 单阶段运行)时沿用已有阶段产物
+
+        返回是否沿用了已有检查点
+        """
+        self.state["last_run"] = started
+        if (resume and self.resumable()) or (keep_data and self.phase_data.get("run_id")):
+            self.save()
+            return True
+        self.state["phase_data"] = {"run_id": uuid.uuid4().hex[:12], "completed": []}
+        self.state["current_phase"] = "0"
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self.save()
+        return False
+
+    def done(self, phase: str) -> bool:
+        return phase in self.completed
+
+    def complete(self, phase: str, **outputs):
+        """记录阶段完成(连同产物)并落盘"""
+        self.phase_data.update(outputs)
+        if phase not in self.completed:
+            self.phase_data.setdefault("completed", []).append(phase)
+        self.state["current_phase"] = phase
+        self.save()
+
+    def journal(self, phase: str) -> LLMJournal:
+        return LLMJournal(self.journal_path, self.phase_data.get("run_id", ""), phase)
+
+    def finish(self, success_time: str, keep_data: bool = False):
+        """
+        运行成功:清空检查点与日志
+
+        keep_data=True(--phase 单阶段运行)时保留阶段产物,供后续阶段单独运行使用
+        """
+        self.state["last_success"] = success_time
+        self.state["current_phase"] = None
+        self.state["retry_count"] = 0
+        if not keep_data:
+            self.state["phase_data"] = {}
+            if self.journal_path.exists():
+                self.journal_path.unlink()
+        self.save()
+
+    def fail(self):
+        """运行失败:累加重试次数,检查点保留供 --resume"""
+        self.state["retry_count"] = self.state.get("retry_count", 0) + 1
+        self.save()
+
+    def save(self):
+        write_state(self.state_path, self.state)
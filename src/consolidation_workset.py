@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Consolidation Working Set
+Consolidation 工作集:活跃池一次加载,各阶段在内存中变换,结束时统一提交
+
+设计要点:
+- 活跃池(facts/beliefs/summaries)按类型首次访问时读取一次,之后各阶段共享同一份列表
+- 阶段通过 replace / extend / archive 修改记录并标记脏类型;原地修改列表元素后调用 touch
+- commit() 先把所有脏文件写成临时文件(fsync 后)再逐个 os.replace:
+  暂存失败时磁盘上仍是整理前的完整状态,不会出现"一半阶段已落盘";
+  替换顺序为归档段 / 追加日志 → 活跃池 → 索引,替换中途崩溃最多留下
+  "已归档但仍在活跃池"的重复记录,不会丢失从活跃池移出的记录
+- 归档在提交时写成新的压缩段(见 archive_store,不读取已有归档),过期日志在提交时追加,
+  关键词/关系索引随同一批文件替换;
+  需要在提交成功后才执行的副作用(如清空 pending)用 defer 登记
+- 每个阶段用 phase() 计时并记录读写字节数,report() 输出对比
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from archive_store import ArchiveStore
+
+MEMORY_TYPES = ("facts", "beliefs", "summaries")
+MEMORY_TYPE_SINGULAR = {"facts": "fact", "beliefs": "belief", "summaries": "summary"}  # 活跃池文件名 → 记录 type
+
+
+def _dump_lines(records: List[dict]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+
+class WorkingSet:
+    """一次 Consolidation 的内存工作集"""
+
+    def __init__(self, memory_dir, archive_store: Optional[ArchiveStore] = None):
+        self.memory_dir = Path(memory_dir)
+        self.archive_store = archive_store or ArchiveStore(self.memory_dir)
+        self._records: Dict[str, List[dict]] = {}
+        self._dirty: set = set()
+        self._archived: Dict[str, List[dict]] = {}
+        self._appends: Dict[str, List[dict]] = {}  # 相对路径 → 待追加记录(日志类文件)
+        self._files: Dict[str, object] = {}  # 相对路径 → 随提交整体写出的 JSON(索引文件)
+        self._deferred: List[Callable[[], None]] = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.phases: List[Dict] = []
+        self.committed = False
+
+    def _active_path(self, mem_type: str) -> Path:
+        return self.memory_dir / f"layer2/active/{mem_type}.jsonl"
+
+    # ================================================================
+    # 读取与变换
+    # ================================================================
+
+    def active(self, mem_type: str) -> List[dict]:
+        """活跃记录列表(首次访问时读取文件,之后返回同一列表)"""
+        records = self._records.get(mem_type)
+        if records is None:
+            records = []
+            path = self._active_path(mem_type)
+            if path.exists():
+                data = path.read_bytes()
+                self.bytes_read += len(data)
+                for line in data.decode("utf-8").splitlines():
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+            self._records[mem_type] = records
+        return records
+
+    def all_active(self) -> Dict[str, List[dict]]:
+        return {mem_type: self.active(mem_type) for mem_type in MEMORY_TYPES}
+
+    def replace(self, mem_type: str, records: List[dict]):
+        """整体替换某类记录"""
+        self._records[mem_type] = records
+        self._dirty.add(mem_type)
+
+    def extend(self, mem_type: str, records: List[dict]):
+        """追加记录"""
+        if records:
+            self.active(mem_type).extend(records)
+            self._dirty.add(mem_type)
+
+    def touch(self, mem_type: str):
+        """原地修改了记录内容,标记为脏"""
+        self.active(mem_type)
+        self._dirty.add(mem_type)
+
+    def archive(self, mem_type: str, records: List[dict]):
+        """登记归档记录(调用方负责从活跃列表中移除)"""
+        if records:
+            self._archived.setdefault(mem_type, []).extend(records)
+
+    def append_log(self, rel_path: str, records: List[dict]):
+        """登记提交时追加到日志文件的记录"""
+        if records:
+            self._appends.setdefault(rel_path, []).extend(records)
+
+    def write_json(self, rel_path: str, data):
+        """登记随提交写出的 JSON 文件(与活跃池同批替换)"""
+        self._files[rel_path] = data
+
+    def defer(self, action: Callable[[], None]):
+        """登记提交成功后执行的副作用"""
+        self._deferred.append(action)
+
+    def is_dirty(self, mem_type: Optional[str] = None) -> bool:
+        if mem_type is None:
+            return bool(self._dirty or self._archived or self._appends or self._files)
+        return mem_type in self._dirty
+
+    # ================================================================
+    # 提交
+    # ================================================================
+
+    def commit(self) -> Dict:
+        """
+        写出所有变更:先写临时文件,全部成功后再逐个替换(新增内容先于截断后的活跃池落盘)
+
+        返回: {"files": 写出的文件数, "bytes": 写入字节数}
+        """
+        staged = []  # (临时路径, 目标路径, 字节数)
+        written = 0
+        try:
+            for mem_type, records in self._archived.items():
+                path = self.archive_store.next_segment_path(mem_type)
+                staged.append(self._stage(path, self.archive_store.encode(records)))
+            for rel_path, records in self._appends.items():
+                path = self.memory_dir / rel_path
+                staged.append(self._stage(path, self._existing_bytes(path) + _dump_lines(records)))
+            for mem_type in MEMORY_TYPES:
+                if mem_type in self._dirty:
+                    staged.append(self._stage(self._active_path(mem_type), _dump_lines(self._records[mem_type])))
+            for rel_path, data in self._files.items():
+                payload = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+                staged.append(self._stage(self.memory_dir / rel_path, payload))
+        except Exception:
+            for tmp_path, _, _ in staged:
+                tmp_path.unlink(missing_ok=True)
+            raise
+
+        for tmp_path, path, size in staged:
+            os.replace(tmp_path, path)
+            written += size
+        self.bytes_written += written
+        for mem_type in self._archived:
+            self.archive_store.maybe_merge(mem_type)
+
+        self._dirty.clear()
+        self._archived.clear()
+        self._appends.clear()
+        self._files.clear()
+        self.committed = True
+
+        deferred, self._deferred = self._deferred, []
+        for action in deferred:
+            action()
+        return {"files": len(staged), "bytes": written}
+
+    def _existing_bytes(self, path: Path) -> bytes:
+        if not path.exists():
+            return b""
+        data = path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+        self.bytes_read += len(data)
+        return data
+
+    @staticmethod
+    def _stage(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path, path, len(data)
+
+    # ================================================================
+    # 阶段统计
+    # ================================================================
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个阶段的耗时与读写字节数"""
+        start = time.perf_counter()
+        read_before, written_before = self.bytes_read, self.bytes_written
+        try:
+            yield self
+        finally:
+            self.phases.append({
+                "phase": name,
+                "ms": (time.perf_counter() - start) * 1000,
+                "bytes_read": self.bytes_read - read_before,
+                "bytes_written": self.bytes_written - written_before,
+            })
+
+    def report(self) -> List[str]:
+        """各阶段耗时与读写量(文本行)"""
+        lines = []
+        for p in self.phases + [{
+            "phase": "合计",
+            "ms": sum(p["ms"] for p in self.phases),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }]:
+            lines.append(
+                f"   {p['phase']}: {p['ms']:.1f} ms | 读 {p['bytes_read'] / 1024:.1f} KB"
+                f" | 写 {p['bytes_written'] / 1024:.1f} KB"
+            )
+        return lines
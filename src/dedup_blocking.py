@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Dedup Blocking
+Phase 4a 去重的候选分块索引:每条新 fact 只与少量候选比较
+
+设计要点:
+- MemoryOperator 判定冲突需要同时满足:实体有重叠、词集 Jaccard > 阈值、内容矛盾。
+  前两个是必要条件,可以提前用倒排索引筛掉绝大多数已有 fact:
+  - 实体块:entity → 已有 fact 下标
+  - 词签名桶:按全局顺序(文档频率升序)排列词集,只把前缀
+    |A| - ⌊t·|A|⌋ + 1 个词入桶(prefix filtering:Jaccard ≥ t 的两个集合前缀必有交集),
+    "用户"这类高频词排在末尾,不会把所有 fact 拉进候选
+  - 长度过滤:Jaccard ≤ min(|A|,|B|) / max(|A|,|B|),比值不超过阈值的直接跳过
+  分词与 MemoryOperator._tokenize 一致
+- 候选集是真实冲突集的超集,且按已有 fact 的原始顺序返回,
+  MemoryOperator 取"第一个冲突"的决策与全量比较完全一致
+- 每次去重只建一次索引,已有 fact 的分词结果缓存;UPDATE 改写内容后调用 update() 重新入桶
+"""
+
+import math
+from typing import Callable, Dict, Iterable, List, Set
+
+
+class FactBlockingIndex:
+    """已有 facts 的实体 / 词签名分块索引"""
+
+    def __init__(self, facts: List[Dict], tokenize: Callable[[str], Iterable[str]], threshold: float):
+        self.facts = facts
+        self.tokenize = tokenize
+        self.threshold = threshold
+        self._by_entity: Dict[str, Set[int]] = {}
+        self._by_token: Dict[str, Set[int]] = {}
+        self._tokens: List[Set[str]] = []
+        self._prefixes: List[List[str]] = []
+        self._positions = {id(fact): i for i, fact in enumerate(facts)}
+        self.stats = {"lookups": 0, "candidates": 0}
+
+        for fact in facts:
+            self._tokens.append(set(tokenize(fact.get("content", ""))))
+        # 全局词序:建索引时的文档频率升序(之后出现的新词频率视为 0),查询与入桶共用
+        self._df: Dict[str, int] = {}
+        for tokens in self._tokens:
+            for token in tokens:
+                self._df[token] = self._df.get(token, 0) + 1
+
+        for i, fact in enumerate(facts):
+            for entity in fact.get("entities", []) or []:
+                self._by_entity.setdefault(entity, set()).add(i)
+            self._prefixes.append([])
+            self._index_tokens(i)
+
+    def _prefix(self, tokens: Set[str]) -> List[str]:
+        """Jaccard > threshold 时必与对方前缀相交的词(threshold < 0 时不做词过滤,返回全部)"""
+        ordered = sorted(tokens, key=lambda token: (self._df.get(token, 0), token))
+        if self.threshold < 0:
+            return ordered
+        size = len(ordered)
+        # floor 取代 ceil 并留浮点余量:前缀只会更长(更保守),不会漏候选
+        length = size - math.floor(self.threshold * size + 1e-9) + 1
+        return ordered[:max(1, min(size, length))]
+
+    def _index_tokens(self, i: int):
+        prefix = self._prefix(self._tokens[i]) if self._tokens[i] else []
+        self._prefixes[i] = prefix
+        for token in prefix:
+            self._by_token.setdefault(token, set()).add(i)
+
+    def update(self, fact: Dict):
+        """已有 fact 内容被改写后重新计算词签名"""
+        i = self._positions.get(id(fact))
+        if i is None:
+            return
+        for token in self._prefixes[i]:
+            self._by_token.get(token, set()).discard(i)
+        self._tokens[i] = set(self.tokenize(fact.get("content", "")))
+        self._index_tokens(i)
+
+    def candidates(self, new_fact: Dict) -> List[Dict]:
+        """可能与 new_fact 冲突的已有 facts(保持原始顺序)"""
+        self.stats["lookups"] += 1
+        entity_hits: Set[int] = set()
+        for entity in set(new_fact.get("entities", []) or []):
+            entity_hits |= self._by_entity.get(entity, set())
+        if not entity_hits:
+            return []
+
+        tokens = set(self.tokenize(new_fact.get("content", "")))
+        if not tokens:
+            return []  # 空词集相似度为 0,不可能冲突
+        if self.threshold < 0:
+            hits = entity_hits
+        else:
+            token_hits: Set[int] = set()
+            for token in self._prefix(tokens):
+                token_hits |= self._by_token.get(token, set())
+            hits = entity_hits & token_hits
+
+        size = len(tokens)
+        result = []
+        for i in sorted(hits):
+            other = len(self._tokens[i])
+            if other and min(size, other) / max(size, other) > self.threshold:
+                result.append(self.facts[i])
+        self.stats["candidates"] += len(result)
+        return result
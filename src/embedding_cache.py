@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Embedding Cache
+持久化嵌入缓存:按 (模型, 维度, sha1(内容)) 缓存向量
+
+- SQLite 存于 state/embedding_cache.db,向量以 float32 BLOB 保存
+- 批量查询/写入,任何嵌入调用前先查缓存,只为未命中的文本调用引擎
+- 条目数超过 max_size 时按最近访问时间淘汰
+- 统计命中率(累计写入数据库,跨进程可见)
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_MAX_SIZE = 10000
+CACHE_DB_FILE = "state/embedding_cache.db"
+
+# SQLite 单条语句参数上限内的批量大小
+_LOOKUP_CHUNK = 500
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (model, dimension, content_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def content_sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _encode(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """嵌入向量缓存"""
+
+    def __init__(self, memory_dir, max_size: int = DEFAULT_MAX_SIZE):
+        self.db_path = Path(memory_dir) / CACHE_DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max(1, int(max_size))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+        self._conn.executescript(SCHEMA_SQL)
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+    def _bump(self, **counts):
+        """累加计数(本进程 + 数据库累计),调用方持锁且负责提交"""
+        for name, value in counts.items():
+            if not value:
+                continue
+            self.stats[name] += value
+            self._conn.execute(
+                "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+
+    def get_many(self, model: str, dimension: int, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """批量查询,返回 {content_hash: vector}(只含命中项)"""
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        if not unique:
+            return found
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimension = ? AND content_hash IN ({placeholders})",
+                    (model, dimension, *chunk),
+                ).fetchall()
+                for content_hash, blob in rows:
+                    found[content_hash] = _decode(blob)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND dimension = ? AND content_hash = ?",
+                    [(now, model, dimension, h) for h in found],
+                )
+            self._bump(hits=len(found), misses=len(unique) - len(found))
+            self._conn.commit()
+        return found
+
+    def put_many(self, model: str, dimension: int, items: Dict[str, Sequence[float]]):
+        """批量写入 {content_hash: vector},超出上限时淘汰最久未访问的条目"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimension, content_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(model, dimension, h, _encode(vec), now) for h, vec in items.items()],
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_size
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_access, rowid LIMIT ?)",
+                    (overflow,),
+                )
+            self._bump(puts=len(items), evictions=max(0, overflow))
+            self._conn.commit()
+
+    def get_stats(self, cumulative: bool = True) -> Dict:
+        """统计信息(cumulative=True 时为所有进程累计值)"""
+        with self._lock:
+            counters = dict(self.stats)
+            if cumulative:
+                counters.update({name: value for name, value in self._conn.execute("SELECT name, value FROM cache_stats")})
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            **counters,
+            "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_size": self.max_size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute("DELETE FROM cache_stats")
+            self._conn.commit()
+            self.stats = {name: 0 for name in self.stats}
+
+
+class CachedEmbeddingEngine:
+    """
+    带缓存的嵌入引擎包装
+
+    接口与被包装引擎一致(dimension / model / embed / embed_batch);
+    同一批次内重复的文本只嵌入一次。
+    """
+
+    def __init__(self, engine, cache: EmbeddingCache):
+        self.engine = engine
+        self.cache = cache
+        self.model = engine.model
+        self.dimension = engine.dimension
+        self.provider = getattr(engine, "provider", "")
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        hashes = [content_sha1(text) for text in texts]
+        found = self.cache.get_many(self.model, self.dimension, hashes)
+
+        missing: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = text
+
+        if missing:
+            vectors = self.engine.embed_batch(list(missing.values()))
+            fresh = {h: vec for h, vec in zip(missing, vectors) if vec is not None}
+            self.cache.put_many(self.model, self.dimension, fresh)
+            found.update(fresh)
+
+        return [found.get(h) for h in hashes]
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(memory_dir, max_size: int = DEFAULT_MAX_SIZE) -> EmbeddingCache:
+    key = str(Path(memory_dir).resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = EmbeddingCache(memory_dir, max_size=max_size)
+            _CACHES[key] = cache
+        return cache
+
+
+def wrap_with_cache(engine, memory_dir, max_size: int = DEFAULT_MAX_SIZE):
+    """
+    为嵌入引擎套上缓存
+
+    标记 cacheable=False 的引擎(如离线 hashing,重新计算比查库更快)原样返回
+    """
+    if engine is None or not getattr(engine, "cacheable", True):
+        return engine
+    return CachedEmbeddingEngine(engine, get_embedding_cache(memory_dir, max_size=max_size))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Entity Clusters
+相似实体表:整理时离线计算各实体的直接相似邻居,检索时实体隔离只需查表
+
+设计要点:
+- 相似判定与 v1.1.5 calculate_entity_similarity + 阈值完全一致
+  (共同前缀比例 → 包含关系 → 编辑距离),编辑距离换成带宽限制、超阈值提前退出的版本
+- 候选对生成用字符前缀过滤(prefix filtering):相似的两个实体至少共享
+  ceil(t·L) 个字符,按全局稀有度排序后只需索引每个实体的前 n-α+1 个字符
+- 只记录直接相似的实体对(邻接表),不做传递闭包:相似判定不具传递性,
+  A~B、B~C 不代表 A~C;持久化到 layer2/index/entity_clusters.json(实体 → 相似实体列表)
+- 查询实体或候选实体不在表中(新实体)时,只与本次候选实体逐一比较
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+INDEX_VERSION = 2
+CLUSTERS_FILE = "layer2/index/entity_clusters.json"
+
+# 与 v1.1.5 ENTITY_SYSTEM_CONFIG["isolation"] 默认值一致
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_PREFIX_RATIO = 0.5
+
+_EMPTY_POSTING = ((), ())
+
+
+# ============================================================
+# 相似度判定
+# ============================================================
+
+def bounded_levenshtein(s1: str, s2: str, max_dist: int) -> Optional[int]:
+    """
+    带宽限制的编辑距离
+
+    只计算对角线 ±max_dist 的带;某一行最小值已超过 max_dist 时提前退出。
+    返回距离(≤ max_dist)或 None(超过上限)。
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    n1, n2 = len(s1), len(s2)
+    if n1 - n2 > max_dist:
+        return None
+    if n2 == 0:
+        return n1
+
+    over = max_dist + 1
+    prev = [j if j <= max_dist else over for j in range(n2 + 1)]
+    for i in range(1, n1 + 1):
+        c1 = s1[i - 1]
+        cur = [over] * (n2 + 1)
+        cur[0] = i if i <= max_dist else over
+        row_min = cur[0]
+        for j in range(max(1, i - max_dist), min(n2, i + max_dist) + 1):
+            value = min(prev[j - 1] + (c1 != s2[j - 1]), cur[j - 1] + 1, prev[j] + 1)
+            if value > over:
+                value = over
+            cur[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_dist:
+            return None
+        prev = cur
+    return prev[n2] if prev[n2] <= max_dist else None
+
+
+def _common_prefix_len(e1: str, e2: str) -> int:
+    n = 0
+    for c1, c2 in zip(e1, e2):
+        if c1 != c2:
+            break
+        n += 1
+    return n
+
+
+def entities_similar(
+    e1: str, e2: str, threshold: float = DEFAULT_THRESHOLD, prefix_ratio: float = DEFAULT_PREFIX_RATIO
+) -> bool:
+    """等价于 calculate_entity_similarity(e1, e2) >= threshold"""
+    if e1 == e2:
+        return True
+    longer = max(len(e1), len(e2))
+    shorter = min(len(e1), len(e2))
+
+    prefix = _common_prefix_len(e1, e2)
+    if prefix and prefix / longer >= prefix_ratio:
+        return prefix / longer >= threshold
+
+    if e1 in e2 or e2 in e1:
+        return shorter / longer >= threshold
+
+    # 1 - d / L >= t  <=>  d <= (1 - t) · L
+    max_dist = math.floor((1 - threshold) * longer + 1e-9)
+    return bounded_levenshtein(e1, e2, max_dist) is not None
+
+
+def _min_overlap(length: int, threshold: float) -> int:
+    """相似实体(较长者长度为 length)至少共享的字符数"""
+    return max(1, math.ceil(threshold * length - 1e-9))
+
+
+# ============================================================
+# 相似实体表
+# ============================================================
+
+class EntityClusters:
+    """实体 → 直接相似实体集合(邻接表)"""
+
+    def __init__(
+        self,
+        neighbors: Optional[Dict[str, Iterable[str]]] = None,
+        threshold: float = DEFAULT_THRESHOLD,
+        prefix_ratio: float = DEFAULT_PREFIX_RATIO,
+    ):
+        self.neighbors: Dict[str, Set[str]] = {e: set(similar) for e, similar in (neighbors or {}).items()}
+        self.threshold = threshold
+        self.prefix_ratio = prefix_ratio
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def similar_to(self, entity: str) -> Set[str]:
+        """与实体直接相似的其他实体(未知实体返回空集)"""
+        return self.neighbors.get(entity, set())
+
+    def similar_groups(self, query_entities: Iterable[str], candidate_entities: Iterable[str]) -> List[Set[str]]:
+        """
+        替代 find_similar_entity_groups:每个查询实体与候选实体中相似者组成一组
+
+        已知实体直接查邻接表;未入表的实体(新实体)与对方逐一比较
+        """
+        candidates = set(candidate_entities)
+        unknown_candidates = {e for e in candidates if e not in self.neighbors}
+        groups = []
+        for qe in query_entities:
+            if qe in self.neighbors:
+                similar = self.similar_to(qe) & candidates
+                pending = unknown_candidates
+            else:
+                similar = set()
+                pending = candidates
+            similar.update(
+                e for e in pending if e != qe and entities_similar(qe, e, self.threshold, self.prefix_ratio)
+            )
+            if similar:
+                groups.append({qe} | similar)
+        return groups
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "threshold": self.threshold,
+            "prefix_ratio": self.prefix_ratio,
+            "neighbors": {e: sorted(similar) for e, similar in self.neighbors.items()},
+        }
+
+
+def cluster_entities(
+    entities: Iterable[str], threshold: float = DEFAULT_THRESHOLD, prefix_ratio: float = DEFAULT_PREFIX_RATIO
+) -> EntityClusters:
+    """计算实体集合的相似邻接表(前缀过滤生成候选对 → 精确判定)"""
+    entities = sorted({e for e in entities if e})
+    if not entities:
+        return EntityClusters(threshold=threshold, prefix_ratio=prefix_ratio)
+
+    # 字符多重集转为 (字符, 第 k 次出现) 记号集合,交集大小即共享字符数
+    token_sets = [frozenset((ch, k) for ch, n in Counter(e).items() for k in range(n)) for e in entities]
+    token_freq: Counter = Counter(tok for tokens in token_sets for tok in tokens)
+    order = {tok: rank for rank, (tok, _) in enumerate(sorted(token_freq.items(), key=lambda x: (x[1], x[0])))}
+
+    neighbors: Dict[str, Set[str]] = {e: set() for e in entities}
+    postings: Dict[tuple, tuple] = {}
+    by_length = sorted(range(len(entities)), key=lambda i: (len(entities[i]), entities[i]))
+    for i in by_length:
+        entity, tokens = entities[i], token_sets[i]
+        min_overlap = _min_overlap(len(entity), threshold)
+        min_length = threshold * len(entity) - 1e-9
+        # 按全局频率升序(稀有的在前)取前缀
+        prefix = sorted(tokens, key=order.__getitem__)[: len(entity) - min_overlap + 1]
+
+        # 倒排链按长度升序追加,bisect 跳过过短的实体
+        candidates = set()
+        for tok in prefix:
+            lengths, ids = postings.get(tok, _EMPTY_POSTING)
+            candidates.update(ids[bisect.bisect_left(lengths, min_length) :])
+        for j in candidates:
+            if len(tokens & token_sets[j]) < min_overlap:
+                continue
+            if entities_similar(entity, entities[j], threshold, prefix_ratio):
+                neighbors[entity].add(entities[j])
+                neighbors[entities[j]].add(entity)
+        for tok in prefix:
+            lengths, ids = postings.setdefault(tok, ([], []))
+            lengths.append(len(entity))
+            ids.append(i)
+
+    return EntityClusters(neighbors, threshold=threshold, prefix_ratio=prefix_ratio)
+
+
+# ============================================================
+# 持久化与进程级缓存
+# ============================================================
+
+_CLUSTERS: Dict[str, tuple] = {}
+_CLUSTERS_LOCK = threading.Lock()
+
+
+def _load_entities(memory_dir) -> Set[str]:
+    entities = set()
+    for mem_type in ("facts", "beliefs", "summaries"):
+        path = Path(memory_dir) / f"layer2/active/{mem_type}.jsonl"
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entities.update(json.loads(line).get("entities", []))
+                except (ValueError, AttributeError):
+                    continue
+    return entities
+
+
+def build_entity_clusters(
+    memory_dir,
+    entities: Optional[Iterable[str]] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    prefix_ratio: float = DEFAULT_PREFIX_RATIO,
+) -> Dict[str, int]:
+    """整理时调用:计算相似邻接表并写入 entity_clusters.json"""
+    if entities is None:
+        entities = _load_entities(memory_dir)
+    clusters = cluster_entities(entities, threshold=threshold, prefix_ratio=prefix_ratio)
+
+    path = Path(memory_dir) / CLUSTERS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(clusters.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    with _CLUSTERS_LOCK:
+        _CLUSTERS[str(Path(memory_dir).resolve())] = (path.stat().st_mtime_ns, clusters)
+
+    degrees = [len(similar) for similar in clusters.neighbors.values()]
+    return {"entities": len(clusters), "linked": sum(1 for d in degrees if d), "pairs": sum(degrees) // 2}
+
+
+def get_entity_clusters(
+    memory_dir, threshold: float = DEFAULT_THRESHOLD, prefix_ratio: float = DEFAULT_PREFIX_RATIO
+) -> EntityClusters:
+    """
+    获取相似实体表(按文件 mtime 缓存)
+
+    尚未构建时返回空表,此时所有实体都按未知实体处理(逐一比较)
+    """
+    path = Path(memory_dir) / CLUSTERS_FILE
+    key = str(Path(memory_dir).resolve())
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return EntityClusters(threshold=threshold, prefix_ratio=prefix_ratio)
+
+    with _CLUSTERS_LOCK:
+        cached = _CLUSTERS.get(key)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                raise ValueError("version mismatch")
+            clusters = EntityClusters(
+                data["neighbors"],
+                threshold=data.get("threshold", threshold),
+                prefix_ratio=data.get("prefix_ratio", prefix_ratio),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            clusters = EntityClusters(threshold=threshold, prefix_ratio=prefix_ratio)
+        _CLUSTERS[key] = (mtime_ns, clusters)
+        return clusters
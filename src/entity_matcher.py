@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Learned Entity Matcher
+学习实体匹配器:learned_entities.json 编译一次,进程内共享
+
+设计要点:
+- 精确实体放进字符 trie,从每个位置向下走一遍即可找出全部(含重叠)出现,
+  结果与逐个 `exact in content` 一致,但不随实体数线性增长
+- 学习到的模式预编译(区分大小写 / 忽略大小写各一份,按需编译)
+- 按文件 (mtime_ns, size) 缓存;learn_new_entities 写入后直接在已编译的匹配器上
+  增量追加,并把签名更新为新文件的签名,不触发整体重建
+"""
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LEARNED_ENTITIES_FILE = "layer2/learned_entities.json"
+
+_END = ""  # trie 终止标记(实体字符串本身作为值)
+
+
+class LearnedEntityMatcher:
+    """学习实体的编译态匹配器"""
+
+    def __init__(self, exact: Iterable[str] = (), patterns: Iterable[str] = ()):
+        self._trie: Dict = {}
+        self._exact_count = 0
+        self._patterns: List[list] = []  # [模式, 编译结果, 忽略大小写的编译结果(按需)]
+        self._pattern_set = set()
+        self.add_exact(exact)
+        self.add_patterns(patterns)
+
+    def __len__(self):
+        return self._exact_count + len(self._patterns)
+
+    # ================================================================
+    # 增量构建
+    # ================================================================
+
+    def add_exact(self, entities: Iterable[str]) -> int:
+        added = 0
+        for entity in entities:
+            if not entity:
+                continue
+            node = self._trie
+            for ch in entity:
+                node = node.setdefault(ch, {})
+            if _END not in node:
+                node[_END] = entity
+                added += 1
+        self._exact_count += added
+        return added
+
+    def add_patterns(self, patterns: Iterable[str]) -> int:
+        added = 0
+        for pattern in patterns:
+            if pattern in self._pattern_set:
+                continue
+            try:
+                compiled = re.compile(pattern)
+            except re.error:
+                continue  # 非法模式与旧实现一样跳过
+            self._pattern_set.add(pattern)
+            self._patterns.append([pattern, compiled, None])
+            added += 1
+        return added
+
+    # ================================================================
+    # 匹配
+    # ================================================================
+
+    def find_exact(self, content: str) -> List[str]:
+        """content 中出现的全部精确实体(按首次出现位置排序,去重)"""
+        found = {}
+        root = self._trie
+        for start in range(len(content)):
+            node = root.get(content[start])
+            pos = start + 1
+            while node is not None:
+                entity = node.get(_END)
+                if entity is not None and entity not in found:
+                    found[entity] = start
+                if pos >= len(content):
+                    break
+                node = node.get(content[pos])
+                pos += 1
+        return list(found)
+
+    def find_patterns(self, content: str, ignore_case: bool = False) -> List[str]:
+        """学习模式的全部匹配文本(保持模式顺序、出现顺序,去重)"""
+        found = {}
+        for entry in self._patterns:
+            if ignore_case:
+                if entry[2] is None:
+                    entry[2] = re.compile(entry[0], re.IGNORECASE)
+                compiled = entry[2]
+            else:
+                compiled = entry[1]
+            for match in compiled.finditer(content):
+                found.setdefault(match.group(), None)
+        return list(found)
+
+    def find_all(self, content: str, ignore_case: bool = False) -> List[str]:
+        entities = self.find_exact(content)
+        seen = set(entities)
+        entities.extend(e for e in self.find_patterns(content, ignore_case) if e not in seen)
+        return entities
+
+
+# ============================================================
+# 进程级缓存
+# ============================================================
+
+_MATCHERS: Dict[str, Tuple[Tuple[int, int], LearnedEntityMatcher]] = {}
+_MATCHERS_LOCK = threading.Lock()
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_entity_matcher(memory_dir) -> LearnedEntityMatcher:
+    """获取学习实体匹配器(文件签名不变时复用已编译的实例)"""
+    path = Path(memory_dir) / LEARNED_ENTITIES_FILE
+    key = str(Path(memory_dir).resolve())
+    signature = _file_signature(path)
+
+    with _MATCHERS_LOCK:
+        cached = _MATCHERS.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        learned = {}
+        if signature is not None:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    learned = json.load(f)
+            except (OSError, ValueError):
+                learned = {}
+        matcher = LearnedEntityMatcher(learned.get("exact", []), learned.get("patterns", []))
+        _MATCHERS[key] = (signature, matcher)
+        return matcher
+
+
+def note_learned(memory_dir, previous_signature, exact: Iterable[str] = (), patterns: Iterable[str] = ()):
+    """
+    learn_new_entities 保存后调用:增量更新已编译的匹配器
+
+    previous_signature: 本次写入前的文件签名;与缓存不一致说明期间文件被其他进程改过,
+    此时丢弃缓存,下次使用时重新加载
+    """
+    path = Path(memory_dir) / LEARNED_ENTITIES_FILE
+    key = str(Path(memory_dir).resolve())
+    with _MATCHERS_LOCK:
+        cached = _MATCHERS.get(key)
+        if cached is None:
+            return
+        if cached[0] != previous_signature:
+            del _MATCHERS[key]
+            return
+        matcher = cached[1]
+        matcher.add_exact(exact)
+        matcher.add_patterns(patterns)
+        _MATCHERS[key] = (_file_signature(path), matcher)
+
+
+def learned_file_signature(memory_dir) -> Optional[Tuple[int, int]]:
+    return _file_signature(Path(memory_dir) / LEARNED_ENTITIES_FILE)
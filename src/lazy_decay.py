@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Lazy Decay
+惰性衰减:score 按闭式公式在读取/排序时计算,只在跨过归档阈值时落盘
+
+设计要点:
+- 记录保存 score(锚点时刻的分数)与 decay_anchor(锚点时间);当前分数为
+  score × Π (1 - rate × 保护系数)^(该保护档内经过的天数),
+  rate = 类型衰减率 × (1 - importance × 0.5),与逐日衰减的单步公式一致
+- 访问保护按 last_accessed 分段:访问后 3 / 7 / 14 天内各用一档系数,之后为 beyond 档;
+  锚点到 last_accessed 之间(更早的访问已被覆盖)按 beyond 档计算
+- 没有 decay_anchor 的旧记录视为"score 即当前值",首次 Consolidation 时打锚点
+- 衰减视界索引(state/decay_horizon.json):每条记录预计跌破归档阈值的时间,
+  Phase 5c 只取到期的记录落盘/归档;活跃文件(大小 + mtime)未变时不扫描记录,
+  变化时只为签名(score、锚点、importance、last_accessed)变了的记录重算;
+  索引文件只在条目或活跃文件状态变化时重写,没有到期记录的日常运行不产生写入
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HORIZON_FILE = "state/decay_horizon.json"
+DAY_SECONDS = 86400.0
+
+# (访问后天数上限, 保护系数键名)
+PROTECTION_TIERS = ((3, "within_3_days"), (7, "within_7_days"), (14, "within_14_days"))
+BEYOND_TIER = "beyond_14_days"
+
+_TYPE_BY_PREFIX = {"f": "fact", "b": "belief", "s": "summary"}
+_TYPE_BY_POOL = {"facts": "fact", "beliefs": "belief", "summaries": "summary"}
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """ISO 时间(无时区按 UTC)→ epoch 秒"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def format_timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class DecayModel:
+    """闭式衰减模型"""
+
+    def __init__(self, decay_rates: Dict[str, float], archive_threshold: float, protection: Optional[Dict] = None):
+        """
+        Args:
+            decay_rates: {"fact": 0.008, ...} 每日基础衰减率
+            archive_threshold: 归档阈值
+            protection: 访问保护系数(None 表示不做访问保护)
+        """
+        self.decay_rates = decay_rates
+        self.archive_threshold = archive_threshold
+        self.protection = protection
+
+    def daily_rate(self, record: Dict, mem_type: Optional[str] = None) -> float:
+        # mem_type 可为活跃池名(facts)或记录类型(fact);缺省时按 id 前缀推断
+        if mem_type:
+            kind = _TYPE_BY_POOL.get(mem_type, mem_type)
+        else:
+            kind = _TYPE_BY_PREFIX.get(str(record.get("id", ""))[:1], "summary")
+        return self.decay_rates.get(kind, 0.01) * (1 - record.get("importance", 0.5) * 0.5)
+
+    def _segments(self, record: Dict, start: float) -> List[Tuple[float, float, float]]:
+        """锚点之后的保护分段 [(起点, 终点, 保护系数)],最后一段终点为 inf"""
+        if not self.protection:
+            return [(start, math.inf, 1.0)]
+        beyond = self.protection.get(BEYOND_TIER, 1.0)
+        accessed = parse_timestamp(record.get("last_accessed"))
+        if accessed is None:
+            return [(start, math.inf, beyond)]
+
+        segments = []
+        edge = accessed
+        if start < accessed:
+            segments.append((start, accessed, beyond))
+        for days, key in PROTECTION_TIERS:
+            end = accessed + days * DAY_SECONDS
+            lo = max(edge, start)
+            if lo < end:
+                segments.append((lo, end, self.protection.get(key, 1.0)))
+            edge = end
+        segments.append((max(edge, start), math.inf, beyond))
+        return segments
+
+    def score_at(self, record: Dict, now: Optional[float] = None, mem_type: Optional[str] = None) -> float:
+        """记录在 now 时刻的分数"""
+        score = record.get("score", record.get("importance", 0.5))
+        anchor = parse_timestamp(record.get("decay_anchor"))
+        now = time.time() if now is None else now
+        if anchor is None or now <= anchor or score <= 0:
+            return score
+
+        rate = self.daily_rate(record, mem_type)
+        log_factor = 0.0
+        for lo, hi, protect in self._segments(record, anchor):
+            if lo >= now:
+                break
+            step = rate * protect
+            if step >= 1:
+                return 0.0
+            log_factor += (min(hi, now) - lo) / DAY_SECONDS * math.log1p(-step)
+        return score * math.exp(log_factor)
+
+    def archive_at(self, record: Dict, mem_type: Optional[str] = None) -> float:
+        """预计跌破归档阈值的时间(epoch 秒;不会跌破时为 inf)"""
+        score = record.get("score", record.get("importance", 0.5))
+        anchor = parse_timestamp(record.get("decay_anchor"))
+        if anchor is None:
+            return math.inf
+        if score < self.archive_threshold:
+            return anchor
+        if self.archive_threshold <= 0:
+            return math.inf
+
+        rate = self.daily_rate(record, mem_type)
+        remaining = math.log(self.archive_threshold / score)  # ≤ 0,还能下降的对数量
+        for lo, hi, protect in self._segments(record, anchor):
+            step = rate * protect
+            if step >= 1:
+                return lo
+            slope = math.log1p(-step) / DAY_SECONDS  # 每秒对数变化(≤ 0)
+            if slope >= 0:
+                continue
+            if hi == math.inf or slope * (hi - lo) <= remaining:
+                return lo + remaining / slope
+            remaining -= slope * (hi - lo)
+        return math.inf
+
+    def materialize(self, record: Dict, now: Optional[float] = None, mem_type: Optional[str] = None) -> float:
+        """把当前分数写回记录并移动锚点"""
+        now = time.time() if now is None else now
+        record["score"] = self.score_at(record, now, mem_type)
+        record["decay_anchor"] = format_timestamp(now)
+        return record["score"]
+
+
+def _signature(record: Dict) -> str:
+    return f"{record.get('score')}|{record.get('decay_anchor')}|{record.get('importance')}|{record.get('last_accessed')}"
+
+
+class DecayHorizon:
+    """衰减视界索引:各类记忆的 id → 预计归档时间"""
+
+    def __init__(self, memory_dir):
+        self.memory_dir = Path(memory_dir)
+        self.path = self.memory_dir / HORIZON_FILE
+        self.stats = {"refreshed": 0, "skipped_scan": 0}
+        self._dirty = False
+        data = {}
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        self._files: Dict[str, List[int]] = data.get("files", {})
+        # mem_type → {id: [archive_at, signature]}(inf 存为 null)
+        self._entries: Dict[str, Dict[str, List]] = data.get("entries", {})
+        # mem_type → 按时间排序的 [archive_at, id](只含会跌破阈值的记录);修改 entries 后置空重建
+        self._timeline: Dict[str, Optional[List[List]]] = data.get("timeline", {})
+
+    def _file_stat(self, mem_type: str) -> Optional[List[int]]:
+        path = self.memory_dir / f"layer2/active/{mem_type}.jsonl"
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def due(
+        self, mem_type: str, records: List[Dict], model: DecayModel, now: float, changed: bool = False
+    ) -> Tuple[List[Dict], int]:
+        """
+        预计在 now 之前跌破归档阈值的记录
+
+        changed: 本进程已在内存中修改过这类记录(文件状态不能代表记录内容)
+        重算时顺带为没有 decay_anchor 的记录打锚点(原地修改)
+
+        返回: (到期记录, 新打锚点的记录数)
+        """
+        entries = self._entries.setdefault(mem_type, {})
+        anchored = 0
+        if not changed and self._files.get(mem_type) == self._file_stat(mem_type) and len(entries) == len(records):
+            self.stats["skipped_scan"] += 1
+        else:
+            anchored = self._refresh(mem_type, records, model, now)
+
+        due_ids = {memory_id for _, memory_id in self.upcoming(mem_type, now)}
+        if not due_ids:
+            return [], anchored
+        return [r for r in records if r.get("id") in due_ids], anchored
+
+    def _refresh(self, mem_type: str, records: Iterable[Dict], model: DecayModel, now: float) -> int:
+        entries = self._entries.get(mem_type, {})
+        fresh = {}
+        anchored = 0
+        for record in records:
+            memory_id = record.get("id")
+            if memory_id is None:
+                continue
+            if not record.get("decay_anchor"):
+                model.materialize(record, now, mem_type)
+                anchored += 1
+            signature = _signature(record)
+            entry = entries.get(memory_id)
+            if entry is None or entry[1] != signature:
+                at = model.archive_at(record, mem_type)
+                entry = [None if at == math.inf else at, signature]
+                self.stats["refreshed"] += 1
+            fresh[memory_id] = entry
+        if fresh != entries:
+            self._entries[mem_type] = fresh
+            self._timeline[mem_type] = None
+            self._dirty = True
+        return anchored
+
+    def update(self, mem_type: str, record: Dict, model: DecayModel):
+        """单条记录重新落盘后更新索引"""
+        at = model.archive_at(record, mem_type)
+        entry = [None if at == math.inf else at, _signature(record)]
+        entries = self._entries.setdefault(mem_type, {})
+        if entries.get(record["id"]) != entry:
+            entries[record["id"]] = entry
+            self._timeline[mem_type] = None
+            self._dirty = True
+
+    def discard(self, mem_type: str, memory_ids: Iterable[str]):
+        entries = self._entries.get(mem_type, {})
+        for memory_id in memory_ids:
+            if entries.pop(memory_id, None) is not None:
+                self._timeline[mem_type] = None
+                self._dirty = True
+
+    def _sorted(self, mem_type: str) -> List[List]:
+        timeline = self._timeline.get(mem_type)
+        if timeline is None:
+            timeline = sorted(
+                [at, memory_id] for memory_id, (at, _) in self._entries.get(mem_type, {}).items() if at is not None
+            )
+            self._timeline[mem_type] = timeline
+        return timeline
+
+    def upcoming(self, mem_type: str, until: float) -> List[Tuple[float, str]]:
+        """until 之前将跌破阈值的 (时间, id),按时间排序"""
+        timeline = self._sorted(mem_type)
+        lo, hi = 0, len(timeline)
+        while lo < hi:  # 二分:第一个 archive_at > until 的位置
+            mid = (lo + hi) // 2
+            if timeline[mid][0] <= until:
+                lo = mid + 1
+            else:
+                hi = mid
+        return [(at, memory_id) for at, memory_id in timeline[:lo]]
+
+    def save(self) -> bool:
+        """
+        记录当前活跃文件状态并原子写入(活跃文件落盘之后调用)
+
+        条目与活跃文件状态都没变时不写盘;返回是否写入
+        """
+        files = {}
+        for mem_type in self._entries:
+            stat = self._file_stat(mem_type)
+            if stat is not None:
+                files[mem_type] = stat
+        if not self._dirty and files == self._files and self.path.exists():
+            return False
+
+        self._files = files
+        for mem_type in self._entries:
+            self._sorted(mem_type)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self._files, "entries": self._entries, "timeline": self._timeline}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
+        return True
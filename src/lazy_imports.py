@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Lazy Imports
+可选子系统按需导入:模块在首次取属性时才执行,CLI 冷启动只加载本次命令用到的部分
+
+设计要点:
+- lazy_module(name) 返回模块代理,首次取属性时 importlib.import_module,
+  之后把真实模块缓存在代理上,属性访问只多一次转发
+- module_available(*names) 只用 importlib.util.find_spec 判断模块是否存在(不执行模块代码),
+  替代 "try: import ... except ImportError" 的 *_ENABLED 开关;模块存在但依赖缺失时
+  要到首次使用才会抛 ImportError,调用处原有的 try/except 降级依然生效
+- on_load 回调在模块首次经代理加载后调用一次(用于安装钩子等模块级初始化)
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+from typing import Callable, Optional
+
+
+def module_available(*names: str) -> bool:
+    """所有模块均可找到(已导入或在搜索路径上)"""
+    for name in names:
+        if name in sys.modules:
+            if sys.modules[name] is None:
+                return False
+            continue
+        try:
+            if importlib.util.find_spec(name) is None:
+                return False
+        except (ImportError, ValueError):
+            return False
+    return True
+
+
+class LazyModule:
+    """模块代理:首次取属性时导入"""
+
+    def __init__(self, name: str, on_load: Optional[Callable] = None):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_on_load", on_load)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def load(self):
+        """导入并返回真实模块(失败时抛 ImportError)"""
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                object.__setattr__(self, "_module", module)
+                if self._on_load is not None:
+                    self._on_load(module)
+            return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str, on_load: Optional[Callable] = None) -> LazyModule:
+    return LazyModule(name, on_load)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM Batching
+多片段合并为一次 LLM 请求:编号打包 → JSON 数组响应 → 校验后按片段拆回
+
+设计要点:
+- 每批 batch_size 个片段共用一份系统提示,请求数与提示词开销约降为 1/N
+- 响应必须是长度与批次一致的 JSON 数组,元素为对象且 index 覆盖 0..N-1
+  (缺 index 时按数组顺序对应);任何一项不合法整批视为解析失败
+- 解析失败或请求失败时整批回退到逐条调用,结果与不分批一致
+- 批次与回退的逐条调用都交给调用方的 mapper 发起(通常经 llm_dispatcher 并发执行),
+  回退请求同样受令牌桶与熔断约束
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BATCH_SIZE = 8
+
+_ARRAY_PATTERN = re.compile(r"\[.*\]", re.S)
+
+
+def chunk(items: Sequence[Any], batch_size: int) -> List[List[Any]]:
+    """按 batch_size 切分(batch_size ≤ 1 时每批一个)"""
+    size = max(1, int(batch_size or 1))
+    return [list(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def build_batch_prompt(instruction: str, contents: Sequence[str]) -> str:
+    """把多个片段编号后拼成一个提示"""
+    lines = [instruction, ""]
+    for i, content in enumerate(contents):
+        lines.append(f"[{i}] {content}")
+    lines.append("")
+    lines.append(f"按编号返回 JSON 数组,共 {len(contents)} 个对象,每个对象带 \"index\" 字段:")
+    return "\n".join(lines)
+
+
+def parse_batch_response(text: Optional[str], expected: int) -> Optional[List[Dict]]:
+    """
+    解析批量响应
+
+    返回: 按编号排好的对象列表;格式不合法时返回 None
+    """
+    if not text:
+        return None
+    match = _ARRAY_PATTERN.search(text)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group())
+    except ValueError:
+        return None
+    if not isinstance(data, list) or len(data) != expected or not all(isinstance(d, dict) for d in data):
+        return None
+
+    if all("index" in d for d in data):
+        by_index = {}
+        for d in data:
+            try:
+                index = int(d["index"])
+            except (TypeError, ValueError):
+                return None
+            by_index[index] = d
+        if sorted(by_index) != list(range(expected)):
+            return None
+        return [by_index[i] for i in range(expected)]
+    return data
+
+
+def run_batches(
+    items: Sequence[Any],
+    batch_call: Callable[[List[Any]], Optional[List[Any]]],
+    single_call: Callable[[Any], Any],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    mapper: Optional[Callable] = None,
+) -> List[Any]:
+    """
+    分批执行,结果顺序与 items 一致
+
+    batch_call: 一批片段 → 每个片段的结果列表;失败返回 None
+    single_call: 单个片段的调用(批量失败时逐条回退)
+    mapper: 执行器(如 LLMDispatcher.map),批次与回退的逐条调用都经它发起;默认串行
+    """
+    items = list(items)
+    if not items:
+        return []
+    mapper = mapper or (lambda fn, seq: [fn(x) for x in seq])
+
+    def run(batch):
+        results = batch_call(batch)
+        if results is not None and len(results) == len(batch):
+            return results
+        return None
+
+    size = max(1, int(batch_size or 1))
+    starts = range(0, len(items), size)
+    multi = [start for start in starts if len(items[start:start + size]) > 1]
+    batched = mapper(run, [items[start:start + size] for start in multi]) if multi else []
+
+    results: List[Any] = [None] * len(items)
+    done = set()
+    for start, batch_results in zip(multi, batched):
+        # 解析失败或批次执行抛异常(mapper 返回 None)的批次逐条补跑
+        if batch_results is not None:
+            results[start:start + len(batch_results)] = batch_results
+            done.add(start)
+
+    fallback = [i for start in starts if start not in done for i in range(start, min(start + size, len(items)))]
+    if fallback:
+        for i, result in zip(fallback, mapper(single_call, [items[i] for i in fallback])):
+            results[i] = result
+    return results
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM Response Cache
+持久化 LLM 响应缓存:按 sha256(模型, 系统提示, 提示, max_tokens) 缓存成功的响应
+
+- SQLite 存于 state/llm_cache.db;重跑 consolidation(--force、重复处理同一批 pending)
+  时相同的问题直接返回缓存结果,不再请求 LLM
+- 条目超过 ttl_seconds 视为过期(读取时忽略,写入时清理);条目数超过 max_size
+  时按最近访问时间淘汰
+- 只缓存成功响应;命中时累计节省的 token 数(写入时记录该响应消耗的 token)
+- 统计命中/未命中/节省 token(本进程 + 数据库累计)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_MAX_SIZE = 5000
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+CACHE_DB_FILE = "state/llm_cache.db"
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses(last_access);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def request_key(model: str, system_prompt: Optional[str], prompt: str, max_tokens: int) -> str:
+    payload = json.dumps([model, system_prompt or "", prompt, int(max_tokens)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LLM 响应缓存"""
+
+    def __init__(self, memory_dir, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_size: int = DEFAULT_MAX_SIZE):
+        self.db_path = Path(memory_dir) / CACHE_DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, int(max_size))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+        self._conn.executescript(SCHEMA_SQL)
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "tokens_saved": 0}
+
+    def _bump(self, **counts):
+        """累加计数(本进程 + 数据库累计),调用方持锁且负责提交"""
+        for name, value in counts.items():
+            if not value:
+                continue
+            self.stats[name] += value
+            self._conn.execute(
+                "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+
+    def get(self, model: str, system_prompt: Optional[str], prompt: str, max_tokens: int) -> Optional[str]:
+        """查询缓存,未命中或已过期返回 None"""
+        key = request_key(model, system_prompt, prompt, max_tokens)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, tokens FROM llm_responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self._bump(misses=1)
+            else:
+                self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+                self._bump(hits=1, tokens_saved=row[1])
+            self._conn.commit()
+        return row[0] if row else None
+
+    def put(self, model: str, system_prompt: Optional[str], prompt: str, max_tokens: int, response: str, tokens: int = 0):
+        """写入成功的响应,同时清理过期条目并按上限淘汰"""
+        key = request_key(model, system_prompt, prompt, max_tokens)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, tokens, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, int(tokens or 0), now, now),
+            )
+            expired = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] - self.max_size
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE rowid IN "
+                    "(SELECT rowid FROM llm_responses ORDER BY last_access, rowid LIMIT ?)",
+                    (overflow,),
+                )
+            self._bump(puts=1, evictions=max(0, expired) + max(0, overflow))
+            self._conn.commit()
+
+    def get_stats(self, cumulative: bool = True) -> Dict:
+        """统计信息(cumulative=True 时为所有进程累计值)"""
+        with self._lock:
+            counters = dict(self.stats)
+            if cumulative:
+                counters.update({name: value for name, value in self._conn.execute("SELECT name, value FROM cache_stats")})
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            **counters,
+            "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_size": self.max_size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.execute("DELETE FROM cache_stats")
+            self._conn.commit()
+            self.stats = {name: 0 for name in self.stats}
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_CACHES: Dict[str, LLMCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_llm_cache(memory_dir, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_size: int = DEFAULT_MAX_SIZE) -> LLMCache:
+    key = str(Path(memory_dir).resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = LLMCache(memory_dir, ttl_seconds=ttl_seconds, max_size=max_size)
+            _CACHES[key] = cache
+        else:
+            cache.ttl_seconds = ttl_seconds
+            cache.max_size = max(1, int(max_size))
+        return cache
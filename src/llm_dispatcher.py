@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM Dispatcher
+Consolidation LLM 兜底的并发调度:线程池 + 令牌桶限速 + 按输入顺序收集结果
+
+设计要点:
+- LLM 调用是网络 I/O(llm_transport 连接池 / requests),线程池即可并发,无需 asyncio
+- 令牌桶在进程内共享:同一进程里所有调度共用一个速率上限(rate_limit_per_sec,
+  允许 burst 次突发),并发数由 max_concurrency 控制
+- map() 结果顺序与输入一致;单个调用抛异常时该位置返回 default,不影响其他调用
+- 调用方只把确实会请求 LLM 的片段交给调度器,规则路径不受限速影响
+- 统计、学习实体等有共享状态的后处理由调用方在收集结果后串行完成
+- skip_limit() 为真(如 LLM 熔断中)时不取令牌:调用会被立即短路到规则兜底,
+  没必要再按限速排队
+- 工作线程在调用方的 contextvars 上下文中执行(如进程内 API 指定的记忆目录)
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_OPTIONS = {
+    "max_concurrency": 4,
+    "rate_limit_per_sec": 2.0,
+    "burst": 4,
+}
+
+
+class TokenBucket:
+    """令牌桶:rate 个/秒补充,最多攒 burst 个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌,不足时阻塞到补足(rate ≤ 0 表示不限速)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMDispatcher:
+    """并发 LLM 调度器"""
+
+    def __init__(self, max_concurrency: int = 4, rate_limit_per_sec: float = 2.0, burst: int = 4):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.bucket = TokenBucket(rate_limit_per_sec, burst)
+
+    def _call(self, fn: Callable, item: Any, default: Any, skip_limit: Optional[Callable[[], bool]] = None):
+        if skip_limit is None or not skip_limit():
+            self.bucket.acquire()
+        try:
+            return fn(item)
+        except Exception:
+            return default
+
+    def map(
+        self,
+        fn: Callable[[Any], Any],
+        items: Iterable[Any],
+        default: Any = None,
+        skip_limit: Optional[Callable[[], bool]] = None,
+    ) -> List[Any]:
+        """
+        并发执行 fn(item),按输入顺序返回结果
+
+        fn 抛出异常时对应位置为 default;skip_limit() 为真时该调用不取令牌
+        """
+        items = list(items)
+        if not items:
+            return []
+        if self.max_concurrency == 1 or len(items) == 1:
+            return [self._call(fn, item, default, skip_limit) for item in items]
+        workers = min(self.max_concurrency, len(items))
+        contexts = [contextvars.copy_context() for _ in items]  # Context 不能被多个线程同时进入
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-llm") as pool:
+            return list(pool.map(
+                lambda ctx, item: ctx.run(self._call, fn, item, default, skip_limit), contexts, items
+            ))
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_DISPATCHER: Optional[LLMDispatcher] = None
+_DISPATCHER_OPTIONS: Optional[Dict] = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_llm_dispatcher(options: Optional[Dict] = None) -> LLMDispatcher:
+    """
+    获取进程内共享的调度器(共用令牌桶)
+
+    options: 配置里的 llm_fallback 段,读取 max_concurrency / rate_limit_per_sec / burst;
+    参数变化时重建
+    """
+    global _DISPATCHER, _DISPATCHER_OPTIONS
+    options = options or {}
+    resolved = {key: options.get(key, default) for key, default in DEFAULT_OPTIONS.items()}
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None or resolved != _DISPATCHER_OPTIONS:
+            _DISPATCHER = LLMDispatcher(**resolved)
+            _DISPATCHER_OPTIONS = resolved
+        return _DISPATCHER
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM Stub Server
+本地 OpenAI 兼容桩服务:测试与基准使用,不访问真实 LLM
+
+- POST .../chat/completions,HTTP/1.1 keep-alive,返回标准 choices/usage 结构
+- 默认回复 "stub: <最后一条用户消息前 50 字>";可传入 responder(request) → 文本 自定义
+- 可配置人工延迟(latency_ms)与固定错误码(fail_status),统计请求数与 TCP 连接数
+
+用法:
+    python llm_stub_server.py --port 8765 --latency-ms 20      # 常驻,配合 OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+    python llm_stub_server.py --bench 200                       # 连接池 vs 每次新建连接(及 curl)的耗时对比
+"""
+
+import argparse
+import json
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.stub.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        stub.count("requests")
+        stub.last_headers = dict(self.headers)
+
+        if not self.path.endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "not found"}})
+        if stub.latency_ms:
+            time.sleep(stub.latency_ms / 1000)
+        if stub.fail_status:
+            return self._reply(stub.fail_status, {"error": {"message": "stub failure"}})
+        try:
+            request = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return self._reply(400, {"error": {"message": "invalid json"}})
+
+        content = stub.responder(request)
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", []))
+        completion_tokens = len(content)
+        self._reply(200, {
+            "id": f"stub-{stub.stats['requests']}",
+            "object": "chat.completion",
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def default_responder(request: Dict) -> str:
+    user_messages = [m.get("content", "") for m in request.get("messages", []) if m.get("role") == "user"]
+    return f"stub: {(user_messages[-1] if user_messages else '')[:50]}"
+
+
+class StubLLMServer:
+    """后台线程运行的桩服务(可作上下文管理器)"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        responder: Optional[Callable[[Dict], str]] = None,
+        latency_ms: float = 0,
+        fail_status: int = 0,
+    ):
+        self.responder = responder or default_responder
+        self.latency_ms = latency_ms
+        self.fail_status = fail_status
+        self.stats = {"requests": 0, "connections": 0}
+        self.last_headers: Dict = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+# ============================================================
+# 基准
+# ============================================================
+
+def run_bench(requests: int, latency_ms: float):
+    """对比连接池、每次新建连接、curl 子进程三种方式的单请求耗时"""
+    from llm_transport import LLMTransport
+
+    messages = [{"role": "user", "content": "评估以下内容的重要性:用户对花生过敏"}]
+    with StubLLMServer(latency_ms=latency_ms) as server:
+        results = {}
+
+        pooled = LLMTransport()
+        start = time.perf_counter()
+        for _ in range(requests):
+            pooled.chat_completion(server.base_url, "stub-key", "stub", messages, max_tokens=50)
+        results["连接池(keep-alive)"] = time.perf_counter() - start
+        pooled.close()
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            fresh = LLMTransport()
+            fresh.chat_completion(server.base_url, "stub-key", "stub", messages, max_tokens=50)
+            fresh.close()
+        results["每次新建连接"] = time.perf_counter() - start
+
+        if shutil.which("curl"):
+            data = json.dumps({"model": "stub", "messages": messages, "max_tokens": 50})
+            start = time.perf_counter()
+            for _ in range(requests):
+                subprocess.run(
+                    ["curl", "-s", f"{server.base_url}/chat/completions", "-H", "Content-Type: application/json", "-d", data],
+                    capture_output=True,
+                )
+            results["curl 子进程"] = time.perf_counter() - start
+
+    print(f"📊 LLM 传输基准({requests} 次请求,服务端延迟 {latency_ms}ms)")
+    for name, elapsed in results.items():
+        print(f"   {name}: {elapsed * 1000 / requests:.2f} ms/次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--bench", type=int, default=0, help="运行 N 次请求的传输基准后退出")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args.bench, args.latency_ms)
+        return
+
+    server = StubLLMServer(args.host, args.port, latency_ms=args.latency_ms)
+    print(f"🧪 LLM 桩服务: {server.base_url}(Ctrl+C 退出)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM Transport
+进程内共享的 OpenAI 兼容 HTTP 客户端(标准库 http.client + keep-alive 连接池)
+
+设计要点:
+- 按 (scheme, host, port) 维护空闲连接池,请求结束且响应读完后连接放回复用,
+  省去每次请求的进程创建与 TLS 握手(原实现每次起一个 curl 子进程)
+- API Key 只放在请求头里,不再出现在进程命令行上
+- 超时分两层:connect_timeout 限制建连,读超时按每次 socket 读计算;
+  另有整体 deadline(timeout),分块读取响应体时超过即中止,流式/慢速响应也不会无限挂起
+- 复用的连接可能已被服务端关闭:首次发送失败时换新连接重试一次
+- call_llm 与 v1.1.7 的 call_llm_with_fallback 共用同一个实例
+"""
+
+import http.client
+import json
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+MAX_IDLE_PER_HOST = 8
+READ_CHUNK = 16384
+
+
+class LLMTransportError(Exception):
+    """传输层错误(连接失败、超时、响应不可解析)"""
+
+
+class LLMTimeoutError(LLMTransportError):
+    """请求超过整体 deadline"""
+
+
+class LLMTransport:
+    """带连接池的 HTTP 客户端"""
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        self.connect_timeout = connect_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context: Optional[ssl.SSLContext] = None  # 首次 https 连接时再加载 CA(约 40ms)
+        self.stats = {"requests": 0, "connections": 0, "reused": 0, "retries": 0}
+
+    # ================================================================
+    # 连接池
+    # ================================================================
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["reused"] += 1
+                return idle.pop(), True
+            self.stats["connections"] += 1
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        return conn, False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    # ================================================================
+    # 请求
+    # ================================================================
+
+    def post_json(self, url: str, payload: Dict, headers: Optional[Dict] = None, timeout: float = DEFAULT_TIMEOUT) -> Tuple[int, bytes]:
+        """
+        POST JSON,返回 (状态码, 响应体)
+
+        超时抛 LLMTimeoutError,其他网络错误抛 LLMTransportError
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        key = (scheme, parts.hostname or "", parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request_headers = {"Content-Type": "application/json", "Connection": "keep-alive", **(headers or {})}
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            self.stats["requests"] += 1
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key)
+            try:
+                self._send(conn, path, body, request_headers, deadline)
+                response = conn.getresponse()
+                data = self._read_body(conn, response, deadline)
+            except LLMTimeoutError:
+                conn.close()
+                raise
+            except socket.timeout as e:
+                conn.close()
+                raise LLMTimeoutError(f"LLM call timed out ({timeout:.0f}s)") from e
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    # 服务端已关闭空闲连接,换新连接重试
+                    with self._lock:
+                        self.stats["retries"] += 1
+                    continue
+                raise LLMTransportError(f"HTTP request failed: {e}") from e
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return response.status, data
+        raise LLMTransportError("HTTP request failed")
+
+    def _send(self, conn, path: str, body: bytes, headers: Dict, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM call timed out before sending")
+        if conn.sock is None:
+            conn.timeout = min(self.connect_timeout, remaining)
+            conn.connect()
+            # 小请求/响应不等 Nagle 合包,避免与延迟 ACK 叠加出 ~40ms 停顿
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.sock.settimeout(remaining)
+        conn.request("POST", path, body=body, headers=headers)
+
+    @staticmethod
+    def _read_body(conn, response, deadline: float) -> bytes:
+        """分块读取响应体,每块前按剩余时间收紧 socket 超时"""
+        chunks = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError("LLM response exceeded deadline")
+            if conn.sock is not None:
+                conn.sock.settimeout(remaining)
+            chunk = response.read(READ_CHUNK)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def chat_completion(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        messages: List[Dict],
+        max_tokens: int = 1000,
+        temperature: float = 0.3,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> Dict:
+        """
+        OpenAI 兼容 /chat/completions
+
+        返回解析后的响应 JSON;HTTP 非 200 时返回 {"error": ...}
+        """
+        status, data = self.post_json(
+            f"{base_url.rstrip('/')}/chat/completions",
+            {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+        try:
+            resp = json.loads(data.decode("utf-8"))
+        except ValueError as e:
+            if status != 200:
+                return {"error": f"HTTP {status}: {data[:100].decode('utf-8', 'replace')}"}
+            raise LLMTransportError(f"invalid JSON response: {e}") from e
+        if status != 200 and "error" not in resp:
+            resp = {"error": f"HTTP {status}: {json.dumps(resp, ensure_ascii=False)[:100]}"}
+        return resp
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_TRANSPORT: Optional[LLMTransport] = None
+_TRANSPORT_LOCK = threading.Lock()
+
+
+def get_llm_transport() -> LLMTransport:
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None:
+            _TRANSPORT = LLMTransport()
+        return _TRANSPORT
+
+
+def message_content(resp: Dict) -> Tuple[str, Dict]:
+    """
+    取出回复文本与 usage
+
+    兼容思考模型:content 为空时使用 reasoning_content
+    """
+    message = resp["choices"][0]["message"]
+    content = message.get("content") or ""
+    if not content.strip():
+        content = message.get("reasoning_content") or ""
+    return content.strip(), resp.get("usage", {})
@@ -18,12 +18,19 @@ Memory System v1.4.0 - 三层记忆架构 CLI
 """
 
 import argparse
+import contextvars
+import copy
 import hashlib
 import json
 import os
 import re
 import subprocess
+import sys
+import threading
+import time
 import uuid
+from collections.abc import Mapping
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -38,16 +45,14 @@ except ImportError:
     V1_1_ENABLED = False
     print("⚠️ v1.1 模块未找到,部分功能不可用")
 
-# 导入 v1.1.5 实体系统模块(用于实体隔离和学习实体清理)
-try:
-    from v1_1_5_entity_system import ENTITY_SYSTEM_CONFIG
+# 导入 v1.7.0 按需导入(可选子系统在首次使用时才加载,*_ENABLED 只检查模块是否存在)
+from lazy_imports import lazy_module, module_available
 
-    V1_1_5_ENABLED = True
-except ImportError:
-    V1_1_5_ENABLED = False
-    # 静默失败,不打印警告(功能会优雅降级)
+# 导入 v1.1.5 实体系统模块(用于实体隔离和学习实体清理)
+v1_1_5_entity_system = lazy_module("v1_1_5_entity_system")
+V1_1_5_ENABLED = module_available("v1_1_5_entity_system")
 
-# 导入 v1.1.7 LLM 深度集成模块
+# 导入 v1.1.7 LLM 深度集成模块(保持立即导入:本模块在导入时向其安装 provider 钩子)
 try:
     from v1_1_7_llm_integration import (
         INTEGRATION_STATS,
@@ -61,80 +66,117 @@ try:
         smart_filter_segment,
     )
 
+    import v1_1_7_llm_integration
+
     V1_1_7_ENABLED = True
 except ImportError:
     V1_1_7_ENABLED = False
     # 静默失败,功能会优雅降级
 
-# 导入 v1.6.0 向量检索模块
-try:
-    from hybrid_search import HybridSearchEngine, create_hybrid_search_engine
-    from vector_embedding import VectorEmbeddingEngine, get_embedding_engine
-    from vector_index import VectorIndexManager, build_vector_index
+# 导入 v1.6.0 向量检索模块(v1.7.0: 本地向量索引,不再依赖 hybrid_search)
+vector_embedding = lazy_module("vector_embedding")
+vector_index = lazy_module("vector_index")
+VECTOR_SEARCH_ENABLED = module_available("vector_embedding", "vector_index")
 
-    VECTOR_SEARCH_ENABLED = True
-except ImportError:
-    VECTOR_SEARCH_ENABLED = False
+# 导入 v1.7.0 持久化嵌入缓存
+embedding_cache = lazy_module("embedding_cache")
+EMBEDDING_CACHE_ENABLED = module_available("embedding_cache")
 
 # 导入 v1.5.2 TF-IDF + RRF 混合检索
-try:
-    from tfidf_engine import tfidf_search, rrf_merge, build_tfidf_index
-    TFIDF_ENABLED = True
-except ImportError:
-    TFIDF_ENABLED = False
+tfidf_engine = lazy_module("tfidf_engine")
+TFIDF_ENABLED = module_available("tfidf_engine")
 
-# 导入主动记忆引擎模块
-try:
-    from proactive_engine import Intent, ProactiveMemoryEngine, Suggestion, create_engine
-    from proactive_executor import ProactiveExecutor, ProactiveSession, create_session
+# 导入 v1.7.0 学习实体匹配器(编译后按文件签名缓存)
+entity_matcher = lazy_module("entity_matcher")
+ENTITY_MATCHER_ENABLED = module_available("entity_matcher")
 
-    PROACTIVE_ENABLED = True
-except ImportError:
-    PROACTIVE_ENABLED = False
-    # 静默失败,功能会优雅降级
+# 导入 v1.7.0 相似实体表(实体隔离查表)
+entity_clusters = lazy_module("entity_clusters")
+ENTITY_CLUSTERS_ENABLED = module_available("entity_clusters")
 
-# 导入 v1.3.0 幻觉防御模块
-try:
-    from noise_filter import NoiseFilter
-    from memory_operator import MemoryOperator
-    from conflict_resolver import ConflictResolver
+# 导入 v1.7.0 会话级增量检索
+session_context = lazy_module("session_context")
+SESSION_CONTEXT_ENABLED = module_available("session_context")
 
-    _noise_filter_instance = NoiseFilter()
-    HALLUCINATION_DEFENSE_ENABLED = True
-except ImportError:
-    HALLUCINATION_DEFENSE_ENABLED = False
-    _noise_filter_instance = None
+# 导入 v1.7.0 基于代价的召回规划
+retrieval_planner = lazy_module("retrieval_planner")
+RETRIEVAL_PLANNER_ENABLED = module_available("retrieval_planner")
 
-# 导入 v1.4.0 时序引擎模块
-try:
-    from temporal_engine import (
-        TemporalQueryEngine,
-        FactEvolutionTracker,
-        EvidenceTracker,
-        create_temporal_engine,
-        create_evolution_tracker,
-        create_evidence_tracker,
-    )
-    TEMPORAL_ENGINE_ENABLED = True
-except ImportError:
-    TEMPORAL_ENGINE_ENABLED = False
+# 导入 v1.7.0 LLM 并发调度(线程池 + 令牌桶)
+llm_dispatcher = lazy_module("llm_dispatcher")
+LLM_DISPATCHER_ENABLED = module_available("llm_dispatcher")
+
+# 导入 v1.7.0 LLM 批量请求(多片段合并为一次调用)
+llm_batching = lazy_module("llm_batching")
+LLM_BATCHING_ENABLED = module_available("llm_batching")
+
+# 导入 v1.7.0 LLM 响应缓存
+llm_cache = lazy_module("llm_cache")
+LLM_CACHE_ENABLED = module_available("llm_cache")
+
+# 导入 v1.7.0 LLM 熔断器与自适应超时
+circuit_breaker = lazy_module("circuit_breaker")
+CIRCUIT_BREAKER_ENABLED = module_available("circuit_breaker")
+
+# 导入 v1.7.0 LLM 传输层(keep-alive 连接池,替代 curl 子进程)
+llm_transport = lazy_module("llm_transport")
+LLM_TRANSPORT_ENABLED = module_available("llm_transport")
+
+# 导入 v1.7.0 去重候选分块索引
+dedup_blocking = lazy_module("dedup_blocking")
+DEDUP_BLOCKING_ENABLED = module_available("dedup_blocking")
+
+# 导入 v1.7.0 惰性衰减(闭式公式,读取时计算)
+lazy_decay = lazy_module("lazy_decay")
+LAZY_DECAY_ENABLED = module_available("lazy_decay")
+
+# 导入 v1.7.0 近重复检测(MinHash + LSH)
+near_dup = lazy_module("near_dup")
+NEAR_DUP_ENABLED = module_available("near_dup")
+
+# 导入 v1.7.0 Consolidation 工作集(活跃池一次加载、统一提交)
+from consolidation_workset import MEMORY_TYPE_SINGULAR, MEMORY_TYPES, WorkingSet
+
+# 导入 v1.7.0 归档分段存储(只追加的压缩段)
+archive_store = lazy_module("archive_store")
+
+# 导入 v1.7.0 进程内 API(CLI 的检索/写入/统计命令是其上的格式化层)
+memory_api = lazy_module("memory_api")
+
+# 导入 v1.7.0 常驻守护进程(UNIX socket)
+from memory_daemon import DaemonError, MemoryDaemon
+from memory_daemon import ping as daemon_ping, request as daemon_request, shutdown as daemon_shutdown
+
+# 导入 v1.7.0 Consolidation 检查点(--resume / --time-budget)
+consolidation_checkpoint = lazy_module("consolidation_checkpoint")
+
+# 导入 v1.7.0 pending 倒排索引
+pending_index = lazy_module("pending_index")
+PENDING_INDEX_ENABLED = module_available("pending_index")
+
+# 导入主动记忆引擎模块
+proactive_engine = lazy_module("proactive_engine")
+PROACTIVE_ENABLED = module_available("proactive_engine", "proactive_executor")
+
+# 导入 v1.3.0 幻觉防御模块
+noise_filter = lazy_module("noise_filter")
+memory_operator = lazy_module("memory_operator")
+conflict_resolver = lazy_module("conflict_resolver")
+HALLUCINATION_DEFENSE_ENABLED = module_available("noise_filter", "memory_operator", "conflict_resolver")
+_noise_filter_instance = None  # 首次 is_noise 时创建
+
+# 导入 v1.4.0 时序引擎模块(v1.7.0: 基于时间分区索引的范围查询)
+temporal_engine = lazy_module("temporal_engine")
+temporal_index = lazy_module("temporal_index")
+TEMPORAL_ENGINE_ENABLED = module_available("temporal_engine", "temporal_index")
 
 # 导入扩展后端模块(阈值控制,>5000 条自动启用)
-try:
-    from scaled_backend import ScaledBackend
-    from async_indexer import AsyncIndexer
-    SCALED_BACKEND_AVAILABLE = True
-except ImportError:
-    SCALED_BACKEND_AVAILABLE = False
+scaled_backend = lazy_module("scaled_backend")
+SCALED_BACKEND_AVAILABLE = module_available("scaled_backend", "async_indexer")
 
-# 导入多级缓存模块
-try:
-    from cache_manager import CacheManager
-    _cache_manager_instance = CacheManager()
-    CACHE_MANAGER_ENABLED = True
-except ImportError:
-    CACHE_MANAGER_ENABLED = False
-    _cache_manager_instance = None
+# 导入多级缓存模块(v1.7.0: 按记忆目录创建,写入后按存储代数失效)
+cache_manager = lazy_module("cache_manager")
+CACHE_MANAGER_ENABLED = module_available("cache_manager")
 
 SCALED_BACKEND_THRESHOLD = 5000
 
@@ -153,10 +195,14 @@ def get_llm_config():
     }
 
 
+LLM_CALL_TIMEOUT = 60.0
+
+
 def call_llm(prompt, system_prompt=None, max_tokens=1000):
     """
     调用 LLM(使用用户的 API Key)
-    使用 curl 避免 Python requests SSL 兼容性问题
+    v1.7.0: 走进程内共享的 keep-alive 连接池(llm_transport),不再每次起 curl 子进程,
+    API Key 也不会出现在进程命令行上
 
     返回: (success: bool, result: str, error: str)
     """
@@ -170,60 +216,70 @@ def call_llm(prompt, system_prompt=None, max_tokens=1000):
     if not config["api_key"]:
         return False, None, "OPENAI_API_KEY not found in environment"
 
+    if not LLM_TRANSPORT_ENABLED:
+        return False, None, "LLM transport module not available"
+
+    # v1.7.0: 相同请求直接取缓存
+    cache = _get_llm_cache()
+    if cache is not None:
+        cached = cache.get(config["model"], system_prompt, prompt, max_tokens)
+        if cached is not None:
+            return True, cached, None
+
+    # v1.7.0: 熔断中直接失败,由调用方走规则兜底;超时按最近延迟自适应
+    breaker = _get_llm_breaker()
+    if breaker is not None and not breaker.allow():
+        _count_llm("short_circuited")
+        return False, None, "LLM circuit open"
+    timeout = breaker.timeout_for(max_tokens) if breaker is not None else LLM_CALL_TIMEOUT
+
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+
+    started = time.monotonic()
     try:
-        import subprocess, json as _json
-
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-
-        data = _json.dumps({
-            "model": config["model"],
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": 0.3
-        })
-
-        result = subprocess.run(
-            [
-                "curl", "-s", "--max-time", "60",
-                f"{config['base_url']}/chat/completions",
-                "-H", f"Authorization: Bearer {config['api_key']}",
-                "-H", "Content-Type: application/json",
-                "-d", data,
-            ],
-            capture_output=True, text=True, timeout=70
+        resp = llm_transport.get_llm_transport().chat_completion(
+            config["base_url"],
+            config["api_key"],
+            config["model"],
+            messages,
+            max_tokens=max_tokens,
+            temperature=0.3,
+            timeout=timeout,
         )
 
-        if result.returncode != 0:
-            LLM_STATS["errors"] += 1
-            return False, None, f"curl failed: {result.stderr}"
-
-        resp = _json.loads(result.stdout)
-
         if "error" in resp:
-            LLM_STATS["errors"] += 1
+            _count_llm("errors")
+            if breaker is not None:
+                breaker.record_failure(max_tokens)
             return False, None, f"API error: {resp['error']}"
 
-        message = resp["choices"][0]["message"]
-        content = message.get("content", "")
-
-        # 兼容思考模型：content 为空时尝试 reasoning_content
-        if not content.strip():
-            content = message.get("reasoning_content", "")
+        # 兼容思考模型:content 为空时使用 reasoning_content
+        content, usage = llm_transport.message_content(resp)
+        if breaker is not None:
+            breaker.record_success(max_tokens, time.monotonic() - started)
 
         # 统计 token 使用
-        usage = resp.get("usage", {})
-        LLM_STATS["total_tokens"] += usage.get("total_tokens", 0)
+        _count_llm("total_tokens", usage.get("total_tokens", 0))
 
-        return True, content.strip(), None
+        if cache is not None:
+            cache.put(config["model"], system_prompt, prompt, max_tokens, content, usage.get("total_tokens", 0))
 
-    except subprocess.TimeoutExpired:
-        LLM_STATS["errors"] += 1
-        return False, None, "LLM call timed out (60s)"
+        return True, content, None
+
+    except llm_transport.LLMTimeoutError:
+        _count_llm("errors")
+        if breaker is not None:
+            breaker.record_failure(max_tokens, timeout=timeout)
+        return False, None, f"LLM call timed out ({timeout:.0f}s)"
     except Exception as e:
-        LLM_STATS["errors"] += 1
+        _count_llm("errors")
+        if breaker is not None:
+            breaker.record_failure(max_tokens)
+        if isinstance(e, llm_transport.LLMTransportError):
+            return False, None, f"HTTP request failed: {e}"
         return False, None, f"LLM call failed: {str(e)}"
 
 
@@ -235,15 +291,36 @@ DEFAULT_CONFIG = {
     "version": "1.4.0",
     "decay_rates": {"fact": 0.008, "belief": 0.07, "summary": 0.025},
     "thresholds": {"archive": 0.05, "summary_trigger": 3},
+    "archive": {
+        "codec": "gzip",  # gzip / lzma(标准库)
+        "max_segments": 16,  # 每类归档段数上限,超出时合并最小的连续段
+    },
     "token_budget": {"layer1_total": 2000},
     "consolidation": {"fallback_hours": 48},
     "conflict_detection": {"enabled": True, "penalty": 0.2},
+    "llm_cache": {
+        "enabled": True,
+        "ttl_days": 30,
+        "max_size": 5000,
+    },
     "llm_fallback": {
         "enabled": True,
         "phase2_filter": True,
         "phase3_extract": True,
         "phase4b_verify": False,
         "min_confidence": 0.6,
+        # v1.7.0: Phase 2/3 LLM 兜底并发调度
+        "max_concurrency": 4,
+        "rate_limit_per_sec": 2.0,
+        "burst": 4,
+        "batch_size": 8,  # 多片段合并为一次请求(1 = 不分批)
+        # v1.7.0: 熔断与自适应超时(所有 LLM 调用点共用)
+        "breaker_failure_threshold": 5,  # 连续失败次数达到即熔断
+        "breaker_cooldown_seconds": 60,  # 熔断后冷却期,期间直接走规则兜底
+        "timeout_min_seconds": 5,
+        "timeout_max_seconds": 60,
+        "timeout_percentile": 0.95,  # 超时 = 最近延迟分位数 × multiplier
+        "timeout_multiplier": 3.0,
     },
     "funnel": {
         "tier2_threshold_lower": 0.35,
@@ -269,10 +346,13 @@ DEFAULT_CONFIG = {
     },
     "vector": {
         "enabled": False,
-        "provider": "openai",
-        "model": "text-embedding-3-small",
-        "dimension": 1536,
+        "provider": "hashing",
+        "model": None,
+        "dimension": 512,
+        "hashing": {"ngram_range": [1, 3], "projection_nnz": 1},
         "backend": "sqlite",
+        "ivf_threshold": 20000,
+        "nprobe": 12,
         "hybrid_search": {
             "keyword_weight": 0.3,
             "vector_weight": 0.7,
@@ -281,6 +361,29 @@ DEFAULT_CONFIG = {
         "cache": {"enabled": True, "max_size": 10000},
         "qdrant": {"host": "localhost", "port": 6333, "collection": "memory"},
     },
+    "pending_index": {"enabled": True, "persist": True, "min_coverage": 0.2},
+    "near_dup": {
+        "threshold": 0.8,  # 字符 3-gram 精确 Jaccard 复核阈值
+        "num_perm": 64,
+        "bands": 16,  # 64 / 16 = 每段 4 行,Jaccard 0.8 时漏检率 < 0.1%
+    },
+    "query_cache": {
+        "enabled": True,
+        "max_entries": 256,
+        "ttl_seconds": 1800,
+        "disk": True,
+        "disk_max_entries": 2000,
+    },
+    "session": {
+        "ttl_seconds": 21600,  # 会话候选池保留时间(inject --session)
+    },
+    "retrieval_planner": {
+        "enabled": True,
+        "explore_every": 20,  # 每 N 次同类查询全量召回一次,保持统计新鲜
+        "min_yield": 0.05,  # 产出低于该值且不便宜的召回器被跳过
+        "cheap_ms": 5.0,
+        "small_corpus": 500,  # 估算记录数低于该值时全部召回
+    },
     "proactive": {
         "enabled": True,
         "intent_window_size": 10,
@@ -332,6 +435,14 @@ NOISE_PATTERNS = {
 }
 
 
+def _get_noise_filter():
+    """NoiseFilter 单例(首次调用时导入并创建)"""
+    global _noise_filter_instance
+    if _noise_filter_instance is None:
+        _noise_filter_instance = noise_filter.NoiseFilter()
+    return _noise_filter_instance
+
+
 def is_noise(content: str) -> tuple[bool, str]:
     """
     前置废话检测,返回 (是否废话, 匹配的类别)
@@ -340,9 +451,9 @@ def is_noise(content: str) -> tuple[bool, str]:
     content = content.strip()
 
     # v1.3.0: 优先用 NoiseFilter(更强的 4 层过滤)
-    if HALLUCINATION_DEFENSE_ENABLED and _noise_filter_instance:
+    if HALLUCINATION_DEFENSE_ENABLED:
         try:
-            result = _noise_filter_instance.is_noise({"content": content})
+            result = _get_noise_filter().is_noise({"content": content})
             if result:
                 return True, "noise_filter"
         except Exception:
@@ -521,21 +632,72 @@ OVERRIDE_SIGNALS = OVERRIDE_SIGNALS_TIER1 + OVERRIDE_SIGNALS_TIER2
 CONFLICT_PENALTY = 0.2
 
 # LLM 调用统计(v1.1.3 新增)
-LLM_STATS = {"phase2_calls": 0, "phase3_calls": 0, "total_tokens": 0, "errors": 0}
+LLM_STATS = {"phase2_calls": 0, "phase3_calls": 0, "total_tokens": 0, "errors": 0, "short_circuited": 0}
+_LLM_STATS_LOCK = threading.Lock()  # v1.7.0: Phase 2/3 的 LLM 调用可能并发执行
+
+
+def _count_llm(key, n=1):
+    """线程安全地累加 LLM 统计"""
+    with _LLM_STATS_LOCK:
+        LLM_STATS[key] += n
+
+
+def _get_llm_cache():
+    """v1.7.0: 当前记忆目录的 LLM 响应缓存(未启用或目录未初始化时返回 None)"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    cache_config = get_config().get("llm_cache", DEFAULT_CONFIG["llm_cache"])
+    if not cache_config.get("enabled", True):
+        return None
+    memory_dir = get_memory_dir()
+    if not (memory_dir / "state").exists():
+        return None
+    return llm_cache.get_llm_cache(
+        memory_dir,
+        ttl_seconds=int(cache_config.get("ttl_days", 30) * 86400),
+        max_size=cache_config.get("max_size", 5000),
+    )
+
+
+def _get_llm_breaker():
+    """v1.7.0: 进程内共享的 LLM 熔断器(模块不可用时返回 None)"""
+    if not CIRCUIT_BREAKER_ENABLED:
+        return None
+    return circuit_breaker.get_circuit_breaker(get_config().get("llm_fallback", {}))
+
+
+def _llm_circuit_open():
+    breaker = _get_llm_breaker()
+    return breaker is not None and breaker.is_open()
+
+
+if V1_1_7_ENABLED:
+    v1_1_7_llm_integration.RESPONSE_CACHE_PROVIDER = _get_llm_cache
+    v1_1_7_llm_integration.CIRCUIT_BREAKER_PROVIDER = _get_llm_breaker
+    if LLM_TRANSPORT_ENABLED:
+        v1_1_7_llm_integration.TRANSPORT_PROVIDER = lambda: llm_transport.get_llm_transport()
 
 # ============================================================
 # 工具函数
 # ============================================================
 
 
+# v1.7.0: 进程内 API 按调用上下文指定记忆目录(优先于环境变量,见 using_memory_dir)
+_MEMORY_DIR_OVERRIDE = contextvars.ContextVar("memory_dir", default=None)
+
+
 def get_memory_dir():
     """获取记忆系统根目录
 
     优先级:
+    0. using_memory_dir() 指定的目录(当前调用上下文)
     1. MEMORY_DIR 环境变量(直接指定记忆目录路径)
     2. WORKSPACE 环境变量 + /memory
     3. 当前工作目录 + /memory
     """
+    override = _MEMORY_DIR_OVERRIDE.get()
+    if override is not None:
+        return override
     memory_dir = os.environ.get("MEMORY_DIR")
     if memory_dir:
         return Path(memory_dir)
@@ -543,20 +705,32 @@ def get_memory_dir():
     return Path(workspace) / "memory"
 
 
+@contextmanager
+def using_memory_dir(memory_dir):
+    """在当前上下文(线程/协程)内把 get_memory_dir() 固定为 memory_dir,不修改环境变量"""
+    token = _MEMORY_DIR_OVERRIDE.set(Path(memory_dir))
+    try:
+        yield
+    finally:
+        _MEMORY_DIR_OVERRIDE.reset(token)
+
+
 def get_config():
-    """读取配置"""
-    config_path = get_memory_dir() / "config.json"
-    if config_path.exists():
-        with open(config_path, encoding="utf-8") as f:
-            return json.load(f)
-    return DEFAULT_CONFIG
+    """
+    读取配置
+    v1.7.0: 按文件 mtime 缓存解析结果,返回值只读;需要修改后保存时先 copy.deepcopy
+    """
+    config = _read_warm(get_memory_dir() / "config.json", _load_json)
+    return DEFAULT_CONFIG if config is None else config
 
 
-def save_config(config):
+def save_config(config, memory_dir=None):
     """保存配置"""
-    config_path = get_memory_dir() / "config.json"
+    config_path = Path(memory_dir or get_memory_dir()) / "config.json"
     with open(config_path, "w", encoding="utf-8") as f:
         json.dump(config, f, indent=2, ensure_ascii=False)
+    with _WARM_LOCK:
+        _WARM_CACHE.pop(config_path, None)
 
 
 def load_jsonl(path):
@@ -572,6 +746,80 @@ def load_jsonl(path):
     return records
 
 
+_WARM_CACHE = {}
+_WARM_LOCK = threading.Lock()
+
+
+def _read_warm(path, loader):
+    """
+    v1.7.0: 读取并缓存文件解析结果,文件大小或 mtime 变化即重新加载(文件不存在返回 None)
+    返回值在进程内共享,调用方不得修改;守护进程常驻时跨请求复用
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _WARM_LOCK:
+        cached = _WARM_CACHE.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    value = loader(path)
+    with _WARM_LOCK:
+        _WARM_CACHE[path] = (stamp, value)
+    return value
+
+
+def _load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _active_memory_maps(memory_dir):
+    """v1.7.0: 各类活跃记忆的 {id: record}(只读,按文件状态缓存)"""
+    maps = []
+    for mem_type in MEMORY_TYPES:
+        path = memory_dir / f"layer2/active/{mem_type}.jsonl"
+        maps.append(_read_warm(path, lambda p: {r["id"]: r for r in load_jsonl(p)}) or {})
+    return maps
+
+
+def _find_active(maps, memory_id):
+    for records in maps:
+        if memory_id in records:
+            return records[memory_id]
+    return None
+
+
+def _active_record(maps, memory_id):
+    """v1.7.0: 按 id 取活跃记录的浅拷贝并标注 type(maps 来自 _active_memory_maps,不得原地修改)"""
+    for mem_type, records in zip(MEMORY_TYPES, maps):
+        record = records.get(memory_id)
+        if record is not None:
+            return {**record, "type": MEMORY_TYPE_SINGULAR[mem_type], "entities": list(record.get("entities", []))}
+    return None
+
+
+class _ActiveRecords(Mapping):
+    """v1.7.0: 活跃池缓存之上的只读 {id: record} 视图;按 id 取值时返回 _active_record 的带类型拷贝"""
+
+    def __init__(self, maps):
+        self._maps = maps
+
+    def __getitem__(self, memory_id):
+        record = _active_record(self._maps, memory_id)
+        if record is None:
+            raise KeyError(memory_id)
+        return record
+
+    def __iter__(self):
+        for records in self._maps:
+            yield from records
+
+    def __len__(self):
+        return sum(len(records) for records in self._maps)
+
+
 def save_jsonl(path, records):
     """保存 JSONL 文件"""
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -644,7 +892,7 @@ def calculate_importance(content):
     return final_score, category
 
 
-def rule_filter(segments, threshold=0.3, use_llm_fallback=True):
+def rule_filter(segments, threshold=0.3, use_llm_fallback=True, journal=None, budget=None):
     """
     Phase 2: 重要性筛选(v1.1.7:智能 LLM 集成)
 
@@ -653,16 +901,22 @@ def rule_filter(segments, threshold=0.3, use_llm_fallback=True):
     - 扩大 LLM 触发区间:0.2~0.5(原 0.2~0.3)
     - LLM 失败回退:失败时回退到规则结果,不丢弃
 
+    v1.7.0: 先按规则逐段判断,需要 LLM 的片段交给并发调度器一次性处理,
+    结果按原顺序合并;journal / budget 为 Consolidation 检查点(见 _run_llm_batches)
+
     输入: 语义片段列表
     输出: 筛选后的重要片段列表(带 importance 标注)
     """
     config = get_config()
     llm_enabled = config.get("llm_fallback", {}).get("enabled", True) and use_llm_fallback
     phase2_llm = config.get("llm_fallback", {}).get("phase2_filter", True)
+    smart_mode = V1_1_7_ENABLED and llm_enabled and phase2_llm
 
-    filtered = []
     noise_skipped = 0  # v1.2.0 统计
 
+    # 1. 规则判断,标出需要 LLM 的片段
+    candidates = []  # (content, source, rule_importance, rule_category)
+    llm_indices = []
     for segment in segments:
         content = segment.get("content", "") if isinstance(segment, dict) else segment
         source = segment.get("source", "unknown") if isinstance(segment, dict) else "unknown"
@@ -673,18 +927,66 @@ def rule_filter(segments, threshold=0.3, use_llm_fallback=True):
             noise_skipped += 1
             continue
 
-        # 1. 规则判断
         rule_importance, rule_category = calculate_importance(content)
+        if smart_mode:
+            if should_use_llm_for_filtering(content, rule_importance, rule_category)[0]:
+                llm_indices.append(len(candidates))
+        elif llm_enabled and phase2_llm and threshold - 0.1 <= rule_importance < threshold:
+            # 不确定区间,尝试 LLM
+            llm_indices.append(len(candidates))
+        candidates.append((content, source, rule_importance, rule_category))
+
+    # 2. v1.7.0: LLM 兜底分批并发执行(无 API Key 时不会发起请求,直接串行走回退)
+    if smart_mode:
+        def llm_call(index):
+            content, _, rule_importance, rule_category = candidates[index]
+            return smart_filter_segment(
+                content=content,
+                rule_importance=rule_importance,
+                rule_category=rule_category,
+                config_dict=config,
+            )
+
+        def llm_batch_call(indices):
+            return smart_filter_batch([candidates[i] for i in indices], config)
 
-        # 2. v1.1.7: 智能 LLM 集成
-        if V1_1_7_ENABLED and llm_enabled and phase2_llm:
-            # 使用智能筛选(自动决定是否调用 LLM)
-            smart_result = smart_filter_segment(
+        reachable = bool(get_api_key(config))
+    else:
+        def llm_call(index):
+            return llm_filter_segment(candidates[index][0])
+
+        def llm_batch_call(indices):
+            return llm_filter_batch([candidates[i][0] for i in indices])
+
+        llm_config = get_llm_config()
+        reachable = llm_config["enabled"] and bool(llm_config["api_key"])
+    llm_results = dict(zip(
+        llm_indices,
+        _run_llm_batches(
+            llm_indices,
+            llm_batch_call,
+            llm_call,
+            config,
+            parallel=reachable,
+            journal=journal,
+            key_of=lambda index: consolidation_checkpoint.content_key(candidates[index][0]),
+            budget=budget,
+        ),
+    ))
+
+    # 3. 按原顺序合并
+    filtered = []
+    for i, (content, source, rule_importance, rule_category) in enumerate(candidates):
+        if smart_mode:
+            # 不需要 LLM 的片段由 smart_filter_segment 直接返回规则结果
+            smart_result = llm_results[i] if i in llm_results else smart_filter_segment(
                 content=content,
                 rule_importance=rule_importance,
                 rule_category=rule_category,
                 config_dict=config,
             )
+            if smart_result is None:  # 调用异常,回退规则结果
+                smart_result = {"importance": rule_importance, "category": rule_category, "method": "rule_fallback"}
 
             importance = smart_result["importance"]
             category = smart_result["category"]
@@ -718,25 +1020,88 @@ def rule_filter(segments, threshold=0.3, use_llm_fallback=True):
                     "method": "rule",
                 }
                 filtered.append(result)
-            elif rule_importance >= threshold - 0.1:
-                # 不确定区间,尝试 LLM
-                if llm_enabled and phase2_llm:
-                    llm_result = llm_filter_segment(content)
-                    if llm_result:
-                        importance = llm_result.get("importance", rule_importance)
-                        if importance >= threshold:
-                            result = {
-                                "content": content,
-                                "importance": importance,
-                                "category": llm_result.get("category", rule_category),
-                                "source": source,
-                                "method": "llm",
-                            }
-                            filtered.append(result)
+            elif llm_results.get(i):
+                llm_result = llm_results[i]
+                importance = llm_result.get("importance", rule_importance)
+                if importance >= threshold:
+                    result = {
+                        "content": content,
+                        "importance": importance,
+                        "category": llm_result.get("category", rule_category),
+                        "source": source,
+                        "method": "llm",
+                    }
+                    filtered.append(result)
 
     return filtered
 
-    return filtered
+
+def _dispatch_llm(fn, items, config, parallel=True):
+    """
+    v1.7.0: 把一批 LLM 调用交给并发调度器,结果顺序与 items 一致
+
+    parallel=False(无 API Key 等不会真正请求的情况)或调度器不可用时串行执行
+    """
+    items = list(items)
+    if not items:
+        return []
+    if LLM_DISPATCHER_ENABLED and parallel:
+        return llm_dispatcher.get_llm_dispatcher(config.get("llm_fallback", {})).map(fn, items, skip_limit=_llm_circuit_open)
+    return [fn(item) for item in items]
+
+
+def _llm_batch_size(config):
+    return config.get("llm_fallback", {}).get("batch_size", llm_batching.DEFAULT_BATCH_SIZE if LLM_BATCHING_ENABLED else 1)
+
+
+def _run_llm_batches(items, batch_call, single_call, config, parallel=True, journal=None, key_of=None, budget=None):
+    """
+    v1.7.0: 按 batch_size 把片段合并为批量请求,各批经调度器并发执行
+
+    批量响应解析失败时该批逐条调用;批量模块不可用或 batch_size ≤ 1 时逐条调度
+
+    journal(Consolidation 检查点日志)给出时:已有结果的片段直接取日志,其余按轮
+    (每轮 batch_size × max_concurrency 个)执行,每轮结束写入日志;budget 用尽时
+    在轮次之间抛 ConsolidationPaused。key_of 把 item 映射为日志键
+    """
+    if journal is None and budget is None:
+        return _run_llm_batches_now(items, batch_call, single_call, config, parallel)
+
+    items = list(items)
+    key_of = key_of or consolidation_checkpoint.content_key
+    results = {}
+    todo = []
+    for i, item in enumerate(items):
+        key = key_of(item)
+        if journal is not None and key in journal:
+            results[i] = journal.get(key)
+        else:
+            todo.append(i)
+
+    llm_fallback = config.get("llm_fallback", {})
+    round_size = max(1, _llm_batch_size(config)) * max(1, int(llm_fallback.get("max_concurrency", 4)))
+    for start in range(0, len(todo), round_size):
+        if budget is not None:
+            budget.check("下一轮 LLM 批次")
+        part = todo[start:start + round_size]
+        part_results = _run_llm_batches_now([items[i] for i in part], batch_call, single_call, config, parallel)
+        results.update(zip(part, part_results))
+        if journal is not None:
+            journal.record((key_of(items[i]), result) for i, result in zip(part, part_results))
+    return [results.get(i) for i in range(len(items))]
+
+
+def _run_llm_batches_now(items, batch_call, single_call, config, parallel=True):
+    batch_size = _llm_batch_size(config)
+    if not LLM_BATCHING_ENABLED or batch_size <= 1:
+        return _dispatch_llm(single_call, items, config, parallel=parallel)
+    return llm_batching.run_batches(
+        items,
+        batch_call,
+        single_call,
+        batch_size=batch_size,
+        mapper=lambda fn, batches: _dispatch_llm(fn, batches, config, parallel=parallel),
+    )
 
 
 def llm_filter_segment(content):
@@ -745,7 +1110,7 @@ def llm_filter_segment(content):
 
     返回: {"importance": float, "category": str} 或 None
     """
-    LLM_STATS["phase2_calls"] += 1
+    _count_llm("phase2_calls")
 
     system_prompt = """你是一个记忆重要性评估专家.
 评估用户输入的重要性(0-1),并分类.
@@ -786,6 +1151,99 @@ def llm_filter_segment(content):
     return None
 
 
+_FILTER_BATCH_SYSTEM_PROMPT = """你是一个记忆重要性评估专家.
+逐条评估用户输入的重要性(0-1),并分类.
+
+分类标准:
+- identity_health_safety (1.0): 身份/健康/安全相关
+- preference_relation_status (0.8): 偏好/关系/状态变更
+- project_task_goal (0.7): 项目/任务/目标
+- general_fact (0.5): 一般事实
+- temporary (0.2): 临时信息
+
+返回 JSON 数组,每条内容一个对象:
+[{"index": 0, "importance": 0.8, "category": "preference_relation_status"}]"""
+
+
+def llm_filter_batch(contents):
+    """
+    v1.7.0: 一次请求评估多个片段(llm_filter_segment 的批量版)
+
+    返回: 与 contents 对应的 [{"importance", "category"} 或 None];
+    响应格式不合法时返回 None(由调用方逐条回退)
+    """
+    _count_llm("phase2_calls")
+
+    prompt = llm_batching.build_batch_prompt("评估以下每条内容的重要性:", contents)
+    success, result, error = call_llm(prompt, _FILTER_BATCH_SYSTEM_PROMPT, max_tokens=60 * len(contents) + 100)
+    if not success:
+        return [None] * len(contents)  # 请求失败与逐条调用失败一致:回退规则结果
+
+    items = llm_batching.parse_batch_response(result, len(contents))
+    if items is None:
+        return None
+    try:
+        return [
+            {"importance": float(d.get("importance", 0.5)), "category": d.get("category", "general_fact")}
+            for d in items
+        ]
+    except (TypeError, ValueError):
+        return None
+
+
+def smart_filter_batch(candidates, config):
+    """
+    v1.7.0: smart_filter_segment 的批量版(v1.1.7 智能筛选路径)
+
+    candidates: [(content, source, rule_importance, rule_category)]
+    返回: 与 smart_filter_segment 结构相同的结果列表;响应格式不合法时返回 None
+    """
+    system_prompt = """你是一个记忆重要性评估专家。逐条评估用户输入的重要性（0-1），并分类。
+
+分类标准：
+- identity_health_safety (0.9-1.0): 身份、健康、安全、过敏、密码、密钥
+- preference_relation (0.7-0.9): 偏好、关系、态度、观点
+- project_task (0.5-0.7): 项目、任务、目标、计划
+- general_fact (0.3-0.5): 一般事实、描述
+- temporary (0.1-0.3): 临时信息、闲聊
+
+返回 JSON 数组，每条内容一个对象：
+[{"index": 0, "importance": 0.8, "category": "preference_relation", "reason": "简短理由"}]"""
+
+    contents = [c[0] for c in candidates]
+    llm_response, method, stats = call_llm_with_fallback(
+        prompt=llm_batching.build_batch_prompt("评估以下每条内容的重要性：", contents),
+        system_prompt=system_prompt,
+        fallback_result=None,
+        config_dict=config,
+        max_tokens=60 * len(contents) + 100,
+    )
+
+    items = llm_batching.parse_batch_response(llm_response, len(contents)) if method == "llm" else None
+    if method == "llm" and items is None:
+        return None
+
+    results = []
+    for i, (content, _, rule_importance, rule_category) in enumerate(candidates):
+        result = {
+            "importance": rule_importance,
+            "category": rule_category,
+            "method": method,
+            "complexity": detect_semantic_complexity(content),
+            "llm_stats": stats if i == 0 else None,  # 一批只计一次调用
+            "decision_reason": "batch",
+        }
+        if items is not None:
+            try:
+                result["importance"] = float(items[i].get("importance", rule_importance))
+                result["category"] = items[i].get("category", rule_category)
+                result["llm_reason"] = items[i].get("reason", "")
+            except (TypeError, ValueError):
+                return None
+        results.append(result)
+    return results
+
+
 # ============================================================
 # Phase 3: 深度提取 - template_extract()
 # ============================================================
@@ -848,25 +1306,11 @@ def extract_entities(content, memory_dir=None, use_llm_fallback=True):
                             matched_positions.add(i)
 
     # ===== Layer 2: 学习过的实体(v1.1.5 新增)=====
-    if V1_1_5_ENABLED and memory_dir:
-        from v1_1_5_entity_system import load_learned_entities
-
-        learned = load_learned_entities(memory_dir)
-
-        # 精确匹配
-        for exact in learned.get("exact", []):
-            if exact in content and exact not in entities:
-                entities.append(exact)
-
-        # 学习的模式匹配
-        for pattern in learned.get("patterns", []):
-            try:
-                for match in re.finditer(pattern, content):
-                    matched_text = match.group()
-                    if matched_text not in entities:
-                        entities.append(matched_text)
-            except re.error:
-                continue
+    # v1.7.0: 走进程内缓存的编译态匹配器,不再每次读取 learned_entities.json
+    if ENTITY_MATCHER_ENABLED and memory_dir:
+        for matched_text in entity_matcher.get_entity_matcher(memory_dir).find_all(content):
+            if matched_text not in entities:
+                entities.append(matched_text)
 
     # ===== Layer 3: LLM 兜底(v1.1.5 新增)=====
     if not entities and V1_1_5_ENABLED and use_llm_fallback:
@@ -874,16 +1318,27 @@ def extract_entities(content, memory_dir=None, use_llm_fallback=True):
         llm_enabled = config.get("llm_fallback", {}).get("enabled", True)
 
         if llm_enabled:
-            llm_result = llm_extract_entities(content)
-            if llm_result:
-                entities = llm_result.get("entities", [])
+            entities = _apply_llm_entities(llm_extract_entities(content), memory_dir)
+
+    return _normalize_entities(entities)
+
+
+def _apply_llm_entities(llm_result, memory_dir):
+    """Layer 3 收尾:取 LLM 结果中的实体并学习(串行执行,学习会写 learned_entities.json)"""
+    if not llm_result:
+        return []
+    entities = llm_result.get("entities", [])
+
+    # 学习新实体
+    if entities and memory_dir:
+        from v1_1_5_entity_system import learn_new_entities
 
-                # 学习新实体
-                if entities and memory_dir:
-                    from v1_1_5_entity_system import learn_new_entities
+        learn_new_entities(entities, memory_dir)
+    return entities
 
-                    learn_new_entities(entities, memory_dir)
 
+def _normalize_entities(entities):
+    """实体去重和过滤"""
     # ===== 去重和过滤(原有逻辑)=====
     entities = [e for e in set(entities) if e and len(e) > 1]
 
@@ -938,12 +1393,12 @@ def classify_memory_type(content, importance):
     return "fact"
 
 
-def template_extract(filtered_segments, use_llm_fallback=True, memory_dir=None):
+def template_extract(filtered_segments, use_llm_fallback=True, memory_dir=None, journal=None, budget=None):
     """
     Phase 3: 深度提取(v1.1.5:三层实体识别 + LLM 兜底)
     将筛选后的片段转为结构化 facts/beliefs
 
-    模板匹配优先,LLM 兜底
+    模板匹配优先,LLM 兜底;journal / budget 为 Consolidation 检查点(见 _run_llm_batches)
     """
     config = get_config()
     llm_enabled = config.get("llm_fallback", {}).get("enabled", True) and use_llm_fallback
@@ -955,14 +1410,30 @@ def template_extract(filtered_segments, use_llm_fallback=True, memory_dir=None):
 
     extracted = {"facts": [], "beliefs": [], "summaries": []}
 
-    for segment in filtered_segments:
+    # 1. v1.1.5: 三层实体识别(传入 memory_dir)
+    # v1.7.0: 先对全部片段做规则识别,规则未识别出实体的片段再并发走 LLM 兜底
+    raw_entities = [extract_entities(s["content"], memory_dir=memory_dir, use_llm_fallback=False) for s in filtered_segments]
+    if V1_1_5_ENABLED and llm_enabled and phase3_llm:
+        missing = [i for i, entities in enumerate(raw_entities) if not entities]
+        llm_config = get_llm_config()
+        llm_results = _run_llm_batches(
+            [filtered_segments[i]["content"] for i in missing],
+            llm_extract_entities_batch,
+            llm_extract_entities,
+            config,
+            parallel=llm_config["enabled"] and bool(llm_config["api_key"]),
+            journal=journal,
+            budget=budget,
+        )
+        for i, llm_result in zip(missing, llm_results):
+            raw_entities[i] = _normalize_entities(_apply_llm_entities(llm_result, memory_dir))
+
+    for segment, entities in zip(filtered_segments, raw_entities):
         content = segment["content"]
         importance = segment["importance"]
         source = segment.get("source", "unknown")
         method = segment.get("method", "rule")
 
-        # 1. v1.1.5: 三层实体识别(传入 memory_dir)
-        entities = extract_entities(content, memory_dir=memory_dir, use_llm_fallback=llm_enabled and phase3_llm)
         mem_type = classify_memory_type(content, importance)
         _, content_category = calculate_importance(content)
 
@@ -1022,7 +1493,7 @@ def llm_extract_entities(content):
 
     返回: {"entities": [...], "type": "fact/belief"} 或 None
     """
-    LLM_STATS["phase3_calls"] += 1
+    _count_llm("phase3_calls")
 
     system_prompt = """你是一个实体提取专家.
 从用户输入中提取关键实体(人物/地点/项目/组织等).
@@ -1056,6 +1527,35 @@ type 可选值:
     return None
 
 
+def llm_extract_entities_batch(contents):
+    """
+    v1.7.0: 一次请求提取多个片段的实体(llm_extract_entities 的批量版)
+
+    返回: 与 contents 对应的 [{"entities", "type"} 或 None];响应格式不合法时返回 None
+    """
+    _count_llm("phase3_calls")
+
+    system_prompt = """你是一个实体提取专家.
+逐条从用户输入中提取关键实体(人物/地点/项目/组织等).
+
+返回 JSON 数组,每条内容一个对象:
+[{"index": 0, "entities": ["实体1", "实体2"], "type": "fact"}]
+
+type 可选值:
+- fact: 确定的事实
+- belief: 推断或不确定的信息"""
+
+    prompt = llm_batching.build_batch_prompt("从以下每条内容中提取实体:", contents)
+    success, result, error = call_llm(prompt, system_prompt, max_tokens=60 * len(contents) + 100)
+    if not success:
+        return [None] * len(contents)
+
+    items = llm_batching.parse_batch_response(result, len(contents))
+    if items is None or not all(isinstance(d.get("entities", []), list) for d in items):
+        return None
+    return [{"entities": d.get("entities", []), "type": d.get("type", "fact")} for d in items]
+
+
 # ============================================================
 # Phase-4A: Facts 去重合并
 # ============================================================
@@ -1110,16 +1610,27 @@ def deduplicate_facts(new_facts, existing_facts):
 
 
 def _deduplicate_with_operator(new_facts, existing_facts):
-    """v1.3.0: 使用 MemoryOperator + ConflictResolver 去重"""
-    operator = MemoryOperator()
-    resolver = ConflictResolver()
+    """
+    v1.3.0: 使用 MemoryOperator + ConflictResolver 去重
+
+    v1.7.0: 已有 facts 建一次实体/词签名分块索引,每条新 fact 只与候选比较
+    (候选是冲突集的超集且保持原顺序,决策与全量比较一致)
+    """
+    operator = memory_operator.MemoryOperator()
+    resolver = conflict_resolver.ConflictResolver()
+    blocking = (
+        dedup_blocking.FactBlockingIndex(existing_facts, operator._token_set, operator.similarity_threshold)
+        if DEDUP_BLOCKING_ENABLED
+        else None
+    )
 
     merged = []
     duplicate_count = 0
     downgraded_count = 0
 
     for new_fact in new_facts:
-        operation, target = operator.decide_operation(new_fact, existing_facts)
+        candidates = blocking.candidates(new_fact) if blocking is not None else existing_facts
+        operation, target = operator.decide_operation(new_fact, candidates)
 
         if operation == "NOOP":
             duplicate_count += 1
@@ -1130,19 +1641,21 @@ def _deduplicate_with_operator(new_facts, existing_facts):
         elif operation == "UPDATE" and target:
             resolution = resolver.resolve(new_fact, target)
             if resolution["action"] == "UPDATE":
-                # 用新记忆内容更新旧记忆
+                # 用新记忆内容更新旧记忆(先按旧 importance 落盘当前分数)
+                target["score"] = max(materialize_score(target), new_fact.get("score", 0))
                 target["content"] = new_fact["content"]
                 target["importance"] = new_fact.get("importance", target["importance"])
-                target["score"] = max(target.get("score", 0), new_fact.get("score", 0))
                 target["updated"] = now_iso()
                 target["supersedes"] = json.dumps([target.get("id")])
+                if blocking is not None:
+                    blocking.update(target)
                 downgraded_count += 1
             else:
                 # KEEP 旧记忆,丢弃新记忆
                 duplicate_count += 1
 
         elif operation == "DELETE" and target:
-            target["score"] = target.get("score", 0.5) * 0.1
+            target["score"] = materialize_score(target) * 0.1
             target["conflict_downgraded"] = True
             target["downgrade_reason"] = new_fact["id"]
             target["downgrade_at"] = now_iso()
@@ -1192,7 +1705,7 @@ def _deduplicate_legacy(new_facts, existing_facts):
 
                     if is_similar:
                         if has_override and overlap_ratio >= DEDUP_CONFIG["min_overlap_ratio"]:
-                            old_score = existing.get("score", existing.get("importance", 0.5))
+                            old_score = materialize_score(existing)
                             if has_tier1_override:
                                 penalty = DEDUP_CONFIG["tier1_penalty"]
                                 existing["override_tier"] = 1
@@ -1206,9 +1719,9 @@ def _deduplicate_legacy(new_facts, existing_facts):
                             downgraded_count += 1
                         else:
                             if new_fact["importance"] > existing.get("importance", 0):
+                                existing["score"] = max(materialize_score(existing), new_fact["score"])
                                 existing["content"] = new_fact["content"]
                                 existing["importance"] = new_fact["importance"]
-                                existing["score"] = max(existing.get("score", 0), new_fact["score"])
                             is_duplicate = True
                             duplicate_count += 1
                         break
@@ -1464,50 +1977,112 @@ QUERY_CONFIG = {
     "broad": {"initial": 35, "rerank": 25, "final": 18},
 }
 
-# 会话缓存
-_session_cache = {}
-_cache_ttl = 1800  # 30分钟
+def get_cache_key(query, *variant):
+    """生成缓存键(variant 区分同一查询的不同检索选项)"""
+    raw = "\x1f".join([query] + [str(v) for v in variant])
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+
+def _get_query_cache(memory_dir):
+    """获取查询缓存(未启用时返回 None)"""
+    if not CACHE_MANAGER_ENABLED:
+        return None
+    cache_config = get_config().get("query_cache", DEFAULT_CONFIG["query_cache"])
+    if not cache_config.get("enabled", True):
+        return None
+    try:
+        return cache_manager.get_cache_manager(
+            memory_dir,
+            max_entries=cache_config.get("max_entries", 256),
+            ttl_seconds=cache_config.get("ttl_seconds", 1800),
+            disk=cache_config.get("disk", True),
+            disk_max_entries=cache_config.get("disk_max_entries", 2000),
+        )
+    except Exception:
+        return None
+
 
+def get_cached_result(key, memory_dir):
+    """获取缓存结果(v1.7.0: L1 内存 LRU → L2 SQLite,存储代数变化即失效)"""
+    cache = _get_query_cache(memory_dir)
+    if cache is None:
+        return None
+    try:
+        return cache.get_query_result(key)
+    except Exception:
+        return None  # 降级为不缓存
 
-def get_cache_key(query):
-    """生成缓存键"""
-    return hashlib.md5(query.encode()).hexdigest()[:12]
 
+def set_cached_result(key, result, memory_dir):
+    """设置缓存结果"""
+    cache = _get_query_cache(memory_dir)
+    if cache is None:
+        return
+    try:
+        cache.set_query_result(key, result)
+    except Exception:
+        pass  # 降级为不缓存
 
-def get_cached_result(query):
-    """获取缓存结果(v1.3.0: 优先用 CacheManager L2 缓存)"""
-    key = get_cache_key(query)
 
-    if CACHE_MANAGER_ENABLED and _cache_manager_instance:
+def mark_store_changed(memory_dir):
+    """
+    记忆存储写入后调用:递增存储代数,使所有进程的查询缓存失效
+    v1.7.0: 同时增量同步本进程已加载的时间索引
+    """
+    if CACHE_MANAGER_ENABLED:
+        try:
+            cache_manager.invalidate_store(memory_dir)
+        except Exception:
+            pass
+    if TEMPORAL_ENGINE_ENABLED:
         try:
-            result = _cache_manager_instance.get_query_result(key)
-            if result is not None:
-                return result
+            temporal_index.refresh_temporal_index(memory_dir)
         except Exception:
-            pass  # 降级到内存缓存
+            pass
 
-    # 原有内存缓存兜底
-    if key in _session_cache:
-        entry = _session_cache[key]
-        if datetime.utcnow().timestamp() - entry["time"] < _cache_ttl:
-            return entry["result"]
-        else:
-            del _session_cache[key]
-    return None
 
+def _decay_model(config=None):
+    """v1.7.0: 按配置构造闭式衰减模型(v1.1 模块可用时带访问保护,与逐日衰减一致)"""
+    config = config or get_config()
+    protection = DECAY_WITH_ACCESS_CONFIG["access_protection"] if V1_1_ENABLED else None
+    return lazy_decay.DecayModel(
+        config.get("decay_rates", DEFAULT_CONFIG["decay_rates"]),
+        config.get("thresholds", DEFAULT_CONFIG["thresholds"])["archive"],
+        protection,
+    )
 
-def set_cached_result(query, result):
-    """设置缓存结果(v1.3.0: 同时写入 CacheManager L2 缓存)"""
-    key = get_cache_key(query)
 
-    if CACHE_MANAGER_ENABLED and _cache_manager_instance:
-        try:
-            _cache_manager_instance.set_query_result(key, result)
-        except Exception:
-            pass  # 降级到内存缓存
+def current_score(record, model=None, mem_type=None):
+    """
+    记录的当前 score
+
+    v1.7.0: 惰性衰减时按 decay_anchor 计算到此刻;批量读取时传入同一个 model
+    """
+    if LAZY_DECAY_ENABLED:
+        return (model or _decay_model()).score_at(record, mem_type=mem_type)
+    return record.get("score", record.get("importance", 0.5))
+
+
+def materialize_score(record, model=None, mem_type=None):
+    """
+    把记录的 score 落盘为当前值(移动 decay_anchor),返回当前 score
 
-    # 原有内存缓存兜底
-    _session_cache[key] = {"time": datetime.utcnow().timestamp(), "result": result}
+    v1.7.0: 改写已有记录 score 的写路径先调用,再与新分数比较 / 相乘;
+    否则新 score 会从旧锚点起算衰减(没有锚点的记录 score 即当前值,不修改)
+    """
+    if LAZY_DECAY_ENABLED and record.get("decay_anchor"):
+        return (model or _decay_model()).materialize(record, mem_type=mem_type)
+    return record.get("score", record.get("importance", 0.5))
+
+
+def _archive_store(memory_dir, config=None):
+    """v1.7.0: 按配置构造归档分段存储"""
+    options = (config or get_config()).get("archive", DEFAULT_CONFIG["archive"])
+    return archive_store.ArchiveStore(
+        memory_dir,
+        codec=options.get("codec", "gzip"),
+        max_segments=options.get("max_segments", 16),
+    )
 
 
 def detect_trigger_layer(query):
@@ -1562,14 +2137,11 @@ def keyword_search(query, memory_dir, limit=20):
     """
     import re
 
-    # 加载关键词索引
-    keywords_path = memory_dir / "layer2/index/keywords.json"
-    if not keywords_path.exists():
+    # 加载关键词索引(v1.7.0: 按文件状态缓存)
+    keywords_index = _read_warm(memory_dir / "layer2/index/keywords.json", _load_json)
+    if keywords_index is None:
         return []
 
-    with open(keywords_path, encoding="utf-8") as f:
-        keywords_index = json.load(f)
-
     # 提取查询关键词(改进版)
     query_words = set()
     segments = re.split(r'[,.!?/;:""' r"()\[\][]\s]+", query)
@@ -1596,26 +2168,23 @@ def keyword_search(query, memory_dir, limit=20):
 
     # 加载记忆内容
     results = []
-    all_memories = {}
-    for mem_type in ["facts", "beliefs", "summaries"]:
-        records = load_jsonl(memory_dir / f"layer2/active/{mem_type}.jsonl")
-        for r in records:
-            all_memories[r["id"]] = r
+    active_maps = _active_memory_maps(memory_dir)
 
     # 排序并返回
+    model = _decay_model() if LAZY_DECAY_ENABLED else None
     sorted_ids = sorted(memory_scores.keys(), key=lambda x: memory_scores[x], reverse=True)
     for mem_id in sorted_ids[:limit]:
-        if mem_id in all_memories:
-            mem = all_memories[mem_id]
+        mem = _find_active(active_maps, mem_id)
+        if mem is not None:
             results.append(
                 {
                     "id": mem_id,
                     "score": memory_scores[mem_id],
                     "content": mem.get("content", ""),
                     "importance": mem.get("importance", 0.5),
-                    "memory_score": mem.get("score", 0.5),
+                    "memory_score": current_score(mem, model),
                     "type": "fact" if mem_id.startswith("f_") else ("belief" if mem_id.startswith("b_") else "summary"),
-                    "entities": mem.get("entities", []),
+                    "entities": list(mem.get("entities", [])),
                     "last_accessed": mem.get("last_accessed"),
                     "is_identity": mem.get("is_identity", False),
                 }
@@ -1629,14 +2198,11 @@ def entity_search(query, memory_dir, limit=20):
     基于实体的检索
     返回: [(memory_id, score, content), ...]
     """
-    # 加载实体索引
-    relations_path = memory_dir / "layer2/index/relations.json"
-    if not relations_path.exists():
+    # 加载实体索引(v1.7.0: 按文件状态缓存)
+    relations_index = _read_warm(memory_dir / "layer2/index/relations.json", _load_json)
+    if relations_index is None:
         return []
 
-    with open(relations_path, encoding="utf-8") as f:
-        relations_index = json.load(f)
-
     # 检查查询中是否包含已知实体
     matched_entities = []
     for entity in relations_index.keys():
@@ -1655,24 +2221,21 @@ def entity_search(query, memory_dir, limit=20):
 
     # 加载记忆内容
     results = []
-    all_memories = {}
-    for mem_type in ["facts", "beliefs", "summaries"]:
-        records = load_jsonl(memory_dir / f"layer2/active/{mem_type}.jsonl")
-        for r in records:
-            all_memories[r["id"]] = r
+    active_maps = _active_memory_maps(memory_dir)
 
+    model = _decay_model() if LAZY_DECAY_ENABLED else None
     for mem_id in list(memory_ids)[:limit]:
-        if mem_id in all_memories:
-            mem = all_memories[mem_id]
+        mem = _find_active(active_maps, mem_id)
+        if mem is not None:
             results.append(
                 {
                     "id": mem_id,
                     "score": len([e for e in matched_entities if e in mem.get("entities", [])]),
                     "content": mem.get("content", ""),
                     "importance": mem.get("importance", 0.5),
-                    "memory_score": mem.get("score", 0.5),
+                    "memory_score": current_score(mem, model),
                     "type": "fact" if mem_id.startswith("f_") else ("belief" if mem_id.startswith("b_") else "summary"),
-                    "entities": mem.get("entities", []),
+                    "entities": list(mem.get("entities", [])),
                     "last_accessed": mem.get("last_accessed"),
                     "is_identity": mem.get("is_identity", False),
                 }
@@ -1731,8 +2294,16 @@ def rerank_results(results, query, limit, memory_dir=None):
             for r in results:
                 all_candidate_entities.update(r.get("entities", []))
 
-            # 找出相似实体组
-            similar_groups = find_similar_entity_groups(query_entities, list(all_candidate_entities))
+            # 找出相似实体组(v1.7.0: 优先查整理时预计算的相似实体表)
+            if ENTITY_CLUSTERS_ENABLED:
+                isolation_config = ENTITY_SYSTEM_CONFIG["isolation"]
+                similar_groups = entity_clusters.get_entity_clusters(
+                    memory_dir,
+                    threshold=isolation_config["similarity_threshold"],
+                    prefix_ratio=isolation_config["min_common_prefix_ratio"],
+                ).similar_groups(query_entities, all_candidate_entities)
+            else:
+                similar_groups = find_similar_entity_groups(query_entities, list(all_candidate_entities))
 
             if similar_groups:
                 inhibition_factor = ENTITY_SYSTEM_CONFIG["isolation"]["inhibition_factor"]
@@ -1866,19 +2437,35 @@ def _get_qmd_env():
     }
 
 
+# v1.7.0: qmd status 探测结果的缓存 [过期时间, 是否可用](守护进程常驻时避免每次检索起子进程)
+QMD_PROBE_TTL = 60
+_qmd_probe = [0.0, False]
+
+
+def _qmd_status_ok():
+    now = time.monotonic()
+    if now < _qmd_probe[0]:
+        return _qmd_probe[1]
+    try:
+        result = subprocess.run(["qmd", "status"], capture_output=True, timeout=5, env=_get_qmd_env())
+        ok = result.returncode == 0
+    except Exception:
+        ok = False
+    _qmd_probe[:] = [now + QMD_PROBE_TTL, ok]
+    return ok
+
+
 def qmd_available(memory_dir=None):
     """
     检查 QMD 是否可用(v1.2.1 增强版)
 
     检查项:
     1. qmd 命令是否存在
-    2. qmd status 是否正常
+    2. qmd status 是否正常(v1.7.0: 结果缓存 QMD_PROBE_TTL 秒)
     3. health.lock 是否存在(写入中断标记)
     """
     try:
-        env = _get_qmd_env()
-        result = subprocess.run(["qmd", "status"], capture_output=True, timeout=5, env=env)
-        if result.returncode != 0:
+        if not _qmd_status_ok():
             return False
 
         # v1.2.1: 检查 health.lock(写入中断标记)
@@ -2085,7 +2672,8 @@ def router_search(query, memory_dir=None, use_qmd=True, use_vector=True):
     2. 向量检索 - 语义相似度匹配(v1.6.0 新增)
     3. QMD 索引 - 已索引,快速语义搜索
     4. 关键词/实体索引 - 原有逻辑
-    5. LLM 兜底 - QMD 不可用时
+    5. 时序召回 - 查询含有界时间表达式时,范围内命中剩余查询词的记录
+    6. LLM 兜底 - QMD 不可用时
 
     参数:
         query: 用户查询
@@ -2109,94 +2697,224 @@ def router_search(query, memory_dir=None, use_qmd=True, use_vector=True):
     if memory_dir is None:
         memory_dir = get_memory_dir()
 
-    cached = get_cached_result(query)
+    cache_key = get_cache_key(query, use_qmd, use_vector)
+    cached = get_cached_result(cache_key, memory_dir)
     if cached:
         cached["cached"] = True
         return cached
 
-    # v1.4.0: 时序查询前置——有时间表达式时优先走时序引擎
-    if TEMPORAL_ENGINE_ENABLED:
-        try:
-            temporal_engine = create_temporal_engine(memory_dir)
-            temporal_result = temporal_engine.temporal_search(query)
-            if temporal_result["has_temporal"] and temporal_result["results"]:
-                injection = format_injection(temporal_result["results"])
-                result = {
-                    "trigger_layer": 0,
-                    "trigger_type": "temporal",
-                    "matched_keywords": [],
-                    "query_type": "precise",
-                    "results": temporal_result["results"],
-                    "injection": injection,
-                    "stats": {
-                        "pending_hits": 0,
-                        "vector_hits": 0,
-                        "keyword_hits": 0,
-                        "entity_hits": 0,
-                        "qmd_hits": 0,
-                        "merged": len(temporal_result["results"]),
-                        "final": len(temporal_result["results"]),
-                    },
-                    "qmd_used": False,
-                    "vector_used": False,
-                    "pending_hits": 0,
-                    "cached": False,
-                    "temporal_used": True,
-                    "time_range": temporal_result["time_range"],
-                }
-                set_cached_result(query, result)
-                return result
-        except Exception:
-            pass  # 降级到原有检索流程
-
     trigger_layer, trigger_type, matched_keywords = detect_trigger_layer(query)
 
     query_type = classify_query_type(query, trigger_layer)
     config = QUERY_CONFIG[query_type]
 
-    pending_results = search_pending(query, memory_dir)
+    retrieved = _run_planned_retrievers(
+        query, memory_dir, config, query_type, trigger_type, use_qmd=use_qmd, use_vector=use_vector
+    )
+    # v1.4.0: 时序召回作为一路候选参与合并(不再绕过其他召回器)
+    time_range = _temporal_retrieve(query, memory_dir, config, retrieved)
+    merged_results = _merge_retrieved(retrieved, config)
+    final_results = _finalize_results(merged_results, query, config, memory_dir)
+    _record_retrieval_stats(retrieved, query_type, final_results)
+
+    result = _build_search_result(
+        trigger_layer, trigger_type, matched_keywords, query_type, retrieved, merged_results, final_results
+    )
+    if time_range is not None:
+        result["time_range"] = time_range
 
-    vector_results = []
-    vector_used = False
-    if use_vector and VECTOR_SEARCH_ENABLED:
-        vector_results = _vector_search(query, memory_dir, config["initial"])
-        if vector_results:
-            vector_used = True
+    set_cached_result(cache_key, result, memory_dir)
 
-    # v1.5.2: TF-IDF 语义检索
-    tfidf_results = []
-    if TFIDF_ENABLED:
-        try:
-            tfidf_results = tfidf_search(query, memory_dir, top_k=config["initial"])
+    return result
+
+
+def _run_retrievers(query, memory_dir, config, use_qmd=True, use_vector=True, include_pending=True, plan=None):
+    """
+    执行各路召回
+
+    plan: 可选的 {召回器: 候选数}(检索规划器给出),不在其中的召回器跳过;None 时全部运行
+
+    返回: {"pending", "vector", "tfidf", "qmd", "keyword", "entity": [...], "qmd_used", "vector_used",
+           "timings": {召回器: 耗时 ms}}
+    """
+    timings = {}
+
+    def limit_for(name):
+        if plan is None:
+            return config["initial"]
+        return plan.get(name)
+
+    def timed(name, fn):
+        limit = limit_for(name)
+        if limit is None:
+            return []
+        started = time.perf_counter()
+        try:
+            return fn(limit)
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
+
+    pending_results = search_pending(query, memory_dir, limit=config["initial"]) if include_pending else []
+
+    vector_results = []
+    if use_vector and VECTOR_SEARCH_ENABLED:
+        vector_results = timed("vector", lambda limit: _vector_search(query, memory_dir, limit))
+
+    # v1.5.2: TF-IDF 语义检索
+    def run_tfidf(limit):
+        try:
+            records = _ActiveRecords(_active_memory_maps(memory_dir))
+            return tfidf_engine.tfidf_search(query, memory_dir, top_k=limit, records=records)
         except Exception:
-            pass
+            return []
 
-    qmd_results = []
-    qmd_used = False
-    if use_qmd and qmd_available(memory_dir):
-        qmd_raw = qmd_search(query, collection="curated", limit=config["initial"])
+    tfidf_results = timed("tfidf", run_tfidf) if TFIDF_ENABLED else []
+
+    def run_qmd(limit):
+        results = []
+        qmd_raw = qmd_search(query, collection="curated", limit=limit)
         if qmd_raw and len(qmd_raw) > 0:
-            qmd_used = True
-            all_records = _load_all_active_records(memory_dir)
+            maps = _active_memory_maps(memory_dir)
             for qr in qmd_raw:
                 mem_id = extract_memory_id_from_snippet(qr.get("snippet", ""))
-                if mem_id and mem_id in all_records:
-                    record = all_records[mem_id].copy()
+                record = _active_record(maps, mem_id) if mem_id else None
+                if record is not None:
                     record["qmd_score"] = qr.get("score", 0)
                     record["match_source"] = "qmd"
-                    qmd_results.append(record)
+                    results.append(record)
+        return results
 
-    keyword_results = keyword_search(query, memory_dir, limit=config["initial"])
-    entity_results = entity_search(query, memory_dir, limit=config["initial"])
+    qmd_results = []
+    qmd_used = False
+    if use_qmd and qmd_available(memory_dir):
+        qmd_results = timed("qmd", run_qmd)
+        qmd_used = bool(qmd_results)
+
+    keyword_results = timed("keyword", lambda limit: keyword_search(query, memory_dir, limit=limit))
+    entity_results = timed("entity", lambda limit: entity_search(query, memory_dir, limit=limit))
+
+    return {
+        "pending": pending_results,
+        "vector": vector_results,
+        "tfidf": tfidf_results,
+        "qmd": qmd_results,
+        "keyword": keyword_results,
+        "entity": entity_results,
+        "qmd_used": qmd_used,
+        "vector_used": bool(vector_results),
+        "timings": timings,
+    }
+
+
+def _temporal_retrieve(query, memory_dir, config, retrieved):
+    """
+    时序召回:有界时间范围内、剩余查询词覆盖率不低于 pending min_coverage 的记录,写入 retrieved["temporal"]
+
+    开区间表达式("之前"/"以前")不构成过滤条件,不召回。
+    返回: 时间范围 {"start", "end", "label"};无时间表达式或时序引擎不可用时返回 None
+    """
+    retrieved["temporal"] = []
+    if not TEMPORAL_ENGINE_ENABLED:
+        return None
+    try:
+        engine = temporal_engine.create_temporal_engine(memory_dir)
+        temporal_result = engine.temporal_search(
+            query,
+            limit=config["initial"],
+            min_coverage=_pending_index_config().get("min_coverage", 0.2),
+            bounded_only=True,
+        )
+    except Exception:
+        return None  # 降级为普通检索
+    retrieved["temporal"] = temporal_result["results"]
+    return temporal_result["time_range"]
+
+
+def _plan_retrievers(query, memory_dir, query_type, trigger_type, config, use_qmd=True, use_vector=True):
+    """检索规划(v1.7.0):返回 (planner, plan);规划器未启用时 plan 为 None(全部召回)"""
+    if not RETRIEVAL_PLANNER_ENABLED:
+        return None, None
+    planner_config = get_config().get("retrieval_planner", DEFAULT_CONFIG["retrieval_planner"])
+    if not planner_config.get("enabled", True):
+        return None, None
+    try:
+        planner = retrieval_planner.get_retrieval_planner(
+            memory_dir,
+            explore_every=planner_config.get("explore_every"),
+            min_yield=planner_config.get("min_yield"),
+            cheap_ms=planner_config.get("cheap_ms"),
+            small_corpus=planner_config.get("small_corpus"),
+        )
+        available = ["tfidf", "keyword", "entity"]
+        if use_vector:
+            available.append("vector")
+        if use_qmd:
+            available.append("qmd")
+        has_entities = bool(extract_entities(query, memory_dir=memory_dir, use_llm_fallback=False))
+        plan = planner.plan(
+            query_type,
+            config["initial"],
+            retrieval_planner.estimate_corpus_size(memory_dir),
+            trigger_type=trigger_type,
+            has_entities=has_entities,
+            available=available,
+        )
+        return planner, plan
+    except Exception:
+        return None, None  # 降级为全部召回
+
+
+def _run_planned_retrievers(query, memory_dir, config, query_type, trigger_type, use_qmd=True, use_vector=True,
+                            include_pending=True):
+    """按规划执行召回;规划内的召回全部落空时补跑被跳过的召回,并记录统计"""
+    planner, plan = _plan_retrievers(query, memory_dir, query_type, trigger_type, config, use_qmd, use_vector)
+    retrieved = _run_retrievers(
+        query, memory_dir, config, use_qmd=use_qmd, use_vector=use_vector, include_pending=include_pending, plan=plan
+    )
+    if plan is not None and not any(retrieved[name] for name in retrieved["timings"]):
+        skipped = {name: config["initial"] for name in retrieval_planner.RETRIEVERS if name not in retrieved["timings"]}
+        if skipped:
+            extra = _run_retrievers(
+                query, memory_dir, config, use_qmd=use_qmd, use_vector=use_vector, include_pending=False, plan=skipped
+            )
+            for name in skipped:
+                retrieved[name] = extra[name]
+            retrieved["timings"].update(extra["timings"])
+            retrieved["qmd_used"] = retrieved["qmd_used"] or extra["qmd_used"]
+            retrieved["vector_used"] = retrieved["vector_used"] or extra["vector_used"]
+    retrieved["planner"] = planner
+    retrieved["plan"] = plan
+    return retrieved
+
+
+def _record_retrieval_stats(retrieved, query_type, final_results):
+    planner = retrieved.get("planner")
+    if planner is None:
+        return
+    try:
+        planner.record(query_type, retrieved["timings"], retrieved, [r["id"] for r in final_results])
+    except Exception:
+        pass
+
+
+def _merge_retrieved(retrieved, config, extra_candidates=None):
+    """
+    合并多路召回结果(pending 直接保留,其余走 RRF)
+
+    extra_candidates: 额外候选(如会话候选池),排在各路召回之后参与合并
+    """
+    pending_results = retrieved["pending"]
+    extra_candidates = extra_candidates or []
 
     # v1.5.2: RRF 合并多路结果（pending 直接保留，其余走 RRF）
-    if TFIDF_ENABLED and (tfidf_results or qmd_results or keyword_results or entity_results):
-        rrf_input = [l for l in [tfidf_results, qmd_results, keyword_results, entity_results, vector_results] if l]
-        rrf_merged = rrf_merge(rrf_input, k=60, top_n=config["rerank"])
+    ranked_lists = [retrieved.get(name, []) for name in ("tfidf", "qmd", "keyword", "entity", "temporal", "vector")]
+    if TFIDF_ENABLED and any(ranked_lists[:5]):
+        rrf_input = [l for l in ranked_lists if l]
+        rrf_merged = tfidf_engine.rrf_merge(rrf_input, k=60, top_n=config["rerank"])
         # pending 优先，RRF 结果去重追加
         seen_ids = {r["id"] for r in pending_results}
         merged_results = list(pending_results)
-        for r in rrf_merged:
+        for r in rrf_merged + extra_candidates:
             if r["id"] not in seen_ids:
                 seen_ids.add(r["id"])
                 merged_results.append(r)
@@ -2208,12 +2926,29 @@ def router_search(query, memory_dir=None, use_qmd=True, use_vector=True):
             if r["id"] not in seen_ids:
                 seen_ids.add(r["id"])
                 merged_results.append(r)
-        for r in vector_results + qmd_results + keyword_results + entity_results:
+        fallback = (
+            retrieved["vector"] + retrieved["qmd"] + retrieved["keyword"] + retrieved["entity"]
+            + retrieved.get("temporal", []) + extra_candidates
+        )
+        for r in fallback:
             if r["id"] not in seen_ids:
                 seen_ids.add(r["id"])
                 merged_results.append(r)
+    return merged_results
 
-    reranked = rerank_results(merged_results, query, config["rerank"], memory_dir=memory_dir)
+
+def _finalize_results(merged_results, query, config, memory_dir, score_adjust=None):
+    """
+    重排 + Spreading Activation,返回最终结果
+
+    score_adjust: 可选的 record → 加分函数(会话实体激活),在重排后、截断前生效
+    """
+    reranked = rerank_results(merged_results, query, len(merged_results), memory_dir=memory_dir)
+    if score_adjust is not None:
+        for r in reranked:
+            r["final_score"] += score_adjust(r)
+        reranked.sort(key=lambda x: x["final_score"], reverse=True)
+    reranked = reranked[: config["rerank"]]
 
     # v1.5.0: Spreading Activation（ACT-R）
     # spread 记录单独保留 top-3，追加到 final 结果末尾
@@ -2228,42 +2963,158 @@ def router_search(query, memory_dir=None, use_qmd=True, use_vector=True):
         traceback.print_exc()
         spread_bonus = []
 
-    final_results = reranked[: config["final"]] + spread_bonus
+    return reranked[: config["final"]] + spread_bonus
 
-    injection = format_injection(final_results)
 
-    result = {
+def _build_search_result(
+    trigger_layer, trigger_type, matched_keywords, query_type, retrieved, merged_results, final_results
+):
+    """组装 router_search 返回结构"""
+    return {
         "trigger_layer": trigger_layer,
         "trigger_type": trigger_type,
         "matched_keywords": matched_keywords,
         "query_type": query_type,
         "results": final_results,
-        "injection": injection,
+        "injection": format_injection(final_results),
         "stats": {
-            "pending_hits": len(pending_results),
-            "vector_hits": len(vector_results),
-            "keyword_hits": len(keyword_results),
-            "entity_hits": len(entity_results),
-            "qmd_hits": len(qmd_results),
+            "pending_hits": len(retrieved["pending"]),
+            "vector_hits": len(retrieved["vector"]),
+            "keyword_hits": len(retrieved["keyword"]),
+            "entity_hits": len(retrieved["entity"]),
+            "qmd_hits": len(retrieved["qmd"]),
+            "temporal_hits": len(retrieved.get("temporal", [])),
             "merged": len(merged_results),
             "final": len(final_results),
+            "retrievers_run": sorted(retrieved.get("timings", {})),
         },
-        "qmd_used": qmd_used,
-        "vector_used": vector_used,
-        "pending_hits": len(pending_results),
+        "qmd_used": retrieved["qmd_used"],
+        "vector_used": retrieved["vector_used"],
+        "temporal_used": bool(retrieved.get("temporal")),
+        "pending_hits": len(retrieved["pending"]),
         "cached": False,
     }
 
-    set_cached_result(query, result)
 
+def session_search(query, session_id, memory_dir=None, use_qmd=True, use_vector=True):
+    """
+    会话级增量检索(v1.7.0)
+
+    同一会话的连续查询复用上一轮候选池:只对含新词的查询片段做召回,
+    与候选池合并后按完整查询重排;会话实体激活度作为额外加分。
+    活跃池变化、会话过期或时序查询时退回完整检索(router_search)。
+
+    返回: 与 router_search 相同,另含 "session": {"id", "turn", "incremental", "delta_query", "pooled"}
+    """
+    if memory_dir is None:
+        memory_dir = get_memory_dir()
+
+    if not SESSION_CONTEXT_ENABLED or (TEMPORAL_ENGINE_ENABLED and temporal_engine.parse_time_expression(query)):
+        return router_search(query, memory_dir, use_qmd=use_qmd, use_vector=use_vector)
+
+    session_config = get_config().get("session", DEFAULT_CONFIG["session"])
+    session = session_context.get_session_context(memory_dir, session_id, ttl_seconds=session_config.get("ttl_seconds", 21600))
+
+    trigger_layer, trigger_type, matched_keywords = detect_trigger_layer(query)
+    query_type = classify_query_type(query, trigger_layer)
+    config = QUERY_CONFIG[query_type]
+
+    signature = session_context.active_signature(memory_dir)
+    incremental = session.is_warm(signature)
+    if incremental:
+        retrieval_query, _ = session.delta_query(query)
+        pool = session.pooled_candidates()
+    else:
+        session.reset()
+        retrieval_query, pool = query, []
+
+    if retrieval_query:
+        retrieved = _run_planned_retrievers(
+            retrieval_query, memory_dir, config, query_type, trigger_type,
+            use_qmd=use_qmd, use_vector=use_vector, include_pending=False,
+        )
+    else:
+        retrieved = {name: [] for name in ("vector", "tfidf", "qmd", "keyword", "entity")}
+        retrieved.update({"qmd_used": False, "vector_used": False, "timings": {}})
+    # pending 每轮按完整查询检索(新写入的记忆都在这里)
+    retrieved["pending"] = search_pending(query, memory_dir, limit=config["initial"])
+
+    session.activate(extract_entities(query, memory_dir=memory_dir, use_llm_fallback=False))
+    merged_results = _merge_retrieved(retrieved, config, extra_candidates=pool)
+    final_results = _finalize_results(merged_results, query, config, memory_dir, score_adjust=session.entity_boost)
+
+    pending_ids = {r["id"] for r in retrieved["pending"]}
+    _record_retrieval_stats(retrieved, query_type, final_results)
+    session.commit_turn(query, [r for r in merged_results if r["id"] not in pending_ids], final_results, signature)
+    session.save()
+
+    result = _build_search_result(
+        trigger_layer, trigger_type, matched_keywords, query_type, retrieved, merged_results, final_results
+    )
+    result["session"] = {
+        "id": session.session_id,
+        "turn": session.turn,
+        "incremental": incremental,
+        "delta_query": retrieval_query,
+        "pooled": len(pool),
+    }
     return result
 
 
+def _get_vector_engine(vector_config, memory_dir, provider=None, model=None):
+    """
+    获取嵌入引擎(get_embedding_engine 按参数在进程内复用,避免每次查询重新初始化)
+
+    默认使用内置离线 hashing 引擎,无需网络与 API Key
+    v1.7.0: 远程/模型引擎外套持久化嵌入缓存(vector.cache),内容未变不再重复嵌入
+    """
+    provider = provider or vector_config.get("provider", "hashing")
+    if provider == "hashing":
+        engine = vector_embedding.get_embedding_engine(
+            provider="hashing",
+            dimension=vector_config.get("dimension", 512),
+            **vector_config.get("hashing", {}),
+        )
+    else:
+        engine = vector_embedding.get_embedding_engine(provider=provider, model=model or vector_config.get("model"))
+
+    cache_config = vector_config.get("cache", {})
+    if EMBEDDING_CACHE_ENABLED and cache_config.get("enabled", True):
+        try:
+            engine = embedding_cache.wrap_with_cache(engine, memory_dir, max_size=cache_config.get("max_size", 10000))
+        except Exception:
+            pass  # 缓存不可用时直接调用引擎
+    return engine
+
+
+def _get_vector_index(memory_dir, vector_config, embedding_engine):
+    """获取本地向量索引(进程内缓存,其他进程更新后自动重新加载)"""
+    return vector_index.get_vector_index(
+        memory_dir,
+        dimension=embedding_engine.dimension,
+        model=getattr(embedding_engine, "model", "") or "",
+        ivf_threshold=vector_config.get("ivf_threshold", 20000),
+        nprobe=vector_config.get("nprobe", 12),
+    )
+
+
+def _vector_hits(query, memory_dir, vector_config, limit):
+    """向量检索原始命中: [(memory_id, score), ...]"""
+    embedding_engine = _get_vector_engine(vector_config, memory_dir)
+    if embedding_engine is None:
+        return []
+    query_vector = embedding_engine.embed(query)
+    if query_vector is None:
+        return []
+    index = _get_vector_index(memory_dir, vector_config, embedding_engine)
+    return index.search(query_vector, top_k=limit)
+
+
 def _vector_search(query: str, memory_dir: Path, limit: int = 20) -> list:
     """
     向量检索(v1.6.0 新增)
 
-    使用混合检索引擎进行语义搜索
+    v1.7.0: 直接查询本地向量索引(精确点积 / IVF 近似),嵌入引擎与索引在进程内复用
     """
     config = get_config()
     vector_config = config.get("vector", {})
@@ -2272,46 +3123,33 @@ def _vector_search(query: str, memory_dir: Path, limit: int = 20) -> list:
         return []
 
     try:
-        embedding_engine = get_embedding_engine(
-            provider=vector_config.get("provider", "openai"),
-            model=vector_config.get("model"),
-        )
-        if embedding_engine is None:
-            return []
-
-        hybrid_config = vector_config.get("hybrid_search", {})
-        hybrid_engine = create_hybrid_search_engine(
-            memory_dir=memory_dir,
-            embedding_engine=embedding_engine,
-            backend=vector_config.get("backend", "sqlite"),
-            keyword_weight=hybrid_config.get("keyword_weight", 0.3),
-            vector_weight=hybrid_config.get("vector_weight", 0.7),
-            min_score=hybrid_config.get("min_score", 0.2),
-        )
-        if hybrid_engine is None:
+        hits = _vector_hits(query, memory_dir, vector_config, limit)
+        if not hits:
             return []
 
-        results = hybrid_engine.search(
-            query=query,
-            memory_dir=memory_dir,
-            top_k=limit,
-            use_keyword=False,
-            use_vector=True,
-        )
+        min_score = vector_config.get("hybrid_search", {}).get("min_score", 0.2)
+        # 只按 id 取命中的 top-k 记录(活跃池按文件状态缓存,不再每次全量解析)
+        maps = _active_memory_maps(memory_dir)
+        model = _decay_model() if LAZY_DECAY_ENABLED else None
 
         formatted_results = []
-        for r in results:
+        for mem_id, score in hits:
+            if score < min_score:
+                continue
+            record = _active_record(maps, mem_id)
+            if record is None:
+                continue
             formatted_results.append(
                 {
-                    "id": r.id,
-                    "content": r.content,
-                    "score": r.score,
-                    "vector_score": r.vector_score,
-                    "keyword_score": r.keyword_score,
-                    "importance": r.metadata.get("importance", 0.5),
-                    "memory_score": r.score,
-                    "type": r.metadata.get("type", "fact"),
-                    "entities": [],
+                    "id": mem_id,
+                    "content": record.get("content", ""),
+                    "score": score,
+                    "vector_score": score,
+                    "keyword_score": 0.0,
+                    "importance": record.get("importance", 0.5),
+                    "memory_score": current_score(record, model) if "score" in record else score,
+                    "type": record.get("type", "fact"),
+                    "entities": record.get("entities", []),
                     "match_source": "vector",
                 }
             )
@@ -2341,7 +3179,7 @@ def _load_all_active_records(memory_dir):
         try:
             count = _get_active_memory_count(memory_dir)
             if count >= SCALED_BACKEND_THRESHOLD:
-                backend = ScaledBackend(memory_dir)
+                backend = scaled_backend.ScaledBackend(memory_dir)
                 all_mems = backend.get_all_active_memories()
                 return {m["id"]: m for m in all_mems}
         except Exception:
@@ -2349,14 +3187,19 @@ def _load_all_active_records(memory_dir):
 
     # 原有 JSONL 逻辑
     records = {}
-    for mem_type in ["facts", "beliefs", "summaries"]:
+    for mem_type in MEMORY_TYPES:
         path = memory_dir / f"layer2/active/{mem_type}.jsonl"
         for r in load_jsonl(path):
-            r["type"] = mem_type.rstrip("s")
+            r["type"] = MEMORY_TYPE_SINGULAR[mem_type]
             records[r["id"]] = r
     return records
 
 
+def _memory_system(memory_dir):
+    """v1.7.0: CLI 命令使用的进程内 API 实例(构造不做 I/O,状态在进程级缓存中复用)"""
+    return memory_api.MemorySystem(memory_dir)
+
+
 def cmd_search(args):
     """执行记忆检索"""
     memory_dir = get_memory_dir()
@@ -2366,7 +3209,7 @@ def cmd_search(args):
         return
 
     query = args.query
-    result = router_search(query, memory_dir)
+    result = _memory_system(memory_dir).search(query)
 
     print(f"🔍 检索: {query}")
     print("=" * 50)
@@ -2408,9 +3251,9 @@ def cmd_search(args):
 # ============================================================
 
 
-def cmd_init(args):
-    """初始化记忆系统目录结构"""
-    memory_dir = get_memory_dir()
+def init_store(memory_dir):
+    """创建记忆目录结构与默认文件(已存在的文件保持不变)"""
+    memory_dir = Path(memory_dir)
 
     # 创建目录结构
     dirs = ["layer1", "layer2/active", "layer2/archive", "layer2/entities", "layer2/index", "state"]
@@ -2421,16 +3264,13 @@ def cmd_init(args):
     # 创建默认配置
     config_path = memory_dir / "config.json"
     if not config_path.exists():
-        save_config(DEFAULT_CONFIG)
+        save_config(DEFAULT_CONFIG, memory_dir)
 
     # 创建空的 JSONL 文件
     jsonl_files = [
         "layer2/active/facts.jsonl",
         "layer2/active/beliefs.jsonl",
         "layer2/active/summaries.jsonl",
-        "layer2/archive/facts.jsonl",
-        "layer2/archive/beliefs.jsonl",
-        "layer2/archive/summaries.jsonl",
     ]
 
     for f in jsonl_files:
@@ -2491,6 +3331,12 @@ def cmd_init(args):
             f.write("# QMD 索引目录(二进制文件,不应提交到 git)\n")
             f.write(".qmd/\n")
 
+
+def cmd_init(args):
+    """初始化记忆系统目录结构"""
+    memory_dir = get_memory_dir()
+    init_store(memory_dir)
+
     print("✅ 记忆系统初始化完成")
     print(f"   目录: {memory_dir}")
     print(f"   配置: {memory_dir / 'config.json'}")
@@ -2509,40 +3355,32 @@ def cmd_status(args):
         print("❌ 记忆系统未初始化,请先运行: memory.py init")
         return
 
-    # 读取状态
-    state_path = memory_dir / "state/consolidation.json"
-    if state_path.exists():
-        with open(state_path, encoding="utf-8") as f:
-            state = json.load(f)
-    else:
-        state = {}
-
-    # 统计记忆数量
-    active_facts = len(load_jsonl(memory_dir / "layer2/active/facts.jsonl"))
-    active_beliefs = len(load_jsonl(memory_dir / "layer2/active/beliefs.jsonl"))
-    active_summaries = len(load_jsonl(memory_dir / "layer2/active/summaries.jsonl"))
-    archive_facts = len(load_jsonl(memory_dir / "layer2/archive/facts.jsonl"))
-    archive_beliefs = len(load_jsonl(memory_dir / "layer2/archive/beliefs.jsonl"))
-    archive_summaries = len(load_jsonl(memory_dir / "layer2/archive/summaries.jsonl"))
-
-    active_total = active_facts + active_beliefs + active_summaries
-    archive_total = archive_facts + archive_beliefs + archive_summaries
+    stats = _memory_system(memory_dir).stats()
+    active = stats["active"]
+    archive = stats["archive"]
+    state = stats["consolidation"]
 
     print("🧠 Memory System Status")
     print("=" * 40)
     print(f"目录: {memory_dir}")
     print()
     print("📊 记忆统计")
-    print(f"   活跃池: {active_total} 条")
-    print(f"     - Facts: {active_facts}")
-    print(f"     - Beliefs: {active_beliefs}")
-    print(f"     - Summaries: {active_summaries}")
-    print(f"   归档池: {archive_total} 条")
+    print(f"   活跃池: {active['total']} 条")
+    print(f"     - Facts: {active['facts']}")
+    print(f"     - Beliefs: {active['beliefs']}")
+    print(f"     - Summaries: {active['summaries']}")
+    print(f"   归档池: {archive['records']} 条")
+    # v1.7.0: 归档条数只读段尾索引
+    if archive["raw_bytes"]:
+        print(
+            f"     - 存储: {archive['segments']} 段, "
+            f"{archive['stored_bytes'] / 1024:.1f} KB(原始 {archive['raw_bytes'] / 1024:.1f} KB)"
+        )
     print()
     print("⏰ Consolidation")
-    print(f"   上次运行: {state.get('last_run', '从未')}")
-    print(f"   上次成功: {state.get('last_success', '从未')}")
-    print(f"   当前阶段: {state.get('current_phase', '无')}")
+    print(f"   上次运行: {state['last_run'] or '从未'}")
+    print(f"   上次成功: {state['last_success'] or '从未'}")
+    print(f"   当前阶段: {state['current_phase'] or '无'}")
 
 
 def cmd_stats(args):
@@ -2553,39 +3391,19 @@ def cmd_stats(args):
         print("❌ 记忆系统未初始化")
         return
 
-    # 加载所有记忆
-    facts = load_jsonl(memory_dir / "layer2/active/facts.jsonl")
-    beliefs = load_jsonl(memory_dir / "layer2/active/beliefs.jsonl")
-    summaries = load_jsonl(memory_dir / "layer2/active/summaries.jsonl")
-
-    # 按重要性分组
-    importance_groups = {
-        "critical": 0,  # 0.9-1.0
-        "high": 0,  # 0.7-0.9
-        "medium": 0,  # 0.4-0.7
-        "low": 0,  # 0-0.4
-    }
-
-    all_records = facts + beliefs + summaries
-    for r in all_records:
-        imp = r.get("importance", 0.5)
-        if imp >= 0.9:
-            importance_groups["critical"] += 1
-        elif imp >= 0.7:
-            importance_groups["high"] += 1
-        elif imp >= 0.4:
-            importance_groups["medium"] += 1
-        else:
-            importance_groups["low"] += 1
+    stats = _memory_system(memory_dir).stats()
+    active = stats["active"]
+    importance_groups = stats["importance"]
+    total = active["total"]
 
     print("📊 Memory System Stats")
     print("=" * 40)
-    print(f"Total: {len(all_records)} memories")
+    print(f"Total: {total} memories")
     print()
     print("By Type:")
-    print(f"  Facts: {len(facts)} ({len(facts) * 100 // max(len(all_records), 1)}%)")
-    print(f"  Beliefs: {len(beliefs)} ({len(beliefs) * 100 // max(len(all_records), 1)}%)")
-    print(f"  Summaries: {len(summaries)} ({len(summaries) * 100 // max(len(all_records), 1)}%)")
+    print(f"  Facts: {active['facts']} ({active['facts'] * 100 // max(total, 1)}%)")
+    print(f"  Beliefs: {active['beliefs']} ({active['beliefs'] * 100 // max(total, 1)}%)")
+    print(f"  Summaries: {active['summaries']} ({active['summaries'] * 100 // max(total, 1)}%)")
     print()
     print("By Importance:")
     print(f"  Critical (0.9-1.0): {importance_groups['critical']}")
@@ -2607,52 +3425,29 @@ def cmd_capture(args):
         print("❌ 记忆系统未初始化")
         return
 
-    content = args.content
-    mem_type = args.type
-    importance = args.importance
+    # 限制 importance 在 0-1 范围(由 MemorySystem.capture 截断)
+    if args.content and args.content.strip():
+        if args.importance < 0:
+            print("⚠️ 警告: importance 已调整为 0")
+        elif args.importance > 1:
+            print("⚠️ 警告: importance 已调整为 1")
 
-    # 输入验证
-    if not content or not content.strip():
-        print("❌ 错误: 内容不能为空")
+    try:
+        record = _memory_system(memory_dir).capture(
+            args.content,
+            mem_type=args.type,
+            importance=args.importance,
+            entities=args.entities.split(",") if args.entities else [],
+            confidence=args.confidence,
+        )
+    except ValueError as e:
+        print(f"❌ 错误: {e}")
         return
 
-    # 限制 importance 在 0-1 范围
-    if importance < 0:
-        importance = 0
-        print("⚠️ 警告: importance 已调整为 0")
-    elif importance > 1:
-        importance = 1
-        print("⚠️ 警告: importance 已调整为 1")
-    entities = args.entities.split(",") if args.entities else []
-
-    record = {
-        "id": generate_id(mem_type[0], content),
-        "content": content,
-        "importance": importance,
-        "score": importance,  # 初始 score = importance
-        "entities": entities,
-        "created": now_iso(),
-        "source": "manual",
-    }
-
-    if mem_type == "belief":
-        record["confidence"] = args.confidence
-
-    # 追加到对应文件
-    if mem_type == "fact":
-        path = memory_dir / "layer2/active/facts.jsonl"
-    elif mem_type == "belief":
-        path = memory_dir / "layer2/active/beliefs.jsonl"
-    else:
-        path = memory_dir / "layer2/active/summaries.jsonl"
-
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
     print(f"✅ 记忆已添加: {record['id']}")
-    print(f"   类型: {mem_type}")
-    print(f"   重要性: {importance}")
-    print(f"   内容: {content[:50]}...")
+    print(f"   类型: {args.type}")
+    print(f"   重要性: {record['importance']}")
+    print(f"   内容: {record['content'][:50]}...")
 
 
 def cmd_archive(args):
@@ -2663,7 +3458,6 @@ def cmd_archive(args):
     # 在活跃池中查找
     for mem_type in ["facts", "beliefs", "summaries"]:
         active_path = memory_dir / f"layer2/active/{mem_type}.jsonl"
-        archive_path = memory_dir / f"layer2/archive/{mem_type}.jsonl"
 
         records = load_jsonl(active_path)
         found = None
@@ -2678,15 +3472,52 @@ def cmd_archive(args):
         if found:
             # 保存剩余记录
             save_jsonl(active_path, remaining)
-            # 追加到归档
-            with open(archive_path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(found, ensure_ascii=False) + "\n")
+            # 追加到归档(v1.7.0: 新的压缩段,不重写已有归档)
+            _archive_store(memory_dir).append(mem_type, [found])
+            mark_store_changed(memory_dir)
             print(f"✅ 已归档: {memory_id}")
             return
 
     print(f"❌ 未找到记忆: {memory_id}")
 
 
+def _archive_decayed(ws, config):
+    """
+    v1.7.0 Phase 5c: 落盘并归档衰减视界中已到期的记录
+
+    其余记录的 score 不变(读取时按闭式公式计算);视界索引在工作集提交后保存
+    返回: 归档条数
+    """
+    model = _decay_model(config)
+    horizon = lazy_decay.DecayHorizon(ws.memory_dir)
+    now = time.time()
+    archived_count = 0
+
+    for mem_type in MEMORY_TYPES:
+        records = ws.active(mem_type)
+        due, anchored = horizon.due(mem_type, records, model, now, changed=ws.is_dirty(mem_type))
+        to_archive = []
+        for r in due:
+            if model.materialize(r, now, mem_type) < model.archive_threshold:
+                to_archive.append(r)
+            else:
+                horizon.update(mem_type, r, model)
+        if anchored or due:
+            ws.touch(mem_type)
+        if to_archive:
+            archived = {id(r) for r in to_archive}
+            ws.replace(mem_type, [r for r in records if id(r) not in archived])
+            ws.archive(mem_type, to_archive)
+            horizon.discard(mem_type, [r["id"] for r in to_archive])
+            archived_count += len(to_archive)
+        if anchored:
+            print(f"       {mem_type}: 为 {anchored} 条旧记录设置衰减锚点")
+
+    ws.defer(horizon.save)
+    print(f"       到期 {archived_count} 条 | 视界索引: 重算 {horizon.stats['refreshed']} 条, 免扫描 {horizon.stats['skipped_scan']} 类")
+    return archived_count
+
+
 # ============================================================
 # Consolidation 命令
 # ============================================================
@@ -2694,20 +3525,33 @@ def cmd_archive(args):
 
 def cmd_consolidate(args):
     """执行 Consolidation 流程"""
+    run_consolidation(args)
+
+
+def run_consolidation(args):
+    """
+    执行 Consolidation 流程(过程输出到 stdout)
+
+    返回: "done" 完成 / "skipped" 距上次成功不足 20 小时 / "paused" 时间预算用尽 /
+          "uninitialized" 记忆目录不存在;失败时抛出异常
+    """
     memory_dir = get_memory_dir()
 
     if not memory_dir.exists():
         print("❌ 记忆系统未初始化,请先运行: memory.py init")
-        return
+        return "uninitialized"
 
     config = get_config()
 
-    # 检查是否需要执行
-    state_path = memory_dir / "state/consolidation.json"
-    with open(state_path, encoding="utf-8") as f:
-        state = json.load(f)
+    # 检查是否需要执行(v1.7.0: 状态与检查点由 ConsolidationCheckpoint 读写)
+    checkpoint = consolidation_checkpoint.ConsolidationCheckpoint(memory_dir)
+    state = checkpoint.state
+    resume = getattr(args, "resume", False)
+    if resume and not checkpoint.resumable():
+        print("ℹ️ 没有未完成的 Consolidation,从头执行")
+        resume = False
 
-    if not args.force and state.get("last_success"):
+    if not args.force and not resume and state.get("last_success"):
         last_success = datetime.fromisoformat(state["last_success"].replace("Z", "+00:00"))
         hours_since = (datetime.now(last_success.tzinfo) - last_success).total_seconds() / 3600
         fallback_hours = config["consolidation"]["fallback_hours"]
@@ -2715,288 +3559,434 @@ def cmd_consolidate(args):
         if hours_since < 20:  # 至少间隔 20 小时
             print(f"⏭️ 跳过: 距离上次成功仅 {hours_since:.1f} 小时")
             print("   使用 --force 强制执行")
-            return
+            return "skipped"
 
     print("🧠 开始 Consolidation...")
     print("=" * 40)
 
-    # 更新状态
-    state["last_run"] = now_iso()
-    state["current_phase"] = 0
-    with open(state_path, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    # 更新状态(v1.7.0: --resume 沿用未完成运行的检查点,--phase 单阶段运行沿用已有阶段产物)
+    if checkpoint.begin(now_iso(), resume=resume, keep_data=bool(args.phase)) and resume:
+        print(f"⏯️ 从检查点继续(已完成: {', '.join(checkpoint.completed) or '无'})")
+    budget = consolidation_checkpoint.TimeBudget(getattr(args, "time_budget", None))
+
+    # v1.7.0: 活跃池一次加载,各阶段在工作集上变换,Phase 6.9 之后统一提交
+    ws = WorkingSet(memory_dir, archive_store=_archive_store(memory_dir, config))
+
+    def resumed_past(phase):
+        """恢复运行时跳过检查点中已完成的阶段"""
+        if args.phase or not checkpoint.done(phase):
+            return False
+        print(f"\n⏭️ Phase {phase}: 已完成(检查点)")
+        return True
 
     try:
-        # 用于存储中间结果
-        phase_data = state.get("phase_data", {})
+        # 用于存储中间结果(v1.7.0: 随检查点持久化)
+        phase_data = checkpoint.phase_data
+        committed = checkpoint.done("commit")  # 工作集已提交:Phase 0-6.9 不再重复执行
+        relations_index = None
+        if committed and not args.phase:
+            print("\n⏭️ Phase 0-6.9: 工作集已提交(检查点)")
 
         # Phase 0: 清理过期记忆(v1.1.4 新增)
-        if V1_1_ENABLED and (not args.phase or args.phase == 0):
+        if V1_1_ENABLED and (not args.phase or args.phase == 0) and not committed:
             print("\n🗑️ Phase 0: 清理过期记忆")
-            expired_count = phase0_expire_memories(memory_dir)
+            with ws.phase("0 过期清理"):
+                expired_count = 0
+                for mem_type in MEMORY_TYPES:
+                    valid, expired = split_expired(ws.active(mem_type))
+                    if expired:
+                        ws.replace(mem_type, valid)
+                        ws.append_log("layer2/expired_log.jsonl", [expired_log_entry(m) for m in expired])
+                        expired_count += len(expired)
             print(f"   归档 {expired_count} 条过期记忆")
             print("   ✅ 完成")
 
         # Phase 1: 轻量全量(切分片段)
-        if not args.phase or args.phase == 1:
+        if (not args.phase or args.phase == 1) and not committed and not resumed_past("1"):
             print("\n📋 Phase 1: 轻量全量(切分片段)")
-            segments = []
-            if args.input:
-                with open(args.input, encoding="utf-8") as f:
-                    raw_text = f.read()
-                for line in raw_text.split("\n"):
-                    line = line.strip()
-                    if line and len(line) > 5:
-                        segments.append({"content": line, "source": args.input})
-                print(f"   从文件读取 {len(segments)} 个片段")
-            else:
-                # 自动读取 pending.jsonl
-                pending = load_pending(memory_dir)
-                if pending:
-                    for item in pending:
-                        content = item.get("content", "").strip()
-                        if content and len(content) > 5:
-                            segments.append({
-                                "content": content,
-                                "source": item.get("source", "user"),
-                                "created": item.get("created", ""),
-                                "session": item.get("session", ""),
-                            })
-                    print(f"   从 pending.jsonl 读取 {len(segments)} 个片段")
-                    # 清空 pending（已处理）
-                    save_pending(memory_dir, [])
-                    print("   pending.jsonl 已清空")
+            with ws.phase("1 切分"):
+                segments = []
+                pending_ids = []
+                if args.input:
+                    with open(args.input, encoding="utf-8") as f:
+                        raw_text = f.read()
+                    for line in raw_text.split("\n"):
+                        line = line.strip()
+                        if line and len(line) > 5:
+                            segments.append({"content": line, "source": args.input})
+                    print(f"   从文件读取 {len(segments)} 个片段")
                 else:
-                    print("   [跳过] pending.jsonl 为空")
-            phase_data["segments"] = segments
+                    # 自动读取 pending.jsonl
+                    pending = load_pending(memory_dir)
+                    if pending:
+                        for item in pending:
+                            content = item.get("content", "").strip()
+                            if content and len(content) > 5:
+                                segments.append({
+                                    "content": content,
+                                    "source": item.get("source", "user"),
+                                    "created": item.get("created", ""),
+                                    "session": item.get("session", ""),
+                                })
+                        print(f"   从 pending.jsonl 读取 {len(segments)} 个片段")
+                        pending_ids = [_pending_key(item) for item in pending]
+                        print("   pending.jsonl 将在提交后清空")
+                    else:
+                        print("   [跳过] pending.jsonl 为空")
+            checkpoint.complete("1", segments=segments, pending_ids=pending_ids)
             print("   ✅ 完成")
 
+        # 清空已读取的 pending:工作集提交成功后才执行,失败或暂停时 pending 保留;
+        # 按 id 移除本次读取的条目,运行期间新追加的保留到下一次(期间 pending 被其他流程清空也不会误删)
+        consumed = phase_data.get("pending_ids") or []
+        if consumed and not committed:
+            ws.defer(lambda: _consume_pending(memory_dir, consumed))
+
         # Phase 2: 重要性筛选
-        if not args.phase or args.phase == 2:
+        if (not args.phase or args.phase == 2) and not committed and not resumed_past("2"):
+            budget.check("Phase 2")
             print("\n🎯 Phase 2: 重要性筛选")
-            segments = phase_data.get("segments", [])
-            if segments:
-                filtered = rule_filter(segments, threshold=0.3)
-                phase_data["filtered"] = filtered
-                print(f"   输入: {len(segments)} 片段")
-                print(f"   筛选后: {len(filtered)} 片段 (threshold=0.3)")
-                for f in filtered[:3]:
-                    print(f"     - [{f['importance']:.1f}] {f['content'][:40]}...")
-            else:
-                phase_data["filtered"] = []
-                print("   [跳过] 无输入片段")
+            with ws.phase("2 筛选"):
+                segments = phase_data.get("segments", [])
+                if segments:
+                    journal = checkpoint.journal("2")
+                    if len(journal):
+                        print(f"   检查点中已有 {len(journal)} 条 LLM 结果")
+                    filtered = rule_filter(segments, threshold=0.3, journal=journal, budget=budget)
+                    phase_data["filtered"] = filtered
+                    print(f"   输入: {len(segments)} 片段")
+                    print(f"   筛选后: {len(filtered)} 片段 (threshold=0.3)")
+                    for f in filtered[:3]:
+                        print(f"     - [{f['importance']:.1f}] {f['content'][:40]}...")
+                else:
+                    phase_data["filtered"] = []
+                    print("   [跳过] 无输入片段")
+            checkpoint.complete("2")
             print("   ✅ 完成")
 
         # Phase 3: 深度提取
-        if not args.phase or args.phase == 3:
+        if (not args.phase or args.phase == 3) and not committed and not resumed_past("3"):
+            budget.check("Phase 3")
             print("\n📝 Phase 3: 深度提取")
-            filtered = phase_data.get("filtered", [])
-            if filtered:
-                extracted = template_extract(filtered)
-                phase_data["extracted"] = extracted
-                print("   提取结果:")
-                print(f"     - Facts: {len(extracted['facts'])}")
-                print(f"     - Beliefs: {len(extracted['beliefs'])}")
-                print(f"     - Summaries: {len(extracted['summaries'])}")
-            else:
-                phase_data["extracted"] = {"facts": [], "beliefs": [], "summaries": []}
-                print("   [跳过] 无筛选片段")
+            with ws.phase("3 提取"):
+                filtered = phase_data.get("filtered", [])
+                if filtered:
+                    journal = checkpoint.journal("3")
+                    if len(journal):
+                        print(f"   检查点中已有 {len(journal)} 条 LLM 结果")
+                    extracted = template_extract(filtered, journal=journal, budget=budget)
+                    phase_data["extracted"] = extracted
+                    print("   提取结果:")
+                    print(f"     - Facts: {len(extracted['facts'])}")
+                    print(f"     - Beliefs: {len(extracted['beliefs'])}")
+                    print(f"     - Summaries: {len(extracted['summaries'])}")
+                else:
+                    phase_data["extracted"] = {"facts": [], "beliefs": [], "summaries": []}
+                    print("   [跳过] 无筛选片段")
+            checkpoint.complete("3")
             print("   ✅ 完成")
 
+        # Phase 0、4-6.9 与提交是一个整体(工作集在内存中),预算用尽时在此之前暂停
+        if not committed:
+            budget.check("Phase 4")
+
         # Phase 4: Layer 2 维护
-        if not args.phase or args.phase == 4:
+        if (not args.phase or args.phase == 4) and not committed:
             print("\n🔧 Phase 4: Layer 2 维护")
-            extracted = phase_data.get("extracted", {"facts": [], "beliefs": [], "summaries": []})
-
-            # 加载现有记忆
-            existing_facts = load_jsonl(memory_dir / "layer2/active/facts.jsonl")
-            existing_beliefs = load_jsonl(memory_dir / "layer2/active/beliefs.jsonl")
-            existing_summaries = load_jsonl(memory_dir / "layer2/active/summaries.jsonl")
-
-            # 4a: Facts 去重合并
-            print("   4a: Facts 去重合并 + 冲突检测")
-            new_facts = extracted.get("facts", [])
-            if new_facts:
-                merged_facts, dup_count, downgrade_count = deduplicate_facts(new_facts, existing_facts)
-                print(f"       新增: {len(merged_facts)}, 去重: {dup_count}, 降权: {downgrade_count}")
-                # 追加新 facts
-                for fact in merged_facts:
-                    append_jsonl(memory_dir / "layer2/active/facts.jsonl", fact)
-                # 如果有降权,需要重写 existing_facts
-                if downgrade_count > 0:
-                    save_jsonl(memory_dir / "layer2/active/facts.jsonl", existing_facts)
-            else:
-                print("       [跳过] 无新 facts")
-
-            # 4b: Beliefs 验证
-            print("   4b: Beliefs 验证")
-            new_beliefs = extracted.get("beliefs", [])
-            all_facts = existing_facts + extracted.get("facts", [])
-            confirmed_count = 0
-            contradicted_count = 0
-
-            for belief in new_beliefs:
-                status, updated = code_verify_belief(belief, all_facts)
-                if status == "confirmed":
-                    # 升级为 fact
-                    append_jsonl(memory_dir / "layer2/active/facts.jsonl", updated)
-                    confirmed_count += 1
-                elif status == "contradicted":
-                    # 降低置信度后保存
-                    append_jsonl(memory_dir / "layer2/active/beliefs.jsonl", updated)
-                    contradicted_count += 1
+            with ws.phase("4 维护"):
+                extracted = phase_data.get("extracted", {"facts": [], "beliefs": [], "summaries": []})
+
+                # 现有记忆(工作集中的同一份列表)
+                existing_facts = ws.active("facts")
+                existing_summaries = ws.active("summaries")
+                prior_facts = list(existing_facts)
+
+                # 4a: Facts 去重合并
+                print("   4a: Facts 去重合并 + 冲突检测")
+                new_facts = extracted.get("facts", [])
+                if new_facts:
+                    merged_facts, dup_count, downgrade_count = deduplicate_facts(new_facts, existing_facts)
+                    print(f"       新增: {len(merged_facts)}, 去重: {dup_count}, 降权: {downgrade_count}")
+                    # 去重/降权会原地修改已有 facts,与新增 facts 一起写回
+                    if dup_count or downgrade_count:
+                        ws.touch("facts")
+                    ws.extend("facts", merged_facts)
                 else:
-                    # 保持不变
-                    append_jsonl(memory_dir / "layer2/active/beliefs.jsonl", belief)
-
-            print(f"       证实→升级: {confirmed_count}, 矛盾→降权: {contradicted_count}")
-
-            # 4c: Summaries 生成
-            print("   4c: Summaries 生成")
-            all_facts_now = load_jsonl(memory_dir / "layer2/active/facts.jsonl")
-            trigger_count = config["thresholds"].get("summary_trigger", 3)
-            new_summaries = generate_summaries(all_facts_now, existing_summaries, trigger_count)
-            if new_summaries:
-                for summary in new_summaries:
-                    append_jsonl(memory_dir / "layer2/active/summaries.jsonl", summary)
-                print(f"       生成: {len(new_summaries)} 条新摘要")
-            else:
-                print("       [跳过] 无需生成摘要")
+                    print("       [跳过] 无新 facts")
+
+                # 4b: Beliefs 验证
+                print("   4b: Beliefs 验证")
+                new_beliefs = extracted.get("beliefs", [])
+                all_facts = prior_facts + extracted.get("facts", [])
+                confirmed_count = 0
+                contradicted_count = 0
+
+                for belief in new_beliefs:
+                    status, updated = code_verify_belief(belief, all_facts)
+                    if status == "confirmed":
+                        # 升级为 fact
+                        ws.extend("facts", [updated])
+                        confirmed_count += 1
+                    elif status == "contradicted":
+                        # 降低置信度后保存
+                        ws.extend("beliefs", [updated])
+                        contradicted_count += 1
+                    else:
+                        # 保持不变
+                        ws.extend("beliefs", [belief])
+
+                print(f"       证实→升级: {confirmed_count}, 矛盾→降权: {contradicted_count}")
+
+                # 4c: Summaries 生成
+                print("   4c: Summaries 生成")
+                trigger_count = config["thresholds"].get("summary_trigger", 3)
+                new_summaries = generate_summaries(ws.active("facts"), existing_summaries, trigger_count)
+                if new_summaries:
+                    ws.extend("summaries", new_summaries)
+                    print(f"       生成: {len(new_summaries)} 条新摘要")
+                else:
+                    print("       [跳过] 无需生成摘要")
 
-            # 4d: Entities 更新
-            print("   4d: Entities 更新")
-            all_facts_final = load_jsonl(memory_dir / "layer2/active/facts.jsonl")
-            all_beliefs_final = load_jsonl(memory_dir / "layer2/active/beliefs.jsonl")
-            all_summaries_final = load_jsonl(memory_dir / "layer2/active/summaries.jsonl")
-            entity_count = update_entities(all_facts_final, all_beliefs_final, all_summaries_final, memory_dir)
-            print(f"       更新: {entity_count} 个实体档案")
+                # 4d: Entities 更新
+                print("   4d: Entities 更新")
+                entity_count = update_entities(
+                    ws.active("facts"), ws.active("beliefs"), ws.active("summaries"), memory_dir
+                )
+                print(f"       更新: {entity_count} 个实体档案")
 
             print("   ✅ 完成")
 
         # Phase 5: 权重更新
-        if not args.phase or args.phase == 5:
+        if (not args.phase or args.phase == 5) and not committed:
             print("\n⚖️ Phase 5: 权重更新")
-            decay_rates = config["decay_rates"]
-            archive_threshold = config["thresholds"]["archive"]
-
-            # 5a: 应用访问加成(v1.1.5 已在 v1_1_helpers.calculate_access_boost 中修复)
-            if V1_1_ENABLED:
-                print("   5a: 应用访问加成")
-                for mem_type in ["facts", "beliefs", "summaries"]:
-                    active_path = memory_dir / f"layer2/active/{mem_type}.jsonl"
-                    records = load_jsonl(active_path)
-                    records = phase5_rank_with_access_boost(records)
-                    save_jsonl(active_path, records)
-                print("   ✅ 访问加成完成")
-
-            # 5b: v1.1.5 清理废弃的学习实体
-            if V1_1_5_ENABLED:
-                print("   5b: 清理废弃学习实体")
-                from v1_1_5_entity_system import cleanup_learned_entities
-
-                cleanup_stats = cleanup_learned_entities(memory_dir)
-                print(f"       清理: {cleanup_stats['exact_removed']} 实体, {cleanup_stats['patterns_removed']} 模式")
-                print(
-                    f"       保留: {cleanup_stats['exact_remaining']} 实体, {cleanup_stats['patterns_remaining']} 模式"
-                )
+            with ws.phase("5 权重"):
+                decay_rates = config["decay_rates"]
+                archive_threshold = config["thresholds"]["archive"]
 
-            # 5c: 衰减(含访问保护)
-            print("   5c: 衰减更新")
-            archived_count = 0
-            for mem_type in ["facts", "beliefs", "summaries"]:
-                active_path = memory_dir / f"layer2/active/{mem_type}.jsonl"
-                archive_path = memory_dir / f"layer2/archive/{mem_type}.jsonl"
-
-                records = load_jsonl(active_path)
-
-                # v1.1.4: 应用访问保护衰减
+                # 5a: 应用访问加成(v1.1.5 已在 v1_1_helpers.calculate_access_boost 中修复)
                 if V1_1_ENABLED:
-                    records = phase6_decay_with_access_protection(records, config)
+                    print("   5a: 应用访问加成")
+                    for mem_type in MEMORY_TYPES:
+                        records = ws.active(mem_type)
+                        before = [(id(r), r.get("final_score")) for r in records]
+                        ranked = phase5_rank_with_access_boost(records)
+                        # v1.7.0: 排名与加成都没变时不标脏,避免每天重写整个活跃池
+                        if [(id(r), r.get("final_score")) for r in ranked] != before:
+                            ws.replace(mem_type, ranked)
+                    print("   ✅ 访问加成完成")
+
+                # 5b: v1.1.5 清理废弃的学习实体
+                if V1_1_5_ENABLED:
+                    print("   5b: 清理废弃学习实体")
+                    from v1_1_5_entity_system import cleanup_learned_entities
+
+                    cleanup_stats = cleanup_learned_entities(memory_dir)
+                    print(f"       清理: {cleanup_stats['exact_removed']} 实体, {cleanup_stats['patterns_removed']} 模式")
+                    print(
+                        f"       保留: {cleanup_stats['exact_remaining']} 实体, {cleanup_stats['patterns_remaining']} 模式"
+                    )
+
+                # v1.7.0: 清理过期会话(inject --session 的候选池)
+                if SESSION_CONTEXT_ENABLED:
+                    session_ttl = config.get("session", DEFAULT_CONFIG["session"]).get("ttl_seconds", 21600)
+                    removed_sessions = session_context.cleanup_sessions(memory_dir, ttl_seconds=session_ttl)
+                    if removed_sessions:
+                        print(f"   清理过期会话: {removed_sessions} 个")
+
+                # 5c: 衰减(含访问保护)
+                print("   5c: 衰减更新")
+                archived_count = 0
+                if LAZY_DECAY_ENABLED:
+                    # v1.7.0: 闭式衰减在读取时计算,这里只落盘/归档衰减视界索引中到期的记录
+                    archived_count = _archive_decayed(ws, config)
                 else:
-                    # v1.1.3 原始衰减逻辑
-                    decay_rate = decay_rates.get(mem_type.rstrip("s"), 0.01)
-                    for r in records:
-                        importance = r.get("importance", 0.5)
-                        actual_decay = decay_rate * (1 - importance * 0.5)
-                        r["score"] = r.get("score", importance) * (1 - actual_decay)
-
-                remaining = []
-                to_archive = []
-
-                for r in records:
-                    if r.get("score", 0) < archive_threshold:
-                        to_archive.append(r)
-                        archived_count += 1
-                    else:
-                        remaining.append(r)
+                    for mem_type in MEMORY_TYPES:
+                        records = ws.active(mem_type)
+
+                        # v1.1.4: 应用访问保护衰减
+                        if V1_1_ENABLED:
+                            records = phase6_decay_with_access_protection(records, config)
+                        else:
+                            # v1.1.3 原始衰减逻辑
+                            decay_rate = decay_rates.get(MEMORY_TYPE_SINGULAR[mem_type], 0.01)
+                            for r in records:
+                                importance = r.get("importance", 0.5)
+                                actual_decay = decay_rate * (1 - importance * 0.5)
+                                r["score"] = r.get("score", importance) * (1 - actual_decay)
+
+                        remaining = []
+                        to_archive = []
+
+                        for r in records:
+                            if r.get("score", 0) < archive_threshold:
+                                to_archive.append(r)
+                                archived_count += 1
+                            else:
+                                remaining.append(r)
 
-                save_jsonl(active_path, remaining)
-                if to_archive:
-                    existing = load_jsonl(archive_path)
-                    save_jsonl(archive_path, existing + to_archive)
+                        ws.replace(mem_type, remaining)
+                        ws.archive(mem_type, to_archive)
 
             print(f"   衰减完成,归档 {archived_count} 条")
             print("   ✅ 完成")
 
         # Phase 6: 索引更新
-        if not args.phase or args.phase == 6:
+        if (not args.phase or args.phase == 6) and not committed:
             print("\n📇 Phase 6: 索引更新")
-            # 重建关键词索引
-            keywords_index = {}
-            relations_index = {}
+            with ws.phase("6 索引"):
+                # 重建关键词索引
+                keywords_index = {}
+                relations_index = {}
+
+                # 中文分词辅助函数
+                def extract_keywords(text):
+                    """提取关键词(改进版:保留连字符词)"""
+                    import re
+
+                    keywords = set()
+
+                    # 1. 优先提取连字符词(memory-system, v1.1, API-key等)
+                    hyphen_words = re.findall(r"[a-zA-Z0-9][-a-zA-Z0-9.]+", text)
+                    for word in hyphen_words:
+                        if len(word) > 1:
+                            keywords.add(word.lower())
+
+                    # 2. 提取中文词组(2字以上)
+                    chinese_words = re.findall(r"[\u4e00-\u9fa5]{2,}", text)
+                    for word in chinese_words:
+                        keywords.add(word)
+
+                    # 3. 提取纯英文单词(不含连字符的)
+                    english_words = re.findall(r"\b[a-zA-Z]{2,}\b", text)
+                    for word in english_words:
+                        keywords.add(word.lower())
 
-            # 中文分词辅助函数
-            def extract_keywords(text):
-                """提取关键词(改进版:保留连字符词)"""
-                import re
+                    return keywords
+
+                for mem_type in MEMORY_TYPES:
+                    for r in ws.active(mem_type):
+                        # 改进的关键词提取
+                        content = r.get("content", "")
+                        keywords = extract_keywords(content)
+                        for word in keywords:
+                            if word not in keywords_index:
+                                keywords_index[word] = []
+                            if r["id"] not in keywords_index[word]:
+                                keywords_index[word].append(r["id"])
+
+                        # 实体关系
+                        for entity in r.get("entities", []):
+                            if entity not in relations_index:
+                                relations_index[entity] = {"facts": [], "beliefs": [], "summaries": []}
+                            relations_index[entity][mem_type].append(r["id"])
+
+                # 与活跃池一起提交,索引与记录保持一致
+                ws.write_json("layer2/index/keywords.json", keywords_index)
+                ws.write_json("layer2/index/relations.json", relations_index)
+            print(f"   关键词: {len(keywords_index)} 个 | 实体关系: {len(relations_index)} 个")
+            print("   ✅ 完成")
 
-                keywords = set()
+        # Phase 6.9: 过时扫描 (v1.5.0 新增;v1.7.0 起在提交前对工作集执行)
+        if (not args.phase or args.phase in [6, 7]) and not committed:
+            print("\n🔍 Phase 6.9: 过时扫描")
+            with ws.phase("6.9 过时扫描"):
+                stale_days = config.get("memory", {}).get("stale_days", 30)  # 默认 30 天
+                now = datetime.now()
+                verified_at = _stale_scan_time(memory_dir)
+                stale_count = 0
+                updated_verified = 0
+
+                # v1.7.0: 未过时的记录不再逐条刷新 last_verified(以本次扫描时间为整体验证时间),
+                # 只有过时标记翻转或补设验证时间的类型才改写活跃池
+                for mem_type in MEMORY_TYPES:
+                    changed = 0
+                    for r in ws.active(mem_type):
+                        verified = _last_verified(r, verified_at)
+                        if verified is None:
+                            # 没有时间信息或解析失败，设置为当前时间
+                            r["last_verified"] = now_iso()
+                            updated_verified += 1
+                            changed += 1
+                            continue
 
-                # 1. 优先提取连字符词(memory-system, v1.1, API-key等)
-                hyphen_words = re.findall(r"[a-zA-Z0-9][-a-zA-Z0-9.]+", text)
-                for word in hyphen_words:
-                    if len(word) > 1:
-                        keywords.add(word.lower())
+                        days_since = (now - verified).days
+                        if days_since > stale_days:
+                            stale_count += 1
+                            if not r.get("stale"):
+                                # 标记为过时：写回实际验证时间，之后天数从这里继续增长
+                                r["stale"] = True
+                                r["stale_days"] = days_since
+                                r["last_verified"] = verified.strftime("%Y-%m-%dT%H:%M:%SZ")
+                                changed += 1
+                        elif r.get("stale"):
+                            # 非过时：清除标记
+                            r.pop("stale", None)
+                            r.pop("stale_days", None)
+                            changed += 1
+
+                    if changed:
+                        ws.touch(mem_type)
+                ws.write_json(STALE_SCAN_FILE, {"verified_at": now_iso()})
 
-                # 2. 提取中文词组(2字以上)
-                chinese_words = re.findall(r"[\u4e00-\u9fa5]{2,}", text)
-                for word in chinese_words:
-                    keywords.add(word)
-
-                # 3. 提取纯英文单词(不含连字符的)
-                english_words = re.findall(r"\b[a-zA-Z]{2,}\b", text)
-                for word in english_words:
-                    keywords.add(word.lower())
-
-                return keywords
-
-            for mem_type in ["facts", "beliefs", "summaries"]:
-                records = load_jsonl(memory_dir / f"layer2/active/{mem_type}.jsonl")
-                for r in records:
-                    # 改进的关键词提取
-                    content = r.get("content", "")
-                    keywords = extract_keywords(content)
-                    for word in keywords:
-                        if word not in keywords_index:
-                            keywords_index[word] = []
-                        if r["id"] not in keywords_index[word]:
-                            keywords_index[word].append(r["id"])
-
-                    # 实体关系
-                    for entity in r.get("entities", []):
-                        if entity not in relations_index:
-                            relations_index[entity] = {"facts": [], "beliefs": [], "summaries": []}
-                        relations_index[entity][mem_type].append(r["id"])
-
-            with open(memory_dir / "layer2/index/keywords.json", "w", encoding="utf-8") as f:
-                json.dump(keywords_index, f, indent=2, ensure_ascii=False)
-            with open(memory_dir / "layer2/index/relations.json", "w", encoding="utf-8") as f:
-                json.dump(relations_index, f, indent=2, ensure_ascii=False)
+            print(f"   过时标记: {stale_count} 条 (>{stale_days}天未验证)")
+            print(f"   补设验证时间: {updated_verified} 条")
+            print("   ✅ 完成")
 
+        # v1.7.0: 统一提交工作集(临时文件全部写完后再逐个替换)
+        if not committed:
+            print("\n💾 提交工作集")
+            with ws.phase("提交"):
+                commit_stats = ws.commit()
+            mark_store_changed(memory_dir)
+            checkpoint.complete("commit", pending_ids=[])
+            print(f"   写出 {commit_stats['files']} 个文件({commit_stats['bytes'] / 1024:.1f} KB)")
+            print("   ✅ 完成")
+
+        # Phase 6(续): 基于已提交文件的派生索引
+        if (not args.phase or args.phase == 6) and not resumed_past("6+"):
+            budget.check("Phase 6(续)")
+            print("\n📇 Phase 6(续): 派生索引更新")
+            with ws.phase("6 派生索引"):
+                # v1.7.0: 时间索引(timeline.json),文件只追加时增量更新
+                if TEMPORAL_ENGINE_ENABLED:
+                    timeline = temporal_index.get_temporal_index(memory_dir)
+                    timeline.refresh()
+                    timeline.save()
+
+                # v1.7.0: 相似实体表(entity_clusters.json),检索时实体隔离直接查表
+                if ENTITY_CLUSTERS_ENABLED:
+                    if relations_index is None:  # 恢复运行:Phase 6 已在上次运行中提交
+                        relations_path = memory_dir / "layer2/index/relations.json"
+                        relations_index = json.loads(relations_path.read_text(encoding="utf-8")) if relations_path.exists() else {}
+                    isolation_config = v1_1_5_entity_system.ENTITY_SYSTEM_CONFIG["isolation"] if V1_1_5_ENABLED else {}
+                    cluster_stats = entity_clusters.build_entity_clusters(
+                        memory_dir,
+                        entities=relations_index.keys(),
+                        threshold=isolation_config.get("similarity_threshold", 0.5),
+                        prefix_ratio=isolation_config.get("min_common_prefix_ratio", 0.5),
+                    )
+                    print(f"   相似实体: {cluster_stats['pairs']} 对(涉及 {cluster_stats['linked']}/{cluster_stats['entities']} 个实体)")
+
+                # v1.7.0: TF-IDF 索引(tfidf.json),只重新切词内容变化的记忆
+                if TFIDF_ENABLED:
+                    active_records = {
+                        r["id"]: {**r, "type": MEMORY_TYPE_SINGULAR[mem_type]}
+                        for mem_type, records in ws.all_active().items()
+                        for r in records
+                        if r.get("id")
+                    }
+                    tfidf_stats = tfidf_engine.build_tfidf_index(memory_dir, records=active_records)
+                    print(
+                        f"   TF-IDF: 新增/更新 {tfidf_stats['added']} | 移除 {tfidf_stats['removed']}"
+                        f" | 未变 {tfidf_stats['unchanged']}"
+                    )
+
+            checkpoint.complete("6+")
             print("   ✅ 完成")
 
         # v1.2.1: Phase 6.5 - QMD 索引更新
-        if not args.phase or args.phase in [6, 7]:
+        if (not args.phase or args.phase in [6, 7]) and not resumed_past("6.5"):
+            budget.check("Phase 6.5")
             if qmd_available(memory_dir):
                 print("\n🔍 Phase 6.5: QMD 索引更新")
                 try:
@@ -3011,28 +4001,58 @@ def cmd_consolidate(args):
                 except Exception as e:
                     print(f"   ⚠️ QMD 更新失败: {e}")
                     print("   继续使用基础索引...")
+            checkpoint.complete("6.5")
+
+        # Phase 6.6: 向量索引增量更新(v1.7.0 新增)
+        vector_config = config.get("vector", {})
+        if (
+            VECTOR_SEARCH_ENABLED
+            and vector_config.get("enabled", False)
+            and (not args.phase or args.phase in [6, 7])
+            and not resumed_past("6.6")
+        ):
+            budget.check("Phase 6.6")
+            print("\n🧭 Phase 6.6: 向量索引增量更新")
+            try:
+                embedding_engine = _get_vector_engine(vector_config, memory_dir)
+                if embedding_engine is None:
+                    print("   ⚠️ 嵌入引擎不可用,跳过")
+                else:
+                    vector_stats = vector_index.build_vector_index(
+                        memory_dir=memory_dir,
+                        embedding_engine=embedding_engine,
+                        ivf_threshold=vector_config.get("ivf_threshold", 20000),
+                        nprobe=vector_config.get("nprobe", 12),
+                    )
+                    print(
+                        f"   新增/更新 {vector_stats['indexed']} | 移除 {vector_stats['removed']}"
+                        f" | 未变 {vector_stats['skipped']} | 失败 {vector_stats['failed']}"
+                    )
+            except Exception as e:
+                print(f"   ⚠️ 向量索引更新失败: {e}")
+            checkpoint.complete("6.6")
 
         # Phase 6.8: 主动记忆引擎更新(v1.4.0 新增)
-        if PROACTIVE_ENABLED and (not args.phase or args.phase in [6, 7]):
+        if PROACTIVE_ENABLED and (not args.phase or args.phase in [6, 7]) and not resumed_past("6.8"):
+            budget.check("Phase 6.8")
             try:
                 print("\n🤖 Phase 6.8: 主动记忆引擎更新")
-                proactive_engine = create_engine(memory_dir)
+                proactive = proactive_engine.create_engine(memory_dir)
 
                 # 用最新的 facts 喂给引擎,更新意图状态
-                recent_facts = load_jsonl(memory_dir / "layer2/active/facts.jsonl")
-                recent_facts.sort(key=lambda x: x.get("created", ""), reverse=True)
+                recent_facts = sorted(ws.active("facts"), key=lambda x: x.get("created", ""), reverse=True)
 
                 fed_count = 0
                 for fact in recent_facts[:20]:  # 只取最新 20 条
-                    proactive_engine.process_message(fact.get("content", ""), role="user")
+                    proactive.process_message(fact.get("content", ""), role="user")
                     fed_count += 1
 
                 # 保存引擎状态
-                proactive_engine.save_state()
+                proactive.save_state()
 
                 # 获取主动建议
-                suggestion = proactive_engine.get_next_suggestion()
-                stats = proactive_engine.get_stats()
+                suggestion = proactive.get_next_suggestion()
+                stats = proactive.get_stats()
                 print(f"   喂入记忆: {fed_count} 条")
                 print(f"   意图检测: {stats.get('intents_detected', 0)} 个")
                 print(f"   主动建议: {stats.get('suggestions_generated', 0)} 条")
@@ -3041,75 +4061,27 @@ def cmd_consolidate(args):
                 print("   ✅ 完成")
             except Exception as e:
                 print(f"   ⚠️ 主动记忆引擎更新失败: {e}")
+            checkpoint.complete("6.8")
 
-        # Phase 6.9: 过时扫描 (v1.5.0 新增)
+        # v1.7.0: 派生索引(tfidf / entity_clusters / timeline / 向量)在提交后写出,再次使查询缓存失效
         if not args.phase or args.phase in [6, 7]:
-            print("\n🔍 Phase 6.9: 过时扫描")
-
-            stale_days = config.get("memory", {}).get("stale_days", 30)  # 默认 30 天
-            now = datetime.now()
-            stale_count = 0
-            updated_verified = 0
-
-            for mem_type in ["facts", "beliefs", "summaries"]:
-                path = memory_dir / f"layer2/active/{mem_type}.jsonl"
-                records = load_jsonl(path)
-                updated_records = []
-
-                for r in records:
-                    # 获取 last_verified 或 created
-                    verified_str = r.get("last_verified") or r.get("created", "")
-                    if not verified_str:
-                        # 没有任何时间信息，设置为当前时间
-                        r["last_verified"] = now_iso()
-                        updated_verified += 1
-                        updated_records.append(r)
-                        continue
-
-                    try:
-                        # 解析时间
-                        verified_str = verified_str.replace("Z", "+00:00")
-                        verified_date = datetime.fromisoformat(verified_str)
-                        if verified_date.tzinfo:
-                            verified_date = verified_date.replace(tzinfo=None)
-                        days_since = (now - verified_date).days
-
-                        if days_since > stale_days:
-                            # 标记为过时（不更新 last_verified，让天数继续增长）
-                            r["stale"] = True
-                            r["stale_days"] = days_since
-                            stale_count += 1
-                        else:
-                            # 非过时：清除标记，更新 last_verified
-                            r.pop("stale", None)
-                            r.pop("stale_days", None)
-                            r["last_verified"] = now_iso()
-                            updated_verified += 1
-                    except Exception:
-                        # 时间解析失败，设置当前时间
-                        r["last_verified"] = now_iso()
-                        updated_verified += 1
-
-                    updated_records.append(r)
-
-                # 保存更新后的记录
-                save_jsonl(path, updated_records)
-
-            print(f"   过时标记: {stale_count} 条 (>{stale_days}天未验证)")
-            print(f"   新增验证时间: {updated_verified} 条")
-            print("   ✅ 完成")
+            mark_store_changed(memory_dir)
 
         # Phase 7: Layer 1 快照
         if not args.phase or args.phase == 7:
+            budget.check("Phase 7")
             print("\n📸 Phase 7: Layer 1 快照")
 
-            # 收集所有活跃记忆并排序
+            # 收集所有活跃记忆并排序(直接取已提交的工作集)
             all_records = []
-            for mem_type in ["facts", "beliefs", "summaries"]:
-                records = load_jsonl(memory_dir / f"layer2/active/{mem_type}.jsonl")
-                for r in records:
-                    r["_type"] = mem_type
-                all_records.extend(records)
+            for mem_type, records in ws.all_active().items():
+                all_records.extend({**r, "_type": mem_type} for r in records)
+
+            # v1.7.0: 惰性衰减的分数在读取时计算(只作用于快照副本)
+            if LAZY_DECAY_ENABLED:
+                decay_model = _decay_model(config)
+                for r in all_records:
+                    r["score"] = decay_model.score_at(r, mem_type=r["_type"])
 
             # 按 score 排序
             all_records.sort(key=lambda x: x.get("score", 0), reverse=True)
@@ -3201,12 +4173,13 @@ def cmd_consolidate(args):
 
             print("   ✅ 完成")
 
-        # 更新成功状态
-        state["last_success"] = now_iso()
-        state["current_phase"] = None
-        state["retry_count"] = 0
-        with open(state_path, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+        # v1.7.0: 各阶段耗时与读写量
+        print("\n⏱️ 阶段耗时")
+        for line in ws.report():
+            print(line)
+
+        # 更新成功状态(清空检查点;--phase 单阶段运行保留阶段产物)
+        checkpoint.finish(now_iso(), keep_data=bool(args.phase))
 
         print("\n" + "=" * 40)
         print("✅ Consolidation 完成!")
@@ -3240,11 +4213,39 @@ def cmd_consolidate(args):
         else:
             print("\n💰 Token 节省: 100% (纯规则处理,无 LLM 调用)")
 
+        # v1.7.0: LLM 响应缓存统计(本次运行)
+        llm_cache = _get_llm_cache()
+        if llm_cache is not None:
+            cache_stats = llm_cache.get_stats(cumulative=False)
+            if cache_stats["hits"] or cache_stats["misses"]:
+                print(
+                    f"🗄️ LLM 缓存: 命中 {cache_stats['hits']} | 未命中 {cache_stats['misses']}"
+                    f" | 节省 Token {cache_stats['tokens_saved']} | 缓存条目 {cache_stats['entries']}"
+                )
+
+        # v1.7.0: LLM 熔断统计(端点故障时提示)
+        llm_breaker = _get_llm_breaker()
+        if llm_breaker is not None:
+            breaker_stats = llm_breaker.get_stats()
+            if breaker_stats["opened"] or breaker_stats["short_circuited"]:
+                print(
+                    f"🔌 LLM 熔断: 触发 {breaker_stats['opened']} 次 | 短路兜底 {breaker_stats['short_circuited']} 次"
+                    f" | 超时 {breaker_stats['timeouts']} 次 | 当前 {breaker_stats['state']}"
+                )
+        return "done"
+
+    except consolidation_checkpoint.ConsolidationPaused as e:
+        # v1.7.0: 时间预算用尽,检查点已落盘(未提交的工作集变换丢弃,恢复时重做)
+        print(f"\n⏸️ 时间预算用尽,在 {e.phase} 之前暂停(已完成: {', '.join(checkpoint.completed) or '无'})")
+        print("   使用 consolidate --resume 继续")
+        return "paused"
     except Exception as e:
-        state["retry_count"] = state.get("retry_count", 0) + 1
-        with open(state_path, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+        checkpoint.fail()
+        if ws.committed:
+            mark_store_changed(memory_dir)  # 提交后的派生索引阶段失败,活跃池已更新
         print(f"\n❌ Consolidation 失败: {e}")
+        if not ws.committed:
+            print("   工作集未提交,活跃池保持整理前状态")
         raise
 
 
@@ -3279,18 +4280,28 @@ def cmd_validate(args):
 
     # 检查 JSONL 文件格式
     for mem_type in ["facts", "beliefs", "summaries"]:
-        for pool in ["active", "archive"]:
-            path = memory_dir / f"layer2/{pool}/{mem_type}.jsonl"
-            if path.exists():
-                try:
-                    records = load_jsonl(path)
-                    for i, r in enumerate(records):
-                        if "id" not in r:
-                            errors.append(f"{path}:{i + 1} 缺少 id 字段")
-                        if "content" not in r:
-                            errors.append(f"{path}:{i + 1} 缺少 content 字段")
-                except Exception as e:
-                    errors.append(f"{path} 解析失败: {e}")
+        path = memory_dir / f"layer2/active/{mem_type}.jsonl"
+        if path.exists():
+            try:
+                records = load_jsonl(path)
+                for i, r in enumerate(records):
+                    if "id" not in r:
+                        errors.append(f"{path}:{i + 1} 缺少 id 字段")
+                    if "content" not in r:
+                        errors.append(f"{path}:{i + 1} 缺少 content 字段")
+            except Exception as e:
+                errors.append(f"{path} 解析失败: {e}")
+
+        # v1.7.0: 归档池(旧格式 JSONL + 压缩段)
+        archive_path = memory_dir / f"layer2/archive/{mem_type}"
+        try:
+            for i, r in enumerate(_archive_store(memory_dir).iter_records(mem_type)):
+                if "id" not in r:
+                    errors.append(f"{archive_path}:{i + 1} 缺少 id 字段")
+                if "content" not in r:
+                    errors.append(f"{archive_path}:{i + 1} 缺少 content 字段")
+        except (archive_store.ArchiveCorruptError, ValueError) as e:
+            errors.append(f"{archive_path} 解析失败: {e}")
 
 
 # ============================================================
@@ -3370,7 +4381,7 @@ def cmd_inject(args):
     动态注入:根据用户消息检索相关记忆,输出可直接注入 prompt 的内容
 
     用法:
-        memory.py inject "用户消息" [--max-tokens 500] [--format text|json]
+        memory.py inject "用户消息" [--max-tokens 500] [--format text|json] [--session ID]
 
     输出格式(text):
         ## 相关记忆
@@ -3389,55 +4400,17 @@ def cmd_inject(args):
             print("# 无相关记忆")
         return
 
-    query = args.query
-    max_tokens = args.max_tokens
-
-    # 调用 router_search 检索
-    result = router_search(query, memory_dir)
-
-    if not result.get("results"):
-        if args.format == "json":
-            print('{"direct": [], "marked": [], "reference": []}')
-        else:
-            print("# 无相关记忆")
-        return
-
-    # 格式化输出
-    injection = result.get("injection", format_injection(result["results"]))
+    # v1.7.0: 检索与渲染由 MemorySystem 完成(带会话 ID 时走增量检索)
+    injection = _memory_system(memory_dir).inject(args.query, session=args.session)
 
     if args.format == "json":
-        print(json.dumps(injection, ensure_ascii=False, indent=2))
+        if any(injection.values()):
+            print(json.dumps(injection, ensure_ascii=False, indent=2))
+        else:
+            print('{"direct": [], "marked": [], "reference": []}')
     else:
         # 文本格式,适合直接注入 prompt
-        lines = []
-
-        # 直接注入的高置信度记忆
-        if injection.get("direct"):
-            lines.append("## 相关记忆")
-            for item in injection["direct"][:5]:  # 最多5条
-                type_tag = item.get("type", "fact")[0].upper()
-                content = item["content"][:200]  # 截断
-                lines.append(f"- [{type_tag}] {content}")
-
-        # 带标记的中置信度记忆
-        if injection.get("marked"):
-            if not lines:
-                lines.append("## 可能相关")
-            for item in injection["marked"][:3]:  # 最多3条
-                type_tag = item.get("type", "fact")[0].upper()
-                content = item["content"][:150]
-                source = item.get("source", "unknown")
-                lines.append(f"- [{type_tag}] {content} (ref:{source})")
-
-        # 控制总 token 数(粗略估计:1中文字≈1.5token)
-        output = "\n".join(lines)
-        estimated_tokens = len(output) * 1.5
-        if estimated_tokens > max_tokens:
-            # 截断
-            char_limit = int(max_tokens / 1.5)
-            output = output[:char_limit] + "\n..."
-
-        print(output if output else "# 无相关记忆")
+        print(memory_api.render_injection(injection, args.max_tokens))
 
 
 def cmd_validate(args):
@@ -3455,18 +4428,28 @@ def cmd_validate(args):
 
     # 检查 JSONL 文件格式
     for mem_type in ["facts", "beliefs", "summaries"]:
-        for pool in ["active", "archive"]:
-            path = memory_dir / f"layer2/{pool}/{mem_type}.jsonl"
-            if path.exists():
-                try:
-                    records = load_jsonl(path)
-                    for i, r in enumerate(records):
-                        if "id" not in r:
-                            errors.append(f"{path}:{i + 1} 缺少 id 字段")
-                        if "content" not in r:
-                            errors.append(f"{path}:{i + 1} 缺少 content 字段")
-                except Exception as e:
-                    errors.append(f"{path} 解析失败: {e}")
+        path = memory_dir / f"layer2/active/{mem_type}.jsonl"
+        if path.exists():
+            try:
+                records = load_jsonl(path)
+                for i, r in enumerate(records):
+                    if "id" not in r:
+                        errors.append(f"{path}:{i + 1} 缺少 id 字段")
+                    if "content" not in r:
+                        errors.append(f"{path}:{i + 1} 缺少 content 字段")
+            except Exception as e:
+                errors.append(f"{path} 解析失败: {e}")
+
+        # v1.7.0: 归档池(旧格式 JSONL + 压缩段)
+        archive_path = memory_dir / f"layer2/archive/{mem_type}"
+        try:
+            for i, r in enumerate(_archive_store(memory_dir).iter_records(mem_type)):
+                if "id" not in r:
+                    errors.append(f"{archive_path}:{i + 1} 缺少 id 字段")
+                if "content" not in r:
+                    errors.append(f"{archive_path}:{i + 1} 缺少 content 字段")
+        except (archive_store.ArchiveCorruptError, ValueError) as e:
+            errors.append(f"{archive_path} 解析失败: {e}")
 
     if errors:
         print(f"❌ 发现 {len(errors)} 个问题:")
@@ -3551,6 +4534,25 @@ def save_pending(memory_dir, records: list):
     pending_path.parent.mkdir(parents=True, exist_ok=True)
     save_jsonl(pending_path, records)
 
+    # v1.7.0: 整体改写后同步倒排索引(清空时直接清空索引)
+    if PENDING_INDEX_ENABLED:
+        pending_index.invalidate_pending_index(memory_dir, cleared=not records)
+    mark_store_changed(memory_dir)
+
+
+def _pending_key(item: dict) -> str:
+    """pending 条目标识:id;缺失 id 的旧条目用创建时间 + 内容"""
+    return item.get("id") or f"{item.get('created', '')}|{item.get('content', '')}"
+
+
+def _consume_pending(memory_dir, keys):
+    """v1.7.0: 从 pending 移除已被 Consolidation 读取的条目(按 _pending_key 匹配)"""
+    keys = set(keys)
+    pending = load_pending(memory_dir)
+    remaining = [item for item in pending if _pending_key(item) not in keys]
+    if len(remaining) != len(pending):
+        save_pending(memory_dir, remaining)
+
 
 def add_to_pending(memory_dir, content: str, source: str = "user") -> dict:
     """
@@ -3570,21 +4572,74 @@ def add_to_pending(memory_dir, content: str, source: str = "user") -> dict:
         "category": category,
     }
 
-    pending = load_pending(memory_dir)
-    pending.append(record)
-    save_pending(memory_dir, pending)
+    # v1.7.0: 追加写入,不再整体读写 pending.jsonl
+    append_jsonl(Path(memory_dir) / "layer2/pending.jsonl", record)
+
+    # 倒排索引只需增量读取新追加的一行;持久化只在写路径进行,检索不写盘
+    if PENDING_INDEX_ENABLED:
+        index_config = _pending_index_config()
+        index = pending_index.peek_pending_index(memory_dir)
+        if index is None and index_config.get("enabled", True) and index_config.get("persist", True):
+            index = pending_index.get_pending_index(memory_dir)
+        if index is not None:
+            try:
+                index.refresh()
+                index.save()
+            except Exception:
+                pass  # 索引失败不影响写入,检索时降级或重建
+    mark_store_changed(memory_dir)
 
     return record
 
 
-def search_pending(query: str, memory_dir=None) -> list:
+def _pending_index_config():
+    """pending 倒排索引配置"""
+    return get_config().get("pending_index", DEFAULT_CONFIG["pending_index"])
+
+
+def search_pending(query: str, memory_dir=None, limit=None) -> list:
     """
-    搜索 pending buffer(Hot Store)
-    简单关键词匹配,用于 router_search 的第一优先级
+    搜索 pending buffer(Hot Store),用于 router_search 的第一优先级
+
+    v1.7.0: 优先使用增量倒排索引(BM25 打分),降级回逐条子串匹配
+    - min_coverage: 命中查询词比例下限,过滤只碰上个别 2-gram 的记录
+    - limit: 最多返回条数
     """
     if memory_dir is None:
         memory_dir = get_memory_dir()
 
+    index_config = _pending_index_config()
+    if PENDING_INDEX_ENABLED and index_config.get("enabled", True):
+        try:
+            # 检索只刷新内存中的索引,不写盘(持久化由 add_to_pending 等写路径负责)
+            index = pending_index.get_pending_index(memory_dir, persist=index_config.get("persist", True))
+            index.refresh()
+            min_coverage = index_config.get("min_coverage", 0.2)
+            results = []
+            for record, bm25_score, coverage in index.search(query):
+                if coverage < min_coverage:
+                    continue
+                record_copy = record.copy()
+                record_copy["type"] = "pending"
+                record_copy["score"] = record.get("importance", 0.5)
+                record_copy["final_score"] = record.get("importance", 0.5)
+                record_copy["match_score"] = bm25_score
+                record_copy["match_coverage"] = coverage
+                record_copy["match_source"] = "pending"
+                record_copy["entities"] = []
+                results.append(record_copy)
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
+        except Exception:
+            pass  # 降级到逐条扫描
+
+    results = _search_pending_scan(query, memory_dir)
+    return results[:limit] if limit is not None else results
+
+
+def _search_pending_scan(query: str, memory_dir) -> list:
+    """原有逐条子串匹配(v1.2.2),作为降级兜底"""
     pending = load_pending(memory_dir)
     if not pending:
         return []
@@ -3622,6 +4677,42 @@ def search_pending(query: str, memory_dir=None) -> list:
 # ============================================================
 
 
+STALE_SCAN_FILE = "state/stale_scan.json"
+
+
+def _stale_scan_time(memory_dir):
+    """v1.7.0: 上次过时扫描(Phase 6.9)的时间;此前未过时的记录视为在该时刻已验证"""
+    data = _read_warm(memory_dir / STALE_SCAN_FILE, _load_json) or {}
+    try:
+        return _naive_datetime(data["verified_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _naive_datetime(value):
+    value = value.replace("Z", "+00:00")
+    dt = datetime.fromisoformat(value)
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _last_verified(record, verified_at=None):
+    """
+    v1.7.0: 记录的有效验证时间(last_verified 或 created;未标记过时的记录不早于上次过时扫描)
+
+    返回 datetime;没有时间信息或解析失败时返回 None
+    """
+    value = record.get("last_verified") or record.get("created", "")
+    if not value:
+        return None
+    try:
+        verified = _naive_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if verified_at is not None and not record.get("stale"):
+        return max(verified, verified_at)
+    return verified
+
+
 def cmd_health_index(args):
     """生成 INDEX.md 健康度仪表盘"""
     memory_dir = get_memory_dir()
@@ -3640,6 +4731,7 @@ def cmd_health_index(args):
 
     # 统计
     now = datetime.now()
+    verified_at = _stale_scan_time(memory_dir)
     stats = {
         "total": len(all_memories),
         "active": 0,
@@ -3654,20 +4746,9 @@ def cmd_health_index(args):
         mem_type = r.get("_type", "facts")
 
         # 计算状态
-        verified_str = r.get("last_verified") or r.get("created", "")
-        is_stale = False
-        days_since = 0
-
-        if verified_str:
-            try:
-                verified_str = verified_str.replace("Z", "+00:00")
-                verified_date = datetime.fromisoformat(verified_str)
-                if verified_date.tzinfo:
-                    verified_date = verified_date.replace(tzinfo=None)
-                days_since = (now - verified_date).days
-                is_stale = days_since > stale_days
-            except Exception:
-                pass
+        verified_date = _last_verified(r, verified_at)
+        days_since = (now - verified_date).days if verified_date else 0
+        is_stale = days_since > stale_days
 
         # 优先级
         importance = r.get("importance", 0.5)
@@ -3870,6 +4951,7 @@ def cmd_mini_consolidate(args):
         existing = load_jsonl(active_path)
         existing.append(record)
         save_jsonl(active_path, existing)
+    mark_store_changed(memory_dir)
 
     print(f"   写入 {len(extracted)} 条记录")
 
@@ -3893,10 +4975,7 @@ def cmd_mini_consolidate(args):
 def cmd_add_pending(args):
     """添加内容到 pending buffer"""
     memory_dir = get_memory_dir()
-    content = args.content
-    source = args.source
-
-    record = add_to_pending(memory_dir, content, source)
+    record = _memory_system(memory_dir).add_pending(args.content, args.source)
 
     print("✅ 已添加到 pending buffer")
     print(f"   ID: {record['id']}")
@@ -3936,6 +5015,302 @@ def cmd_view_pending(args):
     print(f"总计: {len(pending)} 条 | Urgent: {urgent_count} 条")
 
 
+def cmd_cache_stats(args):
+    """查看查询缓存统计"""
+    memory_dir = get_memory_dir()
+    cache = _get_query_cache(memory_dir)
+    if cache is None:
+        print("⚠️ 查询缓存未启用")
+        return
+
+    if args.clear:
+        cache.clear()
+        print("🧹 查询缓存已清空")
+        return
+
+    stats = cache.get_stats(cumulative=True)
+    print("📊 查询缓存统计(所有进程累计)")
+    print("=" * 50)
+    print(f"L1 内存: {stats['l1_entries']}/{stats['l1_max_entries']} 条")
+    if stats["l2_enabled"]:
+        print(f"L2 磁盘: {stats['l2_entries']}/{stats['l2_max_entries']} 条")
+    else:
+        print("L2 磁盘: 未启用")
+    print(f"命中: L1 {stats['l1_hits']} / L2 {stats['l2_hits']} | 未命中: {stats['misses']}")
+    print(f"命中率: {stats['hit_rate']:.1%}")
+    print(f"写入: {stats['sets']} | 淘汰: {stats['evictions']} | 失效: {stats['invalidations']}")
+    print(f"存储代数: {stats['generation']}")
+
+
+# ============================================================
+# 近重复扫描命令
+# ============================================================
+
+
+def _load_scan_records(ws, mem_type):
+    """
+    活跃池 + 归档池的 (pool, record)
+
+    活跃记录取自工作集(合并时原地修改),已被合并取代的归档记录不参与
+    """
+    entries = [("active", record) for record in ws.active(mem_type)]
+    for record in ws.archive_store.iter_records(mem_type):
+        if not record.get("superseded_by"):
+            entries.append(("archive", record))
+    return entries
+
+
+def _merge_near_duplicates(ws, mem_type, clusters, threshold):
+    """
+    用 ConflictResolver 在每个簇的活跃记录中选出保留者,与保留者复核近重复的记录并入后归档
+
+    簇是近重复对的连通分量(A~B、B~C 时 A、C 未必相似):与保留者不够相似的成员
+    留在簇内,在剩余成员中重新选保留者,直到不足 2 条
+    归档池中的记录只作为历史参与检测,不被改写
+    返回: 被合并的记录数
+    """
+    resolver = conflict_resolver.ConflictResolver()
+    records = ws.active(mem_type)
+    losers = {}
+
+    for cluster in clusters:
+        members = [record for pool, record in cluster if pool == "active"]
+        while len(members) >= 2:
+            survivor = members[0]
+            for other in members[1:]:
+                resolution = resolver.resolve(other, survivor)
+                if resolution["winner"] is other:
+                    survivor = other
+
+            content = survivor.get("content", "")
+            group = [
+                r for r in members
+                if r is not survivor and near_dup.near_duplicate(content, r.get("content", ""), threshold)
+            ]
+            members = [r for r in members if r is not survivor and all(r is not g for g in group)]
+            if group:
+                _absorb_near_duplicates(survivor, group, losers)
+
+    if losers:
+        ws.replace(mem_type, [r for r in records if id(r) not in losers])
+        ws.archive(mem_type, list(losers.values()))
+    return len(losers)
+
+
+def _absorb_near_duplicates(survivor, group, losers):
+    """保留者吸收重要性 / score / 实体,被合并记录标记 superseded_by 并登记到 losers"""
+    supersedes = survivor.get("supersedes") or "[]"
+    supersedes = json.loads(supersedes) if isinstance(supersedes, str) else list(supersedes)
+    entities = list(survivor.get("entities", []) or [])
+    model = _decay_model() if LAZY_DECAY_ENABLED else None
+    materialize_score(survivor, model)  # 先按旧 importance 落盘当前分数,再与被合并记录的当前分数比较
+    for other in group:
+        survivor["score"] = max(survivor["score"], current_score(other, model))
+        survivor["importance"] = max(survivor.get("importance", 0), other.get("importance", 0))
+        entities.extend(e for e in other.get("entities", []) or [] if e not in entities)
+        supersedes.append(other.get("id"))
+        other["superseded_by"] = survivor.get("id")
+        other["superseded_at"] = now_iso()
+        losers[id(other)] = other
+    survivor["entities"] = entities
+    survivor["supersedes"] = json.dumps(supersedes)
+    survivor["updated"] = now_iso()
+
+
+def cmd_dedup_scan(args):
+    """全库近重复扫描(可选用 ConflictResolver 合并)"""
+    memory_dir = get_memory_dir()
+    if not NEAR_DUP_ENABLED:
+        print("⚠️ 近重复检测模块不可用")
+        return
+    if args.merge and not HALLUCINATION_DEFENSE_ENABLED:
+        print("⚠️ ConflictResolver 不可用,无法合并")
+        return
+
+    config = get_config()
+    options = config.get("near_dup", {})
+    threshold = args.threshold if args.threshold is not None else options.get("threshold", 0.8)
+    num_perm = options.get("num_perm", 64)
+    bands = options.get("bands", 16)
+    mem_types = [args.type] if args.type else list(MEMORY_TYPES)
+
+    store = near_dup.FingerprintStore(memory_dir)
+    ws = WorkingSet(memory_dir, archive_store=_archive_store(memory_dir, config))
+    seen_ids = []
+    total = {"records": 0, "clusters": 0, "duplicates": 0, "computed": 0, "cached": 0, "elapsed_ms": 0.0}
+    merged = 0
+
+    try:
+        print(f"🔍 近重复扫描(Jaccard ≥ {threshold})")
+        print("=" * 50)
+        for mem_type in mem_types:
+            entries = _load_scan_records(ws, mem_type)
+            records = [record for _, record in entries]
+            seen_ids.extend(r["id"] for r in records if r.get("id"))
+            clusters, stats = near_dup.find_near_duplicates(records, threshold, num_perm, bands, store=store)
+            for key in total:
+                total[key] += stats[key]
+
+            for members in clusters[: args.limit]:
+                print(f"\n[{mem_type}] 簇({len(members)} 条)")
+                for i in members:
+                    pool, record = entries[i]
+                    print(f"  {'📦' if pool == 'archive' else '  '} {record.get('id')}: {record.get('content', '')[:60]}")
+            if len(clusters) > args.limit:
+                print(f"\n[{mem_type}] …另有 {len(clusters) - args.limit} 个簇未显示")
+
+            if args.merge and clusters:
+                merged += _merge_near_duplicates(
+                    ws, mem_type, [[entries[i] for i in members] for members in clusters], threshold
+                )
+
+        if not args.type:
+            store.prune(seen_ids)
+    finally:
+        store.close()
+
+    print("\n" + "=" * 50)
+    print(f"记忆: {total['records']} 条 | 近重复簇: {total['clusters']} | 多余副本: {total['duplicates']}")
+    print(f"指纹: 新计算 {total['computed']} / 复用 {total['cached']} | 耗时 {total['elapsed_ms']:.0f}ms")
+
+    if merged:
+        ws.commit()
+        mark_store_changed(memory_dir)
+        print(f"🔗 已合并 {merged} 条重复记忆(移入归档,标记 superseded_by)")
+    elif args.merge:
+        print("ℹ️ 没有需要合并的活跃记忆")
+
+
+def cmd_archive_compact(args):
+    """合并归档段(并把旧格式 JSONL 归档转换为压缩段)"""
+    memory_dir = get_memory_dir()
+    store = _archive_store(memory_dir)
+    types = [args.type] if args.type else list(MEMORY_TYPES)
+
+    print("🗜️ 归档压缩")
+    print("=" * 50)
+    for mem_type in types:
+        result = store.merge(mem_type, args.max_segments)
+        stats = store.stats(mem_type)
+        ratio = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0
+        print(
+            f"   {mem_type}: {stats['records']} 条, {result['segments']} 段(合并 {result['merged']} 段), "
+            f"{stats['stored_bytes'] / 1024:.1f} KB / 原始 {stats['raw_bytes'] / 1024:.1f} KB"
+            + (f", 压缩比 {ratio:.1f}x" if ratio else "")
+        )
+
+
+# ============================================================
+# 守护进程命令(v1.7.0)
+# ============================================================
+
+# 可由守护进程代答的命令 → (处理函数, 参数默认值);add-pending 为写操作,在守护进程内互斥执行
+DAEMON_COMMANDS = {
+    "inject": (cmd_inject, {"max_tokens": 500, "format": "text", "session": None}),
+    "search": (cmd_search, {"json": False}),
+    "add-pending": (cmd_add_pending, {"source": "user"}),
+}
+DAEMON_WRITE_COMMANDS = ("add-pending",)
+
+
+def _daemon_handler(command):
+    func, defaults = DAEMON_COMMANDS[command]
+    required = "content" if command == "add-pending" else "query"
+
+    def handle(args):
+        if not args.get(required):
+            raise ValueError(f"missing argument: {required}")
+        return func(argparse.Namespace(**{**defaults, **args}))
+
+    return handle
+
+
+def _warm_up(memory_dir):
+    """守护进程启动时预加载活跃记忆、索引与各召回器的进程内缓存"""
+    _active_memory_maps(memory_dir)
+    _read_warm(memory_dir / "layer2/index/keywords.json", _load_json)
+    _read_warm(memory_dir / "layer2/index/relations.json", _load_json)
+    qmd_available(memory_dir)
+    warmers = []
+    if PENDING_INDEX_ENABLED:
+        warmers.append(lambda: pending_index.get_pending_index(memory_dir).refresh())
+    if TEMPORAL_ENGINE_ENABLED:
+        warmers.append(lambda: temporal_index.get_temporal_index(memory_dir))
+    if TFIDF_ENABLED:
+        warmers.append(
+            lambda: tfidf_engine.tfidf_search(
+                "预热", memory_dir, top_k=1, records=_ActiveRecords(_active_memory_maps(memory_dir))
+            )
+        )
+    if ENTITY_MATCHER_ENABLED:
+        warmers.append(lambda: entity_matcher.get_entity_matcher(memory_dir))
+    for warm in warmers:
+        try:
+            warm()
+        except Exception:
+            pass  # 预热失败不影响服务,首个请求时再加载
+
+
+def _run_via_daemon(args):
+    """
+    守护进程在运行时把命令转交给它(MEMORY_NO_DAEMON=1 关闭)
+
+    返回: True 表示已由守护进程处理;False 表示应在本进程执行
+    """
+    payload = {k: v for k, v in vars(args).items() if k not in ("func", "command")}
+    try:
+        response = daemon_request(get_memory_dir(), args.command, payload)
+    except DaemonError as e:
+        if args.command in DAEMON_WRITE_COMMANDS:
+            # 请求可能已被执行,不再本地重试以免重复写入
+            print(f"❌ 守护进程请求失败: {e}", file=sys.stderr)
+            return True
+        return False
+    if response is None:
+        return False
+
+    sys.stdout.write(response.get("output", ""))
+    if not response.get("ok"):
+        print(f"❌ 守护进程执行失败: {response.get('error')}", file=sys.stderr)
+    return True
+
+
+def cmd_serve(args):
+    """常驻守护进程:保持索引与缓存热状态,通过 UNIX socket 应答 inject / search / add-pending"""
+    memory_dir = get_memory_dir().resolve()
+
+    if args.status or args.stop:
+        status = daemon_ping(memory_dir)
+        if status is None:
+            print("⚪ 守护进程未运行")
+        elif args.stop:
+            daemon_shutdown(memory_dir)
+            print(f"🛑 已请求守护进程退出 (pid {status['pid']})")
+        else:
+            print(f"🟢 守护进程运行中 (pid {status['pid']})")
+            print(f"   运行时长: {status['uptime']:.0f}s | 已处理请求: {status['requests']} | 失败: {status['errors']}")
+        return
+
+    if not memory_dir.exists():
+        print("❌ 记忆系统未初始化")
+        return
+
+    # 固定记忆目录,避免请求处理时受工作目录影响
+    os.environ["MEMORY_DIR"] = str(memory_dir)
+    handlers = {command: _daemon_handler(command) for command in DAEMON_COMMANDS}
+    daemon = MemoryDaemon(memory_dir, handlers, exclusive=DAEMON_WRITE_COMMANDS, warmup=lambda: _warm_up(memory_dir))
+    try:
+        daemon.bind()
+    except (DaemonError, OSError) as e:
+        print(f"❌ 无法启动守护进程: {e}")
+        return
+
+    print(f"🛰️ 守护进程已启动: {daemon.socket_path} (pid {os.getpid()},Ctrl+C 退出)")
+    sys.stdout.flush()
+    daemon.serve_forever()
+    print("👋 守护进程已退出")
+
+
 # ============================================================
 # 主动记忆引擎命令
 # ============================================================
@@ -3950,7 +5325,7 @@ def get_proactive_engine():
         memory_dir = get_memory_dir()
         config = get_config()
         proactive_config = config.get("proactive", {})
-        _proactive_engine_instance = create_engine(memory_dir=memory_dir, config=proactive_config)
+        _proactive_engine_instance = proactive_engine.create_engine(memory_dir=memory_dir, config=proactive_config)
     return _proactive_engine_instance
 
 
@@ -4110,10 +5485,10 @@ def cmd_vector_build(args):
         print("❌ 记忆系统未初始化")
         return
 
-    config = get_config()
+    config = copy.deepcopy(get_config())
     vector_config = config.get("vector", {})
 
-    provider = args.provider or vector_config.get("provider", "openai")
+    provider = args.provider or vector_config.get("provider", "hashing")
     model = args.model or vector_config.get("model")
 
     print("🔨 构建向量索引")
@@ -4122,17 +5497,18 @@ def cmd_vector_build(args):
     print()
 
     try:
-        embedding_engine = get_embedding_engine(provider=provider, model=model)
+        embedding_engine = _get_vector_engine(vector_config, memory_dir, provider=provider, model=model)
         if embedding_engine is None:
             print("❌ 嵌入引擎初始化失败")
             print("   请检查 API Key 配置或安装必要的依赖")
             return
 
-        stats = build_vector_index(
+        stats = vector_index.build_vector_index(
             memory_dir=memory_dir,
             embedding_engine=embedding_engine,
-            backend=vector_config.get("backend", "sqlite"),
             batch_size=args.batch_size,
+            ivf_threshold=vector_config.get("ivf_threshold", 20000),
+            nprobe=vector_config.get("nprobe", 12),
         )
 
         print()
@@ -4140,13 +5516,29 @@ def cmd_vector_build(args):
         print(f"   总记忆数: {stats['total']}")
         print(f"   新索引: {stats['indexed']}")
         print(f"   已跳过: {stats['skipped']}")
+        print(f"   已移除: {stats['removed']}")
         print(f"   失败: {stats['failed']}")
 
+        embedding_cache = getattr(embedding_engine, "cache", None)
+        if embedding_cache is not None:
+            cache_stats = embedding_cache.get_stats()
+            print(
+                f"   嵌入缓存: 命中率 {cache_stats['hit_rate']:.1%}"
+                f" ({cache_stats['entries']}/{cache_stats['max_size']} 条)"
+            )
+
+        # 向量索引已重建,旧的查询缓存结果不再有效
+        mark_store_changed(memory_dir)
+
         if stats["indexed"] > 0:
             vector_config["enabled"] = True
+            vector_config["provider"] = provider
             vector_config["dimension"] = embedding_engine.dimension
+            if provider != "hashing":
+                vector_config["model"] = embedding_engine.model
             config["vector"] = vector_config
             save_config(config)
+            mark_store_changed(memory_dir)  # 检索路径随 vector.enabled 变化
             print()
             print("✅ 向量检索已自动启用")
 
@@ -4171,51 +5563,49 @@ def cmd_vector_search(args):
         return
 
     try:
-        embedding_engine = get_embedding_engine(
-            provider=vector_config.get("provider", "openai"),
-            model=vector_config.get("model"),
-        )
-        if embedding_engine is None:
-            print("❌ 嵌入引擎初始化失败")
-            return
-
         hybrid_config = vector_config.get("hybrid_search", {})
-        hybrid_engine = create_hybrid_search_engine(
-            memory_dir=memory_dir,
-            embedding_engine=embedding_engine,
-            backend=vector_config.get("backend", "sqlite"),
-            keyword_weight=hybrid_config.get("keyword_weight", 0.3),
-            vector_weight=hybrid_config.get("vector_weight", 0.7),
-            min_score=hybrid_config.get("min_score", 0.2),
-        )
-        if hybrid_engine is None:
-            print("❌ 混合检索引擎初始化失败")
-            return
-
-        results = hybrid_engine.search(
-            query=args.query,
-            memory_dir=memory_dir,
-            top_k=args.top_k,
-            use_keyword=True,
-            use_vector=True,
-            memory_type=args.type,
-        )
+        keyword_weight = hybrid_config.get("keyword_weight", 0.3)
+        vector_weight = hybrid_config.get("vector_weight", 0.7)
+        min_score = hybrid_config.get("min_score", 0.2)
+
+        # 多取一些候选,过滤类型后再截断
+        candidate_limit = args.top_k * 3
+        vector_scores = dict(_vector_hits(args.query, memory_dir, vector_config, candidate_limit))
+
+        # 关键词分数按本次最高分归一化后加权融合
+        keyword_scores = {}
+        keyword_hits = keyword_search(args.query, memory_dir, limit=candidate_limit)
+        max_keyword = max((r.get("score", 0) for r in keyword_hits), default=0)
+        for r in keyword_hits:
+            if max_keyword > 0:
+                keyword_scores[r["id"]] = r.get("score", 0) / max_keyword
+
+        all_records = _load_all_active_records(memory_dir)
+        results = []
+        for mem_id in set(vector_scores) | set(keyword_scores):
+            record = all_records.get(mem_id)
+            if record is None or (args.type and record.get("type") != args.type):
+                continue
+            v_score = vector_scores.get(mem_id, 0.0)
+            k_score = keyword_scores.get(mem_id, 0.0)
+            score = vector_weight * v_score + keyword_weight * k_score
+            if score < min_score:
+                continue
+            results.append(
+                {
+                    "id": mem_id,
+                    "content": record.get("content", ""),
+                    "score": score,
+                    "vector_score": v_score,
+                    "keyword_score": k_score,
+                    "metadata": {k: record.get(k) for k in ("type", "importance", "created") if k in record},
+                }
+            )
+        results.sort(key=lambda x: x["score"], reverse=True)
+        results = results[: args.top_k]
 
         if args.json:
-            output = {
-                "query": args.query,
-                "results": [
-                    {
-                        "id": r.id,
-                        "content": r.content,
-                        "score": r.score,
-                        "vector_score": r.vector_score,
-                        "keyword_score": r.keyword_score,
-                        "metadata": r.metadata,
-                    }
-                    for r in results
-                ],
-            }
+            output = {"query": args.query, "results": results}
             print(json.dumps(output, indent=2, ensure_ascii=False))
             return
 
@@ -4225,8 +5615,8 @@ def cmd_vector_search(args):
         print()
 
         for i, r in enumerate(results):
-            print(f"{i + 1}. [{r.metadata.get('type', 'fact')[0].upper()}] {r.content[:60]}...")
-            print(f"   综合分数: {r.score:.3f} (向量: {r.vector_score:.3f}, 关键词: {r.keyword_score:.3f})")
+            print(f"{i + 1}. [{r['metadata'].get('type', 'fact')[0].upper()}] {r['content'][:60]}...")
+            print(f"   综合分数: {r['score']:.3f} (向量: {r['vector_score']:.3f}, 关键词: {r['keyword_score']:.3f})")
 
     except Exception as e:
         print(f"❌ 向量检索失败: {e}")
@@ -4246,9 +5636,9 @@ def cmd_vector_status(args):
     print("📊 向量索引状态")
     print("=" * 50)
     print(f"启用状态: {'✅ 已启用' if vector_config.get('enabled', False) else '❌ 未启用'}")
-    print(f"提供者: {vector_config.get('provider', 'openai')}")
-    print(f"模型: {vector_config.get('model', 'text-embedding-3-small')}")
-    print(f"维度: {vector_config.get('dimension', 1536)}")
+    print(f"提供者: {vector_config.get('provider', 'hashing')}")
+    print(f"模型: {vector_config.get('model') or '默认'}")
+    print(f"维度: {vector_config.get('dimension', 512)}")
     print(f"后端: {vector_config.get('backend', 'sqlite')}")
     print()
 
@@ -4260,15 +5650,20 @@ def cmd_vector_status(args):
     print()
 
     try:
-        from vector_index import VectorIndexManager
-
-        manager = VectorIndexManager(
-            memory_dir=memory_dir,
-            dimension=vector_config.get("dimension", 1536),
-            backend=vector_config.get("backend", "sqlite"),
-        )
-        vector_count = manager.get_vector_count()
-        print(f"已索引向量: {vector_count} 条")
+        index_stats = vector_index.get_vector_index(memory_dir).get_stats()
+        print(f"已索引向量: {index_stats['count']} 条")
+        print(f"索引维度: {index_stats['dimension']} | 模型: {index_stats['model'] or '未知'}")
+        print(f"矩阵文件: {index_stats['matrix_bytes'] / 1024 / 1024:.1f} MB (空闲行 {index_stats['free_rows']})")
+        if EMBEDDING_CACHE_ENABLED and (memory_dir / "state/embedding_cache.db").exists():
+            cache_stats = embedding_cache.get_embedding_cache(memory_dir).get_stats()
+            print(
+                f"嵌入缓存: {cache_stats['entries']}/{cache_stats['max_size']} 条"
+                f" | 命中率 {cache_stats['hit_rate']:.1%} (命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']})"
+            )
+        if index_stats["ivf"]:
+            print(f"检索方式: IVF 近似 (nlist={index_stats['nlist']}, nprobe={vector_config.get('nprobe', 12)})")
+        else:
+            print(f"检索方式: 精确点积 (≥{vector_config.get('ivf_threshold', 20000)} 条时启用 IVF)")
     except Exception as e:
         print(f"⚠️ 无法获取向量数量: {e}")
 
@@ -4281,7 +5676,7 @@ def cmd_vector_config(args):
         print("❌ 记忆系统未初始化")
         return
 
-    config = get_config()
+    config = copy.deepcopy(get_config())
     vector_config = config.get("vector", {})
 
     updated = False
@@ -4392,6 +5787,10 @@ def main():
     parser_consolidate = subparsers.add_parser("consolidate", help="执行 Consolidation")
     parser_consolidate.add_argument("--force", action="store_true", help="强制执行")
     parser_consolidate.add_argument("--phase", type=int, choices=[0, 1, 2, 3, 4, 5, 6, 7], help="只执行指定阶段")
+    parser_consolidate.add_argument("--resume", action="store_true", help="从上次中断的检查点继续")
+    parser_consolidate.add_argument(
+        "--time-budget", type=float, default=None, help="运行时间上限(秒),用尽时在检查点暂停,之后用 --resume 继续"
+    )
     parser_consolidate.add_argument("--input", help="输入文件路径(Phase 1 数据源)")
     parser_consolidate.set_defaults(func=cmd_consolidate)
 
@@ -4436,6 +5835,7 @@ def main():
     parser_inject.add_argument("query", help="用户消息")
     parser_inject.add_argument("--max-tokens", type=int, default=500, help="最大 token 数")
     parser_inject.add_argument("--format", choices=["text", "json"], default="text", help="输出格式")
+    parser_inject.add_argument("--session", help="会话 ID:同一对话的连续调用复用上一轮候选集")
     parser_inject.set_defaults(func=cmd_inject)
 
     # v1.2.0 export-qmd 命令
@@ -4461,6 +5861,31 @@ def main():
     parser_view_pending = subparsers.add_parser("view-pending", help="查看 pending buffer")
     parser_view_pending.set_defaults(func=cmd_view_pending)
 
+    # v1.7.0: 查询缓存统计
+    parser_cache_stats = subparsers.add_parser("cache-stats", help="查看查询缓存统计")
+    parser_cache_stats.add_argument("--clear", action="store_true", help="清空查询缓存")
+    parser_cache_stats.set_defaults(func=cmd_cache_stats)
+
+    # v1.7.0: 近重复扫描
+    parser_dedup_scan = subparsers.add_parser("dedup-scan", help="全库近重复扫描(MinHash + LSH)")
+    parser_dedup_scan.add_argument("--threshold", type=float, default=None, help="Jaccard 阈值(默认读配置 0.8)")
+    parser_dedup_scan.add_argument("--type", choices=list(MEMORY_TYPES), help="只扫描某类记忆")
+    parser_dedup_scan.add_argument("--limit", type=int, default=20, help="每类最多显示的簇数")
+    parser_dedup_scan.add_argument("--merge", action="store_true", help="用 ConflictResolver 合并重复的活跃记忆")
+    parser_dedup_scan.set_defaults(func=cmd_dedup_scan)
+
+    # v1.7.0: 常驻守护进程
+    parser_serve = subparsers.add_parser("serve", help="常驻守护进程(UNIX socket),inject/search/add-pending 自动转交")
+    parser_serve.add_argument("--status", action="store_true", help="查看守护进程状态")
+    parser_serve.add_argument("--stop", action="store_true", help="让运行中的守护进程退出")
+    parser_serve.set_defaults(func=cmd_serve)
+
+    # v1.7.0: 归档压缩
+    parser_archive_compact = subparsers.add_parser("archive-compact", help="合并归档段并转换旧格式归档")
+    parser_archive_compact.add_argument("--max-segments", type=int, default=None, help="每类最多保留的段数(默认读配置 16)")
+    parser_archive_compact.add_argument("--type", choices=list(MEMORY_TYPES), help="只处理某类记忆")
+    parser_archive_compact.set_defaults(func=cmd_archive_compact)
+
     # 主动记忆引擎命令
     if PROACTIVE_ENABLED:
         # proactive-analyze: 分析消息意图
@@ -4492,7 +5917,7 @@ def main():
         # vector-build: 构建向量索引
         parser_vector_build = subparsers.add_parser("vector-build", help="构建向量索引")
         parser_vector_build.add_argument("--batch-size", type=int, default=100, help="批量处理大小")
-        parser_vector_build.add_argument("--provider", choices=["openai", "huggingface", "local"], help="嵌入提供者")
+        parser_vector_build.add_argument("--provider", choices=["hashing", "openai", "huggingface", "local"], help="嵌入提供者(默认 hashing,离线)")
         parser_vector_build.add_argument("--model", help="嵌入模型名称")
         parser_vector_build.set_defaults(func=cmd_vector_build)
 
@@ -4531,8 +5956,14 @@ def main():
         parser.print_help()
         return
 
+    # v1.7.0: 守护进程运行时由它代答
+    if args.command in DAEMON_COMMANDS and _run_via_daemon(args):
+        return
+
     args.func(args)
 
 
 if __name__ == "__main__":
+    # 作为脚本运行时以 memory 名注册本模块,memory_api 导入 memory 时复用而不是再执行一遍
+    sys.modules.setdefault("memory", sys.modules[__name__])
     main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Memory API
+进程内 Python 接口:宿主直接调用 MemorySystem,返回结构化结果,免去每次调用的进程启动与 stdout 解析
+
+设计要点:
+- 一个 MemorySystem 对应一个记忆目录;调用期间经 memory.using_memory_dir 固定目录,
+  不读写 MEMORY_DIR 环境变量,同一进程可同时打开多个记忆目录
+- 返回值均为可 JSON 序列化的 dict / str,结构与 CLI --json 输出一致;引擎内部的提示输出
+  按线程捕获丢弃(consolidate 的过程日志放在返回值 log 中),不会写到宿主的 stdout
+- 已加载的状态(活跃记忆、索引、查询缓存、LLM 连接池)保存在进程内,跨调用、跨实例复用;
+  其他进程的写入按存储代数与文件状态自动失效
+- 写操作(add_pending / capture / consolidate)按记忆目录互斥;读操作可并发
+- CLI 的 inject / search / add-pending / capture / consolidate / stats / status 是本接口之上的格式化层
+
+用法:
+    from memory_api import MemorySystem
+
+    memory = MemorySystem.open("~/workspace/memory", create=True)
+    memory.add_pending("用户对花生过敏")
+    prompt = memory.inject_text("晚饭吃什么", max_tokens=300)
+"""
+
+import argparse
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import memory
+from memory_daemon import captured_stdout
+
+CAPTURE_TYPES = ("fact", "belief", "summary")
+
+_STORE_LOCKS: Dict[Path, threading.Lock] = {}
+_STORE_LOCKS_LOCK = threading.Lock()
+
+
+class MemoryNotInitializedError(RuntimeError):
+    """记忆目录不存在(使用 MemorySystem.open(..., create=True) 或 init() 创建)"""
+
+
+def empty_injection() -> Dict[str, List]:
+    return {"direct": [], "marked": [], "reference": []}
+
+
+def render_injection(injection: Dict, max_tokens: int = 500) -> str:
+    """把注入结果渲染为可直接放进 prompt 的文本(与 CLI inject 文本格式一致)"""
+    lines = []
+
+    # 直接注入的高置信度记忆
+    if injection.get("direct"):
+        lines.append("## 相关记忆")
+        for item in injection["direct"][:5]:  # 最多5条
+            type_tag = item.get("type", "fact")[0].upper()
+            content = item["content"][:200]  # 截断
+            lines.append(f"- [{type_tag}] {content}")
+
+    # 带标记的中置信度记忆
+    if injection.get("marked"):
+        if not lines:
+            lines.append("## 可能相关")
+        for item in injection["marked"][:3]:  # 最多3条
+            type_tag = item.get("type", "fact")[0].upper()
+            content = item["content"][:150]
+            source = item.get("source", "unknown")
+            lines.append(f"- [{type_tag}] {content} (ref:{source})")
+
+    # 控制总 token 数(粗略估计:1中文字≈1.5token)
+    output = "\n".join(lines)
+    estimated_tokens = len(output) * 1.5
+    if estimated_tokens > max_tokens:
+        char_limit = int(max_tokens / 1.5)
+        output = output[:char_limit] + "\n..."
+
+    return output if output else "# 无相关记忆"
+
+
+class MemorySystem:
+    """记忆系统进程内接口"""
+
+    def __init__(self, memory_dir=None):
+        """
+        Args:
+            memory_dir: 记忆目录;省略时按 CLI 规则解析(MEMORY_DIR → WORKSPACE/memory → ./memory)
+        """
+        self.memory_dir = Path(memory_dir).expanduser() if memory_dir is not None else memory.get_memory_dir()
+
+    @classmethod
+    def open(cls, memory_dir=None, create: bool = False) -> "MemorySystem":
+        """打开记忆目录;不存在时 create=True 则初始化,否则抛 MemoryNotInitializedError"""
+        system = cls(memory_dir)
+        if not system.initialized:
+            if not create:
+                raise MemoryNotInitializedError(f"记忆系统未初始化: {system.memory_dir}")
+            system.init()
+        return system
+
+    def __repr__(self):
+        return f"MemorySystem({str(self.memory_dir)!r})"
+
+    @property
+    def initialized(self) -> bool:
+        return self.memory_dir.exists()
+
+    # ---------------- 生命周期 ----------------
+
+    def init(self):
+        """创建目录结构与默认文件(幂等)"""
+        with self._write_lock():
+            memory.init_store(self.memory_dir)
+
+    def warm_up(self):
+        """预加载活跃记忆、索引与各召回器缓存(可选;首次调用时也会按需加载)"""
+        self._require()
+        with self._scope():
+            memory._warm_up(self.memory_dir)
+
+    # ---------------- 检索 ----------------
+
+    def inject(self, query: str, session: Optional[str] = None) -> Dict[str, List]:
+        """
+        根据用户消息检索相关记忆,按置信度分组
+
+        Args:
+            session: 会话 ID,同一对话的连续调用复用上一轮候选集
+        返回: {"direct": [...], "marked": [...], "reference": [...]};未初始化或无结果时各组为空
+        """
+        if not self.initialized:
+            return empty_injection()
+        with self._scope():
+            if session:
+                result = memory.session_search(query, session, self.memory_dir)
+            else:
+                result = memory.router_search(query, self.memory_dir)
+            if not result.get("results"):
+                return empty_injection()
+            return result.get("injection") or memory.format_injection(result["results"])
+
+    def inject_text(self, query: str, max_tokens: int = 500, session: Optional[str] = None) -> str:
+        """inject() 的文本形式,可直接拼进 prompt"""
+        return render_injection(self.inject(query, session=session), max_tokens)
+
+    def search(self, query: str, use_qmd: bool = True, use_vector: bool = True) -> Dict:
+        """完整检索结果(含触发层级、各召回器命中统计、排序结果与注入分组)"""
+        self._require()
+        with self._scope():
+            return memory.router_search(query, self.memory_dir, use_qmd=use_qmd, use_vector=use_vector)
+
+    # ---------------- 写入 ----------------
+
+    def add_pending(self, content: str, source: str = "user") -> Dict:
+        """追加到 pending buffer,返回记录(含 urgent / importance / category)"""
+        with self._write_lock(), self._scope():
+            return memory.add_to_pending(self.memory_dir, content, source)
+
+    def capture(
+        self,
+        content: str,
+        mem_type: str = "fact",
+        importance: float = 0.5,
+        entities: Optional[List[str]] = None,
+        confidence: float = 0.6,
+    ) -> Dict:
+        """
+        直接写入活跃记忆(跳过 Consolidation)
+
+        Args:
+            mem_type: fact / belief / summary
+            importance: 超出 0-1 时截断到边界
+            confidence: 仅 belief 使用
+        返回: 写入的记录;内容为空或类型无效时抛 ValueError
+        """
+        if not content or not content.strip():
+            raise ValueError("内容不能为空")
+        if mem_type not in CAPTURE_TYPES:
+            raise ValueError(f"无效的记忆类型: {mem_type}")
+        self._require()
+
+        importance = min(max(importance, 0), 1)
+        record = {
+            "id": memory.generate_id(mem_type[0], content),
+            "content": content,
+            "importance": importance,
+            "score": importance,  # 初始 score = importance
+            "entities": list(entities or []),
+            "created": memory.now_iso(),
+            "source": "manual",
+        }
+        if mem_type == "belief":
+            record["confidence"] = confidence
+
+        path = self.memory_dir / f"layer2/active/{'summaries' if mem_type == 'summary' else mem_type + 's'}.jsonl"
+        with self._write_lock(), self._scope():
+            memory.append_jsonl(path, record)
+            memory.mark_store_changed(self.memory_dir)
+        return record
+
+    def consolidate(
+        self,
+        force: bool = False,
+        phase: Optional[int] = None,
+        resume: bool = False,
+        time_budget: Optional[float] = None,
+        input_path: Optional[str] = None,
+    ) -> Dict:
+        """
+        执行 Consolidation(参数同 CLI consolidate;input_path 对应 --input)
+
+        返回: {"status": "done" | "skipped" | "paused", "log": 过程输出, "stats": 完成后的 stats()}
+        失败时抛出原异常(检查点已记录失败,工作集未提交时活跃池不变)
+        """
+        self._require()
+        args = argparse.Namespace(force=force, phase=phase, resume=resume, time_budget=time_budget, input=input_path)
+        with self._write_lock(), self._scope() as output:
+            status = memory.run_consolidation(args)
+        return {"status": status, "log": output.getvalue(), "stats": self.stats()}
+
+    # ---------------- 统计 ----------------
+
+    def stats(self) -> Dict:
+        """活跃池按类型 / 重要性计数、归档存储统计与 Consolidation 状态"""
+        self._require()
+        with self._scope():
+            active = dict(zip(memory.MEMORY_TYPES, memory._active_memory_maps(self.memory_dir)))
+            archive = [memory._archive_store(self.memory_dir).stats(mem_type) for mem_type in memory.MEMORY_TYPES]
+            state = memory._read_warm(self.memory_dir / "state/consolidation.json", memory._load_json) or {}
+
+        importance = {
+            "critical": 0,  # 0.9-1.0
+            "high": 0,  # 0.7-0.9
+            "medium": 0,  # 0.4-0.7
+            "low": 0,  # 0-0.4
+        }
+        for records in active.values():
+            for r in records.values():
+                imp = r.get("importance", 0.5)
+                if imp >= 0.9:
+                    importance["critical"] += 1
+                elif imp >= 0.7:
+                    importance["high"] += 1
+                elif imp >= 0.4:
+                    importance["medium"] += 1
+                else:
+                    importance["low"] += 1
+
+        counts = {mem_type: len(records) for mem_type, records in active.items()}
+        return {
+            "memory_dir": str(self.memory_dir),
+            "active": {**counts, "total": sum(counts.values())},
+            "importance": importance,
+            "archive": {
+                key: sum(s[key] for s in archive) for key in ("records", "segments", "raw_bytes", "stored_bytes")
+            },
+            "consolidation": {
+                key: state.get(key) for key in ("last_run", "last_success", "current_phase")
+            },
+        }
+
+    # ---------------- 内部 ----------------
+
+    def _require(self):
+        if not self.initialized:
+            raise MemoryNotInitializedError(f"记忆系统未初始化: {self.memory_dir}")
+
+    @contextmanager
+    def _scope(self):
+        """固定记忆目录并捕获引擎输出(产出捕获缓冲区)"""
+        with memory.using_memory_dir(self.memory_dir), captured_stdout() as output:
+            yield output
+
+    def _write_lock(self) -> threading.Lock:
+        key = self.memory_dir.resolve()
+        with _STORE_LOCKS_LOCK:
+            return _STORE_LOCKS.setdefault(key, threading.Lock())
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Memory Daemon
+常驻守护进程:进程内索引/缓存保持热状态,CLI 通过 UNIX socket 转交 inject / search / add-pending
+
+设计要点:
+- socket 位于 {memory_dir}/state/memory.sock(权限 0600),每个记忆目录至多一个守护进程;
+  启动时发现残留 socket 先试连,连不上才删除
+- 协议:每行一个 JSON 请求,每行一个 JSON 响应,同一连接可连续发送多条
+  请求 {"command": "inject", "args": {"query": "...", "format": "json"}}
+  响应 {"ok": true, "output": "<命令的标准输出>", "exit_code": 0} 或 {"ok": false, "error": "..."}
+  内置命令:ping(pid、运行时长、已处理请求数)、shutdown
+- 每个连接一个线程;命令输出按线程捕获(线程局部 stdout),并发请求互不串行;
+  exclusive 中的写命令(add-pending)互斥执行
+- captured_stdout() 供进程内 API 复用同一机制:捕获可嵌套,只影响当前线程
+- 客户端:socket 不存在或连不上时返回 None,由调用方回退到本进程执行;
+  环境变量 MEMORY_NO_DAEMON=1 时始终不使用守护进程
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+SOCKET_FILE = "state/memory.sock"
+NO_DAEMON_ENV = "MEMORY_NO_DAEMON"
+
+CONNECT_TIMEOUT = 0.5
+REQUEST_TIMEOUT = 60.0
+_MAX_LINE = 16 * 1024 * 1024
+
+
+class DaemonError(RuntimeError):
+    """已连上守护进程但请求失败(超时、连接中断、响应无法解析)"""
+
+
+def socket_path(memory_dir) -> Path:
+    return Path(memory_dir) / SOCKET_FILE
+
+
+def daemon_disabled() -> bool:
+    return os.environ.get(NO_DAEMON_ENV, "").strip() not in ("", "0")
+
+
+# ================================================================
+# 线程局部输出捕获
+# ================================================================
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """sys.stdout 代理:当前线程设置了缓冲区时写入最内层缓冲区,否则写入原 stdout"""
+
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+
+    def capture(self) -> io.StringIO:
+        buffer = io.StringIO()
+        self._buffers().append(buffer)
+        return buffer
+
+    def release(self):
+        self._buffers().pop()
+
+    def _buffers(self):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = []
+        return buffers
+
+    def _current(self):
+        buffers = getattr(self._local, "buffers", None)
+        return buffers[-1] if buffers else self._target
+
+    def write(self, text):
+        return self._current().write(text)
+
+    def flush(self):
+        self._current().flush()
+
+    @property
+    def encoding(self):
+        return getattr(self._target, "encoding", "utf-8")
+
+
+_STDOUT_LOCK = threading.Lock()
+
+
+@contextmanager
+def captured_stdout():
+    """
+    捕获当前线程写入 sys.stdout 的内容(产出 StringIO),其他线程照常输出
+
+    首次使用时把 sys.stdout 换成线程局部代理(不捕获的线程透传到原 stdout);
+    守护进程运行时复用其已安装的代理
+    """
+    with _STDOUT_LOCK:
+        proxy = sys.stdout
+        if not isinstance(proxy, _ThreadLocalStdout):
+            proxy = sys.stdout = _ThreadLocalStdout(proxy)
+    buffer = proxy.capture()
+    try:
+        yield buffer
+    finally:
+        proxy.release()
+
+
+# ================================================================
+# 服务端
+# ================================================================
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.daemon
+        while True:
+            try:
+                line = self.rfile.readline(_MAX_LINE)
+            except OSError:
+                return
+            if not line:
+                return
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode("utf-8"))
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {"ok": False, "error": f"invalid request: {e}"}
+            else:
+                response = daemon.dispatch(request.get("command"), request.get("args") or {})
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                return
+            if response.get("stopping"):
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # 默认 5:并发客户端建连时 backlog 满会被直接拒绝
+
+
+class MemoryDaemon:
+    """守护进程:按命令名分发到 handlers,每个 handler 接收 args 字典并向 stdout 输出结果"""
+
+    def __init__(
+        self,
+        memory_dir,
+        handlers: Dict[str, Callable[[Dict], Optional[int]]],
+        exclusive: Iterable[str] = (),
+        warmup: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            memory_dir: 记忆目录(socket 放在其 state/ 下)
+            handlers: {命令名: handler(args) → 退出码(None 视为 0)}
+            exclusive: 需要互斥执行的命令(写操作)
+            warmup: 开始监听前调用一次,预加载索引与缓存
+        """
+        self.memory_dir = Path(memory_dir)
+        self.socket_path = socket_path(memory_dir)
+        self.handlers = handlers
+        self.exclusive = set(exclusive)
+        self.warmup = warmup
+        self.started = time.time()
+        self.stats = {"requests": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stdout: Optional[_ThreadLocalStdout] = None
+        self._server: Optional[_Server] = None
+
+    # ---------------- 生命周期 ----------------
+
+    def bind(self):
+        """创建 socket(已有守护进程在运行时抛 DaemonError)"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            if ping(self.memory_dir) is not None:
+                raise DaemonError(f"daemon already running on {self.socket_path}")
+            self.socket_path.unlink()
+        self._server = _Server(str(self.socket_path), _Handler)
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self):
+        """预热后阻塞服务,直到 shutdown / SIGTERM / Ctrl+C"""
+        if self._server is None:
+            self.bind()
+        if self.warmup is not None:
+            self.warmup()
+        self._stdout = _ThreadLocalStdout(sys.stdout)
+        sys.stdout = self._stdout
+        previous = signal.signal(signal.SIGTERM, lambda *_: self.stop()) if _in_main_thread() else None
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sys.stdout = self._stdout._target
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+            self.close()
+
+    def stop(self):
+        """请求停止(可在任意线程调用,不等待)"""
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+        try:
+            self.socket_path.unlink()
+        except OSError:
+            pass
+
+    # ---------------- 请求分发 ----------------
+
+    def dispatch(self, command, args: Dict) -> Dict:
+        with self._lock:
+            self.stats["requests"] += 1
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                    "commands": sorted(self.handlers), **self.stats}
+        if command == "shutdown":
+            self.stop()
+            return {"ok": True, "stopping": True}
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            return self._error(f"unknown command: {command}")
+        if not isinstance(args, dict):
+            return self._error("args must be a JSON object")
+
+        buffer = self._stdout.capture() if self._stdout is not None else io.StringIO()
+        try:
+            if command in self.exclusive:
+                with self._write_lock:
+                    exit_code = handler(args)
+            else:
+                exit_code = handler(args)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            return self._error(f"{type(e).__name__}: {e}", buffer.getvalue())
+        finally:
+            if self._stdout is not None:
+                self._stdout.release()
+        return {"ok": True, "output": buffer.getvalue(), "exit_code": exit_code or 0}
+
+    def _error(self, message: str, output: str = "") -> Dict:
+        with self._lock:
+            self.stats["errors"] += 1
+        return {"ok": False, "error": message, "output": output}
+
+
+def _in_main_thread() -> bool:
+    return threading.current_thread() is threading.main_thread()
+
+
+# ================================================================
+# 客户端
+# ================================================================
+
+def request(memory_dir, command: str, args: Optional[Dict] = None, timeout: float = REQUEST_TIMEOUT) -> Optional[Dict]:
+    """
+    向守护进程发送一条请求
+
+    返回: 响应字典;守护进程未运行(或已被 MEMORY_NO_DAEMON 关闭)时返回 None
+    已连上但请求失败时抛 DaemonError
+    """
+    if daemon_disabled():
+        return None
+    return _send(socket_path(memory_dir), command, args or {}, timeout)
+
+
+def ping(memory_dir, timeout: float = 2.0) -> Optional[Dict]:
+    """守护进程状态(未运行时返回 None;不受 MEMORY_NO_DAEMON 影响)"""
+    try:
+        return _send(socket_path(memory_dir), "ping", {}, timeout)
+    except DaemonError:
+        return None
+
+
+def shutdown(memory_dir, timeout: float = 2.0) -> bool:
+    """让运行中的守护进程退出(未运行时返回 False)"""
+    try:
+        return _send(socket_path(memory_dir), "shutdown", {}, timeout) is not None
+    except DaemonError:
+        return False
+
+
+def _send(path: Path, command: str, args: Dict, timeout: float) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return None  # 残留 socket 或守护进程正在退出
+
+        sock.settimeout(timeout)
+        payload = json.dumps({"command": command, "args": args}, ensure_ascii=False).encode("utf-8")
+        try:
+            sock.sendall(payload + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline(_MAX_LINE)
+        except OSError as e:
+            raise DaemonError(f"daemon request failed: {e}") from e
+        if not line:
+            raise DaemonError("daemon closed the connection")
+        try:
+            return json.loads(line.decode("utf-8"))
+        except ValueError as e:
+            raise DaemonError(f"invalid daemon response: {e}") from e
+    finally:
+        sock.close()
@@ -65,6 +65,9 @@ class MemoryOperator:
         from noise_filter import NoiseFilter
         self.noise_filter = NoiseFilter(llm_client=llm_client, strict_mode=False)
         
+        # v1.7.0：分词结果缓存（同一批去重中已有记忆会被反复比较）
+        self._token_cache: Dict[str, frozenset] = {}
+        
         # 统计信息
         self.stats = {
             'total': 0,
@@ -218,9 +221,9 @@ class MemoryOperator:
         Returns:
             相似度 [0, 1]
         """
-        # 分词（简单实现）
-        words1 = set(self._tokenize(text1))
-        words2 = set(self._tokenize(text2))
+        # 分词（简单实现，v1.7.0 起带缓存）
+        words1 = self._token_set(text1)
+        words2 = self._token_set(text2)
         
         # Jaccard 相似度
         if not words1 or not words2:
@@ -231,6 +234,16 @@ class MemoryOperator:
         
         return len(intersection) / len(union)
     
+    def _token_set(self, text: str) -> frozenset:
+        """分词结果集合（缓存）"""
+        words = self._token_cache.get(text)
+        if words is None:
+            if len(self._token_cache) >= 50000:
+                self._token_cache.clear()
+            words = frozenset(self._tokenize(text))
+            self._token_cache[text] = words
+        return words
+    
     def _tokenize(self, text: str) -> List[str]:
         """简单分词"""
         # 移除标点
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Near Duplicate Detection
+全库近重复检测:MinHash 指纹 + LSH 分带,数万条记忆秒级找出近重复簇
+
+设计要点:
+- 内容归一化(小写、标点/空白折叠)后取字符 3-gram 作为 shingle 集合,中英文通用
+- 单次哈希 MinHash(one permutation hashing):每个 shingle 只算一次 blake2b,
+  按哈希低位分到 num_perm 个桶取最小值,空桶从右侧非空桶借值(densification);
+  纯 Python 下比 num_perm 次独立哈希快一个数量级
+- LSH:签名切成 bands 段,任一段完全相同即为候选对;候选对再用 shingle 集合的
+  精确 Jaccard 复核(≥ threshold),并查集合并成簇,同簇的对不再复核;
+  簇是复核对的连通分量,相似不传递(A~B、B~C 不代表 A~C),合并前需用 near_duplicate 对保留者复核
+- 指纹按记忆 id 持久化在 state/fingerprints.db(连同内容哈希,内容变化即失效),
+  再次扫描只为新增/改写的记忆计算;扫描结束清理已不存在的 id
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+FINGERPRINT_DB_FILE = "state/fingerprints.db"
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+# 空桶借值时按借用距离错开,避免与原桶的值相等
+_DENSIFY_STEP = 1 << 52
+_EMPTY = (1 << 64) - 1
+
+# SQLite 单条语句参数上限内的批量大小
+_LOOKUP_CHUNK = 500
+
+_SEPARATORS = re.compile(r"[\W_]+", re.UNICODE)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    memory_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    num_perm INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+"""
+
+
+# ================================================================
+# 指纹计算
+# ================================================================
+
+def content_sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """归一化后的字符 n-gram 集合"""
+    normalized = _SEPARATORS.sub(" ", (text or "").lower()).strip()
+    if not normalized:
+        return set()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signature(shingle_set: Iterable[str], num_perm: int = DEFAULT_NUM_PERM) -> Optional[List[int]]:
+    """单次哈希 MinHash 签名(空集合返回 None)"""
+    signature = [_EMPTY] * num_perm
+    blake2b, from_bytes = hashlib.blake2b, int.from_bytes
+    for shingle in shingle_set:
+        h = from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        slot, value = h % num_perm, h // num_perm
+        if value < signature[slot]:
+            signature[slot] = value
+    if _EMPTY not in signature:
+        return signature
+    if signature.count(_EMPTY) == num_perm:
+        return None
+
+    # densification:空桶取右侧(环形)第一个非空桶的值,按距离偏移;从右向左绕两圈一次完成
+    result = list(signature)
+    nearest, distance = _EMPTY, 0
+    for step in range(2 * num_perm - 1, -1, -1):
+        slot = step % num_perm
+        if signature[slot] != _EMPTY:
+            nearest, distance = signature[slot], 0
+            continue
+        distance += 1
+        if step < num_perm and nearest != _EMPTY:
+            result[slot] = nearest + distance * _DENSIFY_STEP
+    return result
+
+
+def estimate_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """签名估计的 Jaccard 相似度"""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def near_duplicate(text_a: str, text_b: str, threshold: float = DEFAULT_THRESHOLD) -> bool:
+    """两段内容是否近重复(内容相同或 shingle 集合 Jaccard ≥ threshold)"""
+    return content_sha1(text_a) == content_sha1(text_b) or jaccard(shingles(text_a), shingles(text_b)) >= threshold
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _encode(signature: Sequence[int]) -> bytes:
+    return array("Q", signature).tobytes()
+
+
+def _decode(blob: bytes) -> List[int]:
+    values = array("Q")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+# ================================================================
+# 指纹存储
+# ================================================================
+
+class FingerprintStore:
+    """按记忆 id 持久化的 MinHash 指纹(内容哈希不符即视为失效)"""
+
+    def __init__(self, memory_dir):
+        self.db_path = Path(memory_dir) / FINGERPRINT_DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+        self._conn.executescript(SCHEMA_SQL)
+        self._conn.commit()
+
+    def get_many(self, wanted: Dict[str, str], num_perm: int) -> Dict[str, List[int]]:
+        """批量查询 {memory_id: content_hash},返回仍然有效的 {memory_id: signature}"""
+        found: Dict[str, List[int]] = {}
+        ids = list(wanted)
+        with self._lock:
+            for start in range(0, len(ids), _LOOKUP_CHUNK):
+                chunk = ids[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT memory_id, content_hash, signature FROM fingerprints "
+                    f"WHERE num_perm = ? AND memory_id IN ({placeholders})",
+                    (num_perm, *chunk),
+                ).fetchall()
+                for memory_id, content_hash, blob in rows:
+                    if wanted.get(memory_id) == content_hash:
+                        found[memory_id] = _decode(blob)
+        return found
+
+    def put_many(self, items: Dict[str, Tuple[str, Sequence[int]]]):
+        """批量写入 {memory_id: (content_hash, signature)}"""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (memory_id, content_hash, num_perm, signature) "
+                "VALUES (?, ?, ?, ?)",
+                [(memory_id, h, len(sig), _encode(sig)) for memory_id, (h, sig) in items.items()],
+            )
+            self._conn.commit()
+
+    def prune(self, keep_ids: Iterable[str]) -> int:
+        """删除不在 keep_ids 中的指纹,返回删除条数"""
+        keep = set(keep_ids)
+        with self._lock:
+            stale = [row[0] for row in self._conn.execute("SELECT memory_id FROM fingerprints") if row[0] not in keep]
+            for start in range(0, len(stale), _LOOKUP_CHUNK):
+                chunk = stale[start:start + _LOOKUP_CHUNK]
+                self._conn.execute(
+                    f"DELETE FROM fingerprints WHERE memory_id IN ({','.join('?' * len(chunk))})", chunk
+                )
+            self._conn.commit()
+        return len(stale)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ================================================================
+# LSH 扫描
+# ================================================================
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_near_duplicates(
+    records: List[Dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    store: Optional[FingerprintStore] = None,
+) -> Tuple[List[List[int]], Dict]:
+    """
+    在 records 中查找近重复簇
+
+    Args:
+        records: 记忆记录(需有 content,持久化指纹时需有 id)
+        threshold: 精确 Jaccard 复核阈值
+        num_perm: 签名长度(需能被 bands 整除)
+        bands: LSH 分带数
+        store: 指纹存储(None 时不持久化)
+
+    Returns:
+        (簇列表(每簇为 records 下标,按下标升序,簇按首元素排序), 统计)
+        簇内成员不一定两两近重复,只保证经复核对相连
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+    start = time.perf_counter()
+    stats = {"records": len(records), "computed": 0, "cached": 0, "candidate_pairs": 0,
+             "verified_pairs": 0, "clusters": 0, "duplicates": 0}
+
+    # 1. 指纹:先查存储,只为缺失/失效的记忆计算
+    hashes = [content_sha1(r.get("content", "")) for r in records]
+    cached: Dict[str, List[int]] = {}
+    if store is not None:
+        wanted = {r["id"]: h for r, h in zip(records, hashes) if r.get("id")}
+        cached = store.get_many(wanted, num_perm)
+
+    shingle_sets: Dict[int, Set[str]] = {}
+    signatures: List[Optional[List[int]]] = []
+    fresh: Dict[str, Tuple[str, List[int]]] = {}
+    for i, record in enumerate(records):
+        signature = cached.get(record.get("id")) if record.get("id") else None
+        if signature is not None:
+            stats["cached"] += 1
+        else:
+            shingle_sets[i] = shingles(record.get("content", ""))
+            signature = minhash_signature(shingle_sets[i], num_perm)
+            stats["computed"] += 1
+            if signature is not None and record.get("id"):
+                fresh[record["id"]] = (hashes[i], signature)
+        signatures.append(signature)
+    if store is not None:
+        store.put_many(fresh)
+
+    # 2. LSH 分带取候选对,精确 Jaccard 复核后并查集合并
+    def shingles_of(i: int) -> Set[str]:
+        if i not in shingle_sets:
+            shingle_sets[i] = shingles(records[i].get("content", ""))
+        return shingle_sets[i]
+
+    uf = _UnionFind(len(records))
+    for band in range(bands):
+        buckets: Dict[Tuple[int, ...], List[int]] = {}
+        lo, hi = band * rows, (band + 1) * rows
+        for i, signature in enumerate(signatures):
+            if signature is not None:
+                buckets.setdefault(tuple(signature[lo:hi]), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    a, b = members[x], members[y]
+                    if uf.find(a) == uf.find(b):
+                        continue
+                    stats["candidate_pairs"] += 1
+                    if hashes[a] == hashes[b] or jaccard(shingles_of(a), shingles_of(b)) >= threshold:
+                        stats["verified_pairs"] += 1
+                        uf.union(a, b)
+
+    groups: Dict[int, List[int]] = {}
+    for i, signature in enumerate(signatures):
+        if signature is not None:
+            groups.setdefault(uf.find(i), []).append(i)
+    clusters = sorted((members for members in groups.values() if len(members) > 1), key=lambda m: m[0])
+
+    stats["clusters"] = len(clusters)
+    stats["duplicates"] = sum(len(members) - 1 for members in clusters)
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return clusters, stats
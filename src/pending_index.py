@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Pending Inverted Index
+pending buffer(Hot Store)的增量倒排索引
+
+设计要点:
+- pending.jsonl 以追加为主:记录已索引的字节偏移,刷新时只解析新增的尾部
+- 用偏移前一小段字节的哈希校验文件前缀未被改写,否则整体重建
+- BM25 打分,查询复杂度只与命中的倒排链长度相关
+- 可选持久化到 layer2/index/pending_index.json,跨 CLI 进程复用;只存倒排链与每条记录的
+  行偏移(不存记录本身),命中时按偏移从 pending.jsonl 读回;只在写路径(add-pending、清空)保存,
+  检索不写盘
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from text_analyzer import analyze, term_frequencies
+
+INDEX_VERSION = 2
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 前缀校验取偏移前多少字节
+_GUARD_BYTES = 256
+
+
+class PendingIndex:
+    """pending buffer 倒排索引"""
+
+    def __init__(self, memory_dir, persist: bool = True):
+        self.memory_dir = Path(memory_dir)
+        self.pending_path = self.memory_dir / "layer2/pending.jsonl"
+        self.index_path = self.memory_dir / "layer2/index/pending_index.json"
+        self.persist = persist
+
+        self._lock = threading.RLock()
+        self._reset()
+        self._dirty = False
+
+        if self.persist:
+            self._load()
+
+    # ================================================================
+    # 状态
+    # ================================================================
+
+    def _reset(self):
+        self._docs: Dict[str, dict] = {}  # 已读入内存的记录(持久化加载后按需从 pending.jsonl 补齐)
+        self._spans: Dict[str, Tuple[int, int]] = {}  # doc_id → (行起始字节偏移, 行字节数)
+        self._doc_len: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+        self._offset = 0
+        self._mtime_ns = 0
+        self._guard = ""
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def _load(self):
+        """加载持久化索引(版本不符或损坏时忽略,下次刷新重建)"""
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            self._spans = {doc_id: tuple(span) for doc_id, span in data["spans"].items()}
+            self._doc_len = data["doc_len"]
+            self._postings = data["postings"]
+            self._total_len = sum(self._doc_len.values())
+            self._offset = data["offset"]
+            self._mtime_ns = data["mtime_ns"]
+            self._guard = data["guard"]
+        except Exception:
+            self._reset()
+
+    def save(self):
+        """持久化索引(仅在有变更时写入,原子替换)"""
+        with self._lock:
+            if not self.persist or not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "version": INDEX_VERSION,
+                "offset": self._offset,
+                "mtime_ns": self._mtime_ns,
+                "guard": self._guard,
+                "spans": self._spans,
+                "doc_len": self._doc_len,
+                "postings": self._postings,
+            }
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def clear(self):
+        """清空索引(pending 被清空时调用)"""
+        with self._lock:
+            self._reset()
+            if self.pending_path.exists():
+                st = self.pending_path.stat()
+                if st.st_size == 0:
+                    self._mtime_ns = st.st_mtime_ns
+            self._dirty = True
+            self.save()
+
+    # ================================================================
+    # 增量维护
+    # ================================================================
+
+    def add(self, record: dict, span: Optional[Tuple[int, int]] = None):
+        """索引一条 pending 记录(同 id 重复添加时先移除旧条目);span 为其在 pending.jsonl 中的行位置"""
+        doc_id = record.get("id")
+        if not doc_id:
+            return
+        with self._lock:
+            if doc_id in self._doc_len:
+                self.remove(doc_id)
+            tf = term_frequencies(record.get("content", ""))
+            self._docs[doc_id] = record
+            if span is not None:
+                self._spans[doc_id] = span
+            length = sum(tf.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            for term, count in tf.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            self._dirty = True
+
+    def remove(self, doc_id: str):
+        """移除一条记录"""
+        with self._lock:
+            if doc_id not in self._doc_len:
+                return
+            record = self._record(doc_id) or {}
+            self._docs.pop(doc_id, None)
+            self._spans.pop(doc_id, None)
+            self._total_len -= self._doc_len.pop(doc_id, 0)
+            for term in set(analyze(record.get("content", ""))):
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self._postings[term]
+            self._dirty = True
+
+    def _record(self, doc_id: str) -> Optional[dict]:
+        """取记录:未在内存中时按行偏移从 pending.jsonl 读回"""
+        record = self._docs.get(doc_id)
+        if record is not None or doc_id not in self._spans:
+            return record
+        start, length = self._spans[doc_id]
+        try:
+            with open(self.pending_path, "rb") as f:
+                f.seek(start)
+                record = json.loads(f.read(length).decode("utf-8"))
+        except (OSError, ValueError, UnicodeDecodeError):
+            return None
+        if record.get("id") != doc_id:
+            return None
+        self._docs[doc_id] = record
+        return record
+
+    def _read_guard(self, f, offset: int) -> str:
+        start = max(0, offset - _GUARD_BYTES)
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+    def refresh(self) -> int:
+        """
+        与 pending.jsonl 同步
+
+        - 文件未变:直接返回
+        - 仅追加:只解析新增的完整行
+        - 被改写/截断:整体重建
+
+        返回: 新索引的记录数
+        """
+        with self._lock:
+            if not self.pending_path.exists():
+                if self._docs or self._offset:
+                    self._reset()
+                    self._dirty = True
+                return 0
+
+            st = self.pending_path.stat()
+            if st.st_size == self._offset and st.st_mtime_ns == self._mtime_ns:
+                return 0
+
+            with open(self.pending_path, "rb") as f:
+                appended = st.st_size >= self._offset and self._read_guard(f, self._offset) == self._guard
+                if not appended:
+                    self._reset()
+                f.seek(self._offset)
+                tail = f.read(st.st_size - self._offset)
+
+                # 只消费完整的行,半行留到下次
+                end = tail.rfind(b"\n") + 1
+                added = 0
+                position = self._offset
+                for line in tail[:end].splitlines(keepends=True):
+                    start, position = position, position + len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        self.add(json.loads(line.decode("utf-8")), span=(start, len(line)))
+                        added += 1
+                    except (ValueError, UnicodeDecodeError):
+                        continue
+
+                self._offset += end
+                self._guard = self._read_guard(f, self._offset)
+
+            self._mtime_ns = st.st_mtime_ns
+            self._dirty = True
+            return added
+
+    # ================================================================
+    # 检索
+    # ================================================================
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[dict, float, float]]:
+        """
+        BM25 检索
+
+        返回: [(record, bm25_score, coverage), ...] 按分数降序
+              coverage = 命中的查询词 / 查询词总数
+        """
+        q_terms = set(analyze(query))
+        if not q_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avgdl = self._total_len / n_docs if self._total_len else 1.0
+
+            scores: Dict[str, float] = {}
+            matched: Dict[str, int] = {}
+            for term in q_terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in posting.items():
+                    dl = self._doc_len.get(doc_id, 0)
+                    norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+
+            ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+            if limit is not None:
+                ranked = ranked[:limit]
+            results = []
+            for doc_id, score in ranked:
+                record = self._record(doc_id)
+                if record is not None:
+                    results.append((record, score, matched[doc_id] / len(q_terms)))
+            return results
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_INDEXES: Dict[str, PendingIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_pending_index(memory_dir, persist: bool = True) -> PendingIndex:
+    """获取(并缓存)指定记忆目录的 pending 索引"""
+    key = str(Path(memory_dir).resolve())
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = PendingIndex(memory_dir, persist=persist)
+            _INDEXES[key] = index
+        return index
+
+
+def peek_pending_index(memory_dir) -> Optional[PendingIndex]:
+    """仅返回已加载的索引,不触发加载"""
+    return _INDEXES.get(str(Path(memory_dir).resolve()))
+
+
+def invalidate_pending_index(memory_dir, cleared: bool = False):
+    """
+    pending.jsonl 被整体改写后调用
+
+    cleared=True 表示 pending 已清空:直接清空索引(含持久化文件);
+    否则丢弃进程内缓存,下次刷新时按前缀校验决定增量或重建。
+    """
+    key = str(Path(memory_dir).resolve())
+    if cleared:
+        get_pending_index(memory_dir).clear()
+        return
+    with _INDEXES_LOCK:
+        _INDEXES.pop(key, None)
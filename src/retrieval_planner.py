@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Retrieval Planner
+基于代价的召回规划:按查询类型、语料规模和各路召回的历史耗时/产出决定跑哪些召回、各取多少
+
+设计要点:
+- 统计按 (查询类型, 召回器) 维护 EWMA:耗时 latency_ms、产出 yield
+  (该路候选进入最终结果的比例)、非空率 hit_rate,持久化到 state/retriever_stats.json
+- 规则(按优先级):
+  1. 小语料(估算记录数 < small_corpus)或探索轮:全部召回(保持统计新鲜)
+  2. 精准的身份/关系查询且查询含实体:只跑实体 + 关键词
+  3. 统计充分(runs ≥ MIN_RUNS)的召回器:产出低于 min_yield 且不便宜(耗时 ≥ cheap_ms)则跳过;
+     产出偏低的缩减候选数
+- 至少保留一路词法召回(keyword / tfidf);计划结果为空时由调用方补跑被跳过的召回
+- pending 不参与规划(总是检索,新写入的记忆都在这里)
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+STATS_FILE = "state/retriever_stats.json"
+RETRIEVERS = ("vector", "tfidf", "qmd", "keyword", "entity")
+LEXICAL = ("keyword", "tfidf")
+
+EWMA_ALPHA = 0.2
+MIN_RUNS = 10
+LOW_YIELD_SCALE = 0.5
+SAVE_INTERVAL_SECONDS = 5.0
+
+# 按活跃池文件大小估算记录数(每条 JSONL 记录约 300 字节)
+BYTES_PER_RECORD = 300
+
+DEFAULT_OPTIONS = {
+    "explore_every": 20,
+    "min_yield": 0.05,
+    "cheap_ms": 5.0,
+    "small_corpus": 500,
+}
+
+
+def estimate_corpus_size(memory_dir) -> int:
+    total = 0
+    for mem_type in ("facts", "beliefs", "summaries"):
+        try:
+            total += (Path(memory_dir) / f"layer2/active/{mem_type}.jsonl").stat().st_size
+        except OSError:
+            continue
+    return total // BYTES_PER_RECORD
+
+
+class RetrievalPlanner:
+    """召回规划器"""
+
+    def __init__(self, memory_dir, **options):
+        self.stats_path = Path(memory_dir) / STATS_FILE
+        self.options = {**DEFAULT_OPTIONS, **{k: v for k, v in options.items() if v is not None}}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}  # query_type → {"plans": n, "retrievers": {name: {...}}}
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.stats_path.exists():
+            return
+        try:
+            with open(self.stats_path, encoding="utf-8") as f:
+                self._stats = json.load(f)
+        except (OSError, ValueError):
+            self._stats = {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.stats_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_path)
+            self._dirty = False
+            self._last_save = time.time()
+
+    def _class_stats(self, query_type: str) -> Dict:
+        return self._stats.setdefault(query_type, {"plans": 0, "retrievers": {}})
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    # ================================================================
+    # 规划
+    # ================================================================
+
+    def plan(
+        self,
+        query_type: str,
+        base_limit: int,
+        corpus_size: int,
+        trigger_type: str = "default",
+        has_entities: bool = False,
+        available: Iterable[str] = RETRIEVERS,
+    ) -> Dict[str, int]:
+        """
+        返回 {召回器: 候选数}
+
+        available: 本次可用的召回器(调用方按 use_qmd / use_vector 等开关过滤)
+        """
+        available = [r for r in RETRIEVERS if r in set(available)]
+        full = {r: base_limit for r in available}
+        with self._lock:
+            cls = self._class_stats(query_type)
+            cls["plans"] += 1
+            self._dirty = True
+            explore = self.options["explore_every"] <= 1 or cls["plans"] % self.options["explore_every"] == 1
+            retriever_stats = cls["retrievers"]
+
+        if explore or corpus_size < self.options["small_corpus"]:
+            return full
+
+        if (
+            query_type == "precise"
+            and has_entities
+            and trigger_type in ("layer1_identity", "layer1_relation")
+            and "entity" in available
+        ):
+            return {r: base_limit for r in ("entity", "keyword") if r in available}
+
+        plan = {}
+        for name in available:
+            stats = retriever_stats.get(name)
+            if not stats or stats["runs"] < MIN_RUNS:
+                plan[name] = base_limit
+                continue
+            if stats["yield"] < self.options["min_yield"] and stats["latency_ms"] >= self.options["cheap_ms"]:
+                continue
+            if stats["yield"] < 2 * self.options["min_yield"]:
+                plan[name] = max(5, int(base_limit * LOW_YIELD_SCALE))
+            else:
+                plan[name] = base_limit
+
+        if not any(r in plan for r in LEXICAL):
+            lexical = [r for r in LEXICAL if r in available]
+            if lexical:
+                plan[lexical[0]] = base_limit
+        return plan
+
+    # ================================================================
+    # 统计
+    # ================================================================
+
+    def record(self, query_type: str, timings: Dict[str, float], results: Dict[str, List[dict]], final_ids: Iterable[str]):
+        """
+        记录一次检索的各路耗时与产出
+
+        timings: {召回器: 耗时 ms}(只含实际运行的召回器)
+        results: {召回器: 候选列表}
+        """
+        final_ids = set(final_ids)
+        with self._lock:
+            retriever_stats = self._class_stats(query_type)["retrievers"]
+            for name, latency_ms in timings.items():
+                candidates = results.get(name) or []
+                contributed = sum(1 for r in candidates if r.get("id") in final_ids)
+                sample = {
+                    "latency_ms": latency_ms,
+                    "yield": contributed / len(candidates) if candidates else 0.0,
+                    "hit_rate": 1.0 if candidates else 0.0,
+                }
+                stats = retriever_stats.get(name)
+                if stats is None:
+                    retriever_stats[name] = {**sample, "runs": 1}
+                    continue
+                for key, value in sample.items():
+                    stats[key] += EWMA_ALPHA * (value - stats[key])
+                stats["runs"] += 1
+            self._dirty = True
+            due = time.time() - self._last_save >= SAVE_INTERVAL_SECONDS
+        if due:
+            self.save()
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_PLANNERS: Dict[str, RetrievalPlanner] = {}
+_PLANNERS_LOCK = threading.Lock()
+
+
+def get_retrieval_planner(memory_dir, **options) -> RetrievalPlanner:
+    key = str(Path(memory_dir).resolve())
+    with _PLANNERS_LOCK:
+        planner = _PLANNERS.get(key)
+        if planner is None:
+            planner = RetrievalPlanner(memory_dir, **options)
+            _PLANNERS[key] = planner
+            atexit.register(planner.save)
+        return planner
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Session Context
+会话级增量检索:同一对话的连续 inject 复用上一轮的候选集
+
+设计要点:
+- 会话状态存于 state/sessions/<session_id>.json:
+  已见查询词、实体激活度、候选池(活跃池记录 + 各路召回分数)、活跃池文件签名
+- 新一轮只对含新词的查询片段做召回(delta),与候选池合并后整体重排
+- pending 每轮照常检索(有倒排索引,开销小);活跃池文件签名变化
+  (整理、归档、直接写入)或会话过期时退回完整检索
+- 实体激活度每轮按 ENTITY_DECAY 衰减,本轮提到的实体重置为 1.0
+- 不带会话 ID 时完全不经过本模块,原有无状态行为不变
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from text_analyzer import analyze
+
+SESSIONS_DIR = "state/sessions"
+SESSION_TTL_SECONDS = 6 * 3600
+MAX_POOL_SIZE = 60
+MAX_POOL_AGE_TURNS = 5  # 连续多少轮未进入结果的候选被移出候选池
+ENTITY_DECAY = 0.5
+MIN_ACTIVATION = 0.1
+ENTITY_BOOST = 0.1
+
+# 重排时按本轮查询重新计算的字段,不带入候选池
+_TRANSIENT_KEYS = ("final_score", "rrf_score", "isolation_applied", "isolation_reason", "spread_from")
+
+_SEGMENT_SPLIT = re.compile(r"[\s,.!?;:，。！？；：、()（）\[\]【】\"'“”‘’]+")
+
+
+def _sanitize(session_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(session_id))[:128] or "default"
+
+
+def active_signature(memory_dir) -> List:
+    """活跃池文件签名(size, mtime_ns)"""
+    signature = []
+    for mem_type in ("facts", "beliefs", "summaries"):
+        try:
+            st = (Path(memory_dir) / f"layer2/active/{mem_type}.jsonl").stat()
+            signature.append([st.st_size, st.st_mtime_ns])
+        except OSError:
+            signature.append([0, 0])
+    return signature
+
+
+class SessionContext:
+    """单个会话的检索状态"""
+
+    def __init__(self, memory_dir, session_id: str, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.memory_dir = Path(memory_dir)
+        self.session_id = _sanitize(session_id)
+        self.path = self.memory_dir / SESSIONS_DIR / f"{self.session_id}.json"
+        self.ttl_seconds = ttl_seconds
+        self.turn = 0
+        self.terms: set = set()
+        self.activations: Dict[str, float] = {}
+        self.pool: Dict[str, dict] = {}  # id → 候选记录(含 last_turn)
+        self.signature: List = []
+        self.updated = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.turn = data["turn"]
+            self.terms = set(data["terms"])
+            self.activations = data["activations"]
+            self.pool = data["pool"]
+            self.signature = data["signature"]
+            self.updated = data["updated"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.reset()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.updated = time.time()
+        data = {
+            "session_id": self.session_id,
+            "turn": self.turn,
+            "terms": sorted(self.terms),
+            "activations": self.activations,
+            "pool": self.pool,
+            "signature": self.signature,
+            "updated": self.updated,
+        }
+        # 临时文件按写入者区分:同一会话的并发保存各写各的,最后一次 os.replace 生效
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        """清空候选状态(保留会话 ID)"""
+        self.turn = 0
+        self.terms = set()
+        self.activations = {}
+        self.pool = {}
+        self.signature = []
+
+    def is_warm(self, signature: List) -> bool:
+        """能否增量检索:有上一轮状态、未过期、活跃池未变"""
+        return (
+            self.turn > 0
+            and bool(self.pool)
+            and signature == self.signature
+            and time.time() - self.updated <= self.ttl_seconds
+        )
+
+    # ================================================================
+    # 增量查询
+    # ================================================================
+
+    def delta_query(self, query: str) -> Tuple[str, set]:
+        """
+        只保留包含新词的查询片段
+
+        返回: (delta 查询文本, 新词集合);没有新词时 delta 为空串
+        """
+        new_terms = set(analyze(query)) - self.terms
+        if not new_terms:
+            return "", new_terms
+        segments = [seg for seg in _SEGMENT_SPLIT.split(query) if seg]
+        kept = [seg for seg in segments if new_terms & set(analyze(seg))]
+        return " ".join(kept), new_terms
+
+    def activate(self, entities: Iterable[str]):
+        """衰减上一轮的实体激活度,本轮提到的实体置为 1.0"""
+        activations = {e: a * ENTITY_DECAY for e, a in self.activations.items() if a * ENTITY_DECAY >= MIN_ACTIVATION}
+        for entity in entities:
+            activations[entity] = 1.0
+        self.activations = activations
+
+    def entity_boost(self, record: dict) -> float:
+        """记录实体在会话中的激活加成"""
+        activation = max((self.activations.get(e, 0.0) for e in record.get("entities", [])), default=0.0)
+        return ENTITY_BOOST * activation
+
+    def pooled_candidates(self) -> List[dict]:
+        return [dict(record) for record in self.pool.values()]
+
+    def commit_turn(self, query: str, candidates: List[dict], ranked: List[dict], signature: List):
+        """
+        记录本轮:查询词并入已见集合,候选池更新
+
+        candidates: 本轮参与重排的活跃池候选(不含 pending)
+        ranked: 重排后的结果,进入结果的候选刷新 last_turn
+        """
+        self.turn += 1
+        self.terms.update(analyze(query))
+        self.signature = signature
+
+        ranked_ids = {r["id"] for r in ranked}
+        pool = {}
+        for record in candidates:
+            prev = self.pool.get(record["id"], {})
+            entry = {k: v for k, v in record.items() if k not in _TRANSIENT_KEYS}
+            entry["last_turn"] = self.turn if record["id"] in ranked_ids else prev.get("last_turn", self.turn)
+            if self.turn - entry["last_turn"] < MAX_POOL_AGE_TURNS:
+                pool[record["id"]] = entry
+        if len(pool) > MAX_POOL_SIZE:
+            keep = sorted(pool.values(), key=lambda r: r["last_turn"], reverse=True)
+            pool = {r["id"]: r for r in keep[:MAX_POOL_SIZE]}
+        self.pool = pool
+
+
+def get_session_context(memory_dir, session_id: str, ttl_seconds: int = SESSION_TTL_SECONDS) -> SessionContext:
+    return SessionContext(memory_dir, session_id, ttl_seconds=ttl_seconds)
+
+
+def cleanup_sessions(memory_dir, ttl_seconds: int = SESSION_TTL_SECONDS) -> int:
+    """删除过期会话文件,返回删除数"""
+    sessions_dir = Path(memory_dir) / SESSIONS_DIR
+    if not sessions_dir.exists():
+        return 0
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for path in sessions_dir.glob("*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Temporal Query Engine
+时序查询:解析 "昨天 / 上周 / 最近3天 / 之前" 等时间表达式,按时间范围检索记忆
+
+- JSONL 后端:走 temporal_index 的排序时间数组(bisect 范围查询)
+- SQLite 后端:走 memories 表的时间索引(idx_memories_timestamp / idx_memories_created)
+- 去掉时间表达式后的剩余查询词用于过滤与排序;没有剩余词时按时间倒序返回
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from temporal_index import get_temporal_index
+from text_analyzer import analyze
+
+DEFAULT_LIMIT = 10
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUM = r"[0-9零一二两三四五六七八九十]+"
+_UNIT = r"(天|日|周|个?星期|个?礼拜|个?月|年)"
+
+# 按优先级排列:更具体的表达式在前("3天之前" 先于 "之前")
+_PATTERNS = [
+    ("recent_n", re.compile(rf"(?:最近|近|过去)\s*({_NUM})\s*{_UNIT}(?:内|里|以来)?")),
+    ("n_ago", re.compile(rf"({_NUM})\s*{_UNIT}(?:之前|以前|前)")),
+    ("day_before_before", re.compile(r"大前天")),
+    ("day_before", re.compile(r"前天")),
+    ("yesterday", re.compile(r"昨天|昨日|昨晚")),
+    ("today", re.compile(r"今天|今日|今早|今晚")),
+    ("just_now", re.compile(r"刚才|刚刚")),
+    ("last_week", re.compile(r"上周|上个?星期|上个?礼拜")),
+    ("this_week", re.compile(r"本周|这周|这个?星期|这个?礼拜")),
+    ("last_month", re.compile(r"上个?月")),
+    ("this_month", re.compile(r"本月|这个?月")),
+    ("last_year", re.compile(r"去年")),
+    ("this_year", re.compile(r"今年")),
+    ("before", re.compile(r"之前|以前|早些时候")),
+]
+
+
+def _parse_number(text: str) -> Optional[int]:
+    """阿拉伯数字或简单中文数字(≤99)"""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return (_CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    if len(text) == 1 and text in _CN_DIGITS:
+        return _CN_DIGITS[text]
+    return None
+
+
+def _month_start(year: int, month: int) -> datetime:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return datetime(year, month, 1)
+
+
+def _unit_start(day: datetime, unit: str) -> Tuple[datetime, datetime]:
+    """包含 day 的自然单位 [start, end)"""
+    if "天" in unit or "日" in unit:
+        start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, start + timedelta(days=1)
+    if "周" in unit or "星期" in unit or "礼拜" in unit:
+        start = (day - timedelta(days=day.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, start + timedelta(days=7)
+    if "月" in unit:
+        start = _month_start(day.year, day.month)
+        return start, _month_start(day.year, day.month + 1)
+    start = datetime(day.year, 1, 1)
+    return start, datetime(day.year + 1, 1, 1)
+
+
+def _shift(now: datetime, n: int, unit: str) -> datetime:
+    if "天" in unit or "日" in unit:
+        return now - timedelta(days=n)
+    if "周" in unit or "星期" in unit or "礼拜" in unit:
+        return now - timedelta(weeks=n)
+    if "月" in unit:
+        start = _month_start(now.year, now.month - n)
+        return start.replace(day=min(now.day, 28))
+    return now.replace(year=now.year - n)
+
+
+def parse_time_expression(query: str, now: Optional[datetime] = None) -> Optional[Dict]:
+    """
+    解析查询中的时间表达式(本地时间)
+
+    返回: {"start": datetime | None, "end": datetime, "label": str, "span": (i, j)} 或 None
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    for kind, pattern in _PATTERNS:
+        match = pattern.search(query)
+        if not match:
+            continue
+
+        if kind in ("recent_n", "n_ago"):
+            n = _parse_number(match.group(1))
+            if n is None:
+                continue
+            unit = match.group(2)
+            if kind == "recent_n":
+                start, end = _shift(now, n, unit), now
+                if "天" in unit or "日" in unit:
+                    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            else:
+                start, end = _unit_start(_shift(now, n, unit), unit)
+        elif kind == "day_before_before":
+            start, end = today - timedelta(days=3), today - timedelta(days=2)
+        elif kind == "day_before":
+            start, end = today - timedelta(days=2), today - timedelta(days=1)
+        elif kind == "yesterday":
+            start, end = today - timedelta(days=1), today
+        elif kind == "today":
+            start, end = today, today + timedelta(days=1)
+        elif kind == "just_now":
+            start, end = now - timedelta(hours=2), now + timedelta(minutes=1)
+        elif kind == "last_week":
+            this_monday = today - timedelta(days=today.weekday())
+            start, end = this_monday - timedelta(days=7), this_monday
+        elif kind == "this_week":
+            start, end = today - timedelta(days=today.weekday()), today + timedelta(days=1)
+        elif kind == "last_month":
+            start, end = _month_start(now.year, now.month - 1), _month_start(now.year, now.month)
+        elif kind == "this_month":
+            start, end = _month_start(now.year, now.month), today + timedelta(days=1)
+        elif kind == "last_year":
+            start, end = datetime(now.year - 1, 1, 1), datetime(now.year, 1, 1)
+        elif kind == "this_year":
+            start, end = datetime(now.year, 1, 1), today + timedelta(days=1)
+        else:  # before: 此前的全部记忆(开区间,靠剩余查询词过滤)
+            start, end = None, now
+
+        return {"start": start, "end": end, "label": match.group(0), "span": match.span()}
+    return None
+
+
+def _to_epoch(dt: Optional[datetime]) -> Optional[float]:
+    """本地时间 → epoch 秒"""
+    return None if dt is None else time.mktime(dt.timetuple()) + dt.microsecond / 1e6
+
+
+def _to_utc_iso(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    return datetime.fromtimestamp(_to_epoch(dt), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TemporalQueryEngine:
+    """时序查询引擎"""
+
+    def __init__(self, memory_dir, use_sqlite: Optional[bool] = None):
+        self.memory_dir = Path(memory_dir)
+        self.db_path = self.memory_dir / "layer2/memories.db"
+        if use_sqlite is None:
+            use_sqlite = self._configured_backend() == "sqlite" and self.db_path.exists()
+        self.use_sqlite = use_sqlite
+
+    def _configured_backend(self) -> str:
+        try:
+            from backend_adapter import get_backend_config
+
+            return get_backend_config(self.memory_dir).get("backend", "jsonl")
+        except Exception:
+            return "jsonl"
+
+    # ================================================================
+    # 范围查询
+    # ================================================================
+
+    def _jsonl_range(self, start: Optional[float], end: Optional[float], limit: int) -> List[dict]:
+        index = get_temporal_index(self.memory_dir)
+        index.refresh()
+        index.save()
+        return index.load_records(index.range(start, end)[:limit])
+
+    def _sqlite_range(self, start: Optional[datetime], end: Optional[datetime], limit: int) -> List[dict]:
+        conn = sqlite3.connect(str(self.db_path))
+        conn.row_factory = sqlite3.Row
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(memories)")}
+            time_col = "timestamp" if "timestamp" in columns else "created"
+            clauses, params = ["state = 0"], []
+            if start is not None:
+                clauses.append(f"{time_col} >= ?")
+                params.append(_to_utc_iso(start))
+            if end is not None:
+                clauses.append(f"{time_col} < ?")
+                params.append(_to_utc_iso(end))
+            params.append(limit)
+            rows = conn.execute(
+                f"SELECT * FROM memories WHERE {' AND '.join(clauses)} ORDER BY {time_col} DESC LIMIT ?", params
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def records_in_range(self, start: Optional[datetime], end: Optional[datetime], limit: int = 500) -> List[dict]:
+        """时间范围内的记忆(最近的在前)"""
+        if self.use_sqlite:
+            try:
+                return self._sqlite_range(start, end, limit)
+            except sqlite3.Error:
+                pass  # 降级到 JSONL 索引
+        return self._jsonl_range(_to_epoch(start), _to_epoch(end), limit)
+
+    # ================================================================
+    # 时序检索
+    # ================================================================
+
+    def temporal_search(
+        self,
+        query: str,
+        limit: int = DEFAULT_LIMIT,
+        now: Optional[datetime] = None,
+        min_coverage: float = 0.0,
+        bounded_only: bool = False,
+    ) -> Dict:
+        """
+        时序检索
+
+        Args:
+            min_coverage: 有剩余查询词时,命中比例低于此值的记录不返回
+            bounded_only: 开区间表达式("之前"/"以前")不构成时间过滤,按无时间表达式处理
+
+        返回:
+            {
+                "has_temporal": bool,
+                "results": [...],
+                "time_range": {"start", "end", "label"} | None
+            }
+        """
+        parsed = parse_time_expression(query, now=now)
+        if parsed is None or (bounded_only and parsed["start"] is None):
+            return {"has_temporal": False, "results": [], "time_range": None}
+
+        i, j = parsed["span"]
+        residual_terms = set(analyze(query[:i] + " " + query[j:]))
+
+        candidates = self.records_in_range(parsed["start"], parsed["end"])
+        scored = []
+        for rank, record in enumerate(candidates):
+            content = record.get("content", "")
+            if residual_terms:
+                matched = residual_terms & set(analyze(content))
+                if not matched:
+                    continue
+                match_score = len(matched) / len(residual_terms)
+                if match_score < min_coverage:
+                    continue
+            else:
+                match_score = 1.0
+            scored.append((match_score, -rank, record))
+        scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+
+        results = []
+        for match_score, _, record in scored[:limit]:
+            importance = record.get("importance", 0.5)
+            results.append(
+                {
+                    **record,
+                    "type": record.get("type", "fact"),
+                    "importance": importance,
+                    "score": match_score,
+                    "memory_score": record.get("score", importance),
+                    "final_score": match_score,
+                    "entities": record.get("entities", []),
+                    "match_source": "temporal",
+                }
+            )
+
+        return {
+            "has_temporal": True,
+            "results": results,
+            "time_range": {
+                "start": _to_utc_iso(parsed["start"]),
+                "end": _to_utc_iso(parsed["end"]),
+                "label": parsed["label"],
+            },
+        }
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_ENGINES: Dict[str, TemporalQueryEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def create_temporal_engine(memory_dir) -> TemporalQueryEngine:
+    """获取时序引擎(按记忆目录在进程内复用,时间索引只构建一次)"""
+    key = str(Path(memory_dir).resolve())
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = TemporalQueryEngine(memory_dir)
+            _ENGINES[key] = engine
+        return engine
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Temporal Index
+时间分区索引:每种记忆类型一个按时间排序的 (epoch, 字节偏移, id) 列表
+
+设计要点:
+- 持久化到 layer2/index/timeline.json(时间 → 记忆 ID)
+- 活跃池文件以追加为主:记录已索引偏移,刷新时只解析新增尾部;
+  偏移前一小段字节的哈希不符(文件被改写)时该类型整体重建
+- 范围查询用 bisect,复杂度 O(log n + 命中数);命中记录按偏移直接 seek 读取
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INDEX_VERSION = 1
+MEMORY_TYPES = ("facts", "beliefs", "summaries")
+MEMORY_TYPE_SINGULAR = {"facts": "fact", "beliefs": "belief", "summaries": "summary"}  # 活跃池文件名 → 记录 type
+
+_GUARD_BYTES = 256
+
+
+def parse_epoch(value) -> Optional[float]:
+    """ISO 时间字符串 → epoch 秒(无时区按 UTC 处理),无法解析返回 None"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _record_epoch(record: dict) -> Optional[float]:
+    return parse_epoch(record.get("timestamp")) or parse_epoch(record.get("created"))
+
+
+class TemporalIndex:
+    """活跃池时间索引"""
+
+    def __init__(self, memory_dir, persist: bool = True):
+        self.memory_dir = Path(memory_dir)
+        self.index_path = self.memory_dir / "layer2/index/timeline.json"
+        self.persist = persist
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._parts: Dict[str, dict] = {t: self._empty_part() for t in MEMORY_TYPES}
+        if persist:
+            self._load()
+
+    @staticmethod
+    def _empty_part() -> dict:
+        # entries: [[epoch, offset, id], ...] 按 epoch 升序;epochs 为并行数组供 bisect
+        return {"entries": [], "epochs": [], "offset": 0, "mtime_ns": 0, "guard": ""}
+
+    def _path(self, mem_type: str) -> Path:
+        return self.memory_dir / f"layer2/active/{mem_type}.jsonl"
+
+    def __len__(self):
+        return sum(len(p["entries"]) for p in self._parts.values())
+
+    # ================================================================
+    # 持久化
+    # ================================================================
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            for mem_type in MEMORY_TYPES:
+                part = data["types"].get(mem_type)
+                if part is None:
+                    continue
+                part["epochs"] = [e[0] for e in part["entries"]]
+                self._parts[mem_type] = part
+        except (OSError, ValueError, KeyError, TypeError):
+            self._parts = {t: self._empty_part() for t in MEMORY_TYPES}
+
+    def save(self):
+        """持久化(仅在有变更时,原子替换)"""
+        with self._lock:
+            if not self.persist or not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "version": INDEX_VERSION,
+                "types": {
+                    t: {k: v for k, v in part.items() if k != "epochs"} for t, part in self._parts.items()
+                },
+            }
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    # ================================================================
+    # 增量维护
+    # ================================================================
+
+    @staticmethod
+    def _read_guard(f, offset: int) -> str:
+        start = max(0, offset - _GUARD_BYTES)
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+    def _refresh_type(self, mem_type: str) -> int:
+        part = self._parts[mem_type]
+        path = self._path(mem_type)
+        if not path.exists():
+            if part["entries"] or part["offset"]:
+                self._parts[mem_type] = self._empty_part()
+                self._dirty = True
+            return 0
+
+        st = path.stat()
+        if st.st_size == part["offset"] and st.st_mtime_ns == part["mtime_ns"]:
+            return 0
+
+        with open(path, "rb") as f:
+            appended = st.st_size >= part["offset"] and self._read_guard(f, part["offset"]) == part["guard"]
+            if not appended:
+                part = self._empty_part()
+                self._parts[mem_type] = part
+            f.seek(part["offset"])
+            tail = f.read(st.st_size - part["offset"])
+            end = tail.rfind(b"\n") + 1
+
+            new_entries = []
+            pos = part["offset"]
+            for line in tail[:end].split(b"\n")[:-1]:
+                line_offset = pos
+                pos += len(line) + 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except (ValueError, UnicodeDecodeError):
+                    continue
+                epoch = _record_epoch(record)
+                if epoch is None or not record.get("id"):
+                    continue
+                new_entries.append([epoch, line_offset, record["id"]])
+
+            part["offset"] += end
+            part["guard"] = self._read_guard(f, part["offset"])
+
+        part["mtime_ns"] = st.st_mtime_ns
+        if new_entries:
+            new_entries.sort(key=lambda e: e[0])
+            if part["entries"] and new_entries[0][0] < part["entries"][-1][0]:
+                part["entries"] = sorted(part["entries"] + new_entries, key=lambda e: e[0])
+            else:
+                part["entries"].extend(new_entries)
+            part["epochs"] = [e[0] for e in part["entries"]]
+        self._dirty = True
+        return len(new_entries)
+
+    def refresh(self) -> int:
+        """与活跃池文件同步,返回新索引的记录数"""
+        with self._lock:
+            return sum(self._refresh_type(t) for t in MEMORY_TYPES)
+
+    # ================================================================
+    # 查询
+    # ================================================================
+
+    def range(
+        self, start: Optional[float], end: Optional[float], types: Optional[Iterable[str]] = None
+    ) -> List[Tuple[float, str, int, str]]:
+        """
+        时间范围查询 [start, end)
+
+        返回: [(epoch, mem_type, offset, id), ...] 按时间降序(最近的在前)
+        """
+        hits = []
+        with self._lock:
+            for mem_type in types or MEMORY_TYPES:
+                part = self._parts.get(mem_type)
+                if not part:
+                    continue
+                epochs = part["epochs"]
+                lo = 0 if start is None else bisect.bisect_left(epochs, start)
+                hi = len(epochs) if end is None else bisect.bisect_left(epochs, end)
+                for epoch, offset, mem_id in part["entries"][lo:hi]:
+                    hits.append((epoch, mem_type, offset, mem_id))
+        hits.sort(key=lambda h: h[0], reverse=True)
+        return hits
+
+    def load_records(self, hits: List[Tuple[float, str, int, str]]) -> List[dict]:
+        """按偏移读取命中的记录(保持 hits 顺序,读取失败或 id 不符的跳过)"""
+        by_type: Dict[str, List[Tuple[int, int, str]]] = {}
+        for i, (_, mem_type, offset, mem_id) in enumerate(hits):
+            by_type.setdefault(mem_type, []).append((offset, i, mem_id))
+
+        loaded: Dict[int, dict] = {}
+        for mem_type, items in by_type.items():
+            path = self._path(mem_type)
+            if not path.exists():
+                continue
+            with open(path, "rb") as f:
+                for offset, i, mem_id in sorted(items):
+                    f.seek(offset)
+                    try:
+                        record = json.loads(f.readline().decode("utf-8"))
+                    except (ValueError, UnicodeDecodeError):
+                        continue
+                    if record.get("id") == mem_id:
+                        record.setdefault("type", MEMORY_TYPE_SINGULAR[mem_type])
+                        loaded[i] = record
+        return [loaded[i] for i in sorted(loaded)]
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+
+_INDEXES: Dict[str, TemporalIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_temporal_index(memory_dir, persist: bool = True) -> TemporalIndex:
+    """获取(并缓存)时间索引,首次获取时从 timeline.json 加载"""
+    key = str(Path(memory_dir).resolve())
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = TemporalIndex(memory_dir, persist=persist)
+            _INDEXES[key] = index
+        return index
+
+
+def refresh_temporal_index(memory_dir, save: bool = True) -> Optional[int]:
+    """写入后调用:已加载的索引增量同步(未加载时不做任何事,下次查询时再同步)"""
+    index = _INDEXES.get(str(Path(memory_dir).resolve()))
+    if index is None:
+        return None
+    added = index.refresh()
+    if save:
+        index.save()
+    return added
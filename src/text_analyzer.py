@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Text Analyzer
+共享分词器：中文 2-gram + 英文/数字词
+
+供 pending 倒排索引、TF-IDF 等检索组件共用，保证索引端与查询端切词一致。
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List
+
+# 英文/数字词(允许内部连字符、点、下划线,如 memory-system / v1.2)或连续中文片段
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_\-.]*|[\u4e00-\u9fff]+")
+
+
+def _is_cjk(ch: str) -> bool:
+    return "\u4e00" <= ch <= "\u9fff"
+
+
+def analyze(text: str) -> List[str]:
+    """
+    切词
+
+    - 中文:连续片段切成 2-gram(单字片段保留单字)
+    - 英文/数字:整词小写,去掉首尾标点,丢弃单字符
+
+    返回: token 列表(保留重复,用于计算词频)
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        piece = match.group()
+        if _is_cjk(piece[0]):
+            if len(piece) == 1:
+                tokens.append(piece)
+            else:
+                tokens.extend(piece[i : i + 2] for i in range(len(piece) - 1))
+        else:
+            piece = piece.strip("-._")
+            if len(piece) >= 2:
+                tokens.append(piece)
+    return tokens
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """返回 {token: 词频}"""
+    return dict(Counter(analyze(text)))
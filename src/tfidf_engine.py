@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - TF-IDF Engine
+增量 TF-IDF 检索 + RRF 多路合并
+
+设计要点:
+- 切词与 pending 索引共用 text_analyzer,索引端与查询端一致
+- 持久化到 layer2/index/tfidf.json:每篇文档的词频与内容哈希、DF 表、文档范数
+- 增量维护:按内容哈希比对活跃池,只增删变化的文档,DF 随之加减
+- 文档范数依赖 idf:文档总数相对上次计算漂移超过 NORM_DRIFT 时才整体重算
+- 检索只遍历查询词的倒排链(稀疏点积),取 top-k
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from text_analyzer import term_frequencies
+
+INDEX_VERSION = 1
+MEMORY_TYPES = ("facts", "beliefs", "summaries")
+MEMORY_TYPE_SINGULAR = {"facts": "fact", "beliefs": "belief", "summaries": "summary"}  # 活跃池文件名 → 记录 type
+
+# 文档数漂移超过该比例时重算全部范数
+NORM_DRIFT = 0.1
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _tf_weight(tf: int) -> float:
+    return 1.0 + math.log(tf)
+
+
+class TfidfIndex:
+    """增量 TF-IDF 索引"""
+
+    def __init__(self, memory_dir, persist: bool = True):
+        self.memory_dir = Path(memory_dir)
+        self.index_path = self.memory_dir / "layer2/index/tfidf.json"
+        self.persist = persist
+        self._lock = threading.RLock()
+        self._reset()
+        if persist:
+            self._load()
+
+    def _reset(self):
+        self._docs: Dict[str, dict] = {}  # id → {"tf": {term: n}, "h": 内容哈希}
+        self._df: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._norms: Dict[str, float] = {}
+        self._norm_n = 0
+        self._signature: List = []
+        self._dirty = False
+        self._file_mtime_ns = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ================================================================
+    # 持久化
+    # ================================================================
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            self._file_mtime_ns = self.index_path.stat().st_mtime_ns
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            self._docs = data["docs"]
+            self._df = data["df"]
+            self._norms = data["norms"]
+            self._norm_n = data["norm_n"]
+            self._signature = data["signature"]
+            for doc_id, doc in self._docs.items():
+                for term, tf in doc["tf"].items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+
+    def save(self):
+        """持久化(仅在有变更时,原子替换)"""
+        with self._lock:
+            if not self.persist or not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "version": INDEX_VERSION,
+                "docs": self._docs,
+                "df": self._df,
+                "norms": self._norms,
+                "norm_n": self._norm_n,
+                "signature": self._signature,
+            }
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._file_mtime_ns = self.index_path.stat().st_mtime_ns
+            self._dirty = False
+
+    def is_stale(self) -> bool:
+        """索引文件是否被其他进程更新过"""
+        try:
+            return self.index_path.stat().st_mtime_ns != self._file_mtime_ns
+        except OSError:
+            return self._file_mtime_ns is not None
+
+    # ================================================================
+    # 增量维护
+    # ================================================================
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._docs) + 1) / (self._df.get(term, 0) + 1)) + 1.0
+
+    def _doc_norm(self, tf: Dict[str, int]) -> float:
+        return math.sqrt(sum((_tf_weight(n) * self._idf(t)) ** 2 for t, n in tf.items())) or 1.0
+
+    def add(self, doc_id: str, content: str):
+        """添加/更新一篇文档"""
+        with self._lock:
+            if doc_id in self._docs:
+                self.remove(doc_id)
+            tf = term_frequencies(content)
+            self._docs[doc_id] = {"tf": tf, "h": _content_hash(content)}
+            for term, n in tf.items():
+                self._df[term] = self._df.get(term, 0) + 1
+                self._postings.setdefault(term, {})[doc_id] = n
+            self._norms[doc_id] = self._doc_norm(tf)
+            self._dirty = True
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return False
+            for term in doc["tf"]:
+                df = self._df.get(term, 0) - 1
+                if df > 0:
+                    self._df[term] = df
+                else:
+                    self._df.pop(term, None)
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self._postings[term]
+            self._norms.pop(doc_id, None)
+            self._dirty = True
+            return True
+
+    def _maybe_recompute_norms(self):
+        n = len(self._docs)
+        if self._norm_n and abs(n - self._norm_n) <= NORM_DRIFT * self._norm_n:
+            return
+        self._norms = {doc_id: self._doc_norm(doc["tf"]) for doc_id, doc in self._docs.items()}
+        self._norm_n = n
+        self._dirty = True
+
+    def sync(self, records: Iterable[dict], signature: Optional[List] = None) -> Dict[str, int]:
+        """
+        与记录集合同步:只增删内容变化的文档
+
+        signature: 数据源签名(活跃池文件的 size/mtime),一致时 search 端可跳过同步
+        """
+        records = [r for r in records if r.get("id")]
+        stats = {"total": len(records), "added": 0, "removed": 0, "unchanged": 0}
+        with self._lock:
+            wanted = {r["id"]: r.get("content", "") for r in records}
+            for doc_id in [d for d in self._docs if d not in wanted]:
+                self.remove(doc_id)
+                stats["removed"] += 1
+            for doc_id, content in wanted.items():
+                doc = self._docs.get(doc_id)
+                if doc is not None and doc["h"] == _content_hash(content):
+                    stats["unchanged"] += 1
+                    continue
+                self.add(doc_id, content)
+                stats["added"] += 1
+            self._maybe_recompute_norms()
+            if signature is not None and signature != self._signature:
+                self._signature = signature
+                self._dirty = True
+        return stats
+
+    # ================================================================
+    # 检索
+    # ================================================================
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """稀疏点积余弦相似度,返回 [(id, score), ...] 降序"""
+        q_tf = term_frequencies(query)
+        with self._lock:
+            if not q_tf or not self._docs:
+                return []
+            q_weights = {t: _tf_weight(n) * self._idf(t) for t, n in q_tf.items() if t in self._postings}
+            if not q_weights:
+                return []
+            q_norm = math.sqrt(sum(w * w for w in q_weights.values()))
+
+            scores: Dict[str, float] = {}
+            for term, q_w in q_weights.items():
+                idf = self._idf(term)
+                for doc_id, tf in self._postings[term].items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + q_w * _tf_weight(tf) * idf
+
+            top = heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+            return [(doc_id, score / (q_norm * self._norms.get(doc_id, 1.0))) for doc_id, score in top]
+
+
+# ============================================================
+# 模块级接口
+# ============================================================
+
+_INDEXES: Dict[str, TfidfIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_tfidf_index(memory_dir) -> TfidfIndex:
+    """获取(并缓存)TF-IDF 索引;其他进程更新过索引文件时重新加载"""
+    key = str(Path(memory_dir).resolve())
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None or (not index._dirty and index.is_stale()):
+            index = TfidfIndex(memory_dir)
+            _INDEXES[key] = index
+        return index
+
+
+def _source_signature(memory_dir) -> List:
+    """活跃池文件签名(size, mtime_ns),用于判断索引是否需要同步"""
+    signature = []
+    for mem_type in MEMORY_TYPES:
+        path = Path(memory_dir) / f"layer2/active/{mem_type}.jsonl"
+        try:
+            st = path.stat()
+            signature.append([mem_type, st.st_size, st.st_mtime_ns])
+        except OSError:
+            signature.append([mem_type, 0, 0])
+    return signature
+
+
+def _load_active_records(memory_dir) -> Dict[str, dict]:
+    records = {}
+    for mem_type in MEMORY_TYPES:
+        path = Path(memory_dir) / f"layer2/active/{mem_type}.jsonl"
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("id"):
+                    record["type"] = MEMORY_TYPE_SINGULAR[mem_type]
+                    records[record["id"]] = record
+    return records
+
+
+def build_tfidf_index(memory_dir, records: Optional[Dict[str, dict]] = None) -> Dict[str, int]:
+    """增量构建 TF-IDF 索引(活跃池未变的文档不重新切词)"""
+    signature = _source_signature(memory_dir)
+    if records is None:
+        records = _load_active_records(memory_dir)
+    index = get_tfidf_index(memory_dir)
+    stats = index.sync(records.values(), signature=signature)
+    index.save()
+    return stats
+
+
+def tfidf_search(
+    query: str, memory_dir, top_k: int = 20, records: Optional[Mapping[str, dict]] = None
+) -> List[dict]:
+    """
+    TF-IDF 检索
+
+    records: 可选的 {id: record} 映射(只读),调用方已缓存活跃池时传入以免每次查询重新解析
+    活跃池文件签名变化时先增量同步索引。
+    """
+    index = get_tfidf_index(memory_dir)
+    signature = _source_signature(memory_dir)
+    if signature != index._signature:
+        if records is None:
+            records = _load_active_records(memory_dir)
+        index.sync(records.values(), signature=signature)
+        index.save()
+
+    hits = index.search(query, top_k=top_k)
+    if not hits:
+        return []
+    if records is None:
+        records = _load_active_records(memory_dir)
+
+    results = []
+    for doc_id, score in hits:
+        record = records.get(doc_id)
+        if record is None:
+            continue
+        results.append(
+            {
+                **record,
+                "score": score,
+                "tfidf_score": score,
+                "memory_score": record.get("score", record.get("importance", 0.5)),
+                "entities": record.get("entities", []),
+                "match_source": "tfidf",
+            }
+        )
+    return results
+
+
+def rrf_merge(
+    result_lists: Sequence[Sequence[Union[dict, str]]], k: int = 60, top_n: Optional[int] = None
+) -> List[Union[dict, str]]:
+    """
+    Reciprocal Rank Fusion
+
+    输入为多路结果列表,元素可以是带 id 的记录或 id 字符串;只按 id 计分,
+    不复制记录:返回每个 id 首次出现的原对象(记录会附加 rrf_score 字段)。
+    """
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, Union[dict, str]] = {}
+    for results in result_lists:
+        for rank, item in enumerate(results):
+            doc_id = item if isinstance(item, str) else item.get("id")
+            if doc_id is None:
+                continue
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(doc_id, item)
+
+    ranked = sorted(scores, key=lambda d: scores[d], reverse=True)
+    if top_n is not None:
+        ranked = ranked[:top_n]
+
+    merged = []
+    for doc_id in ranked:
+        item = first_seen[doc_id]
+        if isinstance(item, dict):
+            item["rrf_score"] = scores[doc_id]
+        merged.append(item)
+    return merged
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Vector Embedding
+向量嵌入引擎
+
+提供者:
+- hashing      内置离线引擎(默认):字符 n-gram 特征哈希 + 次线性 TF,可选稀疏随机投影
+- openai       OpenAI 兼容 /embeddings 接口(需要 OPENAI_API_KEY)
+- huggingface  sentence-transformers 本地模型(需要安装 sentence-transformers)
+- local        同 huggingface,使用默认小模型
+
+所有引擎提供相同接口:dimension / model / embed(text) / embed_batch(texts)。
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import urllib.request
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_HASHING_DIMENSION = 512
+DEFAULT_NGRAM_RANGE = (1, 3)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# ============================================================
+# 基类
+# ============================================================
+
+class VectorEmbeddingEngine:
+    """嵌入引擎基类"""
+
+    provider = ""
+    # 是否值得走持久化嵌入缓存(见 embedding_cache.wrap_with_cache)
+    cacheable = True
+
+    def __init__(self, model: str, dimension: int):
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        """嵌入单条文本(失败返回 None)"""
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量嵌入,返回与输入等长的列表(失败项为 None)"""
+        raise NotImplementedError
+
+
+# ============================================================
+# 离线哈希引擎
+# ============================================================
+
+class HashingEmbeddingEngine(VectorEmbeddingEngine):
+    """
+    字符 n-gram 特征哈希嵌入
+
+    - 文本小写、压缩空白后切出 ngram_range 内的全部字符 n-gram(中英文通用,无需分词)
+    - 每个 n-gram 用 crc32 哈希到 projection_nnz 个维度,符号位由哈希决定(抵消碰撞偏差)
+      projection_nnz > 1 即稀疏随机投影:每个特征分散到多个维度,降低碰撞方差
+    - 词频取 1 + log(tf),最后 L2 归一化,点积即余弦相似度
+
+    纯 Python 实现,进程内运行;特征 → 维度映射带 LRU 缓存,批量嵌入时重复 n-gram 只哈希一次。
+    """
+
+    provider = "hashing"
+    # 重新计算比查询磁盘缓存更快
+    cacheable = False
+
+    def __init__(
+        self,
+        dimension: int = DEFAULT_HASHING_DIMENSION,
+        ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE,
+        projection_nnz: int = 1,
+    ):
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.projection_nnz = max(1, int(projection_nnz))
+        model = f"hashing-char{self.ngram_range[0]}{self.ngram_range[1]}-nnz{self.projection_nnz}"
+        super().__init__(model, int(dimension))
+
+        nnz = self.projection_nnz
+        dim = self.dimension
+        weight = 1.0 / math.sqrt(nnz)
+
+        @lru_cache(maxsize=200000)
+        def slots(feature: str) -> Tuple[Tuple[int, float], ...]:
+            data = feature.encode("utf-8")
+            result = []
+            for seed in range(nnz):
+                h = zlib.crc32(data, seed * 0x9E3779B1 & 0xFFFFFFFF)
+                result.append((h % dim, weight if (h >> 31) & 1 else -weight))
+            return tuple(result)
+
+        self._slots = slots
+
+    def _ngrams(self, text: str) -> Dict[str, int]:
+        text = _WHITESPACE_RE.sub(" ", text.lower()).strip()
+        counts: Dict[str, int] = {}
+        lo, hi = self.ngram_range
+        for n in range(lo, hi + 1):
+            for i in range(len(text) - n + 1):
+                gram = text[i : i + n]
+                if gram.isspace():
+                    continue
+                counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def _embed_one(self, text: str) -> Optional[List[float]]:
+        counts = self._ngrams(text or "")
+        if not counts:
+            return None
+        vec = [0.0] * self.dimension
+        slots = self._slots
+        for gram, tf in counts.items():
+            w = 1.0 + math.log(tf)
+            for idx, sign in slots(gram):
+                vec[idx] += sign * w
+        norm = math.sqrt(sum(v * v for v in vec))
+        if norm == 0:
+            return None
+        return [v / norm for v in vec]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        return [self._embed_one(text) for text in texts]
+
+
+# ============================================================
+# 远程 / 第三方引擎
+# ============================================================
+
+class OpenAIEmbeddingEngine(VectorEmbeddingEngine):
+    """OpenAI 兼容 /embeddings 接口(批量请求)"""
+
+    provider = "openai"
+
+    DIMENSIONS = {
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+        "text-embedding-ada-002": 1536,
+    }
+
+    def __init__(self, model: Optional[str] = None, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        model = model or "text-embedding-3-small"
+        super().__init__(model, self.DIMENSIONS.get(model, 1536))
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.base_url = (base_url or os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        body = json.dumps({"model": self.model, "input": list(texts)}).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.base_url}/embeddings",
+            data=body,
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            data = json.loads(response.read().decode("utf-8"))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for item in data.get("data", []):
+            vectors[item["index"]] = item["embedding"]
+        return vectors
+
+
+class SentenceTransformerEmbeddingEngine(VectorEmbeddingEngine):
+    """sentence-transformers 本地模型"""
+
+    provider = "huggingface"
+
+    def __init__(self, model: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        model = model or "paraphrase-multilingual-MiniLM-L12-v2"
+        self._model = SentenceTransformer(model)
+        super().__init__(model, self._model.get_sentence_embedding_dimension())
+
+    def embed_batch(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        return [vec.tolist() for vec in self._model.encode(list(texts), normalize_embeddings=True)]
+
+
+# ============================================================
+# 工厂
+# ============================================================
+
+_ENGINES: Dict[tuple, Optional[VectorEmbeddingEngine]] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def _create_engine(provider: str, model: Optional[str], dimension: Optional[int], options: dict):
+    if provider == "hashing":
+        return HashingEmbeddingEngine(
+            dimension=dimension or DEFAULT_HASHING_DIMENSION,
+            ngram_range=tuple(options.get("ngram_range", DEFAULT_NGRAM_RANGE)),
+            projection_nnz=options.get("projection_nnz", 1),
+        )
+    if provider == "openai":
+        if not os.environ.get("OPENAI_API_KEY"):
+            return None
+        return OpenAIEmbeddingEngine(model=model)
+    if provider in ("huggingface", "local"):
+        try:
+            return SentenceTransformerEmbeddingEngine(model=model)
+        except ImportError:
+            return None
+    raise ValueError(f"未知的嵌入提供者: {provider}")
+
+
+def get_embedding_engine(
+    provider: str = "hashing", model: Optional[str] = None, dimension: Optional[int] = None, **options
+) -> Optional[VectorEmbeddingEngine]:
+    """
+    获取嵌入引擎(按参数在进程内缓存)
+
+    hashing 引擎的 model 参数会被忽略(模型名由参数推导,用于判断索引是否需要重建);
+    options 仅用于 hashing:ngram_range、projection_nnz。
+    依赖缺失(无 API Key / 未安装 sentence-transformers)时返回 None。
+    """
+    if provider != "hashing":
+        dimension = None  # 远程/第三方模型维度由模型决定
+    key = (provider, model if provider != "hashing" else None, dimension, json.dumps(options, sort_keys=True))
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            _ENGINES[key] = _create_engine(provider, model, dimension, options)
+        return _ENGINES[key]
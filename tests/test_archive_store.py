@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 归档分段存储测试
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive_store import ArchiveCorruptError, ArchiveStore
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+SUBJECTS = ["用户", "用户的同事", "用户的家人", "用户的朋友"]
+VERBS = ["喜欢", "不喜欢", "经常去", "计划学习", "最近在用", "推荐过"]
+OBJECTS = ["美式咖啡", "上海浦东的咖啡馆", "Python 编程", "周末爬山", "日料", "机械键盘", "科幻小说", "羽毛球"]
+
+def make_records(start, count, day_offset=0):
+    """结构与真实归档记录一致的语料"""
+    rng = random.Random(start)
+    records = []
+    for i in range(start, start + count):
+        day = day_offset + (i - start) // 10
+        records.append({
+            "id": f"f_{i:05d}",
+            "content": f"{rng.choice(SUBJECTS)}{rng.choice(VERBS)}{rng.choice(OBJECTS)}",
+            "importance": round(rng.uniform(0.1, 0.9), 2),
+            "score": round(rng.uniform(0.01, 0.05), 4),
+            "entities": rng.sample(OBJECTS, 2),
+            "source": "consolidation",
+            "created": f"2026-{1 + day // 28:02d}-{1 + day % 28:02d}T08:00:00Z",
+            "decay_anchor": f"2026-{1 + day // 28:02d}-{1 + day % 28:02d}T08:00:00Z",
+        })
+    return records
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_append_only():
+    """测试追加只写新段,已有段文件不被改写"""
+    print("\n📋 测试只追加")
+
+    with TestContext() as memory_dir:
+        store = ArchiveStore(memory_dir, max_segments=100)
+        first = store.append("facts", make_records(0, 50))
+        before = (first.read_bytes(), first.stat().st_mtime_ns)
+        second = store.append("facts", make_records(50, 50))
+        unchanged = (first.read_bytes(), first.stat().st_mtime_ns) == before
+
+        ids = [r["id"] for r in store.load("facts")]
+        stats = store.stats("facts")
+
+    passed = (
+        unchanged
+        and first.name == "00000001-00000001.seg"
+        and second.name == "00000002-00000002.seg"
+        and ids == [f"f_{i:05d}" for i in range(100)]
+        and stats["segments"] == 2
+        and stats["records"] == 100
+    )
+    print_test("第二次归档写新段,第一段字节与 mtime 不变,读取保持归档顺序", passed, f"段: {stats['segments']}")
+
+    assert passed
+    return passed
+
+def test_footer_filter():
+    """测试按 id / 时间过滤只解压命中的段"""
+    print("\n📋 测试段尾索引过滤")
+
+    with TestContext() as memory_dir:
+        store = ArchiveStore(memory_dir, max_segments=100)
+        for n in range(5):
+            store.append("facts", make_records(n * 100, 100, day_offset=n * 10))
+
+        decoded = []
+        original = ArchiveStore._read_segment
+        ArchiveStore._read_segment = staticmethod(lambda path: decoded.append(path.name) or original(path))
+        try:
+            by_id = [r["id"] for r in store.iter_records("facts", ids=["f_00250", "f_00251"])]
+            by_id_segments = list(decoded)
+            decoded.clear()
+            by_time = list(store.iter_records("facts", since="2026-02-13T00:00:00Z", until="2026-02-13T23:59:59Z"))
+            by_time_segments = list(decoded)
+            decoded.clear()
+            count = store.count("facts")
+            count_segments = list(decoded)
+        finally:
+            ArchiveStore._read_segment = staticmethod(original)
+
+    passed = (
+        by_id == ["f_00250", "f_00251"]
+        and by_id_segments == ["00000003-00000003.seg"]
+        and len(by_time) == 10
+        and all(r["created"].startswith("2026-02-13") for r in by_time)
+        and by_time_segments == ["00000005-00000005.seg"]
+        and count == 500
+        and count_segments == []
+    )
+    print_test("按 id / 时间只解压 1 段,计数只读段尾", passed, f"id 命中段: {by_id_segments}, 时间命中段: {by_time_segments}")
+
+    assert passed
+    return passed
+
+def test_merge_and_legacy():
+    """测试旧格式迁移、段数超限自动合并与崩溃残留"""
+    print("\n📋 测试合并与旧格式迁移")
+
+    with TestContext() as memory_dir:
+        legacy = make_records(0, 30)
+        write_jsonl(memory_dir / 'layer2/archive/facts.jsonl', legacy)
+        store = ArchiveStore(memory_dir, max_segments=4)
+        for n in range(1, 8):
+            store.append("facts", make_records(n * 30, 30))
+        segments = store.segments("facts")
+        ids = [r["id"] for r in store.load("facts")]
+
+        # 模拟合并中途崩溃:新段已写入,旧段未删除
+        stale = segments[-1].path.with_name("00000007-00000007.seg")
+        stale.write_bytes(store.encode(make_records(210, 30)))
+        stale_ids = [r["id"] for r in ArchiveStore(memory_dir).load("facts")]
+
+        compacted = store.merge("facts", 1)
+        after = [r["id"] for r in store.load("facts")]
+        files = sorted(p.name for p in store.segment_dir("facts").iterdir())
+
+    expected = [f"f_{i:05d}" for i in range(240)]
+    passed = (
+        not (memory_dir / 'layer2/archive/facts.jsonl').exists()
+        and len(segments) <= 4
+        and segments[0].first == 0
+        and ids == expected
+        and stale_ids == expected
+        and compacted["segments"] == 1
+        and after == expected
+        and files == ["00000000-00000007.seg"]
+    )
+    print_test("旧 JSONL 转为第 0 段,段数不超过上限,被覆盖的残留段被忽略,顺序与条数不变", passed, f"合并后: {files}")
+
+    assert passed
+    return passed
+
+def test_compression_and_codecs():
+    """测试压缩比、lzma 编码与损坏检测"""
+    print("\n📋 测试压缩与编码")
+
+    with TestContext() as memory_dir:
+        records = make_records(0, 2000)
+        raw = sum(len(json.dumps(r, ensure_ascii=False).encode("utf-8")) + 1 for r in records)
+        gzip_store = ArchiveStore(memory_dir)
+        gzip_store.append("facts", records)
+        gzip_stats = gzip_store.stats("facts")
+
+        lzma_store = ArchiveStore(memory_dir, codec="lzma")
+        lzma_store.append("beliefs", records)
+        lzma_stats = lzma_store.stats("beliefs")
+        mixed_read = ArchiveStore(memory_dir).load("beliefs") == records
+
+        path = lzma_store.segments("beliefs")[0].path
+        path.write_bytes(path.read_bytes()[:-3])
+        try:
+            ArchiveStore(memory_dir).load("beliefs")
+            detected = False
+        except ArchiveCorruptError:
+            detected = True
+
+    gzip_ratio = raw / gzip_stats["stored_bytes"]
+    lzma_ratio = raw / lzma_stats["stored_bytes"]
+    passed = (
+        gzip_stats["raw_bytes"] == raw
+        and gzip_ratio > 4
+        and lzma_ratio > 4
+        and mixed_read
+        and detected
+    )
+    print_test("归档体积缩小数倍;lzma 段可被默认配置读取;截断的段报错", passed, f"gzip {gzip_ratio:.1f}x, lzma {lzma_ratio:.1f}x")
+
+    assert passed
+    return passed
+
+def test_cli_archive():
+    """测试 archive 命令与 archive-compact 命令使用分段存储"""
+    print("\n📋 测试归档命令")
+
+    with TestContext() as memory_dir:
+        records = make_records(0, 3)
+        write_jsonl(memory_dir / 'layer2/active/facts.jsonl', records)
+        write_jsonl(memory_dir / 'layer2/archive/facts.jsonl', make_records(100, 2))
+
+        with redirect_stdout(StringIO()):
+            memory.cmd_archive(Namespace(id="f_00001"))
+            memory.cmd_archive(Namespace(id="f_00002"))
+        with redirect_stdout(StringIO()) as out:
+            memory.cmd_archive_compact(Namespace(max_segments=1, type="facts"))
+        store = ArchiveStore(memory_dir)
+        ids = [r["id"] for r in store.load("facts")]
+        segments = len(store.segments("facts"))
+
+    passed = (
+        ids == ["f_00100", "f_00101", "f_00001", "f_00002"]
+        and segments == 1
+        and "facts: 4 条, 1 段" in out.getvalue()
+    )
+    print_test("手动归档追加新段,archive-compact 合并为 1 段", passed, f"归档: {ids}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 归档分段存储测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("只追加", test_append_only()))
+    results.append(("段尾索引", test_footer_filter()))
+    results.append(("合并与迁移", test_merge_and_legacy()))
+    results.append(("压缩与编码", test_compression_and_codecs()))
+    results.append(("归档命令", test_cli_archive()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
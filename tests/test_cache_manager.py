@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 多级查询缓存测试
+"""
+
+import os
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from cache_manager import CacheManager, bump_generation
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_l1_lru_bound():
+    """测试 L1 容量上限与 LRU 淘汰"""
+    print("\n📋 测试 L1 LRU 淘汰")
+
+    with TestContext() as memory_dir:
+        cache = CacheManager(memory_dir, max_entries=2, disk=False)
+        cache.set_query_result("a", {"v": 1})
+        cache.set_query_result("b", {"v": 2})
+        cache.get_query_result("a")  # a 变为最近使用
+        cache.set_query_result("c", {"v": 3})  # 应淘汰 b
+
+        stats = cache.get_stats()
+        passed = (
+            cache.get_query_result("b") is None
+            and cache.get_query_result("a") == {"v": 1}
+            and stats["l1_entries"] == 2
+            and stats["evictions"] == 1
+        )
+        print_test("超出容量淘汰最久未用", passed, f"统计: {stats}")
+
+        assert passed
+        return passed
+
+def test_result_isolation():
+    """测试缓存结果与调用方修改隔离"""
+    print("\n📋 测试结果隔离")
+
+    with TestContext() as memory_dir:
+        cache = CacheManager(memory_dir, disk=False)
+        result = {"results": [1, 2], "cached": False}
+        cache.set_query_result("q", result)
+        result["results"].append(3)
+        hit = cache.get_query_result("q")
+        hit["cached"] = True
+
+        passed = cache.get_query_result("q") == {"results": [1, 2], "cached": False}
+        print_test("修改返回值不影响缓存", passed)
+
+        assert passed
+        return passed
+
+def test_generation_invalidation():
+    """测试写入后按存储代数失效"""
+    print("\n📋 测试代数失效")
+
+    with TestContext() as memory_dir:
+        cache = CacheManager(memory_dir)
+        cache.set_query_result("q", {"v": 1})
+        before = cache.get_query_result("q")
+
+        # 模拟另一个进程写入记忆
+        bump_generation(memory_dir)
+        after = cache.get_query_result("q")
+
+        # 粗粒度 mtime:同一时间片内再次递增,代数文件 mtime 不变
+        gen_path = memory_dir / "state/store_generation"
+        cache.set_query_result("q", {"v": 2})
+        stamp = gen_path.stat().st_mtime_ns
+        bump_generation(memory_dir)
+        os.utime(gen_path, ns=(stamp, stamp))
+        same_tick = cache.get_query_result("q")
+
+        stats = cache.get_stats()
+        passed = before == {"v": 1} and after is None and same_tick is None and stats["invalidations"] >= 2
+        print_test("代数变化后缓存失效(mtime 未变也失效)", passed, f"写入前: {before}, 写入后: {after}, 同一时间片: {same_tick}")
+
+        assert passed
+        return passed
+
+def test_l2_shared_across_instances():
+    """测试 L2 跨实例(跨进程)共享"""
+    print("\n📋 测试 L2 共享")
+
+    with TestContext() as memory_dir:
+        writer = CacheManager(memory_dir)
+        writer.set_query_result("q", {"v": "共享"})
+
+        reader = CacheManager(memory_dir)
+        first = reader.get_query_result("q")
+        second = reader.get_query_result("q")
+        stats = reader.get_stats()
+
+        passed = first == second == {"v": "共享"} and stats["l2_hits"] == 1 and stats["l1_hits"] == 1
+        print_test("新实例从 L2 命中并回填 L1", passed, f"统计: L2 {stats['l2_hits']} / L1 {stats['l1_hits']}")
+
+        assert passed
+        return passed
+
+def test_l2_bound():
+    """测试 L2 条目上限"""
+    print("\n📋 测试 L2 上限")
+
+    with TestContext() as memory_dir:
+        cache = CacheManager(memory_dir, disk_max_entries=3)
+        for i in range(5):
+            cache.set_query_result(f"q{i}", {"v": i})
+
+        stats = cache.get_stats()
+        passed = stats["l2_entries"] == 3
+        print_test("L2 条目不超过上限", passed, f"L2 条目: {stats['l2_entries']}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 多级查询缓存测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("L1 LRU 淘汰", test_l1_lru_bound()))
+    results.append(("结果隔离", test_result_isolation()))
+    results.append(("代数失效", test_generation_invalidation()))
+    results.append(("L2 共享", test_l2_shared_across_instances()))
+    results.append(("L2 上限", test_l2_bound()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM 熔断器与自适应超时测试
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from circuit_breaker import AdaptiveTimeout, CircuitBreaker
+from llm_stub_server import StubLLMServer
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器:临时记忆目录 + 指向桩服务的 LLM 环境变量"""
+    def __init__(self, base_url, llm_fallback=None):
+        self.base_url = base_url
+        self.llm_fallback = llm_fallback or {}
+        self.temp_dir = None
+        self.saved_env = {}
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        config = json.loads(json.dumps(memory.DEFAULT_CONFIG))
+        config["llm_fallback"].update(self.llm_fallback)
+        (self.temp_dir / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+        env = {"MEMORY_DIR": str(self.temp_dir), "OPENAI_API_KEY": "test-key", "OPENAI_BASE_URL": self.base_url}
+        for key, value in env.items():
+            self.saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_state_transitions():
+    """测试 closed → open → half_open → closed"""
+    print("\n📋 测试熔断状态机")
+
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    breaker.record_success()  # 成功清零连续失败计数
+    for _ in range(3):
+        breaker.record_failure()
+    opened = breaker.state
+    blocked = not breaker.allow()
+
+    now[0] = 11
+    probe = breaker.allow()
+    second_probe = breaker.allow()  # 半开期只放行一个探测
+    breaker.record_failure()
+    reopened = breaker.state
+
+    now[0] = 22
+    breaker.allow()
+    breaker.record_success()
+
+    stats = breaker.get_stats()
+    passed = (
+        opened == "open"
+        and blocked
+        and probe
+        and not second_probe
+        and reopened == "open"
+        and stats["state"] == "closed"
+        and stats["opened"] == 2
+        and stats["short_circuited"] == 2
+    )
+    print_test("连续失败熔断,冷却后单探测,探测成功恢复", passed, f"统计: {stats}")
+
+    assert passed
+    return passed
+
+def test_adaptive_timeout():
+    """测试分位数超时"""
+    print("\n📋 测试自适应超时")
+
+    timeouts = AdaptiveTimeout(min_seconds=1, max_seconds=60, percentile=0.95, multiplier=3, min_samples=5)
+    cold = timeouts.timeout_for("small")
+    for latency in [0.8, 1.0, 1.2, 0.9, 2.0]:
+        timeouts.observe("small", latency)
+    warm = timeouts.timeout_for("small")
+    for _ in range(5):
+        timeouts.observe("fast", 0.01)
+    floor = timeouts.timeout_for("fast")
+
+    passed = cold == 60 and abs(warm - 6.0) < 1e-9 and floor == 1 and timeouts.timeout_for("batch") == 60
+    print_test("样本不足用上限,按类别取 p95×倍数并夹在上下限内", passed, f"冷启动 {cold}s, 预热 {warm}s, 下限 {floor}s")
+
+    assert passed
+    return passed
+
+def test_outage_short_circuits():
+    """测试端点故障时后续调用立即兜底"""
+    print("\n📋 测试故障短路")
+
+    options = {
+        "breaker_failure_threshold": 2,
+        "breaker_cooldown_seconds": 60,
+        "timeout_min_seconds": 0.1,
+        "timeout_max_seconds": 0.3,
+    }
+    with StubLLMServer(latency_ms=2000) as server:
+        with TestContext(server.base_url, options):
+            start = time.perf_counter()
+            results = [memory.call_llm(f"问题{i}", max_tokens=50) for i in range(10)]
+            elapsed = time.perf_counter() - start
+            stats = memory._get_llm_breaker().get_stats()
+        requests = server.stats["requests"]
+
+    passed = (
+        all(ok is False for ok, _, _ in results)
+        and [error for _, _, error in results[2:]] == ["LLM circuit open"] * 8
+        and requests == 2
+        and elapsed < 1.5  # 不熔断时约 10 × 0.3s
+        and stats["state"] == "open"
+    )
+    print_test("两次超时后熔断,其余 8 次不发请求", passed, f"耗时: {elapsed:.2f}s, 请求数: {requests}, 统计: {stats}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - LLM 熔断器与自适应超时测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("熔断状态机", test_state_transitions()))
+    results.append(("自适应超时", test_adaptive_timeout()))
+    results.append(("故障短路", test_outage_short_circuits()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
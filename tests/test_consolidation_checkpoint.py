@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Consolidation 检查点测试
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from consolidation_checkpoint import ConsolidationCheckpoint, ConsolidationPaused, TimeBudget
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        (self.temp_dir / 'state/consolidation.json').write_text("{}", encoding='utf-8')
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def read_jsonl(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+def consolidate(**kwargs):
+    args = Namespace(force=True, phase=None, input=None, resume=False, time_budget=None)
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    with redirect_stdout(StringIO()) as out:
+        memory.cmd_consolidate(args)
+    return out.getvalue()
+
+PENDING = [
+    {"id": "p_001", "content": "用户对花生过敏,吃了会起疹子", "created": "2026-10-19T00:00:00Z"},
+    {"id": "p_002", "content": "用户住在上海浦东新区", "created": "2026-10-19T00:00:00Z"},
+]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_journal_replay():
+    """测试 LLM 结果日志:已记录的片段恢复时不再调用"""
+    print("\n📋 测试 LLM 结果日志")
+
+    with TestContext() as memory_dir:
+        checkpoint = ConsolidationCheckpoint(memory_dir)
+        checkpoint.begin(memory.now_iso())
+        config = {"llm_fallback": {"batch_size": 2, "max_concurrency": 1}}
+        items = [f"片段{i}" for i in range(5)]
+        calls = []
+
+        def single_call(item):
+            calls.append(item)
+            return {"importance": 0.5, "item": item}
+
+        def batch_call(batch):
+            calls.extend(batch)
+            return [{"importance": 0.5, "item": item} for item in batch]
+
+        # 第一次运行:第一轮(2 个片段)完成后预算用尽
+        budget = TimeBudget(0.05)
+        original = memory._run_llm_batches_now
+
+        def slow_run(*args, **kwargs):
+            time.sleep(0.06)
+            return original(*args, **kwargs)
+
+        memory._run_llm_batches_now = slow_run
+        try:
+            memory._run_llm_batches(items, batch_call, single_call, config, parallel=False,
+                                    journal=checkpoint.journal("2"), budget=budget)
+            paused = False
+        except ConsolidationPaused:
+            paused = True
+        finally:
+            memory._run_llm_batches_now = original
+        first_calls = list(calls)
+
+        # 模拟中断时写到一半的日志行
+        with open(checkpoint.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"run": "')
+
+        calls.clear()
+        resumed = ConsolidationCheckpoint(memory_dir)
+        journal = resumed.journal("2")
+        results = memory._run_llm_batches(items, batch_call, single_call, config, parallel=False, journal=journal)
+
+        passed = (
+            paused
+            and first_calls == items[:2]
+            and calls == items[2:]
+            and journal.replayed == 2
+            and [r["item"] for r in results] == items
+        )
+        print_test("预算用尽在轮次间暂停,恢复后只请求未记录的片段", passed, f"首次: {first_calls}, 恢复: {calls}")
+
+        assert passed
+        return passed
+
+def test_resume_after_crash():
+    """测试 Phase 3 崩溃后 --resume 从 Phase 3 继续"""
+    print("\n📋 测试崩溃恢复")
+
+    with TestContext() as memory_dir:
+        write_jsonl(memory_dir / 'layer2/pending.jsonl', PENDING)
+
+        original_extract, original_filter = memory.template_extract, memory.rule_filter
+        filter_calls = []
+
+        def crashing_extract(*args, **kwargs):
+            raise RuntimeError("模拟中断")
+
+        def counting_filter(*args, **kwargs):
+            filter_calls.append(1)
+            return original_filter(*args, **kwargs)
+
+        memory.template_extract, memory.rule_filter = crashing_extract, counting_filter
+        try:
+            try:
+                consolidate()
+            except RuntimeError:
+                pass  # cmd_consolidate 记录失败后重新抛出
+            crashed_state = json.loads((memory_dir / 'state/consolidation.json').read_text(encoding='utf-8'))
+            memory.template_extract = original_extract
+            out = consolidate(resume=True, force=False)
+        finally:
+            memory.template_extract, memory.rule_filter = original_extract, original_filter
+
+        state = json.loads((memory_dir / 'state/consolidation.json').read_text(encoding='utf-8'))
+        contents = [r["content"] for r in read_jsonl(memory_dir / 'layer2/active/facts.jsonl')]
+
+        passed = (
+            crashed_state["phase_data"]["completed"] == ["1", "2"]
+            and crashed_state["retry_count"] == 1
+            and len(filter_calls) == 1
+            and "Phase 2: 已完成(检查点)" in out
+            and any("花生" in c for c in contents)
+            and read_jsonl(memory_dir / 'layer2/pending.jsonl') == []
+            and state["phase_data"] == {}
+            and state["current_phase"] is None
+        )
+        print_test("Phase 1/2 不重复执行,提交后清空 pending 与检查点", passed, f"facts: {contents}")
+
+        assert passed
+        return passed
+
+def test_time_budget_pause():
+    """测试时间预算用尽后暂停,pending 保留,恢复后完成"""
+    print("\n📋 测试时间预算")
+
+    with TestContext() as memory_dir:
+        write_jsonl(memory_dir / 'layer2/pending.jsonl', PENDING)
+
+        paused_out = consolidate(time_budget=1e-9)
+        paused_state = json.loads((memory_dir / 'state/consolidation.json').read_text(encoding='utf-8'))
+        pending_after_pause = read_jsonl(memory_dir / 'layer2/pending.jsonl')
+        facts_after_pause = read_jsonl(memory_dir / 'layer2/active/facts.jsonl')
+
+        # 暂停期间新追加的 pending 不应被恢复运行的提交清掉
+        memory.add_to_pending(memory_dir, "用户下周要去北京出差")
+        consolidate(resume=True)
+        remaining = [r["content"] for r in read_jsonl(memory_dir / 'layer2/pending.jsonl')]
+        contents = [r["content"] for r in read_jsonl(memory_dir / 'layer2/active/facts.jsonl')]
+
+        passed = (
+            "⏸️" in paused_out
+            and paused_state["phase_data"]["completed"] == ["1"]
+            and paused_state.get("retry_count", 0) == 0
+            and len(pending_after_pause) == 2
+            and facts_after_pause == []
+            and any("上海" in c for c in contents)
+            and remaining == ["用户下周要去北京出差"]
+        )
+        print_test("Phase 2 前暂停,不落盘;恢复后完成,只移除已读取的 pending", passed, f"剩余 pending: {remaining}")
+
+        assert passed
+        return passed
+
+def test_resume_after_external_clear():
+    """测试暂停期间 pending 被其他流程清空并追加新条目,恢复后新条目保留"""
+    print("\n📋 测试恢复时按 id 移除 pending")
+
+    with TestContext() as memory_dir:
+        write_jsonl(memory_dir / 'layer2/pending.jsonl', PENDING)
+        consolidate(time_budget=1e-9)
+        checkpoint_ids = json.loads(
+            (memory_dir / 'state/consolidation.json').read_text(encoding='utf-8')
+        )["phase_data"]["pending_ids"]
+
+        # 暂停期间 mini-consolidate 清空 pending,之后又追加了 2 条
+        memory.save_pending(memory_dir, [])
+        memory.add_to_pending(memory_dir, "用户下周要去北京出差")
+        memory.add_to_pending(memory_dir, "用户最近在学习日语")
+        consolidate(resume=True)
+        remaining = [r["content"] for r in read_jsonl(memory_dir / 'layer2/pending.jsonl')]
+
+    passed = (
+        checkpoint_ids == ["p_001", "p_002"]
+        and remaining == ["用户下周要去北京出差", "用户最近在学习日语"]
+    )
+    print_test("检查点记录已读取的 pending id,提交时只移除这些条目", passed, f"剩余 pending: {remaining}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - Consolidation 检查点测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("LLM 结果日志", test_journal_replay()))
+    results.append(("崩溃恢复", test_resume_after_crash()))
+    results.append(("时间预算", test_time_budget_pause()))
+    results.append(("恢复时按 id 移除 pending", test_resume_after_external_clear()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
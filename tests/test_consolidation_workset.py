@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Consolidation 工作集测试
+"""
+
+import os
+import sys
+import json
+import tempfile
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive_store import ArchiveStore
+import consolidation_workset
+from consolidation_workset import WorkingSet
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def read_jsonl(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+FACTS = [
+    {"id": "f_001", "content": "用户喜欢喝拿铁咖啡", "importance": 0.8, "score": 0.8, "entities": ["拿铁"]},
+    {"id": "f_002", "content": "用户对花生过敏", "importance": 0.9, "score": 0.9, "entities": ["花生"]},
+]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_deferred_commit():
+    """测试变换只在提交时落盘"""
+    print("\n📋 测试统一提交")
+
+    with TestContext() as memory_dir:
+        facts_path = memory_dir / 'layer2/active/facts.jsonl'
+        write_jsonl(facts_path, FACTS)
+        before = facts_path.read_bytes()
+
+        ws = WorkingSet(memory_dir)
+        first = ws.active("facts")
+        ws.extend("facts", [{"id": "f_003", "content": "用户每天早上跑步"}])
+        ws.replace("facts", [r for r in first if r["id"] != "f_001"])
+        ws.archive("facts", [FACTS[0]])
+        ws.write_json("layer2/index/keywords.json", {"花生": ["f_002"]})
+        unchanged_before_commit = facts_path.read_bytes() == before and ArchiveStore(memory_dir).count("facts") == 0
+
+        stats = ws.commit()
+        active_ids = [r["id"] for r in read_jsonl(facts_path)]
+        archived_ids = [r["id"] for r in ArchiveStore(memory_dir).load("facts")]
+
+        passed = (
+            unchanged_before_commit
+            and active_ids == ["f_002", "f_003"]
+            and archived_ids == ["f_001"]
+            and stats["files"] == 3
+            and ws.bytes_read == len(before)
+            and not list(memory_dir.rglob("*.tmp"))
+        )
+        print_test("提交前磁盘不变,提交后活跃池/归档/索引同批写出", passed, f"活跃: {active_ids}, 归档: {archived_ids}")
+
+        assert passed
+        return passed
+
+def test_failed_commit_keeps_store():
+    """测试暂存失败时不替换任何文件"""
+    print("\n📋 测试提交失败回滚")
+
+    with TestContext() as memory_dir:
+        facts_path = memory_dir / 'layer2/active/facts.jsonl'
+        write_jsonl(facts_path, FACTS)
+        before = facts_path.read_bytes()
+
+        ws = WorkingSet(memory_dir)
+        ws.extend("facts", [{"id": "f_003", "content": "用户每天早上跑步"}])
+        ws.write_json("layer2/index/keywords.json", {"bad": {1, 2}})  # set 无法序列化
+        deferred = []
+        ws.defer(lambda: deferred.append(True))
+        try:
+            ws.commit()
+            failed = False
+        except TypeError:
+            failed = True
+
+        passed = (
+            failed
+            and facts_path.read_bytes() == before
+            and not ws.committed
+            and not deferred
+            and not list(memory_dir.rglob("*.tmp"))
+        )
+        print_test("任一文件暂存失败,活跃池保持原样且不执行延后动作", passed)
+
+        assert passed
+        return passed
+
+def test_crash_mid_replace():
+    """测试替换活跃池前崩溃:归档段与追加日志已落盘,移出的记录不丢失"""
+    print("\n📋 测试替换中途崩溃")
+
+    with TestContext() as memory_dir:
+        facts_path = memory_dir / 'layer2/active/facts.jsonl'
+        log_path = memory_dir / 'layer2/archive/expired.jsonl'
+        write_jsonl(facts_path, FACTS)
+
+        ws = WorkingSet(memory_dir)
+        facts = ws.active("facts")
+        archived = [r for r in facts if r["id"] == "f_001"]
+        ws.replace("facts", [r for r in facts if r["id"] != "f_001"])
+        ws.archive("facts", archived)
+        ws.append_log("layer2/archive/expired.jsonl", [{"id": "f_001", "reason": "expired"}])
+
+        real_replace = consolidation_workset.os.replace
+        replaced = []
+
+        def crash_on_active(src, dst):
+            if Path(dst).parent.name == "active":
+                raise OSError("模拟崩溃")
+            replaced.append(Path(dst).name)
+            real_replace(src, dst)
+
+        consolidation_workset.os.replace = crash_on_active
+        try:
+            ws.commit()
+            crashed = False
+        except OSError:
+            crashed = True
+        finally:
+            consolidation_workset.os.replace = real_replace
+
+        archived_ids = [r["id"] for r in ArchiveStore(memory_dir).load("facts")]
+        active_ids = [r["id"] for r in read_jsonl(facts_path)]
+        logged_ids = [r["id"] for r in read_jsonl(log_path)]
+
+    passed = (
+        crashed
+        and archived_ids == ["f_001"]
+        and "f_001" in active_ids
+        and logged_ids == ["f_001"]
+    )
+    print_test("归档段与日志先于截断后的活跃池替换", passed,
+               f"已替换: {replaced}, 归档: {archived_ids}, 活跃: {active_ids}")
+
+    assert passed
+    return passed
+
+def test_consolidate_single_pass():
+    """测试 consolidate 只读写活跃池一次,降权时不丢新增 facts"""
+    print("\n📋 测试 consolidate 工作集流程")
+
+    with TestContext() as memory_dir:
+        write_jsonl(memory_dir / 'layer2/active/facts.jsonl', FACTS)
+        write_jsonl(memory_dir / 'layer2/pending.jsonl', [
+            {"id": "p_001", "content": "用户不再喝拿铁咖啡了,改成喝茶", "created": "2026-10-19T00:00:00Z"},
+        ])
+        (memory_dir / 'state/consolidation.json').write_text("{}", encoding='utf-8')
+
+        def downgrade_first(new_facts, existing_facts):
+            # 模拟冲突降权:原地修改已有 fact,同时新增 fact
+            existing_facts[0]["conflict_downgraded"] = True
+            return list(new_facts), 0, 1
+
+        active_loads = []
+        original_load, original_dedup = memory.load_jsonl, memory.deduplicate_facts
+
+        def counting_load(path):
+            if "layer2/active" in str(path):
+                active_loads.append(str(path))
+            return original_load(path)
+
+        memory.load_jsonl, memory.deduplicate_facts = counting_load, downgrade_first
+        os.environ["MEMORY_DIR"] = str(memory_dir)
+        try:
+            with redirect_stdout(StringIO()) as out:
+                memory.cmd_consolidate(Namespace(force=True, phase=None, input=None))
+        finally:
+            memory.load_jsonl, memory.deduplicate_facts = original_load, original_dedup
+            os.environ.pop("MEMORY_DIR", None)
+
+        facts = read_jsonl(memory_dir / 'layer2/active/facts.jsonl')
+        contents = [r["content"] for r in facts]
+        downgraded = [r["id"] for r in facts if r.get("conflict_downgraded")]
+
+        passed = (
+            not active_loads
+            and any("改成喝茶" in c for c in contents)
+            and downgraded
+            and read_jsonl(memory_dir / 'layer2/pending.jsonl') == []
+            and "提交:" in out.getvalue()
+            and json.loads((memory_dir / 'layer2/index/keywords.json').read_text(encoding='utf-8'))
+        )
+        print_test("新增与降权同时保留,活跃池不再逐阶段重读", passed, f"facts: {contents}, 降权: {downgraded}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - Consolidation 工作集测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("统一提交", test_deferred_commit()))
+    results.append(("提交失败回滚", test_failed_commit_keeps_store()))
+    results.append(("替换中途崩溃", test_crash_mid_replace()))
+    results.append(("consolidate 工作集流程", test_consolidate_single_pass()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 去重候选分块索引测试
+"""
+
+import sys
+import copy
+import random
+import time
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dedup_blocking import FactBlockingIndex
+from memory_operator import MemoryOperator
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+VOCAB = [
+    "coffee", "tea", "latte", "office", "shanghai", "beijing", "running", "piano", "python", "rust",
+    "allergy", "peanut", "cat", "dog", "morning", "evening", "project", "deadline", "travel", "hotel",
+] + [f"topic{i}" for i in range(300)]
+ENTITIES = ["用户", "咖啡", "上海", "北京", "项目", "花生", "猫", "钢琴"]
+SIGNALS = ["now", "actually", "no longer", "changed to", "改成", "不再"]
+VOLATILE = ("updated", "downgrade_at")
+
+def build_corpus(seed, existing_count, new_count):
+    """已有 facts + 新 facts(约一半为已有 fact 的近似改写,部分带矛盾信号)"""
+    rng = random.Random(seed)
+    existing = []
+    for i in range(existing_count):
+        words = rng.sample(VOCAB, rng.randint(3, 7))
+        existing.append({
+            "id": f"f_{i:05d}",
+            "content": "user " + " ".join(words),
+            "entities": rng.sample(ENTITIES, rng.randint(1, 2)),
+            "importance": round(rng.uniform(0.3, 1.0), 2),
+            "score": round(rng.uniform(0.3, 1.0), 2),
+            "timestamp": f"2026-0{rng.randint(1, 6)}-1{rng.randint(0, 9)}T10:00:00",
+            "confidence": rng.choice([0.6, 0.8, 1.0]),
+            "ownership": rng.choice(["user", "assistant"]),
+        })
+    new = []
+    for i in range(new_count):
+        if rng.random() < 0.5 and existing:
+            base = rng.choice(existing)
+            content = base["content"]
+            if rng.random() < 0.6:
+                content += " " + rng.choice(SIGNALS)
+            entities = list(base["entities"]) if rng.random() < 0.8 else rng.sample(ENTITIES, 1)
+        else:
+            content = "user " + " ".join(rng.sample(VOCAB, rng.randint(3, 7)))
+            entities = rng.sample(ENTITIES, rng.randint(1, 2))
+        new.append({
+            "id": f"n_{i:05d}",
+            "content": content,
+            "entities": entities,
+            "importance": round(rng.uniform(0.3, 1.0), 2),
+            "score": round(rng.uniform(0.3, 1.0), 2),
+            "timestamp": f"2026-0{rng.randint(6, 9)}-1{rng.randint(0, 9)}T10:00:00",
+            "confidence": rng.choice([0.6, 0.8, 1.0]),
+            "ownership": rng.choice(["user", "assistant"]),
+        })
+    return existing, new
+
+def run_dedup(existing, new, blocking):
+    """在副本上执行去重,返回可比较的结果"""
+    existing = copy.deepcopy(existing)
+    original = memory.DEDUP_BLOCKING_ENABLED
+    memory.DEDUP_BLOCKING_ENABLED = blocking
+    try:
+        start = time.perf_counter()
+        merged, duplicates, downgraded = memory._deduplicate_with_operator(copy.deepcopy(new), existing)
+        elapsed = time.perf_counter() - start
+    finally:
+        memory.DEDUP_BLOCKING_ENABLED = original
+    strip = lambda r: {k: v for k, v in r.items() if k not in VOLATILE}
+    return ([r["id"] for r in merged], duplicates, downgraded, [strip(r) for r in existing]), elapsed
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_decisions_unchanged():
+    """测试分块后 ADD/UPDATE/NOOP 决策与全量比较一致"""
+    print("\n📋 测试决策回归")
+
+    if not memory.HALLUCINATION_DEFENSE_ENABLED:
+        print_test("幻觉防御模块不可用,跳过", True)
+        return True
+
+    mismatches = []
+    changed = 0
+    for seed in range(5):
+        existing, new = build_corpus(seed, 400, 200)
+        blocked, _ = run_dedup(existing, new, True)
+        full, _ = run_dedup(existing, new, False)
+        if blocked != full:
+            mismatches.append(seed)
+        changed += full[1] + full[2]
+
+    passed = not mismatches and changed > 0
+    print_test("5 组语料的合并结果、计数与已有 facts 改写完全一致", passed, f"不一致: {mismatches}, 去重/降权合计: {changed}")
+
+    assert passed
+    return passed
+
+def test_candidate_reduction():
+    """测试候选集规模与 UPDATE 后重新入桶"""
+    print("\n📋 测试候选规模")
+
+    if not memory.HALLUCINATION_DEFENSE_ENABLED:
+        print_test("幻觉防御模块不可用,跳过", True)
+        return True
+
+    existing, new = build_corpus(42, 3000, 300)
+    operator = MemoryOperator()
+    index = FactBlockingIndex(existing, operator._token_set, operator.similarity_threshold)
+    for fact in new:
+        index.candidates(fact)
+    average = index.stats["candidates"] / index.stats["lookups"]
+
+    target = existing[0]
+    probe = {"content": "user violin concert", "entities": list(target["entities"])}
+    before = index.candidates(probe)
+    target["content"] = "user violin concert tonight"
+    index.update(target)
+    after = index.candidates(probe)
+
+    blocked, blocked_time = run_dedup(existing[1:], new, True)
+    full, full_time = run_dedup(existing[1:], new, False)
+
+    passed = average < len(existing) / 50 and target not in before and after[:1] == [target] and blocked == full
+    print_test(
+        "平均候选远小于已有 facts 数,改写后按新内容匹配", passed,
+        f"平均候选: {average:.1f}/3000, 分块 {blocked_time * 1000:.0f}ms vs 全量 {full_time * 1000:.0f}ms",
+    )
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 去重候选分块索引测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("决策回归", test_decisions_unchanged()))
+    results.append(("候选规模", test_candidate_reduction()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
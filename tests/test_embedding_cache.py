@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 持久化嵌入缓存测试
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from embedding_cache import CachedEmbeddingEngine, EmbeddingCache, wrap_with_cache
+from vector_embedding import HashingEmbeddingEngine
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+class CountingEngine:
+    """记录被调用文本的嵌入引擎(仅测试用)"""
+    model = "counting"
+    dimension = 4
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0, 0.5, 0.25] for t in texts]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_only_misses_embedded():
+    """测试只嵌入未命中的文本"""
+    print("\n📋 测试命中跳过嵌入")
+
+    with TestContext() as memory_dir:
+        engine = CountingEngine()
+        cached = CachedEmbeddingEngine(engine, EmbeddingCache(memory_dir))
+
+        first = cached.embed_batch(["花生过敏", "北京开会", "花生过敏"])
+        second = cached.embed_batch(["花生过敏", "喜欢咖啡"])
+
+        passed = (
+            engine.embedded == ["花生过敏", "北京开会", "喜欢咖啡"]
+            and first[0] == first[2] == second[0]
+            and first[0] == [4.0, 1.0, 0.5, 0.25]
+        )
+        print_test("重复与已缓存文本不再调用引擎", passed, f"引擎收到: {engine.embedded}")
+
+        assert passed
+        return passed
+
+def test_persist_and_stats():
+    """测试跨实例持久化与命中率统计"""
+    print("\n📋 测试持久化与统计")
+
+    with TestContext() as memory_dir:
+        CachedEmbeddingEngine(CountingEngine(), EmbeddingCache(memory_dir)).embed_batch(["a1", "b2"])
+
+        engine = CountingEngine()
+        cache = EmbeddingCache(memory_dir)
+        CachedEmbeddingEngine(engine, cache).embed_batch(["a1", "b2", "c3", "d4"])
+        stats = cache.get_stats()
+
+        passed = engine.embedded == ["c3", "d4"] and stats["hits"] == 2 and stats["misses"] == 4
+        print_test("新实例命中旧缓存,累计统计正确", passed,
+                   f"命中率: {stats['hit_rate']:.1%}, 条目: {stats['entries']}")
+
+        assert passed
+        return passed
+
+def test_model_isolation():
+    """测试不同模型/维度互不命中"""
+    print("\n📋 测试模型隔离")
+
+    with TestContext() as memory_dir:
+        cache = EmbeddingCache(memory_dir)
+        cache.put_many("m1", 4, {"h": [1.0, 0.0, 0.0, 0.0]})
+
+        passed = cache.get_many("m2", 4, ["h"]) == {} and cache.get_many("m1", 8, ["h"]) == {}
+        print_test("模型或维度不同不命中", passed)
+
+        assert passed
+        return passed
+
+def test_size_bound():
+    """测试条目上限淘汰"""
+    print("\n📋 测试容量上限")
+
+    with TestContext() as memory_dir:
+        cache = EmbeddingCache(memory_dir, max_size=3)
+        for i in range(5):
+            cache.put_many("m", 1, {f"h{i}": [float(i)]})
+        stats = cache.get_stats()
+
+        passed = stats["entries"] == 3 and stats["evictions"] == 2 and "h4" in cache.get_many("m", 1, ["h4"])
+        print_test("超出上限淘汰最旧条目", passed, f"条目: {stats['entries']}, 淘汰: {stats['evictions']}")
+
+        assert passed
+        return passed
+
+def test_hashing_not_wrapped():
+    """测试离线 hashing 引擎不套缓存"""
+    print("\n📋 测试 hashing 旁路")
+
+    with TestContext() as memory_dir:
+        engine = HashingEmbeddingEngine(dimension=16)
+        wrapped = wrap_with_cache(engine, memory_dir)
+        other = wrap_with_cache(CountingEngine(), memory_dir)
+
+        passed = wrapped is engine and isinstance(other, CachedEmbeddingEngine) and other.model == "counting"
+        print_test("hashing 原样返回,其他引擎被包装", passed)
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 持久化嵌入缓存测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("命中跳过嵌入", test_only_misses_embedded()))
+    results.append(("持久化与统计", test_persist_and_stats()))
+    results.append(("模型隔离", test_model_isolation()))
+    results.append(("容量上限", test_size_bound()))
+    results.append(("hashing 旁路", test_hashing_not_wrapped()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 相似实体表测试
+"""
+
+import sys
+import random
+import tempfile
+import shutil
+from itertools import combinations
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from entity_clusters import (
+    bounded_levenshtein,
+    build_entity_clusters,
+    cluster_entities,
+    entities_similar,
+    get_entity_clusters,
+)
+from v1_1_5_entity_system import find_similar_entity_groups, is_similar_entity, levenshtein_distance
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2/index').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def random_entities(n, seed=7):
+    rng = random.Random(seed)
+    alphabet = "abcdeXY12项目张三"
+    return sorted({"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 7))) for _ in range(n)})
+
+ENTITIES = ["Project-A", "Project-B", "Project-AB", "张三", "张三丰", "李四", "memory-system", "OpenAI"]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_bounded_levenshtein():
+    """测试带宽编辑距离与完整算法一致"""
+    print("\n📋 测试带宽编辑距离")
+
+    words = random_entities(120)
+    mismatches = 0
+    for a, b in combinations(words[:60], 2):
+        full = levenshtein_distance(a, b)
+        for k in (0, 1, 2, 4):
+            got = bounded_levenshtein(a, b, k)
+            if got != (full if full <= k else None):
+                mismatches += 1
+
+    passed = mismatches == 0
+    print_test("距离 ≤ k 时精确,超过时返回 None", passed, f"不一致: {mismatches}")
+
+    assert passed
+    return passed
+
+def test_matches_legacy_similarity():
+    """测试相似判定与邻接表恰好覆盖 v1.1.5 的相似对"""
+    print("\n📋 测试与 v1.1.5 判定一致")
+
+    entities = random_entities(200) + ENTITIES
+    clusters = cluster_entities(entities)
+    pair_mismatch = 0
+    missed = 0
+    for a, b in combinations(sorted(set(entities)), 2):
+        legacy = is_similar_entity(a, b, 0.5)
+        if entities_similar(a, b) != legacy:
+            pair_mismatch += 1
+        if (b in clusters.similar_to(a)) != legacy or (a in clusters.similar_to(b)) != legacy:
+            missed += 1
+
+    passed = pair_mismatch == 0 and missed == 0
+    print_test("逐对判定一致,邻接表恰为相似对", passed, f"判定不一致: {pair_mismatch}, 邻接不一致: {missed}")
+
+    assert passed
+    return passed
+
+def test_similar_groups_lookup():
+    """测试检索时查表(含未入表的新实体)"""
+    print("\n📋 测试相似组查询")
+
+    with TestContext() as memory_dir:
+        stats = build_entity_clusters(memory_dir, entities=ENTITIES)
+        clusters = get_entity_clusters(memory_dir)
+
+        candidates = ["Project-B", "Project-AB", "李四", "Project-C"]  # Project-C 未入表
+        groups = clusters.similar_groups(["Project-A"], candidates)
+        legacy = find_similar_entity_groups(["Project-A"], candidates)
+        unknown = clusters.similar_groups(["张三疯"], ["张三", "李四"])
+
+        passed = (
+            stats["entities"] == len(ENTITIES)
+            and groups == legacy
+            and groups == [{"Project-A", "Project-B", "Project-AB", "Project-C"}]
+            and unknown == [{"张三疯", "张三"}]
+            and get_entity_clusters(memory_dir) is clusters
+        )
+        print_test("已知实体查表,新实体逐一比较", passed, f"组: {groups}, 新实体: {unknown}")
+
+        assert passed
+        return passed
+
+def test_groups_not_transitive():
+    """测试相似组与 find_similar_entity_groups 一致(相似不传递)"""
+    print("\n📋 测试相似组不传递")
+
+    chains = [["张三", "张三丰", "三丰"], ["abcd", "abxy", "zbxy", "zqxy"]]
+    entities = random_entities(150, seed=11)
+    mismatches = []
+    for group in chains + [entities]:
+        clusters = cluster_entities(group)
+        for qe in group:
+            got = clusters.similar_groups([qe], group)
+            if got != find_similar_entity_groups([qe], group):
+                mismatches.append((qe, got))
+    chain_groups = [cluster_entities(group).similar_groups([group[0]], group) for group in chains]
+
+    passed = not mismatches and chain_groups == [[{"张三", "张三丰"}], [{"abcd", "abxy"}]]
+    print_test("链式相似不并入查询实体的组", passed, f"链: {chain_groups}, 不一致: {mismatches[:3]}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 相似实体表测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("带宽编辑距离", test_bounded_levenshtein()))
+    results.append(("与 v1.1.5 判定一致", test_matches_legacy_similarity()))
+    results.append(("相似组查询", test_similar_groups_lookup()))
+    results.append(("相似组不传递", test_groups_not_transitive()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
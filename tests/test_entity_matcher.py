@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 学习实体匹配器测试
+"""
+
+import sys
+import re
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from entity_matcher import LearnedEntityMatcher, get_entity_matcher
+from v1_1_5_entity_system import learn_new_entities, save_learned_entities, load_learned_entities
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def naive_match(learned, content):
+    """v1.1.5 原实现:逐个子串判断 + 逐个 re.finditer"""
+    found = {e for e in learned["exact"] if e in content}
+    for pattern in learned["patterns"]:
+        found.update(m.group() for m in re.finditer(pattern, content))
+    return found
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_matches_naive():
+    """测试 trie + 预编译模式与逐个匹配结果一致"""
+    print("\n📋 测试匹配结果一致")
+
+    learned = {
+        "exact": ["张三", "张三丰", "三丰", "OpenClaw", "Claw", "记忆系统"],
+        "patterns": [r"机器人_\d+", r"项目[A-Z]", r"[bad"],
+    }
+    matcher = LearnedEntityMatcher(learned["exact"], learned["patterns"])
+    contents = [
+        "张三丰和张三讨论 OpenClaw 的记忆系统",
+        "机器人_12 负责项目B,机器人_7 负责项目C",
+        "没有任何实体",
+        "",
+    ]
+    valid = dict(learned, patterns=learned["patterns"][:2])
+    mismatches = [c for c in contents if set(matcher.find_all(c)) != naive_match(valid, c)]
+
+    passed = not mismatches and len(matcher) == 8
+    print_test("重叠实体与模式匹配全部找到,非法模式跳过", passed, f"不一致: {mismatches}")
+
+    assert passed
+    return passed
+
+def test_cached_by_signature():
+    """测试按文件签名缓存"""
+    print("\n📋 测试进程内缓存")
+
+    with TestContext() as memory_dir:
+        save_learned_entities(memory_dir, {"exact": ["张三"], "patterns": [], "access_stats": {}})
+        first = get_entity_matcher(memory_dir)
+        second = get_entity_matcher(memory_dir)
+
+        # 外部改写文件 → 重新加载
+        learned = load_learned_entities(memory_dir)
+        learned["exact"].append("李四丰收")
+        save_learned_entities(memory_dir, learned)
+        third = get_entity_matcher(memory_dir)
+
+        passed = first is second and third is not first and third.find_exact("李四丰收了") == ["李四丰收"]
+        print_test("文件未变复用,改写后重新加载", passed)
+
+        assert passed
+        return passed
+
+def test_incremental_learning():
+    """测试学习新实体时增量更新已编译的匹配器"""
+    print("\n📋 测试增量学习")
+
+    with TestContext() as memory_dir:
+        save_learned_entities(memory_dir, {"exact": ["张三"], "patterns": [], "access_stats": {}})
+        matcher = get_entity_matcher(memory_dir)
+
+        learn_new_entities(["机器人_1", "机器人_2", "机器人_3"], memory_dir)
+        after = get_entity_matcher(memory_dir)
+        found = after.find_all("机器人_42 和张三")
+        on_disk = json.loads((memory_dir / 'layer2/learned_entities.json').read_text(encoding='utf-8'))
+
+        passed = after is matcher and set(found) == {"张三", "机器人_42"} and r"机器人_\d+" in on_disk["patterns"]
+        print_test("同一实例追加实体与归纳模式", passed, f"匹配: {found}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 学习实体匹配器测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("匹配结果一致", test_matches_naive()))
+    results.append(("进程内缓存", test_cached_by_signature()))
+    results.append(("增量学习", test_incremental_learning()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 惰性衰减测试
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive_store import ArchiveStore
+from lazy_decay import DecayHorizon, DecayModel, format_timestamp
+import memory
+
+DAY = 86400.0
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        (self.temp_dir / 'state/consolidation.json').write_text("{}", encoding='utf-8')
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def read_jsonl(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+def consolidate():
+    args = Namespace(force=True, phase=None, input=None, resume=False, time_budget=None)
+    with redirect_stdout(StringIO()) as out:
+        memory.cmd_consolidate(args)
+    return out.getvalue()
+
+PROTECTION = {"within_3_days": 0.99, "within_7_days": 0.97, "within_14_days": 0.95, "beyond_14_days": 1.0}
+
+def daily_decay(score, importance, rate, days, accessed_day=None):
+    """逐日衰减参考实现(与 v1.1 单步公式一致,访问保护按访问后天数分档)"""
+    for day in range(1, days + 1):
+        since = None if accessed_day is None else day - accessed_day
+        if since is None or since < 0 or since > 14:
+            factor = PROTECTION["beyond_14_days"]
+        elif since <= 3:
+            factor = PROTECTION["within_3_days"]
+        elif since <= 7:
+            factor = PROTECTION["within_7_days"]
+        else:
+            factor = PROTECTION["within_14_days"]
+        score *= 1 - rate * (1 - importance * 0.5) * factor
+    return score
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_closed_form():
+    """测试闭式公式与逐日衰减一致,预计归档时间与分数对应"""
+    print("\n📋 测试闭式衰减")
+
+    model = DecayModel({"fact": 0.008, "belief": 0.07, "summary": 0.025}, 0.05, PROTECTION)
+    now = time.time()
+    errors = []
+    crossings = []
+    for importance, accessed_day, mem_type, rate in [
+        (0.3, None, "facts", 0.008), (0.9, None, "facts", 0.008),
+        (0.5, 0, "beliefs", 0.07), (0.5, 5, "beliefs", 0.07), (0.5, None, "summaries", 0.025),
+    ]:
+        anchor = now - 40 * DAY
+        record = {"id": "x", "score": 0.8, "importance": importance, "decay_anchor": format_timestamp(anchor)}
+        if accessed_day is not None:
+            record["last_accessed"] = format_timestamp(anchor + accessed_day * DAY)
+        lazy = model.score_at(record, anchor + 40 * DAY, mem_type)
+        errors.append(abs(lazy - daily_decay(0.8, importance, rate, 40, accessed_day)) / lazy)
+
+        at = model.archive_at(record, mem_type)
+        crossings.append(math.isinf(at) or abs(model.score_at(record, at, mem_type) - 0.05) < 1e-9)
+
+    unanchored = {"id": "f_1", "score": 0.4, "importance": 0.5}
+    summary = {"id": "s_1", "importance": 0.5}
+    rates = {model.daily_rate(summary, kind) for kind in ("summaries", "summary", None)}
+    passed = (
+        max(errors) < 0.01
+        and rates == {0.025 * 0.75}
+        and all(crossings)
+        and model.score_at(unanchored, now, "facts") == 0.4
+        and math.isinf(model.archive_at(unanchored, "facts"))
+    )
+    print_test("40 天闭式分数与逐日衰减相差 < 1%,archive_at 处恰为阈值", passed, f"最大相对误差: {max(errors):.4%}")
+
+    assert passed
+    return passed
+
+def test_horizon_skips_scan():
+    """测试衰减视界:文件未变时免扫描,只返回到期记录"""
+    print("\n📋 测试衰减视界索引")
+
+    with TestContext() as memory_dir:
+        model = DecayModel({"fact": 0.008}, 0.05, None)
+        now = time.time()
+        records = [
+            {"id": f"f_{i}", "score": 0.9, "importance": 0.5, "decay_anchor": format_timestamp(now)}
+            for i in range(1000)
+        ]
+        records.append({"id": "f_old", "score": 0.06, "importance": 0.2, "decay_anchor": format_timestamp(now - 30 * DAY)})
+        records.append({"id": "f_new", "score": 0.5, "importance": 0.5})
+        path = memory_dir / 'layer2/active/facts.jsonl'
+        write_jsonl(path, records)
+
+        horizon = DecayHorizon(memory_dir)
+        due, anchored = horizon.due("facts", records, model, now)
+        refreshed = horizon.stats["refreshed"]
+        write_jsonl(path, records)  # 打锚点后落盘
+        horizon.save()
+
+        reloaded = DecayHorizon(memory_dir)
+        due_again, _ = reloaded.due("facts", records, model, now)
+        later, _ = reloaded.due("facts", records, model, now + 600 * DAY)
+        saved_unchanged = reloaded.save()
+
+    passed = (
+        not saved_unchanged
+        and [r["id"] for r in due] == ["f_old"]
+        and anchored == 1
+        and refreshed == len(records)
+        and reloaded.stats == {"refreshed": 0, "skipped_scan": 2}
+        and [r["id"] for r in due_again] == ["f_old"]
+        and len(later) == len(records)
+    )
+    print_test("首次全量计算;文件未变时直接从时间线取到期记录,索引不重写", passed, f"重算: {refreshed}, 复查: {reloaded.stats}")
+
+    assert passed
+    return passed
+
+def test_consolidate_lazy():
+    """测试 Phase 5c 只落盘到期记录,其余 score 保持不变"""
+    print("\n📋 测试 Consolidation 惰性衰减")
+
+    with TestContext() as memory_dir:
+        now = time.time()
+        anchor = format_timestamp(now - 10 * DAY)
+        facts = [
+            {"id": "f_keep", "content": "用户住在上海浦东新区", "importance": 0.8, "score": 0.8,
+             "entities": ["上海"], "created": anchor, "decay_anchor": anchor},
+            {"id": "f_fading", "content": "用户上周看了一场电影", "importance": 0.1, "score": 0.051,
+             "entities": [], "created": anchor, "decay_anchor": anchor},
+            {"id": "f_legacy", "content": "用户喜欢喝美式咖啡", "importance": 0.6, "score": 0.6,
+             "entities": ["咖啡"], "created": anchor},
+        ]
+        write_jsonl(memory_dir / 'layer2/active/facts.jsonl', facts)
+
+        first = consolidate()
+        active = {r["id"]: r for r in read_jsonl(memory_dir / 'layer2/active/facts.jsonl')}
+        archived = [r["id"] for r in ArchiveStore(memory_dir).load("facts")]
+        second = consolidate()
+        snapshot = (memory_dir / 'layer1/snapshot.md').read_text(encoding='utf-8')
+
+    keep = active.get("f_keep", {})
+    passed = (
+        archived == ["f_fading"]
+        and keep.get("score") == 0.8
+        and keep.get("decay_anchor") == anchor
+        and active.get("f_legacy", {}).get("decay_anchor") is not None
+        and "为 1 条旧记录设置衰减锚点" in first
+        and "免扫描 3 类" in second
+        and "| 1 | 0.76 |" in snapshot  # 快照排名使用此刻的衰减分数
+    )
+    print_test("到期记录归档,未到期记录不改写;第二次运行免扫描", passed, f"归档: {archived}")
+
+    assert passed
+    return passed
+
+def test_daily_run_no_rewrite():
+    """测试无变化的日常 Consolidation 不重写活跃池与视界索引,只在过时标记翻转时写入"""
+    print("\n📋 测试日常运行写入量")
+
+    with TestContext() as memory_dir:
+        now = time.time()
+        fresh = [
+            {"id": f"f_{i}", "content": f"用户记录第{i}条", "importance": 0.5, "score": 0.9, "entities": [],
+             "created": format_timestamp(now - DAY), "decay_anchor": format_timestamp(now)}
+            for i in range(50)
+        ]
+        old = {"id": "f_old", "content": "用户很久以前的记录", "importance": 0.9, "score": 0.9, "entities": [],
+               "created": format_timestamp(now - 40 * DAY), "decay_anchor": format_timestamp(now)}
+        facts_path = memory_dir / 'layer2/active/facts.jsonl'
+        horizon_path = memory_dir / 'state/decay_horizon.json'
+        write_jsonl(facts_path, fresh + [old])
+
+        consolidate()
+        first = {r["id"]: r for r in read_jsonl(facts_path)}
+        stamps = (facts_path.stat().st_mtime_ns, horizon_path.stat().st_mtime_ns)
+        time.sleep(0.01)
+        consolidate()
+        second = {r["id"]: r for r in read_jsonl(facts_path)}
+        stamps_again = (facts_path.stat().st_mtime_ns, horizon_path.stat().st_mtime_ns)
+
+        # 创建已久但被过时扫描覆盖过的记录不算过时;距上次扫描超过 stale_days 后才翻转
+        scan_path = memory_dir / 'state/stale_scan.json'
+        aged = [{**r, "created": format_timestamp(now - 40 * DAY)} for r in fresh]
+        write_jsonl(facts_path, aged + [first["f_old"]])
+        scan_path.write_text(json.dumps({"verified_at": format_timestamp(now - 20 * DAY)}), encoding='utf-8')
+        consolidate()
+        covered = read_jsonl(facts_path)
+        scan_path.write_text(json.dumps({"verified_at": format_timestamp(now - 35 * DAY)}), encoding='utf-8')
+        consolidate()
+        expired = {r["id"]: r for r in read_jsonl(facts_path)}
+
+    passed = (
+        first["f_old"].get("stale") is True
+        and not any(first[r["id"]].get("stale") or "last_verified" in first[r["id"]] for r in fresh)
+        and stamps_again == stamps
+        and second == first
+        and sum(1 for r in covered if r.get("stale")) == 1
+        and all(expired[r["id"]].get("stale") for r in fresh)
+        and expired["f_0"]["last_verified"] == format_timestamp(now - 35 * DAY)
+        and expired["f_old"] == first["f_old"]
+    )
+    print_test("第二次运行活跃池与视界索引未改写;上次扫描超过 stale_days 后才标记过时", passed,
+               f"mtime 不变: {stamps_again == stamps}, 过时: {sum(1 for r in expired.values() if r.get('stale'))}/{len(expired)}")
+
+    assert passed
+    return passed
+
+def test_score_writers_reanchor():
+    """测试改写 score 的写路径先落盘当前分数:新 score 不再从旧锚点起算衰减"""
+    print("\n📋 测试 score 写路径")
+
+    with TestContext():
+        anchor = format_timestamp(time.time() - 300 * DAY)
+
+        def old_fact(mem_id):
+            return {"id": mem_id, "content": "用户喜欢喝拿铁咖啡", "importance": 0.5, "score": 0.8,
+                    "entities": ["拿铁"], "decay_anchor": anchor}
+
+        existing = old_fact("f_old")
+        before = memory.current_score(existing)
+        new_fact = {"id": "f_new", "content": "用户喜欢喝拿铁咖啡", "importance": 0.7, "score": 0.7, "entities": ["拿铁"]}
+        merged, duplicates, _ = memory._deduplicate_legacy([new_fact], [existing])
+        after_dedup = memory.current_score(existing)
+
+        survivor = old_fact("f_survivor")
+        other = {"id": "f_other", "content": "用户喜欢喝拿铁咖啡。", "importance": 0.7, "score": 0.7, "entities": []}
+        memory._absorb_near_duplicates(survivor, [other], {})
+        after_merge = memory.current_score(survivor)
+
+        stale = old_fact("f_stale")
+        stale["score"] = 0.1
+        memory._absorb_near_duplicates(stale, [{**old_fact("f_x"), "score": 0.05}], {})
+
+    passed = (
+        before < 0.7
+        and not merged and duplicates == 1
+        and abs(after_dedup - 0.7) < 1e-3
+        and existing["decay_anchor"] != anchor
+        and abs(after_merge - 0.7) < 1e-3
+        and stale["score"] < 0.1  # 两者都已衰减时取当前值中较大者
+    )
+    print_test("去重 UPDATE / 近重复合并后显示新分数,锚点移到当前", passed,
+               f"改写前: {before:.3f}, 去重后: {after_dedup:.3f}, 合并后: {after_merge:.3f}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 惰性衰减测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("闭式衰减", test_closed_form()))
+    results.append(("衰减视界", test_horizon_skips_scan()))
+    results.append(("Consolidation", test_consolidate_lazy()))
+    results.append(("日常运行写入量", test_daily_run_no_rewrite()))
+    results.append(("score 写路径", test_score_writers_reanchor()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM 批量请求测试
+"""
+
+import os
+import re
+import sys
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_batching import build_batch_prompt, parse_batch_response, run_batches
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+CONTENTS = ["今天天气很好啊", "晚饭吃得很饱", "周末打算休息一下", "最近睡得不错"]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_parse_batch_response():
+    """测试批量响应校验"""
+    print("\n📋 测试响应解析")
+
+    shuffled = '结果如下:[{"index": 1, "v": "b"}, {"index": 0, "v": "a"}]'
+    cases = {
+        "乱序按 index 还原": parse_batch_response(shuffled, 2) == [{"index": 0, "v": "a"}, {"index": 1, "v": "b"}],
+        "无 index 按顺序": parse_batch_response('[{"v": 1}, {"v": 2}]', 2) == [{"v": 1}, {"v": 2}],
+        "数量不符": parse_batch_response('[{"index": 0}]', 2) is None,
+        "index 重复": parse_batch_response('[{"index": 0}, {"index": 0}]', 2) is None,
+        "非 JSON": parse_batch_response("抱歉,无法处理", 2) is None,
+    }
+    prompt = build_batch_prompt("评估:", ["甲", "乙"])
+
+    passed = all(cases.values()) and "[0] 甲" in prompt and "[1] 乙" in prompt
+    print_test("合法响应拆回各片段,不合法整批拒绝", passed, f"{cases}")
+
+    assert passed
+    return passed
+
+def test_run_batches_fallback():
+    """测试分批与解析失败回退"""
+    print("\n📋 测试分批回退")
+
+    batch_calls = []
+    single_calls = []
+
+    def batch_call(batch):
+        batch_calls.append(list(batch))
+        return None if 4 in batch else [x * 10 for x in batch]
+
+    def single_call(x):
+        single_calls.append(x)
+        return x * 10
+
+    results = run_batches(list(range(7)), batch_call, single_call, batch_size=3)
+
+    passed = (
+        results == [x * 10 for x in range(7)]
+        and batch_calls == [[0, 1, 2], [3, 4, 5]]  # 最后一批只有 1 个,直接单条调用
+        and single_calls == [3, 4, 5, 6]
+    )
+    print_test("失败批次逐条回退,结果顺序不变", passed, f"批量: {batch_calls}, 单条: {single_calls}")
+
+    assert passed
+    return passed
+
+def test_fallback_through_mapper():
+    """测试回退的逐条调用也经 mapper 发起(受调度器限流)"""
+    print("\n📋 测试回退经调度器")
+
+    submitted = []
+
+    def mapper(fn, seq):
+        seq = list(seq)
+        submitted.append((fn.__name__, seq))
+        results = []
+        for x in seq:
+            try:
+                results.append(fn(x))
+            except Exception:
+                results.append(None)  # 与 LLMDispatcher.map 一致:异常位置为 default
+        return results
+
+    def batch_call(batch):
+        if 6 in batch:
+            raise RuntimeError("请求失败")
+        return None if 0 in batch else [x * 10 for x in batch]
+
+    def single_call(x):
+        return x * 10
+
+    results = run_batches(list(range(9)), batch_call, single_call, batch_size=3, mapper=mapper)
+
+    passed = (
+        results == [x * 10 for x in range(9)]
+        and submitted == [("run", [[0, 1, 2], [3, 4, 5], [6, 7, 8]]), ("single_call", [0, 1, 2, 6, 7, 8])]
+    )
+    print_test("解析失败与请求失败的批次合并为一轮逐条调用,经 mapper 提交", passed, f"提交: {submitted}")
+
+    assert passed
+    return passed
+
+def test_template_extract_batched():
+    """测试 Phase 3 实体兜底合并为一次请求"""
+    print("\n📋 测试 Phase 3 批量请求")
+
+    with TestContext() as memory_dir:
+        segments = [{"content": c, "importance": 0.8, "source": "user"} for c in CONTENTS]
+        requests = []
+
+        def fake_call_llm(prompt, system_prompt=None, max_tokens=1000, malformed=False):
+            requests.append(prompt)
+            numbered = re.findall(r"^\[(\d+)\] (.+)$", prompt, re.M)
+            if numbered:
+                if malformed:
+                    return True, "格式错误", None
+                return True, json.dumps([
+                    {"index": int(i), "entities": [f"实体{CONTENTS.index(c)}"], "type": "fact"} for i, c in numbered
+                ], ensure_ascii=False), None
+            content = prompt.split("内容:")[1].split("\n")[0]
+            return True, json.dumps({"entities": [f"单条{CONTENTS.index(content)}"]}, ensure_ascii=False), None
+
+        original = memory.call_llm
+        old_key = os.environ.get("OPENAI_API_KEY")
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        try:
+            memory.call_llm = fake_call_llm
+            batched = memory.template_extract(segments, memory_dir=memory_dir)
+            batched_requests = len(requests)
+
+            requests.clear()
+            memory.call_llm = lambda *a, **k: fake_call_llm(*a, malformed=True, **k)
+            fallback = memory.template_extract(segments, memory_dir=memory_dir)
+            fallback_requests = len(requests)
+        finally:
+            memory.call_llm = original
+            if old_key is None:
+                os.environ.pop("OPENAI_API_KEY", None)
+            else:
+                os.environ["OPENAI_API_KEY"] = old_key
+
+        def entity_map(extracted):
+            records = extracted["facts"] + extracted["beliefs"] + extracted["summaries"]
+            return {r["content"]: r["entities"] for r in records}
+
+        passed = (
+            batched_requests == 1
+            and all(entity_map(batched)[c] == [f"实体{i}"] for i, c in enumerate(CONTENTS))
+            and fallback_requests == 1 + len(CONTENTS)
+            and all(entity_map(fallback)[c] == [f"单条{i}"] for i, c in enumerate(CONTENTS))
+        )
+        print_test(
+            "4 个片段 1 次请求,响应不合法时逐条回退", passed,
+            f"批量请求: {batched_requests}, 回退请求: {fallback_requests}",
+        )
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - LLM 批量请求测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("响应解析", test_parse_batch_response()))
+    results.append(("分批回退", test_run_batches_fallback()))
+    results.append(("回退经调度器", test_fallback_through_mapper()))
+    results.append(("Phase 3 批量请求", test_template_extract_batched()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
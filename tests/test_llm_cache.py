@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM 响应缓存测试
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_cache import LLMCache, get_llm_cache
+from llm_stub_server import StubLLMServer
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器:临时记忆目录 + 伪造 API Key"""
+    def __init__(self):
+        self.temp_dir = None
+        self.saved_env = {}
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'state').mkdir(parents=True)
+        for key, value in {"MEMORY_DIR": str(self.temp_dir), "OPENAI_API_KEY": "test-key"}.items():
+            self.saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_ttl_and_eviction():
+    """测试过期与容量淘汰"""
+    print("\n📋 测试过期与淘汰")
+
+    with TestContext() as memory_dir:
+        cache = LLMCache(memory_dir, ttl_seconds=3600, max_size=2)
+        cache.put("m", "sys", "q1", 100, "a1", tokens=30)
+        time.sleep(0.01)
+        cache.put("m", "sys", "q2", 100, "a2", tokens=40)
+        hit = cache.get("m", "sys", "q1", 100)  # 刷新 q1 的访问时间
+        cache.put("m", "sys", "q3", 100, "a3")   # 淘汰最久未访问的 q2
+        other_key = cache.get("m", "sys", "q1", 200)
+
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        expired = cache.get("m", "sys", "q1", 100)
+        stats = cache.get_stats(cumulative=False)
+
+        passed = (
+            hit == "a1"
+            and other_key is None
+            and cache.get("m", "sys", "q2", 100) is None
+            and expired is None
+            and stats["hits"] == 1
+            and stats["tokens_saved"] == 30
+        )
+        print_test("max_tokens 参与键,超限淘汰最久未访问,过期不命中", passed, f"统计: {stats}")
+
+        assert passed
+        return passed
+
+def test_call_llm_cached():
+    """测试 call_llm 透明使用缓存"""
+    print("\n📋 测试 call_llm 缓存")
+
+    with TestContext() as memory_dir:
+        old_base_url = os.environ.get("OPENAI_BASE_URL")
+        with StubLLMServer(responder=lambda request: " 答案 ") as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            try:
+                first = memory.call_llm("问题", "系统提示", max_tokens=100)
+                second = memory.call_llm("问题", "系统提示", max_tokens=100)
+                different = memory.call_llm("问题", "另一个系统提示", max_tokens=100)
+            finally:
+                if old_base_url is None:
+                    os.environ.pop("OPENAI_BASE_URL", None)
+                else:
+                    os.environ["OPENAI_BASE_URL"] = old_base_url
+            requests = server.stats["requests"]
+
+        stats = get_llm_cache(memory_dir).get_stats(cumulative=False)
+
+        passed = (
+            first == second == different == (True, "答案", None)
+            and requests == 2
+            and stats["hits"] == 1
+            and stats["tokens_saved"] > 0
+            and (memory_dir / 'state/llm_cache.db').exists()
+        )
+        print_test("相同请求第二次不再发请求", passed, f"请求数: {requests}, 统计: {stats}")
+
+        assert passed
+        return passed
+
+def test_fallback_entry_cached():
+    """测试 v1.1.7 call_llm_with_fallback 也走缓存"""
+    print("\n📋 测试 v1.1.7 调用缓存")
+
+    if not memory.V1_1_7_ENABLED:
+        print_test("v1.1.7 模块不可用,跳过", True)
+        return True
+
+    import v1_1_7_llm_integration as integration
+
+    with TestContext() as memory_dir:
+        model = os.environ.get("MEMORY_LLM_MODEL", integration.LLM_INTEGRATION_CONFIG["api"]["default_model"])
+        get_llm_cache(memory_dir).put(model, "sys", "prompt", 100, '{"importance": 0.9}', tokens=20)
+
+        result, method, stats = integration.call_llm_with_fallback(
+            prompt="prompt", system_prompt="sys", fallback_result="rule", max_tokens=100
+        )
+
+        passed = result == '{"importance": 0.9}' and method == "llm" and stats.get("cache_hit") and not stats["llm_called"]
+        print_test("命中时不发请求,也不计入 LLM 调用", passed, f"method: {method}, stats: {stats}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - LLM 响应缓存测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("过期与淘汰", test_ttl_and_eviction()))
+    results.append(("call_llm 缓存", test_call_llm_cached()))
+    results.append(("v1.1.7 调用缓存", test_fallback_entry_cached()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM 并发调度测试
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_dispatcher import LLMDispatcher, TokenBucket
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_ordered_concurrent_map():
+    """测试并发执行且结果按输入顺序返回"""
+    print("\n📋 测试有序并发")
+
+    dispatcher = LLMDispatcher(max_concurrency=4, rate_limit_per_sec=0)
+
+    def slow(i):
+        time.sleep(0.1 * (4 - i % 4))
+        if i == 5:
+            raise RuntimeError("boom")
+        return i * 10
+
+    start = time.perf_counter()
+    results = dispatcher.map(slow, range(8), default=-1)
+    elapsed = time.perf_counter() - start
+
+    passed = results == [0, 10, 20, 30, 40, -1, 60, 70] and elapsed < 1.0  # 串行约 2.0s
+    print_test("乱序完成仍按输入顺序收集,异常位置返回 default", passed, f"耗时: {elapsed:.2f}s")
+
+    assert passed
+    return passed
+
+def test_token_bucket_rate():
+    """测试令牌桶限速"""
+    print("\n📋 测试令牌桶")
+
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(8):
+        bucket.acquire()
+    elapsed = time.perf_counter() - start
+
+    passed = 0.25 <= elapsed < 1.0  # 突发 2 个,其余 6 个按 20/s 补充 ≈ 0.3s
+    print_test("突发用尽后按速率放行", passed, f"8 次取令牌耗时: {elapsed:.2f}s")
+
+    assert passed
+    return passed
+
+def test_template_extract_concurrent_fallback():
+    """测试 Phase 3 实体 LLM 兜底并发执行"""
+    print("\n📋 测试 Phase 3 并发兜底")
+
+    with TestContext() as memory_dir:
+        contents = ["今天天气很好啊", "晚饭吃得很饱", "周末打算休息一下", "最近睡得不错"]
+        segments = [{"content": c, "importance": 0.8, "source": "user"} for c in contents]
+
+        def fake_llm_extract(content):
+            time.sleep(0.2)
+            return {"entities": [f"实体{contents.index(content)}"], "type": "fact"}
+
+        # 关闭批量请求,逐条调用才能观察并发
+        config = json.loads(json.dumps(memory.DEFAULT_CONFIG))
+        config["llm_fallback"]["batch_size"] = 1
+        # 调度器按参数进程内共享;换一组参数得到新的令牌桶,不受前面测试消耗的令牌影响
+        config["llm_fallback"]["burst"] = len(contents) + 1
+        (memory_dir / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+
+        original = memory.llm_extract_entities
+        old_key = os.environ.get("OPENAI_API_KEY")
+        memory.llm_extract_entities = fake_llm_extract
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        os.environ["MEMORY_DIR"] = str(memory_dir)
+        try:
+            start = time.perf_counter()
+            extracted = memory.template_extract(segments, memory_dir=memory_dir)
+            elapsed = time.perf_counter() - start
+        finally:
+            memory.llm_extract_entities = original
+            os.environ.pop("MEMORY_DIR", None)
+            if old_key is None:
+                os.environ.pop("OPENAI_API_KEY", None)
+            else:
+                os.environ["OPENAI_API_KEY"] = old_key
+
+        records = extracted["facts"] + extracted["beliefs"] + extracted["summaries"]
+        entities = {r["content"]: r["entities"] for r in records}
+
+        passed = (
+            all(entities[c] == [f"实体{i}"] for i, c in enumerate(contents))
+            and elapsed < 0.7  # 串行约 0.8s
+        )
+        print_test("规则未识别实体的片段并发调用 LLM,结果对应原片段", passed, f"耗时: {elapsed:.2f}s")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - LLM 并发调度测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("有序并发", test_ordered_concurrent_map()))
+    results.append(("令牌桶", test_token_bucket_rate()))
+    results.append(("Phase 3 并发兜底", test_template_extract_concurrent_fallback()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
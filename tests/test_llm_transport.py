@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - LLM 传输层测试
+"""
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_transport import LLMTimeoutError, LLMTransport
+from llm_stub_server import StubLLMServer
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器:临时记忆目录 + 指向桩服务的 LLM 环境变量"""
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.temp_dir = None
+        self.saved_env = {}
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        env = {"MEMORY_DIR": str(self.temp_dir), "OPENAI_API_KEY": "secret-test-key", "OPENAI_BASE_URL": self.base_url}
+        for key, value in env.items():
+            self.saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_connection_reuse():
+    """测试 keep-alive 连接复用"""
+    print("\n📋 测试连接复用")
+
+    with StubLLMServer() as server:
+        transport = LLMTransport()
+        messages = [{"role": "user", "content": "你好"}]
+        responses = [transport.chat_completion(server.base_url, "k", "m", messages) for _ in range(5)]
+        transport.close()
+
+        passed = (
+            all(r["choices"][0]["message"]["content"] == "stub: 你好" for r in responses)
+            and server.stats["requests"] == 5
+            and server.stats["connections"] == 1
+            and transport.stats["reused"] == 4
+        )
+        print_test("5 次请求只建立 1 个 TCP 连接", passed, f"服务端: {server.stats}, 客户端: {transport.stats}")
+
+        assert passed
+        return passed
+
+def test_deadline_timeout():
+    """测试整体超时"""
+    print("\n📋 测试超时")
+
+    with StubLLMServer(latency_ms=1500) as server:
+        transport = LLMTransport()
+        start = time.perf_counter()
+        try:
+            transport.chat_completion(server.base_url, "k", "m", [{"role": "user", "content": "慢"}], timeout=0.3)
+            timed_out = False
+        except LLMTimeoutError:
+            timed_out = True
+        elapsed = time.perf_counter() - start
+        transport.close()
+
+        passed = timed_out and elapsed < 1.0
+        print_test("慢响应在 deadline 到达时抛 LLMTimeoutError", passed, f"耗时: {elapsed:.2f}s")
+
+        assert passed
+        return passed
+
+def test_call_llm_via_transport():
+    """测试 call_llm 经共享连接池发请求,Key 只在请求头中"""
+    print("\n📋 测试 call_llm 传输")
+
+    with StubLLMServer() as server:
+        with TestContext(server.base_url):
+            ok = memory.call_llm("第一个问题", max_tokens=50)
+            ok2 = memory.call_llm("第二个问题", max_tokens=50)
+        with StubLLMServer(fail_status=500) as failing:
+            with TestContext(failing.base_url):
+                failed = memory.call_llm("第三个问题", max_tokens=50)
+
+        passed = (
+            ok == (True, "stub: 第一个问题", None)
+            and ok2 == (True, "stub: 第二个问题", None)
+            and server.stats["connections"] == 1
+            and server.last_headers.get("Authorization") == "Bearer secret-test-key"
+            and failed[0] is False
+            and "API error" in failed[2]
+        )
+        print_test("成功复用连接,HTTP 错误返回 API error", passed, f"服务端: {server.stats}, 失败: {failed}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - LLM 传输层测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("连接复用", test_connection_reuse()))
+    results.append(("超时", test_deadline_timeout()))
+    results.append(("call_llm 传输", test_call_llm_via_transport()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 进程内 API 测试
+"""
+
+import os
+import sys
+import json
+import tempfile
+import threading
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from memory_api import MemoryNotInitializedError, MemorySystem, render_injection
+from memory_daemon import captured_stdout
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器:count 个临时记忆目录;MEMORY_DIR 指向另一个不存在的目录,确认 API 不依赖环境变量"""
+    def __init__(self, count=1):
+        self.temp_dir = None
+        self.count = count
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        os.environ["MEMORY_DIR"] = str(self.temp_dir / "env-memory")
+        dirs = [self.temp_dir / f"store{n}" for n in range(self.count)]
+        return dirs[0] if self.count == 1 else dirs
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def run_cli(func, **kwargs):
+    with redirect_stdout(StringIO()) as out:
+        func(Namespace(**kwargs))
+    return out.getvalue()
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_structured_results():
+    """测试各方法返回结构化结果且不向 stdout 输出"""
+    print("\n📋 测试结构化结果")
+
+    with TestContext() as memory_dir:
+        try:
+            MemorySystem.open(memory_dir)
+            missing = False
+        except MemoryNotInitializedError:
+            missing = True
+
+        with redirect_stdout(StringIO()) as out:
+            system = MemorySystem.open(memory_dir, create=True)
+            pending = system.add_pending("用户对花生过敏,千万不能吃")
+            captured = system.capture("用户喜欢喝拿铁咖啡", importance=1.5, entities=["拿铁"])
+            belief = system.capture("用户可能是程序员", mem_type="belief", confidence=0.7)
+            injection = system.inject("拿铁咖啡")
+            text = system.inject_text("拿铁咖啡")
+            search = system.search("拿铁咖啡")
+            stats = system.stats()
+            empty = system.inject("完全无关的量子色动力学")
+        try:
+            system.capture("   ")
+            rejected = False
+        except ValueError:
+            rejected = True
+        env_untouched = not Path(os.environ["MEMORY_DIR"]).exists()
+
+    passed = (
+        missing
+        and out.getvalue() == ""
+        and pending["urgent"] is True
+        and captured["importance"] == 1 and captured["entities"] == ["拿铁"]
+        and belief["confidence"] == 0.7 and belief["id"].startswith("b_")
+        and any("拿铁" in item["content"] for group in injection.values() for item in group)
+        and "拿铁" in text and text == render_injection(injection)
+        and search["results"] and search["stats"]["final"] >= 1
+        and stats["active"] == {"facts": 1, "beliefs": 1, "summaries": 0, "total": 2}
+        and stats["importance"]["critical"] == 1
+        and json.loads(json.dumps(stats)) == stats
+        and empty == {"direct": [], "marked": [], "reference": []}
+        and rejected
+        and env_untouched
+    )
+    print_test("open / add_pending / capture / inject / search / stats 返回 dict,无 stdout 输出", passed,
+               f"stats: {stats['active']}, stdout: {out.getvalue()[:60]!r}")
+
+    assert passed
+    return passed
+
+def test_cli_parity():
+    """测试 CLI 是 API 之上的格式化层:输出与 API 结果一致"""
+    print("\n📋 测试 CLI 一致性")
+
+    with TestContext() as memory_dir:
+        system = MemorySystem.open(memory_dir, create=True)
+        system.capture("用户对花生过敏", importance=0.95, entities=["花生"])
+        system.capture("用户每天早上跑步", importance=0.5)
+        os.environ["MEMORY_DIR"] = str(memory_dir)
+
+        text = run_cli(memory.cmd_inject, query="花生过敏", max_tokens=500, format="text", session=None)
+        as_json = run_cli(memory.cmd_inject, query="花生过敏", max_tokens=500, format="json", session=None)
+        nothing = run_cli(memory.cmd_inject, query="量子色动力学", max_tokens=500, format="json", session=None)
+        status = run_cli(memory.cmd_status)
+        capture = run_cli(memory.cmd_capture, content="用户住在上海", type="fact", importance=-1,
+                          confidence=0.6, entities="上海")
+        expected_text = system.inject_text("花生过敏")
+        expected_json = system.inject("花生过敏")
+        after = system.stats()
+
+    passed = (
+        text.strip() == expected_text
+        and json.loads(as_json) == expected_json
+        and json.loads(nothing) == {"direct": [], "marked": [], "reference": []}
+        and "活跃池: 2 条" in status and "上次运行: 从未" in status
+        and "⚠️ 警告: importance 已调整为 0" in capture and "记忆已添加" in capture
+        and after["active"]["facts"] == 3
+        and after["importance"]["low"] == 1
+    )
+    print_test("inject 文本 / JSON、status、capture 与 API 结果一致", passed, f"文本: {text.strip()[:40]!r}")
+
+    assert passed
+    return passed
+
+def test_isolation():
+    """测试多记忆目录并发调用互不串扰,输出捕获只影响当前线程"""
+    print("\n📋 测试多实例与线程隔离")
+
+    with TestContext(count=2) as (first_dir, second_dir):
+        first = MemorySystem.open(first_dir, create=True)
+        second = MemorySystem.open(second_dir, create=True)
+        first.capture("用户喜欢喝拿铁咖啡", importance=0.9, entities=["拿铁"])
+        second.capture("用户喜欢喝乌龙茶", importance=0.9, entities=["乌龙茶"])
+
+        results = {"first": set(), "second": set()}
+        errors = []
+
+        def worker(name, system, query):
+            try:
+                for _ in range(10):
+                    results[name].add(system.inject_text(query))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=worker, args=("first", first, "喜欢喝什么")),
+            threading.Thread(target=worker, args=("second", second, "喜欢喝什么")),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+
+        # 捕获期间其他线程照常输出;嵌套捕获各自独立
+        with redirect_stdout(StringIO()) as outer:
+            with captured_stdout() as buffer:
+                print("捕获")
+                with captured_stdout() as inner:
+                    print("内层")
+                printer = threading.Thread(target=print, args=("其他线程",))
+                printer.start()
+                printer.join()
+            print("结束")
+
+    first_text = "".join(results["first"])
+    second_text = "".join(results["second"])
+    passed = (
+        not errors
+        and len(results["first"]) == 1 and len(results["second"]) == 1
+        and "拿铁" in first_text and "乌龙茶" not in first_text
+        and "乌龙茶" in second_text and "拿铁" not in second_text
+        and buffer.getvalue() == "捕获\n"
+        and inner.getvalue() == "内层\n"
+        and outer.getvalue() == "其他线程\n结束\n"
+    )
+    print_test("两个记忆目录并发检索各自命中;嵌套捕获独立,其他线程输出不受影响", passed, f"错误: {errors[:1]}")
+
+    assert passed
+    return passed
+
+def test_consolidate():
+    """测试 consolidate 返回状态、日志与整理后统计"""
+    print("\n📋 测试 Consolidation")
+
+    with TestContext() as memory_dir:
+        system = MemorySystem.open(memory_dir, create=True)
+        for content in ["用户叫小王,是一名后端工程师", "用户对花生过敏,千万不能吃", "用户下个月要去东京旅游"]:
+            system.add_pending(content)
+
+        with redirect_stdout(StringIO()) as out:
+            first = system.consolidate(force=True)
+            second = system.consolidate()
+        pending_left = memory.load_pending(memory_dir)
+
+    passed = (
+        out.getvalue() == ""
+        and first["status"] == "done"
+        and "Consolidation 完成" in first["log"]
+        and first["stats"]["active"]["total"] >= 1
+        and first["stats"]["consolidation"]["last_success"]
+        and second["status"] == "skipped"
+        and "跳过" in second["log"]
+        and pending_left == []
+    )
+    print_test("consolidate 返回 done / skipped,过程日志在 log 中,pending 已消费", passed,
+               f"整理后活跃池: {first['stats']['active']['total']} 条")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 进程内 API 测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("结构化结果", test_structured_results()))
+    results.append(("CLI 一致性", test_cli_parity()))
+    results.append(("多实例与线程隔离", test_isolation()))
+    results.append(("Consolidation", test_consolidate()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 常驻守护进程测试
+"""
+
+import os
+import sys
+import json
+import socket
+import tempfile
+import threading
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from memory_daemon import NO_DAEMON_ENV, MemoryDaemon, ping, request, socket_path
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器:临时记忆目录 + 后台线程中运行的守护进程"""
+    def __init__(self, start=True):
+        self.temp_dir = None
+        self.start = start
+        self.daemon = None
+        self.thread = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        setup_store(self.temp_dir)
+        if self.start:
+            handlers = {command: memory._daemon_handler(command) for command in memory.DAEMON_COMMANDS}
+            self.daemon = MemoryDaemon(self.temp_dir, handlers, exclusive=memory.DAEMON_WRITE_COMMANDS)
+            self.daemon.bind()
+            self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+            self.thread.start()
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.daemon is not None:
+            self.daemon.stop()
+            self.thread.join(5)
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+FACTS = [
+    {"id": "f_001", "content": "用户喜欢喝拿铁咖啡", "importance": 0.6, "score": 0.6, "entities": ["拿铁"]},
+    {"id": "f_002", "content": "用户对花生过敏", "importance": 0.9, "score": 0.9, "entities": ["花生"]},
+    {"id": "f_003", "content": "用户每天早上跑步", "importance": 0.5, "score": 0.5, "entities": []},
+]
+
+def setup_store(memory_dir):
+    with open(memory_dir / 'layer2/active/facts.jsonl', 'w', encoding='utf-8') as f:
+        for r in FACTS:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+    keywords = {"拿铁": ["f_001"], "咖啡": ["f_001"], "花生": ["f_002"], "过敏": ["f_002"], "跑步": ["f_003"]}
+    (memory_dir / 'layer2/index/keywords.json').write_text(json.dumps(keywords, ensure_ascii=False), encoding='utf-8')
+    (memory_dir / 'layer2/index/relations.json').write_text("{}", encoding='utf-8')
+
+def inject_args(query, **kwargs):
+    return Namespace(command="inject", query=query, max_tokens=500, format="json", session=None, **kwargs)
+
+def run_local(args):
+    with redirect_stdout(StringIO()) as out:
+        args.func(args) if hasattr(args, "func") else memory.DAEMON_COMMANDS[args.command][0](args)
+    return out.getvalue()
+
+def run_cli(args):
+    """模拟 main() 中的转交逻辑,返回 (是否由守护进程处理, 输出)"""
+    with redirect_stdout(StringIO()) as out:
+        handled = memory._run_via_daemon(args)
+    return handled, out.getvalue()
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_protocol():
+    """测试 JSON 行协议:ping、连续请求、错误请求"""
+    print("\n📋 测试协议")
+
+    with TestContext() as memory_dir:
+        status = ping(memory_dir)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(str(socket_path(memory_dir)))
+        reader = sock.makefile("rb")
+        lines = [
+            b"not json\n",
+            json.dumps({"command": "nope"}).encode() + b"\n",
+            json.dumps({"command": "inject", "args": {}}).encode() + b"\n",
+            json.dumps({"command": "inject", "args": {"query": "花生过敏", "format": "json"}}, ensure_ascii=False).encode() + b"\n",
+        ]
+        responses = []
+        for line in lines:
+            sock.sendall(line)
+            responses.append(json.loads(reader.readline()))
+        reader.close()
+        sock.close()
+        mode = oct(socket_path(memory_dir).stat().st_mode & 0o777)
+        stats = ping(memory_dir)
+
+    injected = json.loads(responses[3].get("output") or "{}")
+    passed = (
+        status["pid"] == os.getpid()
+        and [r["ok"] for r in responses] == [False, False, False, True]
+        and "unknown command" in responses[1]["error"]
+        and "missing argument: query" in responses[2]["error"]
+        and any("花生" in item.get("content", "") for item in injected.get("marked", []) + injected.get("direct", []))
+        and mode == "0o600"
+        and stats["requests"] == 5  # 无法解析的行不计入
+        and stats["errors"] == 2
+    )
+    print_test("同一连接连续请求;非法请求返回错误而不断开", passed, f"统计: {stats}")
+
+    assert passed
+    return passed
+
+def test_concurrent_clients():
+    """测试并发客户端:各请求输出独立捕获,与本进程执行一致"""
+    print("\n📋 测试并发客户端")
+
+    queries = ["拿铁咖啡", "花生过敏", "早上跑步", "咖啡和跑步"]
+    with TestContext() as memory_dir:
+        expected = {}
+        os.environ[NO_DAEMON_ENV] = "1"
+        try:
+            for query in queries:
+                expected[query] = run_local(inject_args(query))
+        finally:
+            os.environ.pop(NO_DAEMON_ENV)
+
+        results = {}
+        errors = []
+
+        def client(n):
+            query = queries[n % len(queries)]
+            try:
+                for _ in range(5):
+                    response = request(memory_dir, "inject", {"query": query, "format": "json"})
+                    results.setdefault(query, set()).add(response["output"])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        stats = ping(memory_dir)
+
+    passed = (
+        not errors
+        and all(results.get(query) == {expected[query]} for query in queries)
+        and stats["requests"] == 40 + 1
+    )
+    print_test("8 个客户端并发 40 次请求,输出互不串扰且与本地执行相同", passed, f"错误: {errors[:1]}")
+
+    assert passed
+    return passed
+
+def test_cli_transparent():
+    """测试 CLI 透明转交:守护进程运行时代答,关闭或未运行时回退本地"""
+    print("\n📋 测试 CLI 转交")
+
+    with TestContext() as memory_dir:
+        handled, output = run_cli(inject_args("花生过敏"))
+        added, add_output = run_cli(Namespace(command="add-pending", content="我下周二去北京出差", source="user"))
+        pending = memory.load_pending(memory_dir)
+        _, found = run_cli(inject_args("北京出差"))
+
+        os.environ[NO_DAEMON_ENV] = "1"
+        try:
+            disabled, _ = run_cli(inject_args("花生过敏"))
+        finally:
+            os.environ.pop(NO_DAEMON_ENV)
+        served = ping(memory_dir)["requests"]
+
+    with TestContext(start=False) as memory_dir:
+        socket_path(memory_dir).write_text("")  # 残留的 socket 文件
+        stale, _ = run_cli(inject_args("花生过敏"))
+
+    passed = (
+        handled
+        and "花生过敏" in output
+        and added
+        and "已添加到 pending buffer" in add_output
+        and [p["content"] for p in pending] == ["我下周二去北京出差"]
+        and "北京出差" in found  # 写入后缓存失效,下一次检索即可看到
+        and not disabled
+        and served == 3 + 1
+        and not stale
+    )
+    print_test("运行时经守护进程执行;MEMORY_NO_DAEMON=1 或残留 socket 时回退本地", passed, f"守护进程处理: {served - 1} 次")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 常驻守护进程测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("协议", test_protocol()))
+    results.append(("并发客户端", test_concurrent_clients()))
+    results.append(("CLI 转交", test_cli_transparent()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 近重复检测测试
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+import shutil
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive_store import ArchiveStore
+from near_dup import FingerprintStore, estimate_similarity, find_near_duplicates, jaccard, minhash_signature, shingles
+import memory
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer2/active', 'layer2/archive', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def read_jsonl(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后"
+
+def random_corpus(seed, count):
+    rng = random.Random(seed)
+    return [
+        {"id": f"f_{i:05d}", "content": "用户" + "".join(rng.choice(CHARS) for _ in range(rng.randint(15, 40)))}
+        for i in range(count)
+    ]
+
+def dedup_scan(**kwargs):
+    args = Namespace(threshold=None, type=None, limit=20, merge=False)
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    with redirect_stdout(StringIO()) as out:
+        memory.cmd_dedup_scan(args)
+    return out.getvalue()
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_signature():
+    """测试 MinHash 签名:相同内容签名相同,估计值接近精确 Jaccard"""
+    print("\n📋 测试 MinHash 签名")
+
+    a = "用户对花生过敏,吃了会起疹子,需要随身带药"
+    b = "用户对花生过敏,吃了会起疹子,需要随身带着药"
+    c = "用户住在上海浦东新区,每天坐地铁上班"
+    sig_a, sig_b, sig_c = (minhash_signature(shingles(t)) for t in (a, b, c))
+
+    passed = (
+        sig_a == minhash_signature(shingles(a.replace(",", ", ")))
+        and minhash_signature(shingles("  !! ")) is None
+        and estimate_similarity(sig_a, sig_b) > 0.6
+        and estimate_similarity(sig_a, sig_c) < 0.2
+        and jaccard(shingles(a), shingles(b)) > 0.8
+    )
+    print_test(
+        "标点/空白归一化,近似内容估计值高,无关内容估计值低", passed,
+        f"a~b: {estimate_similarity(sig_a, sig_b):.2f}, a~c: {estimate_similarity(sig_a, sig_c):.2f}",
+    )
+
+    assert passed
+    return passed
+
+def test_clusters_and_store():
+    """测试近重复簇召回与指纹持久化"""
+    print("\n📋 测试近重复簇与指纹存储")
+
+    records = random_corpus(7, 3000)
+    rng = random.Random(8)
+    planted = []
+    for n, base in enumerate(rng.sample(records, 40)):
+        copy = dict(base, id=f"d_{n:03d}", content=base["content"] + rng.choice(["。", "!", "了"]))
+        records.append(copy)
+        planted.append({records.index(base), len(records) - 1})
+
+    with TestContext() as memory_dir:
+        store = FingerprintStore(memory_dir)
+        clusters, stats = find_near_duplicates(records, store=store)
+        found = [set(members) for members in clusters]
+        cold_computed = stats["computed"]
+
+        # 再次扫描复用指纹;改写一条内容后只重算这一条
+        records[0] = dict(records[0], content=records[0]["content"] + "后来改成了别的")
+        _, warm = find_near_duplicates(records, store=store)
+        removed = store.prune([r["id"] for r in records[1:]])
+        store.close()
+
+    passed = (
+        all(pair in found for pair in planted)
+        and len(found) == len(planted)
+        and cold_computed == len(records)
+        and warm["computed"] == 1
+        and warm["cached"] == len(records) - 1
+        and removed == 1
+    )
+    print_test(
+        "植入的 40 组重复全部召回、无误报;指纹复用,内容变化才重算", passed,
+        f"簇: {len(found)}, 候选对: {stats['candidate_pairs']}, 复用: {warm['cached']}, 耗时 {stats['elapsed_ms']:.0f}ms",
+    )
+
+    assert passed
+    return passed
+
+def test_merge():
+    """测试 dedup-scan --merge 通过 ConflictResolver 合并"""
+    print("\n📋 测试合并")
+
+    if not memory.HALLUCINATION_DEFENSE_ENABLED:
+        print_test("幻觉防御模块不可用,跳过", True)
+        return True
+
+    with TestContext() as memory_dir:
+        old = {"id": "f_old", "content": "用户每天早上喝一杯美式咖啡,不加糖", "importance": 0.9, "score": 0.7,
+               "entities": ["咖啡"], "created": "2026-03-01T08:00:00Z", "source": "manual"}
+        new = {"id": "f_new", "content": "用户每天早上喝一杯美式咖啡,不加糖。", "importance": 0.6, "score": 0.8,
+               "entities": ["早餐"], "created": "2026-09-01T08:00:00Z", "source": "manual"}
+        other = {"id": "f_other", "content": "用户住在上海浦东新区", "importance": 0.5, "score": 0.5,
+                 "entities": ["上海"], "created": "2026-05-01T08:00:00Z"}
+        archived = {"id": "f_arch", "content": "用户每天早上喝一杯美式咖啡 不加糖", "importance": 0.3, "score": 0.1,
+                    "entities": [], "created": "2025-12-01T08:00:00Z"}
+        write_jsonl(memory_dir / 'layer2/active/facts.jsonl', [old, other, new])
+        write_jsonl(memory_dir / 'layer2/archive/facts.jsonl', [archived])
+
+        report = dedup_scan()
+        unchanged = read_jsonl(memory_dir / 'layer2/active/facts.jsonl') == [old, other, new]
+        dedup_scan(merge=True)
+        active = read_jsonl(memory_dir / 'layer2/active/facts.jsonl')
+        archive = ArchiveStore(memory_dir).load("facts")
+        rescan = dedup_scan()
+
+    survivor = next((r for r in active if r["id"] == "f_new"), {})
+    loser = next((r for r in archive if r["id"] == "f_old"), {})
+    passed = (
+        "近重复簇: 1" in report
+        and unchanged
+        and [r["id"] for r in active] == ["f_other", "f_new"]
+        and survivor.get("importance") == 0.9
+        and survivor.get("entities") == ["早餐", "咖啡"]
+        and json.loads(survivor.get("supersedes", "[]")) == ["f_old"]
+        and loser.get("superseded_by") == "f_new"
+        and archive[0] == archived
+        and "近重复簇: 1" in rescan  # 未被取代的归档副本仍作为历史被报告
+    )
+    print_test("较新的记录保留并吸收重要性/实体,旧记录归档并标记 superseded_by", passed, f"活跃: {[r['id'] for r in active]}")
+
+    assert passed
+    return passed
+
+def test_merge_chain():
+    """测试链式簇(A~B、B~C,A≁C)合并时只并入与保留者近重复的记录"""
+    print("\n📋 测试链式簇合并")
+
+    if not memory.HALLUCINATION_DEFENSE_ENABLED:
+        print_test("幻觉防御模块不可用,跳过", True)
+        return True
+
+    base = "用户每天早上七点起床后先喝一杯温水然后出门跑步五公里"
+    with TestContext() as memory_dir:
+        chain = [
+            {"id": "f_a", "content": base, "created": "2026-01-01T08:00:00Z"},
+            {"id": "f_b", "content": base + "再吃早餐", "created": "2026-02-01T08:00:00Z"},
+            {"id": "f_c", "content": base + "再吃早餐和牛奶", "created": "2026-03-01T08:00:00Z"},
+        ]
+        for r in chain:
+            r.update({"importance": 0.5, "score": 0.5, "entities": [], "source": "manual"})
+        write_jsonl(memory_dir / 'layer2/active/facts.jsonl', chain)
+
+        report = dedup_scan()
+        dedup_scan(merge=True)
+        active = read_jsonl(memory_dir / 'layer2/active/facts.jsonl')
+
+    survivor = next((r for r in active if r["id"] == "f_c"), {})
+    passed = (
+        "近重复簇: 1" in report
+        and [r["id"] for r in active] == ["f_a", "f_c"]
+        and json.loads(survivor.get("supersedes", "[]")) == ["f_b"]
+    )
+    print_test("与保留者 Jaccard 不足阈值的链端记录不被合并", passed, f"活跃: {[r['id'] for r in active]}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 近重复检测测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("MinHash 签名", test_signature()))
+    results.append(("近重复簇", test_clusters_and_store()))
+    results.append(("合并", test_merge()))
+    results.append(("链式簇合并", test_merge_chain()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - Pending 倒排索引测试
+"""
+
+import sys
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pending_index import PendingIndex
+from text_analyzer import analyze
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def append_pending(memory_dir, records):
+    with open(memory_dir / 'layer2/pending.jsonl', 'a', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def make_record(i, content):
+    return {"id": f"p_test_{i}", "content": content, "importance": 0.5}
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_analyzer():
+    """测试共享分词器"""
+    print("\n📋 测试共享分词器")
+
+    cases = [
+        ("我对花生过敏", ["我对", "对花", "花生", "生过", "过敏"]),
+        ("Memory-System v1.2 OK", ["memory-system", "v1.2", "ok"]),
+        ("猫", ["猫"]),
+        ("a b c", []),
+    ]
+
+    all_passed = True
+    for text, expected in cases:
+        result = analyze(text)
+        passed = result == expected
+        all_passed = all_passed and passed
+        print_test(f"'{text}'", passed, f"期望: {expected}, 实际: {result}")
+
+    assert all_passed
+    return all_passed
+
+def test_incremental_refresh():
+    """测试追加后只增量解析尾部"""
+    print("\n📋 测试增量刷新")
+
+    with TestContext() as memory_dir:
+        append_pending(memory_dir, [make_record(1, "我对花生过敏"), make_record(2, "明天去北京开会")])
+        index = PendingIndex(memory_dir, persist=False)
+        added_first = index.refresh()
+
+        append_pending(memory_dir, [make_record(3, "Ktao 在做记忆系统项目")])
+        added_second = index.refresh()
+        added_third = index.refresh()
+
+        passed = (added_first, added_second, added_third, len(index)) == (2, 1, 0, 3)
+        print_test("追加 1 条只解析 1 条", passed,
+                   f"首次: {added_first}, 追加: {added_second}, 未变: {added_third}, 总数: {len(index)}")
+
+        assert passed
+        return passed
+
+def test_rewrite_triggers_rebuild():
+    """测试文件被改写后整体重建"""
+    print("\n📋 测试改写后重建")
+
+    with TestContext() as memory_dir:
+        append_pending(memory_dir, [make_record(1, "我对花生过敏"), make_record(2, "明天去北京开会")])
+        index = PendingIndex(memory_dir, persist=False)
+        index.refresh()
+
+        # 改写为更长的不同内容(前缀校验应失败)
+        (memory_dir / 'layer2/pending.jsonl').write_text(
+            json.dumps(make_record(9, "用户喜欢喝咖啡,每天早上一杯拿铁"), ensure_ascii=False) + '\n'
+            + json.dumps(make_record(10, "项目截止日期是下周五"), ensure_ascii=False) + '\n',
+            encoding='utf-8'
+        )
+        index.refresh()
+        ids = sorted(r["id"] for r, _, _ in index.search("咖啡 项目"))
+
+        passed = ids == ["p_test_10", "p_test_9"] and len(index) == 2
+        print_test("改写后旧记录消失", passed, f"命中: {ids}, 总数: {len(index)}")
+
+        assert passed
+        return passed
+
+def test_bm25_ranking():
+    """测试 BM25 排序与覆盖率"""
+    print("\n📋 测试 BM25 排序")
+
+    with TestContext() as memory_dir:
+        append_pending(memory_dir, [
+            make_record(1, "我对花生过敏,吃了会呼吸困难"),
+            make_record(2, "今天吃了花生酱面包"),
+            make_record(3, "下午开会讨论项目进度"),
+        ])
+        index = PendingIndex(memory_dir, persist=False)
+        index.refresh()
+        results = index.search("花生过敏")
+        ids = [r["id"] for r, _, _ in results]
+
+        passed = ids[:2] == ["p_test_1", "p_test_2"] and "p_test_3" not in ids and results[0][2] == 1.0
+        print_test("完整命中排第一", passed, f"排序: {ids}")
+
+        assert passed
+        return passed
+
+def test_persist_and_clear():
+    """测试持久化与清空"""
+    print("\n📋 测试持久化与清空")
+
+    with TestContext() as memory_dir:
+        append_pending(memory_dir, [make_record(1, "我对花生过敏")])
+        index = PendingIndex(memory_dir, persist=True)
+        index.refresh()
+        index.save()
+
+        reloaded = PendingIndex(memory_dir, persist=True)
+        reused = reloaded.refresh() == 0 and len(reloaded) == 1
+
+        (memory_dir / 'layer2/pending.jsonl').write_text('', encoding='utf-8')
+        reloaded.clear()
+        cleared = len(PendingIndex(memory_dir, persist=True)) == 0 and not reloaded.search("花生")
+
+        passed = reused and cleared
+        print_test("重新加载无需重建,清空后无结果", passed, f"复用: {reused}, 清空: {cleared}")
+
+        assert passed
+        return passed
+
+def test_persisted_offsets():
+    """测试持久化只存倒排链与行偏移,检索不写盘"""
+    print("\n📋 测试持久化格式与只读检索")
+
+    import memory
+
+    with TestContext() as memory_dir:
+        append_pending(memory_dir, [make_record(1, "我对花生过敏"), make_record(2, "明天下午去北京出差")])
+        index = PendingIndex(memory_dir, persist=True)
+        index.refresh()
+        index.save()
+        index_path = memory_dir / 'layer2/index/pending_index.json'
+        stored = index_path.read_text(encoding='utf-8')
+
+        reloaded = PendingIndex(memory_dir, persist=True)
+        hits = [r for r, _, _ in reloaded.search("北京出差")]
+
+        append_pending(memory_dir, [make_record(3, "北京的烤鸭很好吃")])
+        before = index_path.stat().st_mtime_ns
+        found = [r["id"] for r in memory.search_pending("北京", memory_dir)]
+        after = index_path.stat().st_mtime_ns
+
+    passed = (
+        "北京出差" not in stored
+        and hits == [make_record(2, "明天下午去北京出差")]
+        and "p_test_3" in found
+        and before == after
+    )
+    print_test("索引文件不含记录内容;命中按偏移读回;search_pending 不改写索引文件", passed, f"命中: {found}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - Pending 倒排索引测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("共享分词器", test_analyzer()))
+    results.append(("增量刷新", test_incremental_refresh()))
+    results.append(("改写后重建", test_rewrite_triggers_rebuild()))
+    results.append(("BM25 排序", test_bm25_ranking()))
+    results.append(("持久化与清空", test_persist_and_clear()))
+    results.append(("持久化格式", test_persisted_offsets()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
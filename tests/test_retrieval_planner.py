@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 召回规划器测试
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from retrieval_planner import MIN_RUNS, RETRIEVERS, RetrievalPlanner
+
+BIG_CORPUS = 100000
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def train(planner, query_type, runs, latency, yields):
+    """模拟 runs 次检索:各召回器固定耗时,yields 给出每路进入最终结果的候选数(共 10 个候选)"""
+    for _ in range(runs):
+        results = {name: [{"id": f"{name}-{i}"} for i in range(10)] for name in RETRIEVERS}
+        final_ids = [f"{name}-{i}" for name, n in yields.items() for i in range(n)]
+        planner.record(query_type, {name: latency[name] for name in RETRIEVERS}, results, final_ids)
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_small_corpus_and_explore():
+    """测试小语料与探索轮全量召回"""
+    print("\n📋 测试全量召回条件")
+
+    with TestContext() as memory_dir:
+        planner = RetrievalPlanner(memory_dir, explore_every=20)
+        first = planner.plan("topic", 25, BIG_CORPUS)  # 首次即探索轮
+        small = planner.plan("topic", 25, corpus_size=10)
+
+        passed = first == {r: 25 for r in RETRIEVERS} and small == first
+        print_test("首次与小语料时全部召回", passed, f"计划: {first}")
+
+        assert passed
+        return passed
+
+def test_identity_entity_only():
+    """测试精准身份查询只跑实体 + 关键词"""
+    print("\n📋 测试身份查询规划")
+
+    with TestContext() as memory_dir:
+        planner = RetrievalPlanner(memory_dir, explore_every=1000)
+        planner.plan("precise", 15, BIG_CORPUS)  # 消耗探索轮
+        plan = planner.plan("precise", 15, BIG_CORPUS, trigger_type="layer1_identity", has_entities=True)
+        no_entity = planner.plan("precise", 15, BIG_CORPUS, trigger_type="layer1_identity", has_entities=False)
+
+        passed = plan == {"keyword": 15, "entity": 15} and len(no_entity) == len(RETRIEVERS)
+        print_test("含实体时跳过昂贵召回", passed, f"计划: {plan}")
+
+        assert passed
+        return passed
+
+def test_stats_driven_skip():
+    """测试按统计跳过低产出的昂贵召回并持久化"""
+    print("\n📋 测试统计驱动规划")
+
+    with TestContext() as memory_dir:
+        planner = RetrievalPlanner(memory_dir, explore_every=1000, min_yield=0.05, cheap_ms=5.0)
+        latency = {"vector": 80.0, "tfidf": 3.0, "qmd": 200.0, "keyword": 2.0, "entity": 1.0}
+        yields = {"vector": 0, "tfidf": 4, "qmd": 0, "keyword": 3, "entity": 0}
+        planner.plan("topic", 25, BIG_CORPUS)
+        train(planner, "topic", MIN_RUNS, latency, yields)
+        plan = planner.plan("topic", 25, BIG_CORPUS)
+        planner.save()
+
+        reloaded = RetrievalPlanner(memory_dir, explore_every=1000)
+        reloaded_plan = reloaded.plan("topic", 25, BIG_CORPUS)
+
+        passed = (
+            "vector" not in plan and "qmd" not in plan
+            and plan["tfidf"] == 25 and plan["entity"] == 12  # entity 产出低但便宜:保留,缩减候选数
+            and reloaded_plan == plan
+            and (memory_dir / "state/retriever_stats.json").exists()
+        )
+        print_test("跳过低产出且昂贵的 vector/qmd,缩减便宜的低产出召回", passed, f"计划: {plan}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 召回规划器测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("全量召回条件", test_small_corpus_and_explore()))
+    results.append(("身份查询规划", test_identity_entity_only()))
+    results.append(("统计驱动规划", test_stats_driven_skip()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
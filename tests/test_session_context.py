@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 会话级增量检索测试
+"""
+
+import sys
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from session_context import SessionContext, active_signature
+from memory import session_search
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer2/active', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+FACTS = [
+    {"id": "f_001", "content": "用户喜欢喝拿铁咖啡", "importance": 0.6, "entities": ["拿铁"]},
+    {"id": "f_002", "content": "用户对花生过敏", "importance": 0.9, "entities": ["花生"]},
+    {"id": "f_003", "content": "用户每天早上跑步", "importance": 0.5, "entities": []},
+]
+
+def setup_store(memory_dir):
+    with open(memory_dir / 'layer2/active/facts.jsonl', 'w', encoding='utf-8') as f:
+        for r in FACTS:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+    keywords = {"拿铁": ["f_001"], "咖啡": ["f_001"], "花生": ["f_002"], "过敏": ["f_002"], "跑步": ["f_003"]}
+    (memory_dir / 'layer2/index/keywords.json').write_text(json.dumps(keywords, ensure_ascii=False), encoding='utf-8')
+    (memory_dir / 'layer2/index/relations.json').write_text("{}", encoding='utf-8')
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_delta_query():
+    """测试只保留含新词的查询片段"""
+    print("\n📋 测试 delta 查询")
+
+    with TestContext() as memory_dir:
+        session = SessionContext(memory_dir, "conv/1")
+        session.commit_turn("拿铁咖啡怎么样", [], [], [])
+        delta, new_terms = session.delta_query("拿铁咖啡怎么样,花生过敏吗")
+        repeat, _ = session.delta_query("拿铁咖啡怎么样")
+
+        passed = delta == "花生过敏吗" and "花生" in new_terms and repeat == "" and session.session_id == "conv_1"
+        print_test("重复片段不再召回", passed, f"delta: '{delta}'")
+
+        assert passed
+        return passed
+
+def test_pool_and_activation():
+    """测试候选池老化与实体激活衰减"""
+    print("\n📋 测试候选池与实体激活")
+
+    with TestContext() as memory_dir:
+        session = SessionContext(memory_dir, "s")
+        candidates = [{"id": "a", "entities": ["拿铁"], "final_score": 0.9}, {"id": "b", "entities": []}]
+        session.commit_turn("q1", candidates, [candidates[0]], [])
+        for i in range(5):
+            session.commit_turn(f"q{i + 2}", session.pooled_candidates(), [{"id": "a"}], [])
+
+        session.activate(["拿铁"])
+        session.activate([])
+        boost = session.entity_boost({"entities": ["拿铁"]})
+
+        passed = list(session.pool) == ["a"] and "final_score" not in session.pool["a"] and abs(boost - 0.05) < 1e-9
+        print_test("久未命中的候选移出,激活度逐轮衰减", passed, f"候选池: {list(session.pool)}, 加成: {boost}")
+
+        assert passed
+        return passed
+
+def test_concurrent_save():
+    """测试同一会话并发保存互不干扰"""
+    print("\n📋 测试并发保存")
+
+    import threading
+
+    with TestContext() as memory_dir:
+        errors = []
+
+        sessions = [SessionContext(memory_dir, "shared") for _ in range(4)]
+
+        def writer(n):
+            session = sessions[n]
+            for i in range(50):
+                session.commit_turn(f"查询 {n} {i}", [], [], [])
+                try:
+                    session.save()
+                except OSError as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        leftovers = [p.name for p in (memory_dir / 'state/sessions').iterdir() if p.suffix == '.tmp']
+        final = SessionContext(memory_dir, "shared")
+
+        passed = errors == [] and leftovers == [] and final.turn == 50
+        print_test("并发写入者不共用临时文件", passed, f"错误: {len(errors)}, 残留临时文件: {leftovers}")
+
+        assert passed
+        return passed
+
+def test_incremental_session_search():
+    """测试连续轮次复用候选池"""
+    print("\n📋 测试会话增量检索")
+
+    with TestContext() as memory_dir:
+        setup_store(memory_dir)
+        first = session_search("拿铁咖啡", "conv", memory_dir=memory_dir, use_qmd=False, use_vector=False)
+        second = session_search("拿铁咖啡 花生过敏", "conv", memory_dir=memory_dir, use_qmd=False, use_vector=False)
+        second_ids = {r["id"] for r in second["results"]}
+
+        # 活跃池变化 → 退回完整检索
+        with open(memory_dir / 'layer2/active/facts.jsonl', 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"id": "f_004", "content": "用户养了一只猫"}, ensure_ascii=False) + '\n')
+        third = session_search("拿铁咖啡", "conv", memory_dir=memory_dir, use_qmd=False, use_vector=False)
+
+        passed = (
+            not first["session"]["incremental"]
+            and second["session"]["incremental"]
+            and second["session"]["delta_query"] == "花生过敏"
+            and {"f_001", "f_002"} <= second_ids
+            and not third["session"]["incremental"]
+            and SessionContext(memory_dir, "conv").signature == active_signature(memory_dir)
+        )
+        print_test("第二轮只召回新片段,结果含两轮候选", passed, f"第二轮: {second['session']}, 结果: {sorted(second_ids)}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 会话级增量检索测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("delta 查询", test_delta_query()))
+    results.append(("候选池与实体激活", test_pool_and_activation()))
+    results.append(("会话增量检索", test_incremental_session_search()))
+    results.append(("并发保存", test_concurrent_save()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - CLI 冷启动测试(按需导入 + 配置缓存)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from lazy_imports import LazyModule, lazy_module, module_available
+import memory
+
+# 热路径上不应出现的重型模块(向量/HTTP/LLM/近重复检测)
+HEAVY_MODULES = [
+    "numpy", "vector_index", "vector_embedding", "http.client", "urllib.request",
+    "llm_transport", "llm_dispatcher", "llm_batching", "near_dup", "dedup_blocking",
+]
+
+# 宽松上限:只防止回退到"导入即加载全部子系统",不做精确计时
+IMPORT_BUDGET_US = 1_500_000
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for d in ['layer1', 'layer2/active', 'layer2/archive', 'layer2/entities', 'layer2/index', 'state']:
+            (self.temp_dir / d).mkdir(parents=True)
+        os.environ["MEMORY_DIR"] = str(self.temp_dir)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        os.environ.pop("MEMORY_DIR", None)
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def run_importtime(args, memory_dir):
+    """以 -X importtime 运行 CLI,返回 (标准输出, {模块名: 累计导入微秒})"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    env["MEMORY_DIR"] = str(memory_dir)
+    env["MEMORY_NO_DAEMON"] = "1"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import memory; memory.main()", *args],
+        capture_output=True, text=True, env=env, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    imports = {}
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$", line)
+        if m:
+            imports[m.group(3)] = int(m.group(1))
+    return proc.stdout, imports
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_lazy_module():
+    """测试模块代理:首次取属性才导入,可用性检查不执行模块"""
+    print("\n📋 测试按需导入代理")
+
+    proxy = lazy_module("colorsys")
+    sys.modules.pop("colorsys", None)
+    before = proxy.loaded or "colorsys" in sys.modules
+    available = module_available("colorsys")
+    still_unloaded = "colorsys" not in sys.modules
+    value = proxy.rgb_to_hsv(1.0, 0.0, 0.0)
+
+    hooked = []
+    LazyModule("colorsys", on_load=lambda m: hooked.append(m.__name__)).ONE_THIRD
+
+    try:
+        lazy_module("memory_no_such_module").anything
+        missing_raises = False
+    except ImportError:
+        missing_raises = True
+
+    passed = (
+        not before
+        and available
+        and still_unloaded
+        and proxy.loaded
+        and value == (0.0, 1.0, 1.0)
+        and hooked == ["colorsys"]
+        and not module_available("memory_no_such_module")
+        and missing_raises
+        and memory.VECTOR_SEARCH_ENABLED == module_available("vector_embedding", "vector_index")
+    )
+    print_test("find_spec 判断可用性不导入;首次取属性导入并调用 on_load;缺失模块抛 ImportError", passed)
+
+    assert passed
+    return passed
+
+def test_hot_path_imports():
+    """测试 inject / add-pending 冷启动不加载重型子系统"""
+    print("\n📋 测试热路径导入")
+
+    with TestContext() as memory_dir:
+        _, pending_imports = run_importtime(["add-pending", "用户对花生过敏"], memory_dir)
+        output, inject_imports = run_importtime(["inject", "花生过敏"], memory_dir)
+
+    loaded = sorted(m for m in HEAVY_MODULES if m in pending_imports or m in inject_imports)
+    slowest = max(pending_imports.get("memory", 0), inject_imports.get("memory", 0))
+    passed = (
+        "花生过敏" in output
+        and "memory" in inject_imports
+        and not loaded
+        and slowest < IMPORT_BUDGET_US
+    )
+    print_test("add-pending / inject 不导入向量、HTTP、LLM、近重复模块", passed,
+               f"memory 累计导入 {slowest / 1000:.0f}ms, 意外加载: {loaded}")
+
+    assert passed
+    return passed
+
+def test_config_cache():
+    """测试配置按 mtime 缓存,文件变化与 save_config 后重新加载"""
+    print("\n📋 测试配置缓存")
+
+    with TestContext() as memory_dir:
+        default = memory.get_config()
+        config_path = memory_dir / "config.json"
+        config_path.write_text(json.dumps({"version": "1"}), encoding="utf-8")
+        first = memory.get_config()
+        again = memory.get_config()
+
+        time.sleep(0.01)
+        config_path.write_text(json.dumps({"version": "2", "extra": True}), encoding="utf-8")
+        edited = memory.get_config()
+
+        memory.save_config({"version": "3"})
+        saved = memory.get_config()
+
+    passed = (
+        default is memory.DEFAULT_CONFIG
+        and first == {"version": "1"}
+        and again is first
+        and edited == {"version": "2", "extra": True}
+        and saved == {"version": "3"}
+    )
+    print_test("未变化时复用解析结果;外部修改与 save_config 后读到新配置", passed, f"最终: {saved}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - CLI 冷启动测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("按需导入代理", test_lazy_module()))
+    results.append(("热路径导入", test_hot_path_imports()))
+    results.append(("配置缓存", test_config_cache()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 时间分区索引与时序查询测试
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from temporal_index import TemporalIndex
+from temporal_engine import TemporalQueryEngine, parse_time_expression
+import memory
+
+NOW = datetime(2026, 3, 18, 15, 30)  # 周三
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2/active').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def utc_iso(local_dt):
+    """本地时间 → 记录中使用的 UTC ISO 字符串"""
+    return local_dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def append_facts(memory_dir, records, mode='a'):
+    with open(memory_dir / 'layer2/active/facts.jsonl', mode, encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+def fact(mem_id, content, days_ago):
+    return {"id": mem_id, "content": content, "created": utc_iso(NOW - timedelta(days=days_ago)), "importance": 0.5}
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_parse_expressions():
+    """测试时间表达式解析"""
+    print("\n📋 测试时间表达式解析")
+
+    cases = [
+        ("昨天说了什么", datetime(2026, 3, 17), datetime(2026, 3, 18)),
+        ("前天的会议", datetime(2026, 3, 16), datetime(2026, 3, 17)),
+        ("上周做了什么", datetime(2026, 3, 9), datetime(2026, 3, 16)),
+        ("上个月的计划", datetime(2026, 2, 1), datetime(2026, 3, 1)),
+        ("三天前", datetime(2026, 3, 15), datetime(2026, 3, 16)),
+        ("最近7天", datetime(2026, 3, 11), NOW),
+        ("我之前说过", None, NOW),
+    ]
+
+    all_passed = True
+    for query, start, end in cases:
+        parsed = parse_time_expression(query, now=NOW)
+        passed = parsed is not None and parsed["start"] == start and parsed["end"] == end
+        all_passed = all_passed and passed
+        got = (parsed["start"], parsed["end"]) if parsed else None
+        print_test(f"'{query}'", passed, f"期望: {(start, end)}, 实际: {got}")
+
+    no_time = parse_time_expression("我对什么过敏", now=NOW) is None
+    print_test("无时间表达式返回 None", no_time)
+
+    assert all_passed and no_time
+    return all_passed and no_time
+
+def test_incremental_index():
+    """测试追加增量与改写重建"""
+    print("\n📋 测试增量索引")
+
+    with TestContext() as memory_dir:
+        append_facts(memory_dir, [fact("f1", "喝咖啡", 1), fact("f2", "开会", 5)])
+        index = TemporalIndex(memory_dir)
+        first = index.refresh()
+
+        # 乱序追加(较早的 created)
+        append_facts(memory_dir, [fact("f3", "看电影", 3)])
+        second = index.refresh()
+        ordered = [h[3] for h in index.range(None, None)]
+
+        # 改写文件(归档删除 f2)
+        append_facts(memory_dir, [fact("f1", "喝咖啡", 1), fact("f3", "看电影", 3)], mode='w')
+        index.refresh()
+        after_rewrite = [h[3] for h in index.range(None, None)]
+
+        passed = (first, second) == (2, 1) and ordered == ["f1", "f3", "f2"] and after_rewrite == ["f1", "f3"]
+        print_test("追加只解析尾部,改写后重建", passed, f"排序: {ordered}, 改写后: {after_rewrite}")
+
+        assert passed
+        return passed
+
+def test_range_and_load():
+    """测试 bisect 范围查询与按偏移读取"""
+    print("\n📋 测试范围查询")
+
+    with TestContext() as memory_dir:
+        append_facts(memory_dir, [fact(f"f{i}", f"第{i}天的记录", i) for i in range(10)])
+        index = TemporalIndex(memory_dir)
+        index.refresh()
+        index.save()
+
+        reloaded = TemporalIndex(memory_dir)
+        start = (NOW - timedelta(days=4, hours=1)).timestamp()
+        end = (NOW - timedelta(days=1, hours=1)).timestamp()
+        records = reloaded.load_records(reloaded.range(start, end))
+        ids = [r["id"] for r in records]
+
+        passed = reloaded.refresh() == 0 and ids == ["f2", "f3", "f4"] and records[0]["content"] == "第2天的记录"
+        print_test("持久化后直接查询,结果按时间倒序", passed, f"命中: {ids}")
+
+        assert passed
+        return passed
+
+def test_record_types():
+    """测试按偏移读取的记录按活跃池标注 type(summaries → summary)"""
+    print("\n📋 测试记录类型")
+
+    with TestContext() as memory_dir:
+        append_facts(memory_dir, [fact("f1", "事实", 1)])
+        with open(memory_dir / 'layer2/active/summaries.jsonl', 'w', encoding='utf-8') as f:
+            f.write(json.dumps(fact("s1", "摘要", 2), ensure_ascii=False) + '\n')
+        index = TemporalIndex(memory_dir)
+        index.refresh()
+        records = index.load_records(index.range((NOW - timedelta(days=3)).timestamp(), NOW.timestamp()))
+        types = {r["id"]: r["type"] for r in records}
+
+        passed = types == {"f1": "fact", "s1": "summary"}
+        print_test("摘要记录类型为 summary", passed, f"类型: {types}")
+
+        assert passed
+        return passed
+
+def test_temporal_search():
+    """测试时序检索的剩余词过滤"""
+    print("\n📋 测试时序检索")
+
+    with TestContext() as memory_dir:
+        append_facts(memory_dir, [
+            fact("f1", "昨天喝了拿铁咖啡", 1),
+            fact("f2", "昨天开了项目会", 1),
+            fact("f3", "上周喝了美式咖啡", 6),
+        ])
+        engine = TemporalQueryEngine(memory_dir, use_sqlite=False)
+        result = engine.temporal_search("昨天 咖啡", now=NOW)
+        ids = [r["id"] for r in result["results"]]
+        everything = [r["id"] for r in engine.temporal_search("昨天", now=NOW)["results"]]
+
+        passed = result["has_temporal"] and ids == ["f1"] and sorted(everything) == ["f1", "f2"]
+        print_test("范围内按剩余查询词过滤", passed, f"咖啡: {ids}, 全部: {everything}")
+
+        assert passed
+        return passed
+
+def test_router_merge():
+    """测试时序召回并入常规检索:开区间不召回,低覆盖记录不召回"""
+    print("\n📋 测试 Router 时序召回")
+
+    with TestContext() as memory_dir:
+        memory.init_store(memory_dir)
+        os.environ["MEMORY_DIR"] = str(memory_dir)
+        now = datetime.now()
+        records = [
+            {"id": "f1", "content": "昨天喝了拿铁咖啡", "days": 1},
+            {"id": "f2", "content": "昨天开了项目会", "days": 1},
+            {"id": "f3", "content": "上个季度喝过美式咖啡", "days": 100},
+        ]
+        append_facts(memory_dir, [
+            {"id": r["id"], "content": r["content"], "created": utc_iso(now - timedelta(days=r["days"])),
+             "importance": 0.5, "score": 0.5, "entities": []}
+            for r in records
+        ])
+        try:
+            bounded = memory.router_search("昨天 咖啡", memory_dir, use_qmd=False, use_vector=False)
+            open_ended = memory.router_search("我之前说过的咖啡", memory_dir, use_qmd=False, use_vector=False)
+            sparse = memory.router_search("今年 咖啡 项目 会议 安排 预算 出差", memory_dir, use_qmd=False,
+                                          use_vector=False)
+        finally:
+            os.environ.pop("MEMORY_DIR", None)
+
+        bounded_ids = [r["id"] for r in bounded["results"]]
+        open_ids = [r["id"] for r in open_ended["results"]]
+
+        passed = (
+            bounded["stats"]["temporal_hits"] == 1
+            and bounded["time_range"]["label"] == "昨天"
+            and bounded["trigger_type"] != "temporal"
+            and "f1" in bounded_ids
+            and open_ended["stats"]["temporal_hits"] == 0 and "time_range" not in open_ended
+            and "f3" in open_ids
+            and sparse["stats"]["temporal_hits"] == 0
+        )
+        print_test("有界范围的命中参与合并;'之前' 与只碰上个别词的记录不走时序召回", passed,
+                   f"昨天: {bounded_ids}, 之前: {open_ids}, 低覆盖: {sparse['stats']['temporal_hits']}")
+
+        assert passed
+        return passed
+
+def test_sqlite_range():
+    """测试 SQLite 后端的时间范围查询"""
+    print("\n📋 测试 SQLite 范围查询")
+
+    with TestContext() as memory_dir:
+        conn = sqlite3.connect(memory_dir / 'layer2/memories.db')
+        conn.execute("CREATE TABLE memories (id TEXT, type TEXT, content TEXT, created TEXT, state INTEGER)")
+        conn.execute("CREATE INDEX idx_memories_created ON memories(created DESC)")
+        for mem_id, days in [("s1", 1), ("s2", 2), ("s3", 8)]:
+            conn.execute("INSERT INTO memories VALUES (?, 'fact', ?, ?, 0)",
+                         (mem_id, f"记录 {mem_id}", utc_iso(NOW - timedelta(days=days))))
+        conn.commit()
+        conn.close()
+
+        engine = TemporalQueryEngine(memory_dir, use_sqlite=True)
+        ids = [r["id"] for r in engine.temporal_search("最近3天", now=NOW)["results"]]
+
+        passed = ids == ["s1", "s2"]
+        print_test("使用 created 索引查询", passed, f"命中: {ids}")
+
+        assert passed
+        return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 时间分区索引测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("时间表达式解析", test_parse_expressions()))
+    results.append(("增量索引", test_incremental_index()))
+    results.append(("范围查询", test_range_and_load()))
+    results.append(("记录类型", test_record_types()))
+    results.append(("时序检索", test_temporal_search()))
+    results.append(("Router 时序召回", test_router_merge()))
+    results.append(("SQLite 范围查询", test_sqlite_range()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
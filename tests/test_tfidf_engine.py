@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - TF-IDF 引擎与 RRF 合并测试
+"""
+
+import sys
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import tfidf_engine
+from tfidf_engine import TfidfIndex, build_tfidf_index, tfidf_search, rrf_merge
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / 'layer2/active').mkdir(parents=True)
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def write_facts(memory_dir, records):
+    with open(memory_dir / 'layer2/active/facts.jsonl', 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+FACTS = [
+    {"id": "f1", "content": "用户对花生过敏", "importance": 0.9},
+    {"id": "f2", "content": "用户喜欢喝拿铁咖啡", "importance": 0.6},
+    {"id": "f3", "content": "项目使用 Python 和 SQLite", "importance": 0.5},
+    {"id": "f4", "content": "用户每天早上喝咖啡", "importance": 0.4},
+]
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_search_ranking():
+    """测试稀疏点积检索排序"""
+    print("\n📋 测试 TF-IDF 检索")
+
+    with TestContext() as memory_dir:
+        write_facts(memory_dir, FACTS)
+        results = tfidf_search("拿铁咖啡", memory_dir, top_k=3)
+        ids = [r["id"] for r in results]
+
+        passed = (
+            ids[:2] == ["f2", "f4"]
+            and all(r["match_source"] == "tfidf" for r in results)
+            and results[0]["score"] > results[1]["score"]
+        )
+        print_test("包含稀有词的记录排在前面", passed, f"结果: {ids}")
+
+        assert passed
+        return passed
+
+def test_incremental_sync():
+    """测试增量增删与持久化"""
+    print("\n📋 测试增量同步")
+
+    with TestContext() as memory_dir:
+        write_facts(memory_dir, FACTS)
+        first = build_tfidf_index(memory_dir)
+
+        changed = [dict(FACTS[0], content="用户对海鲜过敏")] + FACTS[1:3]
+        write_facts(memory_dir, changed)
+        second = build_tfidf_index(memory_dir)
+
+        reloaded = TfidfIndex(memory_dir)
+        hits = [doc_id for doc_id, _ in reloaded.search("海鲜")]
+        stale = [doc_id for doc_id, _ in reloaded.search("花生")]
+
+        passed = (
+            first["added"] == 4
+            and (second["added"], second["removed"], second["unchanged"]) == (1, 1, 2)
+            and hits == ["f1"] and stale == []
+            and reloaded._df.get("咖啡") == 1
+        )
+        print_test("只重新切词变化的记录,DF 随之更新", passed, f"第二次: {second}, 海鲜: {hits}")
+
+        assert passed
+        return passed
+
+def test_search_syncs_on_write():
+    """测试活跃池变化后检索自动同步"""
+    print("\n📋 测试写入后自动同步")
+
+    with TestContext() as memory_dir:
+        write_facts(memory_dir, FACTS[:2])
+        before = [r["id"] for r in tfidf_search("SQLite", memory_dir)]
+        write_facts(memory_dir, FACTS)
+        after = [r["id"] for r in tfidf_search("SQLite", memory_dir)]
+
+        passed = before == [] and after == ["f3"]
+        print_test("文件签名变化时增量同步", passed, f"之前: {before}, 之后: {after}")
+
+        assert passed
+        return passed
+
+def test_summary_type():
+    """测试摘要命中标注为 summary 类型"""
+    print("\n📋 测试命中类型")
+
+    with TestContext() as memory_dir:
+        write_facts(memory_dir, FACTS[:1])
+        with open(memory_dir / 'layer2/active/summaries.jsonl', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"id": "s1", "content": "本周讨论了拿铁咖啡", "importance": 0.5},
+                               ensure_ascii=False) + '\n')
+        types = {r["id"]: r["type"] for r in tfidf_search("拿铁咖啡", memory_dir)}
+
+        passed = types == {"s1": "summary"}
+        print_test("summaries 中的记录类型为 summary", passed, f"类型: {types}")
+
+        assert passed
+        return passed
+
+def test_router_records():
+    """测试 Router 用缓存的活跃池装载命中,不再每次查询全量解析 JSONL"""
+    print("\n📋 测试 Router 命中装载")
+
+    import memory
+
+    with TestContext() as memory_dir:
+        write_facts(memory_dir, FACTS)
+        with open(memory_dir / 'layer2/active/beliefs.jsonl', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"id": "b1", "content": "用户可能每天都喝咖啡", "importance": 0.5,
+                                "entities": ["咖啡"]}, ensure_ascii=False) + '\n')
+
+        original = tfidf_engine._load_active_records
+        loads = []
+        tfidf_engine._load_active_records = lambda d: loads.append(d) or original(d)
+        try:
+            config = {"initial": 5}
+            first = memory._run_retrievers("喝咖啡", memory_dir, config, use_qmd=False, use_vector=False,
+                                           include_pending=False, plan={"tfidf": 5})["tfidf"]
+            first[0]["entities"].append("改动")
+            second = memory._run_retrievers("喝咖啡", memory_dir, config, use_qmd=False, use_vector=False,
+                                            include_pending=False, plan={"tfidf": 5})["tfidf"]
+        finally:
+            tfidf_engine._load_active_records = original
+        cached = memory._active_memory_maps(memory_dir)[1]["b1"]
+
+    types = {r["id"]: r["type"] for r in second}
+    passed = (
+        not loads
+        and types.get("b1") == "belief" and types.get("f4") == "fact"
+        and cached["entities"] == ["咖啡"] and "type" not in cached
+    )
+    print_test("同步与装载都走缓存映射;结果带类型,修改结果不影响缓存", passed,
+               f"全量解析次数: {len(loads)}, 类型: {types}")
+
+    assert passed
+    return passed
+
+def test_rrf_merge():
+    """测试 RRF 按 id 合并且不复制记录"""
+    print("\n📋 测试 RRF 合并")
+
+    a = [{"id": "x"}, {"id": "y"}, {"id": "z"}]
+    b = [{"id": "y"}, {"id": "w"}]
+    merged = rrf_merge([a, b], k=60, top_n=3)
+    ids = [r["id"] for r in merged]
+    id_only = rrf_merge([["x", "y"], ["y"]], k=60)
+
+    passed = (
+        ids == ["y", "x", "w"]
+        and merged[0] is a[1]
+        and merged[0]["rrf_score"] > merged[1]["rrf_score"]
+        and id_only == ["y", "x"]
+    )
+    print_test("两路都命中的排第一,返回原对象", passed, f"结果: {ids}, id 列表: {id_only}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - TF-IDF 引擎测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("TF-IDF 检索", test_search_ranking()))
+    results.append(("增量同步", test_incremental_sync()))
+    results.append(("写入后自动同步", test_search_syncs_on_write()))
+    results.append(("命中类型", test_summary_type()))
+    results.append(("Router 命中装载", test_router_records()))
+    results.append(("RRF 合并", test_rrf_merge()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 离线哈希嵌入测试
+"""
+
+import sys
+import math
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from vector_embedding import HashingEmbeddingEngine, get_embedding_engine
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_shape_and_norm():
+    """测试维度与归一化"""
+    print("\n📋 测试维度与归一化")
+
+    engine = HashingEmbeddingEngine(dimension=128)
+    vec = engine.embed("我对花生过敏")
+    norm = math.sqrt(sum(v * v for v in vec))
+
+    passed = len(vec) == 128 and abs(norm - 1.0) < 1e-9 and engine.embed("   ") is None
+    print_test("固定维度、单位长度、空文本返回 None", passed, f"维度: {len(vec)}, 范数: {norm:.6f}")
+
+    assert passed
+    return passed
+
+def test_deterministic_batch():
+    """测试确定性与批量一致"""
+    print("\n📋 测试确定性")
+
+    texts = ["我对花生过敏", "Memory System uses SQLite", "明天去北京开会"]
+    batch = HashingEmbeddingEngine(dimension=64).embed_batch(texts)
+    single = [HashingEmbeddingEngine(dimension=64).embed(t) for t in texts]
+
+    passed = batch == single
+    print_test("跨实例结果一致,批量与逐条一致", passed)
+
+    assert passed
+    return passed
+
+def test_similarity_ordering():
+    """测试相似文本得分更高"""
+    print("\n📋 测试相似度排序")
+
+    all_passed = True
+    for nnz in (1, 4):
+        engine = HashingEmbeddingEngine(dimension=256, projection_nnz=nnz)
+        query = engine.embed("花生过敏")
+        near = cosine(query, engine.embed("Ktao 对花生过敏,吃了会呼吸困难"))
+        far = cosine(query, engine.embed("明天下午去北京开项目评审会"))
+        passed = near > far
+        all_passed = all_passed and passed
+        print_test(f"projection_nnz={nnz}", passed, f"相关: {near:.3f}, 无关: {far:.3f}")
+
+    assert all_passed
+    return all_passed
+
+def test_factory_cache():
+    """测试工厂缓存与模型名"""
+    print("\n📋 测试工厂")
+
+    a = get_embedding_engine("hashing", dimension=96)
+    b = get_embedding_engine("hashing", dimension=96)
+    c = get_embedding_engine("hashing", dimension=96, projection_nnz=2)
+
+    passed = a is b and a is not c and a.model != c.model and a.dimension == 96
+    print_test("相同参数复用实例,参数不同模型名不同", passed, f"{a.model} / {c.model}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 离线哈希嵌入测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("维度与归一化", test_shape_and_norm()))
+    results.append(("确定性", test_deterministic_batch()))
+    results.append(("相似度排序", test_similarity_ordering()))
+    results.append(("工厂", test_factory_cache()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
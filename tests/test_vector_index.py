@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Memory System v1.7.0 - 本地向量索引测试
+"""
+
+import sys
+import tempfile
+import shutil
+from pathlib import Path
+
+# 添加当前目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from vector_index import NUMPY_AVAILABLE, VectorIndexManager
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# ============================================================
+# 测试辅助
+# ============================================================
+
+class TestContext:
+    """测试上下文管理器"""
+    def __init__(self):
+        self.temp_dir = None
+
+    def __enter__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        return self.temp_dir
+
+    def __exit__(self, *args):
+        if self.temp_dir and self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+
+def print_test(name, passed, details=""):
+    """打印测试结果"""
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {name}")
+    if details:
+        print(f"       {details}")
+
+class CharEngine:
+    """按字符计数的极简嵌入(仅测试用)"""
+    dimension = 32
+    model = "char-test"
+
+    def embed_batch(self, texts):
+        vectors = []
+        for text in texts:
+            vec = [0.0] * self.dimension
+            for ch in text:
+                vec[ord(ch) % self.dimension] += 1.0
+            vectors.append(vec)
+        return vectors
+
+# ============================================================
+# 测试用例
+# ============================================================
+
+def test_exact_search():
+    """测试精确检索"""
+    print("\n📋 测试精确检索")
+    if not NUMPY_AVAILABLE:
+        print_test("跳过(未安装 numpy)", True)
+        return True
+
+    with TestContext() as memory_dir:
+        index = VectorIndexManager(memory_dir, dimension=3)
+        index.add(["a", "b", "c"], [[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0]])
+        hits = index.search([1, 0, 0], top_k=2)
+        ids = [mem_id for mem_id, _ in hits]
+
+        passed = ids == ["a", "c"] and abs(hits[0][1] - 1.0) < 1e-5
+        print_test("余弦相似度排序", passed, f"结果: {hits}")
+
+        assert passed
+        return passed
+
+def test_remove_and_reuse():
+    """测试删除后行号复用"""
+    print("\n📋 测试增量删除")
+    if not NUMPY_AVAILABLE:
+        print_test("跳过(未安装 numpy)", True)
+        return True
+
+    with TestContext() as memory_dir:
+        index = VectorIndexManager(memory_dir, dimension=3)
+        index.add(["a", "b"], [[1, 0, 0], [0, 1, 0]])
+        index.remove(["a"])
+        not_found = all(mem_id != "a" for mem_id, _ in index.search([1, 0, 0], top_k=5))
+        index.add(["d"], [[0, 0, 1]])
+
+        stats = index.get_stats()
+        passed = not_found and len(index) == 2 and stats["free_rows"] == 0
+        print_test("删除的向量不再命中,空闲行被复用", passed, f"统计: {stats}")
+
+        assert passed
+        return passed
+
+def test_persist_reload():
+    """测试持久化后通过内存映射重新加载"""
+    print("\n📋 测试持久化")
+    if not NUMPY_AVAILABLE:
+        print_test("跳过(未安装 numpy)", True)
+        return True
+
+    with TestContext() as memory_dir:
+        index = VectorIndexManager(memory_dir, dimension=3)
+        index.add(["a", "b"], [[1, 0, 0], [0, 1, 0]])
+        index.save()
+
+        reloaded = VectorIndexManager(memory_dir)
+        hits = reloaded.search([0, 1, 0], top_k=1)
+        mismatched = VectorIndexManager(memory_dir, dimension=4)
+
+        passed = hits[0][0] == "b" and reloaded.dimension == 3 and mismatched.search([0, 1, 0, 0]) == []
+        print_test("重新加载可检索,维度不符时不返回结果", passed, f"结果: {hits}")
+
+        assert passed
+        return passed
+
+def test_sync_incremental():
+    """测试 sync 只嵌入新增/变化的记录"""
+    print("\n📋 测试增量同步")
+    if not NUMPY_AVAILABLE:
+        print_test("跳过(未安装 numpy)", True)
+        return True
+
+    with TestContext() as memory_dir:
+        engine = CharEngine()
+        index = VectorIndexManager(memory_dir)
+        records = [
+            {"id": "f1", "content": "我对花生过敏"},
+            {"id": "f2", "content": "明天去北京开会"},
+        ]
+        first = index.sync(records, engine)
+
+        records = [{"id": "f1", "content": "我对花生过敏"}, {"id": "f3", "content": "喜欢喝咖啡"}]
+        second = index.sync(records, engine)
+
+        passed = (
+            first["indexed"] == 2
+            and (second["indexed"], second["skipped"], second["removed"]) == (1, 1, 1)
+            and "f2" not in index
+        )
+        print_test("未变记录跳过,删除记录移除", passed, f"首次: {first}, 第二次: {second}")
+
+        assert passed
+        return passed
+
+def test_ivf_recall():
+    """测试 IVF 近似检索召回率"""
+    print("\n📋 测试 IVF 召回率")
+    if not NUMPY_AVAILABLE:
+        print_test("跳过(未安装 numpy)", True)
+        return True
+
+    with TestContext() as memory_dir:
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 16))
+        data = centers[rng.integers(0, 20, size=2000)] + 0.3 * rng.standard_normal((2000, 16))
+        index = VectorIndexManager(memory_dir, dimension=16, ivf_threshold=1000, nprobe=8)
+        index.add([f"m{i}" for i in range(2000)], data)
+        trained = index.maybe_train()
+
+        queries = data[:50]
+        overlap = 0
+        for q in queries:
+            exact = {mem_id for mem_id, _ in index.search(q, top_k=10, exact=True)}
+            approx = {mem_id for mem_id, _ in index.search(q, top_k=10)}
+            overlap += len(exact & approx)
+        recall = overlap / (10 * len(queries))
+
+        passed = trained and recall >= 0.9
+        print_test("IVF recall@10 ≥ 0.9", passed, f"recall: {recall:.3f}")
+
+        assert passed
+        return passed
+
+def test_router_hydration():
+    """测试 _vector_search 按 id 从缓存的活跃池取记录,不再每次全量解析 JSONL"""
+    print("\n📋 测试命中记录装载")
+
+    import json
+    import memory
+
+    with TestContext() as memory_dir:
+        (memory_dir / 'layer2/active').mkdir(parents=True)
+        for mem_type, prefix in (("facts", "f"), ("beliefs", "b"), ("summaries", "s")):
+            with open(memory_dir / f'layer2/active/{mem_type}.jsonl', 'w', encoding='utf-8') as f:
+                for i in range(50):
+                    f.write(json.dumps({"id": f"{prefix}_{i}", "content": f"{mem_type} {i}", "importance": 0.5,
+                                        "entities": ["x"]}, ensure_ascii=False) + '\n')
+
+        originals = (memory.get_config, memory._vector_hits, memory.load_jsonl)
+        parsed = []
+        memory.get_config = lambda: {"vector": {"enabled": True}}
+        memory._vector_hits = lambda query, memory_dir, config, limit: [("b_3", 0.9), ("f_7", 0.8), ("gone", 0.7)]
+        memory.load_jsonl = lambda path: parsed.append(path.name) or originals[2](path)
+        try:
+            first = memory._vector_search("q", memory_dir)
+            warm = len(parsed)
+            second = memory._vector_search("q", memory_dir)
+        finally:
+            memory.get_config, memory._vector_hits, memory.load_jsonl = originals
+        same = second == first
+        second[0]["entities"].append("y")
+        third_entities = memory._active_memory_maps(memory_dir)[1]["b_3"]["entities"]
+
+    passed = (
+        [(r["id"], r["type"]) for r in first] == [("b_3", "belief"), ("f_7", "fact")]
+        and same
+        and len(parsed) == warm
+        and third_entities == ["x"]
+    )
+    print_test("第二次检索不解析任何 JSONL;结果带类型,修改结果不影响缓存", passed,
+               f"首次解析 {warm} 个文件, 第二次 {len(parsed) - warm} 个")
+
+    assert passed
+    return passed
+
+def test_build_invalidates_cache():
+    """测试 vector-build 重建索引并启用向量检索后递增存储代数,旧查询缓存失效"""
+    print("\n📋 测试重建后缓存失效")
+
+    import io
+    import json
+    import argparse
+    import contextlib
+    import memory
+    from cache_manager import read_generation
+
+    with TestContext() as memory_dir:
+        (memory_dir / 'layer2/active').mkdir(parents=True)
+        with open(memory_dir / 'layer2/active/facts.jsonl', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"id": "f_1", "content": "用户住在上海", "importance": 0.5}, ensure_ascii=False) + '\n')
+
+        original = memory.get_memory_dir
+        memory.get_memory_dir = lambda: memory_dir
+        try:
+            before = read_generation(memory_dir)
+            args = argparse.Namespace(provider="hashing", model=None, batch_size=100)
+            with contextlib.redirect_stdout(io.StringIO()):
+                memory.cmd_vector_build(args)
+            after = read_generation(memory_dir)
+            enabled = memory.get_config().get("vector", {}).get("enabled")
+        finally:
+            memory.get_memory_dir = original
+
+    passed = after > before and enabled is True
+    print_test("重建并启用向量检索后存储代数递增", passed, f"代数 {before} -> {after}, enabled={enabled}")
+
+    assert passed
+    return passed
+
+def test_cli_type_filter():
+    """测试 vector-search --type summary 能命中摘要(活跃池文件名 summaries → type summary)"""
+    print("\n📋 测试按类型过滤")
+
+    import io
+    import json
+    import argparse
+    import contextlib
+    import memory
+    import vector_index
+
+    with TestContext() as memory_dir:
+        (memory_dir / 'layer2/active').mkdir(parents=True)
+        for mem_type, prefix in (("facts", "f"), ("summaries", "s")):
+            with open(memory_dir / f'layer2/active/{mem_type}.jsonl', 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"id": f"{prefix}_1", "content": "用户住在上海浦东", "importance": 0.5},
+                                   ensure_ascii=False) + '\n')
+
+        original = memory.get_memory_dir
+        memory.get_memory_dir = lambda: memory_dir
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                memory.cmd_vector_build(argparse.Namespace(provider="hashing", model=None, batch_size=100))
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                memory.cmd_vector_search(argparse.Namespace(query="用户住在上海浦东", top_k=5, type="summary", json=True))
+            ids = [r["id"] for r in json.loads(out.getvalue())["results"]]
+            types = {r["id"]: r["type"] for r in vector_index.load_active_records(memory_dir)}
+        finally:
+            memory.get_memory_dir = original
+
+    passed = ids == ["s_1"] and types == {"f_1": "fact", "s_1": "summary"}
+    print_test("--type summary 只返回摘要", passed, f"结果: {ids}, 类型: {types}")
+
+    assert passed
+    return passed
+
+# ============================================================
+# 主函数
+# ============================================================
+
+def main():
+    print("=" * 60)
+    print("Memory System v1.7.0 - 本地向量索引测试")
+    print("=" * 60)
+
+    results = []
+    results.append(("精确检索", test_exact_search()))
+    results.append(("增量删除", test_remove_and_reuse()))
+    results.append(("持久化", test_persist_reload()))
+    results.append(("增量同步", test_sync_incremental()))
+    results.append(("IVF 召回率", test_ivf_recall()))
+    results.append(("命中记录装载", test_router_hydration()))
+    results.append(("重建后缓存失效", test_build_invalidates_cache()))
+    results.append(("按类型过滤", test_cli_type_filter()))
+
+    passed_count = sum(1 for _, passed in results if passed)
+    print(f"\n总计: {passed_count}/{len(results)} 通过")
+    return 0 if passed_count == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())